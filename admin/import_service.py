@@ -1,30 +1,85 @@
 """
 Bulk Data Import Service for DeciFrame
 Handles CSV/Excel file processing and data import
+
+Imports stream the file in chunks: each chunk resolves its user/department references with
+one prefetched lookup per table, is inserted with a single executemany INSERT and committed
+together with the job's progress. Rows that fail validation or insertion are recorded on the
+ImportJob without discarding the rest of their chunk. Jobs run on a background worker so the
+upload request returns immediately.
+
+A running job refreshes heartbeat_at with every chunk. If the process dies mid-import the job
+would stay 'Importing' forever, so at startup jobs whose heartbeat is older than
+IMPORT_STALE_SECONDS are marked Failed (the uploaded file is gone, so they cannot be resumed;
+rows from committed chunks remain imported).
 """
 
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import pandas as pd
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Iterator, Optional
+from flask import current_app
+from sqlalchemy import insert, func
+from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.datastructures import FileStorage
 
 from app import db
-from models import ImportJob, Problem, BusinessCase, Project, User, Department
+from models import (ImportJob, Problem, BusinessCase, Project, User, Department,
+                    StatusEnum, PriorityEnum, ImpactEnum, UrgencyEnum, CaseTypeEnum)
+from services.code_sequences import code_allocator, code_number
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', '1000'))
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', '1'))
+MAX_ERROR_DETAILS = int(os.getenv('IMPORT_MAX_ERROR_DETAILS', '1000'))
+IMPORT_STALE_SECONDS = int(os.getenv('IMPORT_STALE_SECONDS', '900'))
+
+# Free-text status values seen in uploaded files
+STATUS_ALIASES = {
+    'open': StatusEnum.Open,
+    'planning': StatusEnum.Open,
+    'in progress': StatusEnum.InProgress,
+    'in_progress': StatusEnum.InProgress,
+    'inprogress': StatusEnum.InProgress,
+    'investigating': StatusEnum.InProgress,
+    'active': StatusEnum.InProgress,
+    'on hold': StatusEnum.OnHold,
+    'on_hold': StatusEnum.OnHold,
+    'onhold': StatusEnum.OnHold,
+    'resolved': StatusEnum.Resolved,
+    'closed': StatusEnum.Resolved,
+    'completed': StatusEnum.Resolved,
+    'cancelled': StatusEnum.Resolved,
+    'approved': StatusEnum.Approved,
+    'rejected': StatusEnum.Rejected,
+    'submitted': StatusEnum.Submitted
+}
+
+LEVEL_ALIASES = {'low': 'Low', 'medium': 'Medium', 'high': 'High', 'critical': 'High', 'urgent': 'High'}
+
+
+class ImportRowError(ValueError):
+    """A row that cannot be imported; the message is shown on the import results page"""
 
 
 class ImportService:
     """Service for handling bulk data imports"""
-    
+
     # Define required and optional fields for each data type
     FIELD_MAPPINGS = {
         'Problem': {
             'required': ['title', 'description'],
-            'optional': ['priority', 'reporter_email', 'department_name', 'status', 'impact', 'urgency'],
+            'optional': ['code', 'priority', 'reporter_email', 'department_name', 'status', 'impact', 'urgency'],
             'model_fields': {
+                'code': 'code',                       # Existing code (e.g. P0042); allocated if empty
                 'title': 'title',
-                'description': 'description', 
+                'description': 'description',
                 'priority': 'priority',
-                'reporter_email': 'reporter_id',  # Will lookup user by email
-                'department_name': 'dept_id',     # Will lookup department by name
+                'reporter_email': 'reported_by',      # Will lookup user by email
+                'department_name': 'department_id',   # Will lookup department by name
                 'status': 'status',
                 'impact': 'impact',
                 'urgency': 'urgency'
@@ -32,79 +87,84 @@ class ImportService:
         },
         'BusinessCase': {
             'required': ['title', 'summary'],
-            'optional': ['case_type', 'cost_estimate', 'benefit_estimate', 'submitter_email', 'department_name', 'status'],
+            'optional': ['code', 'case_type', 'cost_estimate', 'benefit_estimate', 'submitter_email', 'department_name', 'status'],
             'model_fields': {
+                'code': 'code',
                 'title': 'title',
-                'summary': 'summary',
+                'summary': 'description',
                 'case_type': 'case_type',
                 'cost_estimate': 'cost_estimate',
                 'benefit_estimate': 'benefit_estimate',
-                'submitter_email': 'submitter_id',  # Will lookup user by email
+                'submitter_email': 'submitted_by',  # Will lookup user by email
                 'department_name': 'dept_id',       # Will lookup department by name
                 'status': 'status'
             }
         },
         'Project': {
             'required': ['name', 'description'],
-            'optional': ['project_manager_email', 'department_name', 'status', 'budget', 'start_date', 'target_end_date'],
+            'optional': ['code', 'project_manager_email', 'department_name', 'status', 'budget', 'start_date', 'target_end_date'],
             'model_fields': {
+                'code': 'code',
                 'name': 'name',
                 'description': 'description',
                 'project_manager_email': 'project_manager_id',  # Will lookup user by email
-                'department_name': 'dept_id',                   # Will lookup department by name
+                'department_name': 'department_id',             # Will lookup department by name
                 'status': 'status',
                 'budget': 'budget',
                 'start_date': 'start_date',
-                'target_end_date': 'target_end_date'
+                'target_end_date': 'end_date',
+                'end_date': 'end_date'
             }
         }
     }
-    
+
+    MODELS = {'Problem': Problem, 'BusinessCase': BusinessCase, 'Project': Project}
+
     @staticmethod
     def validate_file(file: FileStorage) -> Tuple[bool, str]:
         """Validate uploaded file format and size"""
         if not file or not file.filename:
             return False, "No file selected"
-        
+
         allowed_extensions = {'.csv', '.xlsx', '.xls'}
         file_ext = '.' + file.filename.rsplit('.', 1)[-1].lower()
-        
+
         if file_ext not in allowed_extensions:
             return False, f"Unsupported file format. Allowed: {', '.join(allowed_extensions)}"
-        
+
         # Check file size (max 10MB)
         file.seek(0, 2)  # Seek to end
         size = file.tell()
         file.seek(0)     # Reset to beginning
-        
+
         if size > 10 * 1024 * 1024:  # 10MB
             return False, "File size exceeds 10MB limit"
-        
+
         return True, "File validation passed"
-    
+
     @staticmethod
     def read_file_preview(file: FileStorage, max_rows: int = 10) -> Tuple[bool, Any]:
         """Read file and return preview data"""
         try:
             file_ext = '.' + file.filename.rsplit('.', 1)[-1].lower()
-            
+
             if file_ext == '.csv':
                 df = pd.read_csv(file, nrows=max_rows)
             else:  # Excel files
                 df = pd.read_excel(file, nrows=max_rows)
-            
+
             file.seek(0)  # Reset file pointer
-            
+
             return True, {
                 'columns': df.columns.tolist(),
                 'preview_data': df.to_dict('records'),
                 'total_rows': len(df)
             }
-        
+
         except Exception as e:
             file.seek(0)  # Reset file pointer
             return False, f"Error reading file: {str(e)}"
-    
+
     @staticmethod
     def create_import_job(user_id: int, data_type: str, filename: str) -> ImportJob:
         """Create new import job record"""
@@ -117,7 +177,7 @@ class ImportService:
         db.session.add(job)
         db.session.commit()
         return job
-    
+
     @staticmethod
     def save_column_mapping(job_id: int, mapping: Dict[str, str]) -> bool:
         """Save column mapping configuration"""
@@ -125,117 +185,214 @@ class ImportService:
             job = ImportJob.query.get(job_id)
             if not job:
                 return False
-            
+
             job.mapping = mapping
             job.status = 'Mapping'
             db.session.commit()
             return True
-        
+
         except Exception:
             db.session.rollback()
             return False
-    
+
+    @staticmethod
+    def start_import(job_id: int, file_path: str, include_rows: Optional[set] = None,
+                     remove_file: bool = True):
+        """
+        Queue an import on the background worker and return immediately
+
+        Progress is written to the ImportJob after every chunk, so callers poll the job.
+        """
+        job = ImportJob.query.get(job_id)
+        if not job or not job.mapping:
+            return False, "Invalid job or missing mapping"
+
+        job.status = 'Importing'
+        job.rows_success = 0
+        job.rows_failed = 0
+        job.error_details = []
+        job.heartbeat_at = datetime.utcnow()
+        db.session.commit()
+
+        import_worker.submit(current_app._get_current_object(), job_id, file_path,
+                             include_rows=include_rows, remove_file=remove_file)
+        return True, "Import started"
+
     @staticmethod
-    def process_import(job_id: int, file_data: Any) -> Tuple[bool, str]:
-        """Process the actual data import"""
+    def process_import(job_id: int, file_data: Any, include_rows: Optional[set] = None,
+                       chunksize: int = IMPORT_CHUNK_SIZE) -> Tuple[bool, str]:
+        """
+        Stream the file into the database chunk by chunk
+
+        Args:
+            job_id: ImportJob to run (its mapping must be saved)
+            file_data: Path or file object of the uploaded CSV/Excel file
+            include_rows: 0-based row indexes selected for import (all rows if empty)
+            chunksize: Rows per chunk (one INSERT and one commit per chunk)
+        """
         job = ImportJob.query.get(job_id)
         if not job or not job.mapping:
             return False, "Invalid job or missing mapping"
-        
+
         try:
+            user = User.query.get(job.user_id)
+            context = _ImportContext(job, user)
+
             job.status = 'Importing'
+            job.rows_success = 0
+            job.rows_failed = 0
+            job.error_details = []
+            job.heartbeat_at = datetime.utcnow()
             db.session.commit()
-            
-            # Read full file
-            file_ext = '.' + job.filename.rsplit('.', 1)[-1].lower()
-            if file_ext == '.csv':
-                df = pd.read_csv(file_data)
-            else:
-                df = pd.read_excel(file_data)
-            
+
+            errors = []
             success_count = 0
             error_count = 0
-            errors = []
-            
-            # Process each row
-            for index, row in df.iterrows():
-                try:
-                    if ImportService._import_single_row(job.data_type, job.mapping, row, index + 1):
-                        success_count += 1
-                    else:
-                        error_count += 1
-                        errors.append({
-                            'row': index + 1,
-                            'error': 'Failed to create record'
-                        })
-                
-                except Exception as e:
-                    error_count += 1
-                    errors.append({
-                        'row': index + 1,
-                        'error': str(e)
-                    })
-            
-            # Update job status
-            job.rows_success = success_count
-            job.rows_failed = error_count
-            job.error_details = errors
+
+            for chunk in ImportService._iter_chunks(file_data, job.filename, chunksize):
+                inserted, chunk_errors = ImportService._import_chunk(context, chunk, include_rows)
+                success_count += inserted
+                error_count += len(chunk_errors)
+                errors.extend(chunk_errors[:max(0, MAX_ERROR_DETAILS - len(errors))])
+
+                # Progress is committed in the same transaction as the chunk's rows
+                job.rows_success = success_count
+                job.rows_failed = error_count
+                job.error_details = list(errors)
+                job.heartbeat_at = datetime.utcnow()
+                db.session.commit()
+                logger.info(f"📥 Import job {job.id}: {success_count} imported, {error_count} failed")
+
             job.status = 'Complete' if error_count == 0 else 'Failed'
             db.session.commit()
-            
+
+            if success_count and context.organization_id:
+                ImportService._invalidate_caches(context.organization_id)
+
             return True, f"Import completed: {success_count} success, {error_count} failed"
-        
+
         except Exception as e:
+            db.session.rollback()
+            job = ImportJob.query.get(job_id)
             job.status = 'Failed'
-            job.error_details = [{'error': f"Import failed: {str(e)}"}]
+            job.error_details = (job.error_details or []) + [{'error': f"Import failed: {str(e)}"}]
             db.session.commit()
             return False, f"Import failed: {str(e)}"
-    
+
     @staticmethod
-    def _import_single_row(data_type: str, mapping: Dict[str, str], row: pd.Series, row_number: int) -> bool:
-        """Import a single row of data"""
-        try:
-            # Prepare data based on mapping
-            data = {}
-            field_config = ImportService.FIELD_MAPPINGS[data_type]['model_fields']
-            
-            for csv_field, model_field in mapping.items():
-                if csv_field in row and pd.notna(row[csv_field]):
-                    value = row[csv_field]
-                    
-                    # Handle special field mappings
-                    if model_field.endswith('_id') and model_field != 'id':
-                        # Lookup foreign key relationships
-                        if 'email' in csv_field:
-                            user = User.query.filter_by(email=value).first()
-                            if user:
-                                data[model_field] = user.id
-                        elif 'department_name' in csv_field:
-                            dept = Department.query.filter_by(name=value).first()
-                            if dept:
-                                data[model_field] = dept.id
-                    else:
-                        # Direct field mapping
-                        data[model_field] = value
-            
-            # Create record based on data type
-            if data_type == 'Problem':
-                record = Problem(**data)
-            elif data_type == 'BusinessCase':
-                record = BusinessCase(**data)
-            elif data_type == 'Project':
-                record = Project(**data)
-            else:
-                return False
-            
-            db.session.add(record)
+    def fail_stale_imports(stale_seconds: int = IMPORT_STALE_SECONDS) -> int:
+        """
+        Mark 'Importing' jobs whose worker stopped (no heartbeat for stale_seconds) as Failed
+
+        Jobs still running in another worker or node keep refreshing their heartbeat and are left
+        alone. Returns the number of jobs marked Failed.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+        stale = ImportJob.query.filter(
+            ImportJob.status == 'Importing',
+            func.coalesce(ImportJob.heartbeat_at, ImportJob.created_at) < cutoff
+        ).all()
+        for job in stale:
+            job.status = 'Failed'
+            job.error_details = (job.error_details or []) + [{
+                'error': f"Import interrupted after {job.rows_success or 0} rows: the worker stopped. "
+                         f"Upload the file again to import the remaining rows."
+            }]
+        if stale:
             db.session.commit()
-            return True
-        
-        except Exception:
-            db.session.rollback()
-            return False
-    
+            logger.warning(f"⚠️ Marked {len(stale)} interrupted import job(s) as Failed")
+        return len(stale)
+
+    @staticmethod
+    def _iter_chunks(file_data: Any, filename: str, chunksize: int) -> Iterator[pd.DataFrame]:
+        """Yield the file as DataFrames of at most chunksize rows, indexed by 0-based data row"""
+        file_ext = '.' + filename.rsplit('.', 1)[-1].lower()
+
+        if file_ext == '.csv':
+            yield from pd.read_csv(file_data, chunksize=chunksize, dtype=str)
+            return
+
+        if file_ext == '.xlsx':
+            # openpyxl's read-only mode streams rows instead of loading the whole workbook
+            from openpyxl import load_workbook
+            workbook = load_workbook(file_data, read_only=True, data_only=True)
+            try:
+                rows = workbook.active.iter_rows(values_only=True)
+                header = [str(c) if c is not None else f'Unnamed: {i}' for i, c in enumerate(next(rows, ()))]
+                start, batch = 0, []
+                for values in rows:
+                    batch.append(values)
+                    if len(batch) == chunksize:
+                        yield pd.DataFrame(batch, columns=header, index=range(start, start + len(batch)))
+                        start, batch = start + len(batch), []
+                if batch:
+                    yield pd.DataFrame(batch, columns=header, index=range(start, start + len(batch)))
+            finally:
+                workbook.close()
+            return
+
+        # Legacy .xls has no streaming reader
+        df = pd.read_excel(file_data)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+
+    @staticmethod
+    def _import_chunk(context: '_ImportContext', chunk: pd.DataFrame,
+                      include_rows: Optional[set]) -> Tuple[int, List[Dict[str, Any]]]:
+        """Validate, resolve and insert one chunk; returns (rows inserted, row errors)"""
+        errors = []
+        rows = []
+        row_numbers = []
+        lookups = context.prefetch(chunk)
+
+        for index, row in zip(chunk.index, chunk.to_dict('records')):
+            row_number = int(index) + 2  # Spreadsheet row: 1-based plus the header line
+            if include_rows and index not in include_rows:
+                errors.append({'row': row_number, 'error': 'Skipped duplicate', 'type': 'duplicate_skipped'})
+                continue
+            try:
+                rows.append(context.build_record(row, lookups))
+                row_numbers.append(row_number)
+            except ImportRowError as e:
+                errors.append({'row': row_number, 'error': str(e)})
+
+        if not rows:
+            return 0, errors
+
+        context.assign_codes(rows)
+        table = context.model.__table__
+
+        # executemany needs the same keys in every parameter set
+        keys = set().union(*rows)
+        rows = [{key: row.get(key) for key in keys} for row in rows]
+
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table), rows)
+            return len(rows), errors
+        except SQLAlchemyError:
+            logger.warning(f"Bulk insert failed for import job {context.job_id}; retrying chunk row by row")
+
+        # Isolate the failing rows so the rest of the chunk is still imported
+        inserted = 0
+        for row_number, record in zip(row_numbers, rows):
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(table), [record])
+                inserted += 1
+            except SQLAlchemyError as e:
+                errors.append({'row': row_number, 'error': str(getattr(e, 'orig', e)).split('\n')[0]})
+        return inserted, errors
+
+    @staticmethod
+    def _invalidate_caches(organization_id: int):
+        """Bulk inserts bypass ORM events, so invalidate the executive metrics cache explicitly"""
+        try:
+            from metrics.service import invalidate_metrics
+            invalidate_metrics(organization_id)
+        except Exception as e:
+            logger.warning(f"Could not invalidate metrics cache after import: {e}")
+
     @staticmethod
     def get_import_jobs(user_id: int = None) -> List[ImportJob]:
         """Get import jobs, optionally filtered by user"""
@@ -243,7 +400,7 @@ class ImportService:
         if user_id:
             query = query.filter_by(user_id=user_id)
         return query.order_by(ImportJob.created_at.desc()).all()
-    
+
     @staticmethod
     def get_field_requirements(data_type: str) -> Dict[str, List[str]]:
         """Get required and optional fields for a data type"""
@@ -252,4 +409,205 @@ class ImportService:
                 'required': ImportService.FIELD_MAPPINGS[data_type]['required'],
                 'optional': ImportService.FIELD_MAPPINGS[data_type]['optional']
             }
-        return {'required': [], 'optional': []}
\ No newline at end of file
+        return {'required': [], 'optional': []}
+
+
+class _ImportContext:
+    """Per-job state: target model, importing user, defaults and per-chunk lookups"""
+
+    def __init__(self, job: ImportJob, user: User):
+        if user is None:
+            raise ValueError("Import job user not found")
+
+        self.job_id = job.id
+        self.data_type = job.data_type
+        self.model = ImportService.MODELS[job.data_type]
+        self.user_id = user.id
+        self.organization_id = user.organization_id
+        self.now = datetime.utcnow()
+
+        model_fields = ImportService.FIELD_MAPPINGS[job.data_type]['model_fields']
+        # Saved mappings are {file column: import field}; fields may also name a model column directly
+        self.columns = {column: model_fields.get(field, field) for column, field in job.mapping.items()}
+        self.email_columns = [c for c, f in job.mapping.items() if f.endswith('_email')]
+        self.department_columns = [c for c, f in job.mapping.items() if f == 'department_name']
+
+        default_department = user.department_id
+        if not default_department:
+            default_department = db.session.query(Department.id).filter_by(
+                organization_id=self.organization_id).order_by(Department.id).limit(1).scalar()
+        self.default_department_id = default_department
+
+    def prefetch(self, chunk: pd.DataFrame) -> Dict[str, Dict[str, int]]:
+        """Resolve every user email and department name in the chunk with one query each"""
+        lookups = {'users': {}, 'departments': {}}
+
+        emails = self._distinct_values(chunk, self.email_columns)
+        if emails:
+            rows = db.session.query(User.id, User.email).filter(
+                User.organization_id == self.organization_id,
+                func.lower(User.email).in_(emails)
+            ).all()
+            lookups['users'] = {email.lower(): user_id for user_id, email in rows}
+
+        names = self._distinct_values(chunk, self.department_columns)
+        if names:
+            rows = db.session.query(Department.id, Department.name).filter(
+                Department.organization_id == self.organization_id,
+                func.lower(Department.name).in_(names)
+            ).all()
+            lookups['departments'] = {name.lower(): dept_id for dept_id, name in rows}
+
+        return lookups
+
+    @staticmethod
+    def _distinct_values(chunk: pd.DataFrame, columns: List[str]) -> List[str]:
+        values = set()
+        for column in columns:
+            if column in chunk:
+                values.update(str(v).strip().lower() for v in chunk[column].dropna())
+        values.discard('')
+        return sorted(values)
+
+    def build_record(self, row: Dict[str, Any], lookups: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+        """Turn one file row into column values for the target table"""
+        data = {}
+        for column, field in self.columns.items():
+            value = row.get(column)
+            if value is None or (not isinstance(value, str) and pd.isna(value)):
+                continue
+            value = value.strip() if isinstance(value, str) else value
+            if value == '':
+                continue
+
+            if column in self.email_columns:
+                user_id = lookups['users'].get(str(value).lower())
+                if user_id:
+                    data[field] = user_id
+            elif column in self.department_columns:
+                dept_id = lookups['departments'].get(str(value).lower())
+                if dept_id:
+                    data[field] = dept_id
+            else:
+                data[field] = value
+
+        record = {
+            'organization_id': self.organization_id,
+            'created_by': self.user_id,
+            'created_at': self.now,
+            'updated_at': self.now
+        }
+        if 'code' in data:
+            record['code'] = str(data['code']).upper()
+        if 'status' in data:
+            record['status'] = STATUS_ALIASES.get(str(data['status']).lower(), StatusEnum.Open)
+        else:
+            record['status'] = StatusEnum.Open
+
+        if self.data_type == 'Problem':
+            record.update(self._require(data, 'title', 'description'))
+            record['reported_by'] = data.get('reported_by') or self.user_id
+            record['department_id'] = data.get('department_id') or self.default_department_id
+            if not record['department_id']:
+                raise ImportRowError('No departments available in system - please create departments first')
+            record['priority'] = PriorityEnum[self._level(data.get('priority'))]
+            record['impact'] = ImpactEnum[self._level(data.get('impact'))]
+            record['urgency'] = UrgencyEnum[self._level(data.get('urgency'))]
+
+        elif self.data_type == 'BusinessCase':
+            record.update(self._require(data, 'title', 'description'))
+            record['dept_id'] = data.get('dept_id') or self.default_department_id
+            if not record['dept_id']:
+                raise ImportRowError('No departments available in system - please create departments first')
+            if data.get('submitted_by'):
+                record['submitted_by'] = data['submitted_by']
+            record['case_type'] = (CaseTypeEnum.Proactive if str(data.get('case_type', '')).lower() == 'proactive'
+                                   else CaseTypeEnum.Reactive)
+            cost = self._number(data, 'cost_estimate')
+            benefit = self._number(data, 'benefit_estimate')
+            record['cost_estimate'] = cost
+            record['benefit_estimate'] = benefit
+            record['roi'] = ((benefit - cost) / cost) * 100 if cost > 0 else 0
+
+        elif self.data_type == 'Project':
+            record.update(self._require(data, 'name'))
+            record['description'] = data.get('description')
+            record['project_manager_id'] = data.get('project_manager_id') or self.user_id
+            record['department_id'] = data.get('department_id') or self.default_department_id
+            if not record['department_id']:
+                raise ImportRowError('No departments available in system - please create departments first')
+            if 'budget' in data:
+                record['budget'] = self._number(data, 'budget')
+            for field in ('start_date', 'end_date'):
+                if field in data:
+                    parsed = pd.to_datetime(data[field], errors='coerce')
+                    if pd.isna(parsed):
+                        raise ImportRowError(f"Invalid {field.replace('_', ' ')}: {data[field]}")
+                    record[field] = parsed.date()
+
+        return record
+
+    @staticmethod
+    def _require(data: Dict[str, Any], *fields: str) -> Dict[str, Any]:
+        missing = [field for field in fields if not data.get(field)]
+        if missing:
+            raise ImportRowError(f"Missing required field(s): {', '.join(missing)}")
+        return {field: str(data[field]) for field in fields}
+
+    @staticmethod
+    def _level(value: Any) -> str:
+        """Map free-text priority/impact/urgency to Low/Medium/High (default Medium)"""
+        return LEVEL_ALIASES.get(str(value).strip().lower(), 'Medium') if value is not None else 'Medium'
+
+    @staticmethod
+    def _number(data: Dict[str, Any], field: str) -> float:
+        value = data.get(field)
+        if value is None:
+            return 0.0
+        try:
+            return float(str(value).replace(',', '').replace('$', ''))
+        except ValueError:
+            raise ImportRowError(f"Invalid number for {field.replace('_', ' ')}: {value}")
+
+    def assign_codes(self, rows: List[Dict[str, Any]]):
+        """Give every row a code from the table's sequence (P0001, C0001, PRJ0001), one block per chunk"""
+        # Codes supplied in the file first move the counter past them, so no allocated code collides
+        prefix = code_allocator.prefix_for(self.data_type)
+        supplied = [code_number(prefix, row['code']) for row in rows if row.get('code')]
+        code_allocator.reserve_through(self.data_type, max((n for n in supplied if n is not None), default=0))
+
+        uncoded = [row for row in rows if not row.get('code')]
+        codes = code_allocator.allocate(self.data_type, len(uncoded))
+        for row, code in zip(uncoded, codes):
+            row['code'] = code
+
+
+class ImportWorker:
+    """Runs import jobs on a small thread pool outside the request cycle"""
+
+    def __init__(self, max_workers: int = IMPORT_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='import-worker')
+
+    def submit(self, app, job_id: int, file_path: str, include_rows: Optional[set] = None,
+               remove_file: bool = True):
+        return self.executor.submit(self._run, app, job_id, file_path, include_rows, remove_file)
+
+    @staticmethod
+    def _run(app, job_id: int, file_path: str, include_rows: Optional[set], remove_file: bool):
+        with app.app_context():
+            try:
+                success, message = ImportService.process_import(job_id, file_path, include_rows=include_rows)
+                logger.info(f"📥 Import job {job_id}: {message}")
+            except Exception as e:
+                logger.error(f"❌ Import job {job_id} crashed: {e}")
+            finally:
+                db.session.remove()
+                if remove_file and os.path.exists(file_path):
+                    try:
+                        os.remove(file_path)
+                    except OSError:
+                        pass  # Don't fail import if cleanup fails
+
+
+# Global background import worker
+import_worker = ImportWorker()
@@ -9,6 +9,7 @@ from app import db
 from admin.forms import UserForm
 from datetime import datetime
 from utils.date import format_datetime
+from utils.preferences import invalidate_org_preferences
 import os
 
 def init_admin_routes(app):
@@ -35,17 +36,17 @@ def init_admin_routes(app):
         return wrapper
     
     def log_action(action, details=None):
-        """Log admin actions"""
+        """Log admin actions (queued on the audit pipeline; does not commit the session)"""
         try:
+            from audit.pipeline import audit_pipeline
             user = current_user
-            log = AuditLog(
-                user_id=user.id if user else None,
-                action=action,
-                details=details,
-                ip_address=getattr(request, 'remote_addr', None) if request else None
-            )
-            db.session.add(log)
-            db.session.commit()
+            audit_pipeline.record({
+                'user_id': user.id,
+                'action': action,
+                'module': 'admin',
+                'details': details,
+                'ip_address': getattr(request, 'remote_addr', None) if request else None
+            })
         except:
             pass
     
@@ -631,8 +632,12 @@ def init_admin_routes(app):
                         }
                     )
                     print(f"🔧 Created essential workflow: {workflow['name']}")
-            
+
             db.session.commit()
+
+            # Raw SQL inserts bypass the ORM events that keep the trigger index fresh
+            from workflows.trigger_index import invalidate_trigger_index
+            invalidate_trigger_index()
             
         except Exception as e:
             print(f"🔧 Error ensuring essential workflows: {str(e)}")
@@ -1209,42 +1214,28 @@ def init_admin_routes(app):
                                      job=job,
                                      auth_token=request.args.get('auth_token'))
             
-            # For POST requests, execute the import
-            from models import ImportJob, Problem, BusinessCase, Project, Department
-            import pandas as pd
+            # For POST requests, queue the import on the background worker
+            from models import ImportJob
+            from admin.import_service import ImportService
             
             job = ImportJob.query.get(int(job_id))
             if not job or not job.mapping:
                 return jsonify({'success': False, 'error': 'Invalid job or missing mapping'}), 400
             
-            # Update status to Importing if not already
-            if job.status != 'Importing':
-                job.status = 'Importing'
-                db.session.commit()
-            
             # Read full file from uploaded location
             upload_folder = app.config.get('UPLOAD_FOLDER', 'uploads')
             filepath = os.path.join(upload_folder, job.filename)
+            is_upload = True
             
             # Check if file exists
             if not os.path.exists(filepath):
                 # Try to find file in static/sample_data for sample files
                 if job.filename.startswith('sample_data_'):
                     filepath = os.path.join('static/sample_data', job.filename)
+                    is_upload = False
                 if not os.path.exists(filepath):
                     return jsonify({'success': False, 'error': f'File not found: {job.filename}'}), 400
             
-            file_ext = '.' + job.filename.rsplit('.', 1)[-1].lower()
-            
-            if file_ext == '.csv':
-                df = pd.read_csv(filepath)
-            else:
-                df = pd.read_excel(filepath)
-            
-            success_count = 0
-            error_count = 0
-            errors = []
-            
             # Get row inclusion preferences from the form (from checkboxes)
             import_rows = set()
             for key in request.form.keys():
@@ -1252,356 +1243,16 @@ def init_admin_routes(app):
                     row_num = int(key.replace('include_row_', ''))
                     import_rows.add(row_num - 1)  # Convert to 0-based index
             
-            print(f"Import rows selected: {import_rows}")
-            print(f"Processing {len(df)} rows with mapping: {job.mapping}")
-            
-            # Process each row
-            for index, row in df.iterrows():
-                # Check if this row was selected for import
-                if import_rows and index not in import_rows:
-                    print(f"Skipping row {index + 1} - excluded by user (duplicate or unchecked)")
-                    errors.append({
-                        'row': index + 1,
-                        'error': 'Skipped duplicate',
-                        'type': 'duplicate_skipped'
-                    })
-                    error_count += 1
-                    continue
-                try:
-                    # Prepare data based on mapping
-                    data = {}
-                    
-                    for csv_field, model_field in job.mapping.items():
-                        if csv_field in row and pd.notna(row[csv_field]):
-                            value = str(row[csv_field]).strip()
-                            
-                            # Handle special field mappings using helper functions
-                            if 'email' in csv_field:
-                                user_id = _lookup_user_id(value)
-                                if user_id:
-                                    data[model_field.replace('_email', '_id')] = user_id
-                            elif 'department_name' in csv_field:
-                                dept_id = _lookup_department_id(value)
-                                if dept_id:
-                                    data['department_id'] = dept_id
-                            elif model_field == 'problem_id':
-                                problem_id = _lookup_problem_id(value)
-                                if problem_id:
-                                    data[model_field] = problem_id
-                            elif model_field == 'case_id':
-                                case_id = _lookup_case_id(value)
-                                if case_id:
-                                    data[model_field] = case_id
-                            else:
-                                # Direct field mapping
-                                data[model_field] = value
-                    
-                    print(f"Row {index + 2} data: {data}")
-                    
-                    # Add required fields that might be missing
-                    current_user = current_user
-                    
-                    if job.data_type == 'Problem':
-                        # Add default values for required fields if not provided
-                        if 'reported_by' not in data:
-                            data['reported_by'] = current_user.id
-                        if 'department_id' not in data:
-                            # Use current user's department or first available department
-                            if current_user.department_id:
-                                data['department_id'] = current_user.department_id
-                            else:
-                                first_dept = Department.query.filter_by(organization_id=current_user.organization_id).first()
-                                if first_dept:
-                                    data['department_id'] = first_dept.id
-                        
-                        # Handle enum fields properly with proper casting
-                        if 'priority' in data:
-                            from models import PriorityEnum
-                            priority_value = str(data['priority']).strip()
-                            try:
-                                # Try direct enum value mapping
-                                if priority_value in ['Critical', 'Urgent']:
-                                    data['priority'] = PriorityEnum.High  # Map Critical to High
-                                else:
-                                    data['priority'] = PriorityEnum(priority_value)
-                            except ValueError:
-                                # Fallback to Medium if invalid value
-                                data['priority'] = PriorityEnum.Medium
-                        
-                        if 'status' in data:
-                            from models import StatusEnum
-                            status_value = str(data['status']).strip()
-                            try:
-                                # Map common variations to enum values
-                                status_mapping = {
-                                    'In Progress': StatusEnum.InProgress,
-                                    'In_Progress': StatusEnum.InProgress,
-                                    'InProgress': StatusEnum.InProgress,
-                                    'On Hold': StatusEnum.OnHold,
-                                    'On_Hold': StatusEnum.OnHold,
-                                    'OnHold': StatusEnum.OnHold,
-                                    'Resolved': StatusEnum.Resolved,
-                                    'Open': StatusEnum.Open
-                                }
-                                data['status'] = status_mapping.get(status_value, StatusEnum(status_value))
-                            except ValueError:
-                                data['status'] = StatusEnum.Open
-                        
-                        if 'impact' in data:
-                            from models import ImpactEnum
-                            impact_value = str(data['impact']).strip()
-                            try:
-                                data['impact'] = ImpactEnum(impact_value)
-                            except ValueError:
-                                data['impact'] = ImpactEnum.Medium
-                        
-                        if 'urgency' in data:
-                            from models import UrgencyEnum
-                            urgency_value = str(data['urgency']).strip()
-                            try:
-                                data['urgency'] = UrgencyEnum(urgency_value)
-                            except ValueError:
-                                data['urgency'] = UrgencyEnum.Medium
-                    
-                    elif job.data_type == 'BusinessCase':
-                        # Add default values for business case required fields
-                        if 'submitted_by' not in data:
-                            data['submitted_by'] = current_user.id
-                        if 'department_id' not in data:
-                            if current_user.department_id:
-                                data['department_id'] = current_user.department_id
-                            else:
-                                first_dept = Department.query.filter_by(organization_id=current_user.organization_id).first()
-                                if first_dept:
-                                    data['department_id'] = first_dept.id
-                        
-                        # Handle enum fields for business case
-                        if 'case_type' in data:
-                            from models import CaseTypeEnum
-                            case_type_value = data['case_type']
-                            if case_type_value == 'Reactive':
-                                data['case_type'] = CaseTypeEnum.Reactive
-                            else:
-                                data['case_type'] = CaseTypeEnum.Proactive
-                        
-                        if 'status' in data:
-                            from models import StatusEnum
-                            status_value = data['status']
-                            if status_value == 'In Progress':
-                                data['status'] = StatusEnum.InProgress
-                            elif status_value == 'Approved':
-                                data['status'] = StatusEnum.Approved
-                            elif status_value == 'Rejected':
-                                data['status'] = StatusEnum.Rejected
-                            else:
-                                data['status'] = StatusEnum.Open
-                        
-                        # Convert numeric fields
-                        if 'cost_estimate' in data:
-                            try:
-                                data['cost_estimate'] = float(data['cost_estimate'])
-                            except (ValueError, TypeError):
-                                data['cost_estimate'] = 0.0
-                        
-                        if 'benefit_estimate' in data:
-                            try:
-                                data['benefit_estimate'] = float(data['benefit_estimate'])
-                            except (ValueError, TypeError):
-                                data['benefit_estimate'] = 0.0
-                    
-                    # Create record based on data type
-                    if job.data_type == 'Problem':
-                        from models import Problem, StatusEnum
-                        
-                        # Generate code if not present
-                        if 'code' not in data or not data['code']:
-                            last_problem = Problem.query.order_by(Problem.id.desc()).first()
-                            next_id = (last_problem.id + 1) if last_problem else 1
-                            data['code'] = f"P{next_id:04d}"
-                        
-                        # Set required fields with defaults
-                        data['reported_by'] = data.get('reported_by') or current_user.id
-                        data['created_by'] = data.get('created_by') or current_user.id
-                        
-                        # Handle department assignment - use fallback if not provided
-                        # Department can be updated later via problem editing
-                        if not data.get('department_id'):
-                            # Try current user's department first
-                            if current_user.department_id:
-                                data['department_id'] = current_user.department_id
-                            else:
-                                # Use first available department as fallback
-                                first_dept = Department.query.filter_by(organization_id=current_user.organization_id).first()
-                                if first_dept:
-                                    data['department_id'] = first_dept.id
-                                else:
-                                    # Skip this row if no departments exist at all
-                                    error_details.append({
-                                        'row': idx + 1,
-                                        'error': 'No departments available in system - please create departments first'
-                                    })
-                                    continue
-                        
-                        # Remove any old dept_id field to avoid conflicts (Problem model uses department_id)
-                        if 'org_unit_id' in data:
-                            del data['org_unit_id']
-                        
-                        # Handle status mapping for Problems using StatusEnum (since ProblemStatusEnum doesn't exist)
-                        if 'status' in data:
-                            status_value = str(data['status']).strip()
-                            status_mapping = {
-                                'open': StatusEnum.Open,
-                                'investigating': StatusEnum.InProgress,
-                                'resolved': StatusEnum.Resolved,
-                                'closed': StatusEnum.Resolved,
-                                'in progress': StatusEnum.InProgress
-                            }
-                            mapped_status = status_mapping.get(status_value.lower())
-                            if mapped_status:
-                                data['status'] = mapped_status
-                            else:
-                                data['status'] = StatusEnum.Open
-                        else:
-                            data['status'] = StatusEnum.Open
-                        
-                        print(f"Creating Problem with data: {data}")
-                        record = Problem(**data)
-                    elif job.data_type == 'BusinessCase':
-                        from models import BusinessCase
-                        
-                        # Generate code if not present
-                        if 'code' not in data or not data['code']:
-                            last_case = BusinessCase.query.order_by(BusinessCase.id.desc()).first()
-                            next_id = (last_case.id + 1) if last_case else 1
-                            data['code'] = f"C{next_id:04d}"
-                        
-                        # Set required fields with defaults
-                        data['created_by'] = data.get('created_by') or current_user.id
-                        
-                        # Remove submitted_by field as BusinessCase model doesn't have it
-                        if 'submitted_by' in data:
-                            del data['submitted_by']
-                        
-                        # Handle department assignment (BusinessCase uses department_id)
-                        if not data.get('department_id'):
-                            if current_user.department_id:
-                                data['department_id'] = current_user.department_id
-                            else:
-                                first_dept = Department.query.filter_by(organization_id=current_user.organization_id).first()
-                                if first_dept:
-                                    data['department_id'] = first_dept.id
-                        
-                        # Remove department_id field if present (BusinessCase uses dept_id)
-                        if 'department_id' in data:
-                            del data['department_id']
-                        
-                        # Map 'summary' field to 'description' if present (BusinessCase uses description, not summary)
-                        if 'summary' in data:
-                            data['description'] = data.pop('summary')
-                        
-                        print(f"Creating BusinessCase with data: {data}")
-                        record = BusinessCase(**data)
-                    elif job.data_type == 'Project':
-                        from models import Project, StatusEnum
-                        
-                        # Generate code if not present
-                        if 'code' not in data or not data['code']:
-                            last_project = Project.query.order_by(Project.id.desc()).first()
-                            next_id = (last_project.id + 1) if last_project else 1
-                            data['code'] = f"PRJ{next_id:04d}"
-                        
-                        # Set required fields with defaults
-                        data['created_by'] = data.get('created_by') or current_user.id
-                        data['project_manager_id'] = data.get('project_manager_id') or current_user.id
-                        
-                        # Handle department assignment - use fallback if not provided
-                        # Department can be updated later via project editing
-                        if not data.get('department_id'):
-                            # Try current user's department first
-                            if current_user.department_id:
-                                data['department_id'] = current_user.department_id
-                            else:
-                                # Use first available department as fallback
-                                first_dept = Department.query.filter_by(organization_id=current_user.organization_id).first()
-                                if first_dept:
-                                    data['department_id'] = first_dept.id
-                                # If no departments exist, leave as None (nullable field)
-                        
-                        # Remove any old dept_id field to avoid conflicts
-                        if 'org_unit_id' in data:
-                            del data['org_unit_id']
-                        data['department_id'] = data.get('department_id') or current_user.department_id
-                        
-                        # Handle status mapping for Projects using StatusEnum
-                        if 'status' in data:
-                            status_value = str(data['status']).strip()
-                            # Map common project status values to StatusEnum
-                            status_mapping = {
-                                'planning': StatusEnum.Open,
-                                'active': StatusEnum.InProgress, 
-                                'in progress': StatusEnum.InProgress,
-                                'on hold': StatusEnum.OnHold,  # Use OnHold instead of Draft
-                                'completed': StatusEnum.Resolved,
-                                'cancelled': StatusEnum.Resolved
-                            }
-                            mapped_status = status_mapping.get(status_value.lower())
-                            if mapped_status:
-                                data['status'] = mapped_status
-                            else:
-                                data['status'] = StatusEnum.Open  # Default to Open
-                        else:
-                            data['status'] = StatusEnum.Open
-                        
-                        print(f"Creating Project with data: {data}")
-                        record = Project(**data)
-                    else:
-                        raise ValueError(f"Unknown data type: {job.data_type}")
-                    
-                    db.session.add(record)
-                    db.session.flush()  # Flush to get any database errors before commit
-                    success_count += 1
-                    print(f"Successfully added record {index + 2}")
-                
-                except Exception as e:
-                    db.session.rollback()
-                    error_count += 1
-                    print(f"Error importing row {index + 2}: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
-                    errors.append({
-                        'row': index + 2,  # +2 because pandas is 0-indexed and we have header
-                        'error': str(e)
-                    })
-            
-            # Commit all successful records
-            if success_count > 0:
-                db.session.commit()
-            
-            # Update job status
-            job.rows_success = success_count
-            job.rows_failed = error_count
-            job.error_details = errors
-            job.status = 'Complete' if error_count == 0 else 'Failed'
-            db.session.commit()
-            
-            print(f"Import completed: {success_count} success, {error_count} errors")
-            
-            # Clean up uploaded file after processing
-            try:
-                upload_folder = app.config.get('UPLOAD_FOLDER', 'uploads')
-                filepath = os.path.join(upload_folder, job.filename)
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-            except Exception:
-                pass  # Don't fail import if cleanup fails
-            
-            message = f"Import completed: {success_count} records imported successfully"
-            if error_count > 0:
-                message += f", {error_count} failed"
+            # Uploaded files are removed by the worker once the import finishes
+            success, message = ImportService.start_import(job.id, filepath, include_rows=import_rows,
+                                                          remove_file=is_upload)
+            if not success:
+                return jsonify({'success': False, 'error': message}), 400
             
             return jsonify({
                 'success': True,
                 'message': message,
+                'status_url': url_for('admin_import_job_status', job_id=job.id),
                 'redirect_url': url_for('admin_import_result', job_id=job.id, auth_token=request.form.get('auth_token'))
             })
         
@@ -1808,13 +1459,10 @@ def init_admin_routes(app):
                 parent = Department.query.get(int(parent_id))
                 if parent and parent.id != unit.id:
                     # Check for circular reference
-                    current = parent
-                    while current:
-                        if current.id == unit.id:
-                            from flask import flash
-                            flash('Cannot set parent - would create circular reference', 'error')
-                            return redirect('/admin/org-structure')
-                        current = current.parent
+                    if parent.id in unit.get_descendant_ids(include_self=True):
+                        from flask import flash
+                        flash('Cannot set parent - would create circular reference', 'error')
+                        return redirect('/admin/org-structure')
                     unit.parent = parent
                 else:
                     unit.parent = None
@@ -2205,8 +1853,10 @@ def init_admin_routes(app):
         try:
             from models import Department
             
-            # Get all departments
-            all_units = Department.query.filter_by(organization_id=current_user.organization_id).all()
+            # Get all departments with level and path preloaded from the closure table
+            all_units = Department.preload_hierarchy(
+                Department.query.filter_by(organization_id=current_user.organization_id).all()
+            )
             
             # Calculate statistics
             total_units = len(all_units)
@@ -2256,10 +1906,17 @@ def init_admin_routes(app):
         try:
             from models import Department
             from flask import Response, send_file
+            from sqlalchemy.orm import joinedload, selectinload
             import io
             import csv
             
-            all_units = Department.query.filter_by(organization_id=current_user.organization_id).all()
+            # Managers, children and level/path are loaded up front so the report runs a fixed number of queries
+            all_units = Department.preload_hierarchy(
+                Department.query.options(
+                    joinedload(Department.manager),
+                    selectinload(Department.children)
+                ).filter_by(organization_id=current_user.organization_id).all()
+            )
             
             if format == 'csv':
                 # Generate CSV report
@@ -2491,14 +2148,18 @@ def init_admin_routes(app):
     def serialize_org_unit_tree():
         """Serialize departments into tree structure for charts"""
         from models import Department
+        from sqlalchemy.orm import joinedload
         
-        # Get all root departments (departments without parents)
-        root_units = Department.query.filter_by(parent_id=None).all()
+        # Load the organization's departments once and build the tree in memory
+        units = Department.query.options(joinedload(Department.manager)).filter_by(
+            organization_id=current_user.organization_id
+        ).all()
+        children_by_parent = {}
+        for unit in units:
+            children_by_parent.setdefault(unit.parent_id, []).append(unit)
+        root_units = children_by_parent.get(None, [])
         
         def serialize_unit(unit):
-            # Get children for this department
-            children = Department.query.filter_by(parent_id=unit.id).all()
-            
             return {
                 'id': unit.id,
                 'name': unit.name,
@@ -2507,7 +2168,7 @@ def init_admin_routes(app):
                     'name': unit.manager.name,
                     'email': unit.manager.email
                 } if unit.manager else None,
-                'children': [serialize_unit(child) for child in children]
+                'children': [serialize_unit(child) for child in children_by_parent.get(unit.id, [])]
             }
         
         return [serialize_unit(unit) for unit in root_units]
@@ -2755,6 +2416,7 @@ def init_admin_routes(app):
             
             try:
                 db.session.commit()
+                invalidate_org_preferences(org_settings.organization_id)
                 log_action('UPDATE_ORG_SETTINGS', f'Updated organization preferences: currency={org_settings.currency}, theme={org_settings.default_theme}')
                 flash('Organization preferences updated successfully!', 'success')
             except Exception as e:
@@ -0,0 +1,390 @@
+"""
+LLM Gateway for DeciFrame AI features
+One place for chat completions, so repeated prompts (review insights on every detail page view,
+re-classifying the same problem text, regenerating the same summary) cost one upstream call.
+
+- Content-addressed cache: responses are keyed by a SHA-256 of the deployment, organization,
+  model, messages and parameters and stored with a TTL and LRU eviction. The default backend is
+  a SQLite file shared by all workers on the host (LLM_CACHE_BACKEND=sqlite), created on first
+  use in the instance folder (or LLM_CACHE_PATH) with 0600 permissions, since prompts and
+  responses contain organization data; 'memory' keeps a per-process cache and 'off' disables
+  caching.
+- Request coalescing: concurrent identical requests in a process wait for the first one's
+  upstream call instead of issuing their own.
+- Metrics: hit rate, coalesced requests, errors and upstream/cached latency percentiles
+  (get_stats(), served at /api/ai/gateway-stats for admins).
+- Pluggable client: anything with the OpenAI client's chat.completions.create() interface.
+  LLM_BASE_URL points the default OpenAI client at an OpenAI-compatible server (e.g. a local
+  stub in tests), or call llm_gateway.set_client(...) directly.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, deque
+from flask import has_request_context
+from utils.local_state import instance_file, deployment_namespace
+
+try:
+    from openai import OpenAI
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_BACKEND = os.getenv('LLM_CACHE_BACKEND', 'sqlite')
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', '86400'))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '5000'))
+LLM_BASE_URL = os.getenv('LLM_BASE_URL')
+LLM_COALESCE_TIMEOUT = int(os.getenv('LLM_COALESCE_TIMEOUT', '120'))
+DEFAULT_MODEL = 'gpt-4o'
+LATENCY_WINDOW = 500
+
+
+class LLMUnavailableError(RuntimeError):
+    """No LLM client is configured (e.g. OPENAI_API_KEY is not set)"""
+
+
+def cache_key(model, messages, params, scope=None):
+    """SHA-256 over the canonical JSON of everything that determines the response, within scope"""
+    payload = json.dumps({'scope': scope, 'model': model, 'messages': messages, 'params': params},
+                         sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class InProcessResponseCache:
+    """Per-process LRU cache with TTL"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, content)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, model, content, ttl):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, content)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class SQLiteResponseCache:
+    """LRU cache with TTL shared by all workers on a host through a SQLite file in WAL mode"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=None, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _create(self):
+        """Create the file (0600, instance folder by default) and schema on first use"""
+        self.path = self.path or instance_file('llm_cache.sqlite3', 'LLM_CACHE_PATH')
+        conn = self._open()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_responses_last_used ON llm_responses (last_used_at)")
+
+    def _connect(self):
+        if not self._ready:
+            with self._ready_lock:
+                if not self._ready:
+                    self._create()
+                    self._ready = True
+        return self._open()
+
+    def _open(self):
+        # One connection per thread, reopened after fork (connections must not cross processes)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute("SELECT content, expires_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE llm_responses SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, model, content, ttl):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("""
+            INSERT INTO llm_responses (key, model, content, created_at, expires_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET content = excluded.content, created_at = excluded.created_at,
+                expires_at = excluded.expires_at, last_used_at = excluded.last_used_at
+        """, (key, model, content, now, now + ttl, now))
+        self._writes += 1
+        if self._writes % 50 == 1:
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then the least recently used ones beyond max_entries"""
+        conn.execute("DELETE FROM llm_responses WHERE expires_at < ?", (now,))
+        conn.execute("""
+            DELETE FROM llm_responses WHERE key IN (
+                SELECT key FROM llm_responses ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def clear(self):
+        self._connect().execute("DELETE FROM llm_responses")
+
+    def size(self):
+        return self._connect().execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+
+
+def create_response_cache(name=LLM_CACHE_BACKEND):
+    """Build the configured cache; None disables caching"""
+    if name == 'off':
+        return None
+    try:
+        if name == 'sqlite':
+            return SQLiteResponseCache()
+    except Exception as e:
+        print(f"⚠️ LLM cache backend '{name}' unavailable ({e}); using in-process cache")
+    return InProcessResponseCache()
+
+
+def _default_client():
+    api_key = os.environ.get('OPENAI_API_KEY')
+    if not OPENAI_AVAILABLE or not (api_key or LLM_BASE_URL):
+        return None
+    kwargs = {'api_key': api_key or 'stub'}
+    if LLM_BASE_URL:
+        kwargs['base_url'] = LLM_BASE_URL
+    return OpenAI(**kwargs)
+
+
+class _InflightCall:
+    __slots__ = ('done', 'content', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.content = None
+        self.error = None
+
+
+class LLMGateway:
+    """Cached, coalescing front for chat completion calls"""
+
+    def __init__(self, client=None, cache='default', ttl=LLM_CACHE_TTL, client_factory=_default_client):
+        self._client = client
+        self._client_factory = client_factory
+        self._cache = create_response_cache() if cache == 'default' else cache
+        self.ttl = ttl
+
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    # ------------------------------------------------------------------ configuration
+
+    def set_client(self, client):
+        """Use this client (OpenAI-compatible) for upstream calls, e.g. a local stub in tests"""
+        self._client = client
+
+    def set_cache(self, cache):
+        self._cache = cache
+
+    @property
+    def client(self):
+        if self._client is None and self._client_factory is not None:
+            self._client = self._client_factory()
+        return self._client
+
+    def is_available(self):
+        return self.client is not None
+
+    # ------------------------------------------------------------------ completions
+
+    def complete(self, messages, model=DEFAULT_MODEL, cache=True, ttl=None, organization_id=None, **params):
+        """
+        Return the assistant message content for a chat completion
+
+        Args:
+            messages: Chat messages as passed to chat.completions.create
+            model: Model name
+            cache: Read and store the response in the cache
+            ttl: Cache lifetime in seconds (default LLM_CACHE_TTL)
+            organization_id: Organization the prompt belongs to; defaults to the current user's.
+                             Cached responses are only shared within one organization
+            **params: Other create() parameters (max_tokens, temperature, response_format, ...);
+                      they are part of the cache key
+
+        Raises:
+            LLMUnavailableError: No client is configured
+            Exception: Upstream errors are re-raised (and never cached)
+        """
+        started = time.perf_counter()
+        key = cache_key(model, messages, params, self._scope(organization_id))
+        store = self._cache if cache else None
+        self._count('requests')
+
+        if store is not None:
+            content = self._cache_get(store, key)
+            if content is not None:
+                self._count('hits', latency=('cached', started))
+                return content
+
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InflightCall()
+
+        if not leader:
+            self._count('coalesced')
+            if not call.done.wait(LLM_COALESCE_TIMEOUT):
+                raise TimeoutError("Timed out waiting for an identical in-flight LLM request")
+            if call.error is not None:
+                raise call.error
+            self._count('hits', latency=('coalesced', started))
+            return call.content
+
+        try:
+            self._count('misses')
+            client = self.client
+            if client is None:
+                raise LLMUnavailableError("No LLM client configured (set OPENAI_API_KEY or LLM_BASE_URL)")
+            upstream_started = time.perf_counter()
+            response = client.chat.completions.create(model=model, messages=messages, **params)
+            content = response.choices[0].message.content
+            self._count('upstream_calls', latency=('upstream', upstream_started))
+            if store is not None and content is not None:
+                self._cache_set(store, key, model, content, ttl or self.ttl)
+            call.content = content
+            return content
+        except Exception as e:
+            if not isinstance(e, LLMUnavailableError):
+                self._count('errors')
+            call.error = e
+            raise
+        finally:
+            call.done.set()
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    @staticmethod
+    def _scope(organization_id):
+        """Cache scope: this deployment and the prompt's organization"""
+        if organization_id is None and has_request_context():
+            from flask_login import current_user
+            if current_user.is_authenticated:
+                organization_id = getattr(current_user, 'organization_id', None)
+        return f"{deployment_namespace()}:{organization_id or ''}"
+
+    def _cache_get(self, store, key):
+        try:
+            return store.get(key)
+        except Exception as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            self._count('cache_errors')
+            return None
+
+    def _cache_set(self, store, key, model, content, ttl):
+        try:
+            store.set(key, model, content, ttl)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+            self._count('cache_errors')
+
+    # ------------------------------------------------------------------ metrics
+
+    def _reset_stats(self):
+        with self._stats_lock:
+            self._stats = {'requests': 0, 'hits': 0, 'misses': 0, 'coalesced': 0,
+                           'upstream_calls': 0, 'errors': 0, 'cache_errors': 0}
+            self._latency = {kind: deque(maxlen=LATENCY_WINDOW) for kind in ('cached', 'coalesced', 'upstream')}
+
+    def _count(self, name, latency=None):
+        with self._stats_lock:
+            self._stats[name] += 1
+            if latency:
+                kind, started = latency
+                self._latency[kind].append((time.perf_counter() - started) * 1000)
+
+    @staticmethod
+    def _percentiles(samples):
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        pick = lambda pct: round(ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))], 2)
+        return {'p50_ms': pick(50), 'p95_ms': pick(95), 'max_ms': round(ordered[-1], 2), 'samples': len(ordered)}
+
+    def get_stats(self):
+        """Hit rate, coalescing and latency since start (latency over the last LATENCY_WINDOW calls)"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            latency = {kind: self._percentiles(samples) for kind, samples in self._latency.items()}
+        served = stats['hits'] + stats['misses']
+        try:
+            size = self._cache.size() if self._cache is not None else None
+        except Exception:
+            size = None
+        return {
+            **stats,
+            'hit_rate': round(stats['hits'] / served, 4) if served else None,
+            'latency': latency,
+            'cache_backend': self._cache.name if self._cache is not None else 'off',
+            'cache_size': size,
+            'cache_ttl': self.ttl,
+            'client_configured': self.is_available()
+        }
+
+    def reset_stats(self):
+        self._reset_stats()
+
+
+# Global LLM gateway instance
+llm_gateway = LLMGateway()
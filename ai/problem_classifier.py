@@ -2,7 +2,6 @@
 AI-Powered Problem Classification Service
 Analyzes problem titles and descriptions to suggest issue types
 """
-import os
 import logging
 from typing import Tuple
 
@@ -14,15 +13,12 @@ def classify_problem(title: str, description: str) -> Tuple[str, float]:
     Returns: (issue_type, confidence_score)
     """
     try:
-        from openai import OpenAI
+        from ai.llm_gateway import llm_gateway
         
-        openai_api_key = os.environ.get("OPENAI_API_KEY")
-        if not openai_api_key:
+        if not llm_gateway.is_available():
             logger.warning("OpenAI API key not available for problem classification")
             return 'PROCESS', 0.5  # Default fallback
         
-        client = OpenAI(api_key=openai_api_key)
-        
         # Create classification prompt
         prompt = f"""
 Analyze this problem report and classify it into one of these categories:
@@ -44,7 +40,7 @@ Respond with JSON in this exact format:
 
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
-        response = client.chat.completions.create(
+        content = llm_gateway.complete(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You are an expert problem classifier for business systems. Provide accurate classifications with confidence scores."},
@@ -56,7 +52,7 @@ Respond with JSON in this exact format:
         )
         
         import json
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(content)
         
         issue_type = result.get('issue_type', 'PROCESS')
         confidence = float(result.get('confidence', 0.5))
@@ -81,10 +81,9 @@ def refine_problem():
                 'message': 'Generated using intelligent analysis (OpenAI unavailable)'
             })
         
-        # Use OpenAI for enhanced refinement
+        # Use OpenAI for enhanced refinement (repeated descriptions are served from the gateway cache)
         try:
-            from openai import OpenAI
-            openai_client = OpenAI(api_key=openai_api_key)
+            from ai.llm_gateway import llm_gateway
             
             prompt = f"""
             Analyze this problem statement and create 3 refined versions that are more specific, actionable, and business-focused:
@@ -111,7 +110,7 @@ def refine_problem():
             [Description]
             """
             
-            response = openai_client.chat.completions.create(
+            content = llm_gateway.complete(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": "You are a business analyst expert at refining problem statements. Create specific, actionable problem descriptions that lead to clear solutions."},
@@ -122,7 +121,7 @@ def refine_problem():
             )
             
             # Parse the structured response
-            variants = parse_variants(response.choices[0].message.content)
+            variants = parse_variants(content)
             
             current_app.logger.info(f"Generated {len(variants)} AI-refined problem variants")
             return jsonify({
@@ -1861,6 +1860,16 @@ def delete_story_api(story_id):
         logging.error(f"Error deleting story: {e}")
         return jsonify({'success': False, 'error': 'Failed to delete story'}), 500
 
+@ai_bp.route('/gateway-stats', methods=['GET'])
+@login_required
+def gateway_stats():
+    """LLM gateway cache hit rate, coalescing and latency (Admin only)"""
+    if current_user.role.value != 'Admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    from ai.llm_gateway import llm_gateway
+    return jsonify(llm_gateway.get_stats())
+
 # Duplicate clear_epics function removed to avoid routing conflicts
 
 # End of AI routes module
\ No newline at end of file
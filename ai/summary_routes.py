@@ -4,15 +4,9 @@ Generates executive summaries for business cases
 """
 
 from flask import Blueprint, request, jsonify, current_app
+from flask_login import login_required, current_user
 import logging
-import os
-
-# Import OpenAI conditionally
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+from ai.llm_gateway import llm_gateway, OPENAI_AVAILABLE
 
 # Create blueprint
 summary_bp = Blueprint('ai_summary', __name__)
@@ -40,14 +34,12 @@ def generate_summary():
             })
         
         # Generate AI summary
-        openai_client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
-        
         # Create prompt from business case data
         prompt = create_summary_prompt(data)
         
         logging.info(f"Generating AI summary for user {user.id}")
         
-        response = openai_client.chat.completions.create(
+        summary = llm_gateway.complete(
             model="gpt-4o",  # Latest OpenAI model
             messages=[
                 {
@@ -61,9 +53,7 @@ def generate_summary():
             ],
             max_tokens=300,
             temperature=0.3
-        )
-        
-        summary = response.choices[0].message.content.strip()
+        ).strip()
         
         logging.info(f"AI summary generated successfully for user {user.id}")
         
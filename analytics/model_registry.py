@@ -0,0 +1,279 @@
+"""
+Versioned ML Model Registry for DeciFrame Predictive Analytics
+
+Layout under analytics/models/:
+    manifest.json                 active version, per-artifact hashes, training metadata, history
+    versions/<version>/*.pkl      immutable artifacts of one training run
+
+A version is the content hash of its artifacts, so retraining on unchanged data republishes
+the same version. MLModelTrainer writes a run into a staging directory and publishes it; the
+manifest is replaced atomically (write + os.replace), so readers always see a complete version.
+
+Workers check the manifest at most every MODEL_REGISTRY_CHECK_INTERVAL seconds and switch to a
+new version without a restart. Artifacts are loaded with joblib mmap_mode='r', so the NumPy
+arrays inside the models are memory-mapped and every worker shares the same page-cache pages.
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from datetime import datetime
+import joblib
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+MODEL_TYPES = ('success', 'cycle_time', 'anomaly')
+ARTIFACT_KINDS = ('model', 'scaler', 'features')
+MANIFEST_NAME = 'manifest.json'
+CHECK_INTERVAL = float(os.getenv('MODEL_REGISTRY_CHECK_INTERVAL', '30'))
+MMAP_MODE = os.getenv('MODEL_REGISTRY_MMAP_MODE', 'r') or None
+KEEP_VERSIONS = int(os.getenv('MODEL_REGISTRY_KEEP_VERSIONS', '5'))
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Publishes versioned model artifacts and serves the active version to request handlers"""
+
+    def __init__(self, models_dir=MODELS_DIR, check_interval=CHECK_INTERVAL, mmap_mode=MMAP_MODE):
+        self.models_dir = models_dir
+        self.versions_dir = os.path.join(models_dir, 'versions')
+        self.manifest_path = os.path.join(models_dir, MANIFEST_NAME)
+        self.check_interval = check_interval
+        self.mmap_mode = mmap_mode
+
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._manifest_mtime = None
+        self._checked_at = 0.0
+        self._loaded = {}           # model_type -> {'model', 'scaler', 'features', 'version'}
+        self.reloads = 0
+
+    # ------------------------------------------------------------------ publishing
+
+    def create_staging_dir(self):
+        """Directory a training run writes its artifacts into before publish()"""
+        path = os.path.join(self.models_dir, f'.staging-{uuid.uuid4().hex}')
+        os.makedirs(path)
+        return path
+
+    def carry_forward(self, staging_dir, model_type):
+        """Copy one model's artifacts from the active version into staging_dir; returns True if copied"""
+        manifest = self._read_manifest()
+        entry = (manifest or {}).get('models', {}).get(model_type)
+        if not entry:
+            return False
+        source_dir = os.path.join(self.versions_dir, manifest['version'])
+        for kind in ARTIFACT_KINDS:
+            source = os.path.join(source_dir, entry[kind]['file'])
+            if not os.path.exists(source):
+                return False
+            shutil.copy2(source, os.path.join(staging_dir, entry[kind]['file']))
+        return True
+
+    def publish(self, staging_dir, metadata=None):
+        """
+        Version the artifacts in staging_dir by content hash and make them the active version
+
+        Returns:
+            The published version string
+        """
+        artifacts = {}
+        for filename in sorted(os.listdir(staging_dir)):
+            if filename.endswith('.pkl'):
+                artifacts[filename] = _file_sha256(os.path.join(staging_dir, filename))
+        if not artifacts:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise ValueError("No model artifacts to publish")
+
+        combined = hashlib.sha256()
+        for filename, digest in artifacts.items():
+            combined.update(f'{filename}:{digest}\n'.encode())
+        version = combined.hexdigest()[:16]
+
+        os.makedirs(self.versions_dir, exist_ok=True)
+        version_dir = os.path.join(self.versions_dir, version)
+        if os.path.exists(version_dir):
+            shutil.rmtree(staging_dir, ignore_errors=True)  # Identical content already published
+        else:
+            os.replace(staging_dir, version_dir)
+
+        previous = self._read_manifest() or {}
+        history = [v for v in previous.get('history', []) if v != version]
+        if previous.get('version') and previous['version'] != version:
+            history.insert(0, previous['version'])
+
+        models = {}
+        for model_type in MODEL_TYPES:
+            files = {kind: f'{model_type}_{kind}.pkl' for kind in ARTIFACT_KINDS}
+            if all(name in artifacts for name in files.values()):
+                models[model_type] = {kind: {'file': name, 'sha256': artifacts[name]}
+                                      for kind, name in files.items()}
+
+        manifest = {
+            'version': version,
+            'published_at': datetime.utcnow().isoformat(),
+            'models': models,
+            'metadata': metadata or {},
+            'history': history[:KEEP_VERSIONS]
+        }
+        self._write_manifest(manifest)
+        self._prune(keep={version, *manifest['history']})
+        logger.info(f"📦 Published model version {version} ({', '.join(models) or 'no complete models'})")
+        return version
+
+    def rollback(self):
+        """Re-activate the most recent previous version; returns it, or None if there is none"""
+        manifest = self._read_manifest()
+        if not manifest or not manifest.get('history'):
+            return None
+        for candidate in manifest['history']:
+            candidate_dir = os.path.join(self.versions_dir, candidate)
+            previous = self._read_version_manifest(candidate)
+            if os.path.isdir(candidate_dir) and previous:
+                previous['history'] = [v for v in manifest['history'] if v != candidate]
+                previous['history'].insert(0, manifest['version'])
+                previous['published_at'] = datetime.utcnow().isoformat()
+                self._write_manifest(previous)
+                logger.info(f"🔄 Rolled back models to version {candidate}")
+                return candidate
+        return None
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.models_dir, exist_ok=True)
+        # Keep a copy beside the artifacts so rollback can restore that version's manifest
+        version_dir = os.path.join(self.versions_dir, manifest['version'])
+        if os.path.isdir(version_dir):
+            with open(os.path.join(version_dir, MANIFEST_NAME), 'w') as f:
+                json.dump(manifest, f, indent=2, default=str)
+
+        tmp_path = f'{self.manifest_path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def _read_version_manifest(self, version):
+        try:
+            with open(os.path.join(self.versions_dir, version, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _prune(self, keep):
+        if not os.path.isdir(self.versions_dir):
+            return
+        for name in os.listdir(self.versions_dir):
+            if name not in keep:
+                shutil.rmtree(os.path.join(self.versions_dir, name), ignore_errors=True)
+                logger.info(f"🗑️ Removed old model version {name}")
+
+    # ------------------------------------------------------------------ serving
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.error(f"Unreadable model manifest {self.manifest_path}: {e}")
+            return None
+
+    def _refresh_manifest(self, force=False):
+        """Re-read the manifest if it changed on disk (checked at most every check_interval seconds)"""
+        now = time.monotonic()
+        if not force and self._manifest is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            self._manifest, self._manifest_mtime = None, None
+            return
+        if mtime == self._manifest_mtime:
+            return
+
+        manifest = self._read_manifest()
+        if manifest is None:
+            return
+        if self._manifest and manifest.get('version') != self._manifest.get('version'):
+            logger.info(f"🔄 Model manifest changed: {self._manifest.get('version')} -> {manifest.get('version')}")
+            self.reloads += 1
+        self._manifest, self._manifest_mtime = manifest, mtime
+
+    def get(self, model_type):
+        """
+        Return {'model', 'scaler', 'features', 'version'} for the active version, or None
+
+        Falls back to unversioned <type>_model.pkl files when no manifest has been published.
+        """
+        with self._lock:
+            self._refresh_manifest()
+            manifest = self._manifest
+            version = manifest.get('version') if manifest else None
+
+            cached = self._loaded.get(model_type)
+            if cached is not None and cached['version'] == version:
+                return cached
+
+            if manifest is not None:
+                entry = manifest.get('models', {}).get(model_type)
+                if not entry:
+                    return None
+                base_dir = os.path.join(self.versions_dir, version)
+                paths = {kind: os.path.join(base_dir, entry[kind]['file']) for kind in ARTIFACT_KINDS}
+            else:
+                base_dir = self.models_dir
+                paths = {kind: os.path.join(base_dir, f'{model_type}_{kind}.pkl') for kind in ARTIFACT_KINDS}
+
+            if not all(os.path.exists(p) for p in paths.values()):
+                return None
+
+            try:
+                loaded = {kind: joblib.load(path, mmap_mode=self.mmap_mode) for kind, path in paths.items()}
+            except Exception as e:
+                logger.error(f"Error loading {model_type} model version {version}: {e}")
+                return cached  # Keep serving the previous version if the new one cannot be loaded
+
+            loaded['version'] = version
+            self._loaded[model_type] = loaded
+            return loaded
+
+    def get_status(self):
+        """Active and on-disk versions for monitoring"""
+        with self._lock:
+            self._refresh_manifest(force=True)
+            manifest = self._manifest or {}
+            return {
+                'manifest_version': manifest.get('version'),
+                'published_at': manifest.get('published_at'),
+                'loaded_versions': {model_type: data['version'] for model_type, data in self._loaded.items()},
+                'models_available': {model_type: model_type in manifest.get('models', {})
+                                     for model_type in MODEL_TYPES} if manifest else None,
+                'history': manifest.get('history', []),
+                'mmap_mode': self.mmap_mode,
+                'reloads': self.reloads
+            }
+
+    def get_metadata(self):
+        with self._lock:
+            self._refresh_manifest()
+            return (self._manifest or {}).get('metadata')
+
+
+# Global registry instance
+model_registry = ModelRegistry()
@@ -7,17 +7,26 @@ import os
 import sys
 import logging
 import threading
-from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from analytics.train_models import MLModelTrainer
+from analytics.train_models import MLModelTrainer, train_in_subprocess, TRAINING_TIMEOUT
+from analytics.model_registry import model_registry
+from services.job_leases import job_leases
 
 logger = logging.getLogger(__name__)
 
+# Retrain in a child process so model fitting does not compete with the web process's request threads
+TRAIN_IN_SUBPROCESS = os.getenv('ML_TRAINING_SUBPROCESS', 'true').lower() == 'true'
+
+# Every gunicorn worker runs this scheduler; the lease lets only one of them train at a time.
+# It outlives the subprocess timeout, so a crashed holder releases it by expiry.
+TRAINING_LEASE = 'ml_training'
+TRAINING_LEASE_SECONDS = int(os.getenv('ML_TRAINING_LEASE_SECONDS', str(TRAINING_TIMEOUT + 300)))
+
 class MLScheduler:
     def __init__(self):
         self.scheduler = BackgroundScheduler()
@@ -62,7 +71,9 @@ class MLScheduler:
         
         def training_thread():
             try:
-                success = self.trainer.train_all_models()
+                success = self._run_training()
+                if success is None:
+                    return
                 if success:
                     logger.info("✅ Scheduled ML model retraining completed successfully")
                 else:
@@ -79,25 +90,23 @@ class MLScheduler:
         logger.info("🔄 Starting comprehensive ML model retraining...")
         
         def comprehensive_training_thread():
+            # Published versions are immutable and the manifest is swapped atomically, so a failed
+            # run leaves the active version in place; previous versions stay available for rollback
+            previous_version = model_registry.get_status()['manifest_version']
             try:
-                # First backup existing models
-                self._backup_existing_models()
-                
-                # Train new models
-                success = self.trainer.train_all_models()
+                success = self._run_training()
+                if success is None:
+                    return
                 
                 if success:
                     logger.info("✅ Comprehensive ML model retraining completed successfully")
-                    # Clean up old backups (keep last 3 months)
-                    self._cleanup_old_backups()
                 else:
                     logger.error("❌ Comprehensive ML model retraining failed")
-                    # Restore from backup if needed
-                    self._restore_from_backup()
+                    self._restore_version(previous_version)
                     
             except Exception as e:
                 logger.error(f"❌ Error in comprehensive ML training: {str(e)}")
-                self._restore_from_backup()
+                self._restore_version(previous_version)
         
         thread = threading.Thread(target=comprehensive_training_thread, daemon=True)
         thread.start()
@@ -107,7 +116,9 @@ class MLScheduler:
         logger.info("🔄 Starting manual ML model retraining...")
         
         try:
-            success = self.trainer.train_all_models()
+            success = self._run_training()
+            if success is None:
+                return {"success": False, "error": "Training is already running"}
             if success:
                 logger.info("✅ Manual ML model retraining completed successfully")
                 return {"success": True, "message": "Models retrained successfully"}
@@ -118,91 +129,28 @@ class MLScheduler:
             logger.error(f"❌ Error in manual ML training: {str(e)}")
             return {"success": False, "error": str(e)}
     
-    def _backup_existing_models(self):
-        """Backup existing models before retraining"""
-        models_dir = self.trainer.models_dir
-        backup_dir = os.path.join(models_dir, 'backups')
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-        backup_path = os.path.join(backup_dir, f'models_backup_{timestamp}')
-        os.makedirs(backup_path, exist_ok=True)
-        
-        # Copy existing model files
-        import shutil
-        model_files = [
-            'success_model.pkl', 'success_scaler.pkl', 'success_features.pkl',
-            'cycle_time_model.pkl', 'cycle_time_scaler.pkl', 'cycle_time_features.pkl',
-            'anomaly_model.pkl', 'anomaly_scaler.pkl', 'anomaly_features.pkl',
-            'training_metadata.pkl'
-        ]
-        
-        for filename in model_files:
-            src_path = os.path.join(models_dir, filename)
-            if os.path.exists(src_path):
-                dst_path = os.path.join(backup_path, filename)
-                shutil.copy2(src_path, dst_path)
-        
-        logger.info(f"🗂️ Models backed up to {backup_path}")
-    
-    def _restore_from_backup(self):
-        """Restore models from most recent backup"""
-        backup_dir = os.path.join(self.trainer.models_dir, 'backups')
-        if not os.path.exists(backup_dir):
-            logger.warning("⚠️ No backup directory found for model restoration")
-            return
-        
-        # Find most recent backup
-        backups = [d for d in os.listdir(backup_dir) if d.startswith('models_backup_')]
-        if not backups:
-            logger.warning("⚠️ No model backups found for restoration")
-            return
-        
-        latest_backup = sorted(backups)[-1]
-        backup_path = os.path.join(backup_dir, latest_backup)
-        
-        # Restore model files
-        import shutil
-        model_files = [
-            'success_model.pkl', 'success_scaler.pkl', 'success_features.pkl',
-            'cycle_time_model.pkl', 'cycle_time_scaler.pkl', 'cycle_time_features.pkl',
-            'anomaly_model.pkl', 'anomaly_scaler.pkl', 'anomaly_features.pkl',
-            'training_metadata.pkl'
-        ]
-        
-        for filename in model_files:
-            backup_file = os.path.join(backup_path, filename)
-            if os.path.exists(backup_file):
-                dst_path = os.path.join(self.trainer.models_dir, filename)
-                shutil.copy2(backup_file, dst_path)
-        
-        logger.info(f"🔄 Models restored from backup: {latest_backup}")
+    def _run_training(self):
+        """
+        Train all models, in a subprocess when ML_TRAINING_SUBPROCESS is enabled
+
+        Returns None without training if another process holds the training lease
+        """
+        token = job_leases.acquire(TRAINING_LEASE, TRAINING_LEASE_SECONDS)
+        if token is None:
+            logger.info("⏭️ ML training skipped: another process is already training")
+            return None
+        try:
+            if TRAIN_IN_SUBPROCESS:
+                return train_in_subprocess()
+            return self.trainer.train_all_models()
+        finally:
+            job_leases.release(TRAINING_LEASE, token)
     
-    def _cleanup_old_backups(self):
-        """Clean up old model backups (keep last 3 months)"""
-        backup_dir = os.path.join(self.trainer.models_dir, 'backups')
-        if not os.path.exists(backup_dir):
-            return
-        
-        import shutil
-        from datetime import timedelta
-        
-        cutoff_date = datetime.utcnow() - timedelta(days=90)
-        
-        for backup_name in os.listdir(backup_dir):
-            if backup_name.startswith('models_backup_'):
-                try:
-                    # Extract timestamp from backup name
-                    timestamp_str = backup_name.replace('models_backup_', '')
-                    backup_date = datetime.strptime(timestamp_str, '%Y%m%d_%H%M%S')
-                    
-                    if backup_date < cutoff_date:
-                        backup_path = os.path.join(backup_dir, backup_name)
-                        shutil.rmtree(backup_path)
-                        logger.info(f"🗑️ Cleaned up old backup: {backup_name}")
-                        
-                except Exception as e:
-                    logger.warning(f"⚠️ Error cleaning up backup {backup_name}: {str(e)}")
+    def _restore_version(self, version):
+        """Re-activate a model version if a failed run changed the active one"""
+        if version and model_registry.get_status()['manifest_version'] != version:
+            restored = model_registry.rollback()
+            logger.info(f"🔄 Models restored to version {restored}")
     
     def get_status(self):
         """Get scheduler status information"""
@@ -219,7 +167,8 @@ class MLScheduler:
         return {
             'running': self.running,
             'jobs': jobs,
-            'models_directory': self.trainer.models_dir
+            'models_directory': self.trainer.models_dir,
+            'model_registry': model_registry.get_status()
         }
 
 # Global scheduler instance
@@ -5,6 +5,10 @@ Trains models for project success forecasting, cycle-time estimation, and anomal
 
 import os
 import sys
+import shutil
+import argparse
+import subprocess
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import joblib
@@ -18,205 +22,82 @@ from sklearn.metrics import mean_absolute_error, r2_score
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import app, db
-from models import Project, BusinessCase, StatusEnum, PriorityEnum
+# Run as a script (including by train_in_subprocess), importing the app must not start its
+# schedulers, queue workers and flushers in this process
+if __name__ == '__main__':
+    os.environ.setdefault('BACKGROUND_SERVICES', 'false')
+
+from app import app
+from models import StatusEnum
+from analytics.model_registry import model_registry
+from predict.features import load_project_features
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ACTIVE_STATUSES = (StatusEnum.Open.name, StatusEnum.InProgress.name, StatusEnum.In_Progress.name)
+
+# Settings for training in a separate process (see train_in_subprocess)
+TRAINING_N_JOBS = int(os.getenv('ML_TRAINING_N_JOBS', '-1'))
+TRAINING_CHUNKSIZE = int(os.getenv('ML_TRAINING_CHUNKSIZE', '5000'))
+TRAINING_TIMEOUT = int(os.getenv('ML_TRAINING_TIMEOUT', '3600'))
+TRAINING_NICE = int(os.getenv('ML_TRAINING_NICE', '10'))
+
 class MLModelTrainer:
-    def __init__(self):
-        self.models_dir = os.path.join(os.path.dirname(__file__), 'models')
+    def __init__(self, n_jobs=None, chunksize=None):
+        # In-process training (e.g. from a request) stays single-threaded unless asked otherwise
+        self.n_jobs = n_jobs if n_jobs is not None else 1
+        self.chunksize = chunksize or TRAINING_CHUNKSIZE
+        self.models_dir = model_registry.models_dir
         os.makedirs(self.models_dir, exist_ok=True)
+        # Artifacts are written to a staging directory and published as one registry version
+        self.output_dir = self.models_dir
         
     def extract_project_features(self):
         """Extract features and targets from historical project data"""
         logger.info("Extracting project features from database...")
         
         with app.app_context():
-            # Query all completed or active projects with sufficient data
-            projects = db.session.query(Project).join(BusinessCase).all()
-            
-            data = []
-            for project in projects:
-                if not project.business_case:
-                    continue
-                    
-                # Calculate project metrics
-                record = {
-                    'project_id': project.id,
-                    'business_case_id': project.business_case.id,
-                    'cost_estimate': project.business_case.cost_estimate or 0,
-                    'actual_cost': project.business_case.actual_cost or project.business_case.cost_estimate or 0,
-                    'priority': self._encode_priority(project.priority),
-                    'complexity_score': self._calculate_complexity(project),
-                    'team_size': self._get_team_size(project),
-                    'milestone_count': len(project.milestones),
-                    'days_since_start': self._days_since_start(project),
-                    'department_risk': self._get_department_risk(project.business_case.department_id),
-                    'roi_estimate': project.business_case.roi_percentage or 0,
-                }
-                
-                # Target variables
-                record['success_probability'] = self._calculate_success_probability(project)
-                record['cycle_time'] = self._calculate_cycle_time(project)
-                record['cost_variance'] = self._calculate_cost_variance(project)
-                record['is_anomaly'] = self._detect_manual_anomaly(project)
-                
-                data.append(record)
+            # One aggregate query (milestones and distinct team members computed in SQL), read in chunks
+            df = load_project_features(chunksize=self.chunksize)
             
-            if not data:
+            if df.empty:
                 logger.warning("No project data found for training")
                 return pd.DataFrame()
-                
-            df = pd.DataFrame(data)
-            logger.info(f"Extracted {len(df)} project records for training")
-            return df
-    
-    def _encode_priority(self, priority):
-        """Convert priority enum to numeric value"""
-        priority_map = {
-            PriorityEnum.Low: 1,
-            PriorityEnum.Medium: 2,
-            PriorityEnum.High: 3
-        }
-        return priority_map.get(priority, 2)
-    
-    def _calculate_complexity(self, project):
-        """Calculate project complexity score based on multiple factors"""
-        complexity = 0
-        
-        # Base complexity from milestone count
-        complexity += len(project.milestones) * 2
-        
-        # Business case complexity
-        if project.business_case:
-            if project.business_case.cost_estimate and project.business_case.cost_estimate > 50000:
-                complexity += 3
-            if project.business_case.roi_percentage and project.business_case.roi_percentage > 100:
-                complexity += 2
-        
-        # Status complexity
-        if project.status == StatusEnum.OnHold:
-            complexity += 5
-            
-        return min(complexity, 20)  # Cap at 20
-    
-    def _get_team_size(self, project):
-        """Estimate team size based on project assignments"""
-        team_members = set()
-        if project.project_manager_id:
-            team_members.add(project.project_manager_id)
-        if project.business_case and project.business_case.business_analyst_id:
-            team_members.add(project.business_case.business_analyst_id)
-        
-        # Add milestone owners
-        for milestone in project.milestones:
-            if milestone.assigned_to:
-                team_members.add(milestone.assigned_to)
-        
-        return max(len(team_members), 1)
-    
-    def _days_since_start(self, project):
-        """Calculate days since project start"""
-        if not project.start_date:
-            return 0
-        return (datetime.utcnow().date() - project.start_date).days
-    
-    def _get_department_risk(self, department_id):
-        """Calculate department risk factor based on historical performance"""
-        if not department_id:
-            return 5  # Default medium risk
             
-        # Simple risk scoring based on department ID
-        # In practice, this would be based on historical success rates
-        risk_scores = {1: 3, 2: 4, 3: 6, 4: 5, 5: 7}
-        return risk_scores.get(department_id, 5)
-    
-    def _calculate_success_probability(self, project):
-        """Calculate target success probability (1 = success, 0 = failure)"""
-        if project.status == StatusEnum.Completed:
-            # Check if completed on time and within budget
-            on_time = True
-            if project.end_date and project.planned_end_date:
-                on_time = project.end_date <= project.planned_end_date
-            
-            within_budget = True
-            if project.business_case:
-                actual = project.business_case.actual_cost or project.business_case.cost_estimate
-                estimated = project.business_case.cost_estimate
-                if actual and estimated:
-                    within_budget = actual <= estimated * 1.1  # 10% tolerance
-            
-            return 1.0 if (on_time and within_budget) else 0.0
-        
-        # For active projects, estimate based on current performance
-        elif project.status in [StatusEnum.InProgress, StatusEnum.Open]:
-            score = 0.7  # Base optimistic score
+            df = df.reset_index(drop=True)
             
-            # Adjust based on overdue milestones
-            overdue_count = sum(1 for m in project.milestones 
-                              if m.due_date and m.due_date < datetime.utcnow().date() and not m.completed)
-            score -= overdue_count * 0.1
+            # Target variables
+            df['success_probability'] = self._success_probability(df)
+            df['is_anomaly'] = self._manual_anomalies(df)
             
-            # Adjust based on progress
-            completed_milestones = sum(1 for m in project.milestones if m.completed)
-            total_milestones = len(project.milestones)
-            if total_milestones > 0:
-                progress = completed_milestones / total_milestones
-                score = score * 0.5 + progress * 0.5
-            
-            return max(0.0, min(1.0, score))
-        
-        return 0.3  # Default for on-hold or unknown status
+            logger.info(f"Extracted {len(df)} project records for training")
+            return df
     
-    def _calculate_cycle_time(self, project):
-        """Calculate actual or estimated cycle time in days"""
-        if project.business_case and project.business_case.approval_date and project.start_date:
-            return (project.start_date - project.business_case.approval_date).days
-        
-        # Estimate based on complexity and priority
-        base_days = 30
-        complexity_factor = self._calculate_complexity(project) / 10
-        priority_factor = 2.0 - (self._encode_priority(project.priority) / 3.0)
-        
-        return int(base_days * complexity_factor * priority_factor)
+    def _success_probability(self, df):
+        """Target success probability (1 = success, 0 = failure) for every project"""
+        # Completed projects: within budget (10% tolerance); no planned end date is tracked, so on time
+        within_budget = df['actual_cost'] <= df['cost_estimate'] * 1.1
+        completed_score = np.where(within_budget, 1.0, 0.0)
+        
+        # Active projects: optimistic base, reduced per overdue milestone, blended with progress
+        milestones = df['milestone_count'].astype(float)
+        active_score = 0.7 - df['overdue_milestones'].astype(float) * 0.1
+        progress = df['completed_milestones'].astype(float) / milestones.where(milestones > 0)
+        active_score = np.where(milestones > 0, active_score * 0.5 + progress.fillna(0) * 0.5, active_score)
+        active_score = np.clip(active_score, 0.0, 1.0)
+        
+        return np.select(
+            [df['status'] == StatusEnum.Resolved.name, df['status'].isin(ACTIVE_STATUSES)],
+            [completed_score, active_score],
+            default=0.3  # On-hold or unknown status
+        )
     
-    def _calculate_cost_variance(self, project):
-        """Calculate cost variance ratio (actual/estimated)"""
-        if not project.business_case:
-            return 1.0
-            
-        actual = project.business_case.actual_cost
-        estimated = project.business_case.cost_estimate
-        
-        if actual and estimated and estimated > 0:
-            return actual / estimated
-        
-        return 1.0
-    
-    def _detect_manual_anomaly(self, project):
-        """Manual anomaly detection based on business rules"""
-        if not project.business_case:
-            return False
-            
-        # High cost variance
-        cost_variance = self._calculate_cost_variance(project)
-        if cost_variance > 2.0 or cost_variance < 0.5:
-            return True
-            
-        # Very long cycle time
-        cycle_time = self._calculate_cycle_time(project)
-        if cycle_time > 180:  # More than 6 months
-            return True
-            
-        # Too many overdue milestones
-        overdue_count = sum(1 for m in project.milestones 
-                          if m.due_date and m.due_date < datetime.utcnow().date() and not m.completed)
-        if overdue_count > 3:
-            return True
-            
-        return False
+    def _manual_anomalies(self, df):
+        """Rule-based anomaly flags: cost variance, cycle time over 6 months, many overdue milestones"""
+        return ((df['cost_variance'] > 2.0) | (df['cost_variance'] < 0.5)
+                | (df['cycle_time'] > 180)
+                | (df['overdue_milestones'] > 3))
     
     def train_success_model(self, df):
         """Train project success prediction model"""
@@ -242,7 +123,7 @@ class MLModelTrainer:
         X_test_scaled = scaler.transform(X_test)
         
         # Train model
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
+        model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=self.n_jobs)
         
         # Convert to binary classification
         y_train_binary = (y_train > 0.5).astype(int)
@@ -257,9 +138,9 @@ class MLModelTrainer:
             logger.info(f"Success model accuracy: {accuracy:.3f}")
         
         # Save model and scaler
-        joblib.dump(model, os.path.join(self.models_dir, 'success_model.pkl'))
-        joblib.dump(scaler, os.path.join(self.models_dir, 'success_scaler.pkl'))
-        joblib.dump(feature_cols, os.path.join(self.models_dir, 'success_features.pkl'))
+        joblib.dump(model, os.path.join(self.output_dir, 'success_model.pkl'))
+        joblib.dump(scaler, os.path.join(self.output_dir, 'success_scaler.pkl'))
+        joblib.dump(feature_cols, os.path.join(self.output_dir, 'success_features.pkl'))
         
         logger.info("Success model saved successfully")
         return model
@@ -287,7 +168,7 @@ class MLModelTrainer:
         X_test_scaled = scaler.transform(X_test)
         
         # Train model
-        model = LinearRegression()
+        model = LinearRegression(n_jobs=self.n_jobs)
         model.fit(X_train_scaled, y_train)
         
         # Evaluate
@@ -298,9 +179,9 @@ class MLModelTrainer:
             logger.info(f"Cycle time model MAE: {mae:.2f} days, R²: {r2:.3f}")
         
         # Save model and scaler
-        joblib.dump(model, os.path.join(self.models_dir, 'cycle_time_model.pkl'))
-        joblib.dump(scaler, os.path.join(self.models_dir, 'cycle_time_scaler.pkl'))
-        joblib.dump(feature_cols, os.path.join(self.models_dir, 'cycle_time_features.pkl'))
+        joblib.dump(model, os.path.join(self.output_dir, 'cycle_time_model.pkl'))
+        joblib.dump(scaler, os.path.join(self.output_dir, 'cycle_time_scaler.pkl'))
+        joblib.dump(feature_cols, os.path.join(self.output_dir, 'cycle_time_features.pkl'))
         
         logger.info("Cycle time model saved successfully")
         return model
@@ -323,7 +204,7 @@ class MLModelTrainer:
         X_scaled = scaler.fit_transform(X)
         
         # Train isolation forest
-        model = IsolationForest(contamination=0.1, random_state=42)
+        model = IsolationForest(contamination=0.1, random_state=42, n_jobs=self.n_jobs)
         model.fit(X_scaled)
         
         # Evaluate on known anomalies
@@ -334,9 +215,9 @@ class MLModelTrainer:
         logger.info(f"Detected {sum(anomaly_predictions == -1)} anomalies")
         
         # Save model and scaler
-        joblib.dump(model, os.path.join(self.models_dir, 'anomaly_model.pkl'))
-        joblib.dump(scaler, os.path.join(self.models_dir, 'anomaly_scaler.pkl'))
-        joblib.dump(feature_cols, os.path.join(self.models_dir, 'anomaly_features.pkl'))
+        joblib.dump(model, os.path.join(self.output_dir, 'anomaly_model.pkl'))
+        joblib.dump(scaler, os.path.join(self.output_dir, 'anomaly_scaler.pkl'))
+        joblib.dump(feature_cols, os.path.join(self.output_dir, 'anomaly_features.pkl'))
         
         logger.info("Anomaly model saved successfully")
         return model
@@ -354,12 +235,19 @@ class MLModelTrainer:
         
         logger.info(f"Training on {len(df)} records")
         
-        # Train models
-        success_model = self.train_success_model(df)
-        cycle_time_model = self.train_cycle_time_model(df)
-        anomaly_model = self.train_anomaly_model(df)
-        
-        # Save metadata
+        # Train models into a fresh staging directory
+        self.output_dir = model_registry.create_staging_dir()
+        try:
+            success_model = self.train_success_model(df)
+            cycle_time_model = self.train_cycle_time_model(df)
+            anomaly_model = self.train_anomaly_model(df)
+        except Exception:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+            raise
+        finally:
+            staging_dir, self.output_dir = self.output_dir, self.models_dir
+
+        # Metadata lives in the manifest, so it does not change the artifacts' content hash
         metadata = {
             'training_date': datetime.utcnow().isoformat(),
             'data_size': len(df),
@@ -369,15 +257,59 @@ class MLModelTrainer:
                 'anomaly': anomaly_model is not None
             }
         }
-        
-        joblib.dump(metadata, os.path.join(self.models_dir, 'training_metadata.pkl'))
-        
-        logger.info("ML model training pipeline completed successfully")
+
+        if not any(metadata['models_trained'].values()):
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            logger.warning("No models trained; active model version unchanged")
+            return True
+
+        # Keep serving the previous version of any model that could not be retrained
+        for model_type, trained in metadata['models_trained'].items():
+            if not trained and model_registry.carry_forward(staging_dir, model_type):
+                logger.info(f"Keeping previous {model_type} model")
+
+        version = model_registry.publish(staging_dir, metadata)
+        logger.info(f"ML model training pipeline completed successfully (version {version})")
         return True
 
+def train_in_subprocess(n_jobs=None, timeout=None):
+    """
+    Run the training pipeline in a separate Python process
+
+    Web workers pick up the published version through the model registry, so nothing has to be
+    reloaded in this process. The child imports the app with BACKGROUND_SERVICES=false, so it
+    trains only: no workflow workers, schedulers, digest or audit flushers. Returns True if the
+    subprocess exited successfully.
+    """
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, '-m', 'analytics.train_models',
+               '--n-jobs', str(n_jobs if n_jobs is not None else TRAINING_N_JOBS),
+               '--nice', str(TRAINING_NICE)]
+    env = dict(os.environ, BACKGROUND_SERVICES='false', WORKFLOW_QUEUE_AUTOSTART='False')
+    try:
+        result = subprocess.run(command, cwd=project_root, timeout=timeout or TRAINING_TIMEOUT,
+                                capture_output=True, text=True, env=env)
+    except subprocess.TimeoutExpired:
+        logger.error("ML training subprocess timed out")
+        return False
+    
+    if result.returncode != 0:
+        logger.error(f"ML training subprocess failed ({result.returncode}): {result.stderr[-2000:]}")
+        return False
+    return True
+
 def main():
     """Main training script entry point"""
-    trainer = MLModelTrainer()
+    parser = argparse.ArgumentParser(description='Train DeciFrame predictive models')
+    parser.add_argument('--n-jobs', type=int, default=None, help='Parallel jobs for model fitting (-1 = all cores)')
+    parser.add_argument('--chunksize', type=int, default=None, help='Rows per chunk when reading features')
+    parser.add_argument('--nice', type=int, default=0, help='Lower this process priority by N')
+    args = parser.parse_args()
+    
+    if args.nice and hasattr(os, 'nice'):
+        os.nice(args.nice)
+    
+    trainer = MLModelTrainer(n_jobs=args.n_jobs, chunksize=args.chunksize)
     success = trainer.train_all_models()
     
     if success:
@@ -387,4 +319,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
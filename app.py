@@ -25,6 +25,9 @@ logging.basicConfig(level=logging.DEBUG)
 class Base(DeclarativeBase):
     pass
 
+# Background schedulers and workers (see create_app); disabled in one-off processes that import the app
+BACKGROUND_SERVICES = os.getenv('BACKGROUND_SERVICES', 'true').lower() == 'true'
+
 # Initialize Flask extensions
 db = SQLAlchemy(model_class=Base)
 migrate = Migrate()
@@ -85,6 +88,11 @@ def create_app():
                 'api_requests_total', 'Total API Requests', 
                 labels={'method': lambda: request.method}
             )
+            # System/DB gauges are filled by the background metrics sampler
+            from monitoring.sampler import system_sampler
+            system_sampler.register_prometheus(metrics.registry)
+            from notifications.digest import digest_service
+            digest_service.register_prometheus(metrics.registry)
             logging.info("✓ Prometheus metrics initialized at /metrics")
         except ValueError as e:
             if "Duplicated timeseries" in str(e):
@@ -125,10 +133,8 @@ def create_app():
         # Get currency from org preferences if available
         if not currency_code:
             try:
-                from models import OrganizationSettings
-                org_settings = OrganizationSettings.get_organization_settings()
-                currency_code = org_settings.currency if org_settings else 'USD'
-                print(f"🔧 Currency Filter Debug: Retrieved currency_code={currency_code} from org_settings")
+                from utils.preferences import get_org_settings
+                currency_code = get_org_settings().currency
             except Exception as e:
                 print(f"🔧 Currency Filter Debug: Error getting org settings: {e}")
                 currency_code = current_app.config.get('DEFAULT_CURRENCY', 'USD')
@@ -144,9 +150,7 @@ def create_app():
                 'INR': '₹'
             }
             symbol = currency_symbols.get(currency_code, '$')
-            result = f"{symbol}{formatted}"
-            print(f"🔧 Currency Filter Debug: value={value}, currency_code={currency_code}, symbol={symbol}, result={result}")
-            return result
+            return f"{symbol}{formatted}"
         
         return formatted
     
@@ -165,10 +169,8 @@ def create_app():
         # Get format from org preferences if available
         if not format_override:
             try:
-                from models import OrganizationSettings
-                org_settings = OrganizationSettings.get_organization_settings()
-                date_format = org_settings.date_format if org_settings else 'ISO'
-                print(f"🔧 Date Filter Debug: Retrieved date_format={date_format}")
+                from utils.preferences import get_org_settings
+                date_format = get_org_settings().date_format
             except Exception as e:
                 print(f"🔧 Date Filter Debug: Error getting org settings: {e}")
                 date_format = current_app.config.get('DEFAULT_DATE_FORMAT', 'ISO')
@@ -200,11 +202,10 @@ def create_app():
         
         # Get timezone and format from org preferences if available
         try:
-            from models import OrganizationSettings
-            org_settings = OrganizationSettings.get_organization_settings()
-            timezone_name = org_settings.timezone if org_settings else 'UTC'
-            date_format = org_settings.date_format if org_settings else 'ISO'
-            print(f"🔧 Date Filter Debug: Retrieved timezone={timezone_name}, date_format={date_format}")
+            from utils.preferences import get_org_settings
+            org_settings = get_org_settings()
+            timezone_name = org_settings.timezone
+            date_format = org_settings.date_format
         except Exception as e:
             print(f"🔧 Date Filter Debug: Error getting org settings: {e}")
             timezone_name = current_app.config.get('DEFAULT_TIMEZONE', 'UTC')
@@ -253,23 +254,40 @@ def create_app():
     def get_currency_symbol():
         """Global template function to get currency symbol"""
         try:
-            from models import OrganizationSettings
-            org_settings = OrganizationSettings.get_organization_settings()
-            currency_code = org_settings.currency if org_settings else 'USD'
+            from utils.preferences import get_org_settings
+            currency_code = get_org_settings().currency
             currency_symbols = {
                 'USD': '$', 'EUR': '€', 'GBP': '£', 'JPY': '¥',
                 'CAD': 'C$', 'AUD': 'A$', 'CHF': 'CHF', 'CNY': '¥',
                 'INR': '₹'
             }
-            symbol = currency_symbols.get(currency_code, '$')
-            print(f"🔧 Global Currency Symbol Debug: currency_code={currency_code}, symbol={symbol}")
-            return symbol
+            return currency_symbols.get(currency_code, '$')
         except Exception as e:
             print(f"🔧 Global Currency Symbol Debug: Error: {e}")
             return '$'
     
     app.jinja_env.globals.update(get_currency_symbol=get_currency_symbol)
     
+    # Invalidate cached organization preferences when settings or memberships change
+    from utils.preferences import register_preference_signals
+    register_preference_signals()
+    
+    # Maintain navigation badge counters on status and read-flag transitions
+    from services.badge_counters import register_badge_counter_signals
+    register_badge_counter_signals()
+    
+    # Maintain the department closure table on create, move and delete
+    from services.department_closure import register_department_closure_signals
+    register_department_closure_signals()
+    
+    # Precompute AI review insights when items are submitted or their reviewed content changes
+    from services.review_insights import register_review_insight_signals
+    register_review_insight_signals()
+    
+    # Count SQL queries per request and per rendered template
+    from utils.query_counter import init_query_counter
+    init_query_counter(app)
+    
     @app.context_processor
     def inject_org_preferences():
         """Inject organization preferences into all templates"""
@@ -308,27 +326,20 @@ def create_app():
                 'org_settings': OrgSettings(default_currency, default_date_format, default_timezone, default_theme)
             }
         
-        # Get organization settings from database
+        # Get organization settings (request memo + per-org cache, see utils/preferences.py)
         try:
-            from models import OrganizationSettings
-            org_settings = OrganizationSettings.get_organization_settings()
+            from utils.preferences import get_org_settings
+            org_settings = get_org_settings()
         except Exception as e:
             print(f"🔧 Context Processor Debug: Error getting org settings: {e}")
             org_settings = None
         
         # Use user theme preference first, then organization default, then 'light'
-        # Force fresh lookup from database to avoid caching issues
-        from models import User
-        fresh_user = User.query.get(current_user.id) if current_user.id else None
-        user_theme = getattr(fresh_user, 'theme', None) if fresh_user else getattr(current_user, 'theme', None)
+        # current_user is loaded by the user loader on every request, so its theme is already fresh
+        user_theme = getattr(current_user, 'theme', None)
         org_theme = getattr(org_settings, 'default_theme', 'light') if org_settings else 'light'
         theme = user_theme if user_theme else org_theme
         
-        print("🔧 Context Processor Debug:")
-        print(f"   User Theme: {user_theme}")
-        print(f"   Org Theme: {org_theme}")
-        print(f"   Final Theme: {theme}")
-        
         currency = getattr(org_settings, 'currency', current_app.config.get('DEFAULT_CURRENCY', 'USD')) if org_settings else 'USD'
         date_format = getattr(org_settings, 'date_format', current_app.config.get('DEFAULT_DATE_FORMAT', 'ISO')) if org_settings else 'ISO'
         timezone = getattr(org_settings, 'timezone', current_app.config.get('DEFAULT_TIMEZONE', 'UTC')) if org_settings else 'UTC'
@@ -349,12 +360,12 @@ def create_app():
     def inject_first_user_admin():
         """Inject first user admin access context for unrestricted admin setup"""
         unrestricted_admin = False
-        if current_user.is_authenticated:
+        if current_user.is_authenticated and current_user.role.value == 'Admin':
             try:
                 # Check if current user is the first and only user in their organization
-                from models import User
-                org_users = User.query.filter_by(organization_id=current_user.organization_id).count()
-                if org_users == 1 and current_user.role.value == 'Admin':
+                from utils.preferences import get_org_user_count
+                org_users = get_org_user_count(current_user.organization_id)
+                if org_users == 1:
                     unrestricted_admin = True
                     print(f"🔧 First User Admin: Granting unrestricted access to {current_user.email}")
             except Exception as e:
@@ -369,33 +380,14 @@ def create_app():
         
         # Only show counts for users with reviewing roles
         if not current_user.is_authenticated:
-            print("🔧 Badge Debug: User not authenticated")
             return {}
         
-        print(f"🔧 Badge Debug: User {current_user.email} role: {current_user.role}")
-        
         if current_user.role.value not in ['Manager', 'Director', 'CEO', 'PM', 'Admin']:
-            print(f"🔧 Badge Debug: Role {current_user.role.value} not in reviewing roles")
             return {}
         
         try:
-            from models import Epic, BusinessCase, Project
-            
-            pending_epics = Epic.query.filter_by(status='Submitted').count()
-            pending_cases = BusinessCase.query.filter_by(status='Submitted').count()
-            pending_projects = Project.query.filter_by(status='Submitted').count()
-            
-            print(f"🔧 Badge Debug: Counts - Epics: {pending_epics}, Cases: {pending_cases}, Projects: {pending_projects}")
-            
-            result = {
-                'pending_epics': pending_epics,
-                'pending_cases': pending_cases,
-                'pending_projects': pending_projects,
-                'total_pending': pending_epics + pending_cases + pending_projects
-            }
-            
-            print(f"🔧 Badge Debug: Returning context: {result}")
-            return result
+            from services.badge_counters import badge_counters
+            return badge_counters.get_pending_counts(current_user.organization_id)
         except Exception as e:
             print(f"🔧 Badge Debug: Exception occurred: {e}")
             db.session.rollback()  # Rollback failed transaction
@@ -541,6 +533,14 @@ def create_app():
     # Create database tables and load models first to prevent circular imports
     with app.app_context():
         db.create_all()
+        
+        # Backfill the department closure table for departments created before it existed
+        try:
+            from services.department_closure import rebuild_department_closure
+            rebuild_department_closure()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Department closure rebuild failed: {e}")
     
     # Register all blueprints after models are loaded
     try:
@@ -742,29 +742,81 @@ def create_app():
     
     # Note: scheduled doesn't have a routes.py, only send_exec_report.py
     
-    # Initialize workflow automation and scheduled tasks
+    # Server-side sessions (SESSION_BACKEND=database|sqlite; cookie sessions by default) and expiry sweeping
     try:
-        from workflows.integration import initialize_workflow_integrations
-        initialize_workflow_integrations()
-        logging.info("✓ Workflow automation initialized")
+        from session_storage import init_session_store
+        init_session_store(app, sweep=BACKGROUND_SERVICES)
     except Exception as e:
-        logging.warning(f"⚠️ Workflow automation initialization failed: {e}")
+        logging.warning(f"⚠️ Session store failed to initialize, using cookie sessions: {e}")
     
-    # Initialize machine learning training scheduler
-    try:
-        from analytics.scheduler import init_ml_scheduler
-        init_ml_scheduler()
-        logging.info("✓ ML training scheduler initialized")
-    except Exception as e:
-        logging.warning(f"⚠️ ML training scheduler initialization failed: {e}")
+    # Schedulers, queue workers and flushers. Off (BACKGROUND_SERVICES=false) in one-off processes
+    # that import the app, such as the ML training subprocess, so they never process events or send email
+    if BACKGROUND_SERVICES:
+        # Initialize workflow automation and scheduled tasks
+        try:
+            from workflows.integration import initialize_workflow_integrations
+            initialize_workflow_integrations()
+            logging.info("✓ Workflow automation initialized")
+        except Exception as e:
+            logging.warning(f"⚠️ Workflow automation initialization failed: {e}")
     
-    # Initialize automated report scheduler
-    try:
-        from reports.scheduler import init_report_scheduler
-        init_report_scheduler()
-        logging.info("✓ Report scheduler initialized")
-    except Exception as e:
-        logging.warning(f"⚠️ Report scheduler initialization failed: {e}")
+        # Initialize machine learning training scheduler
+        try:
+            from analytics.scheduler import init_ml_scheduler
+            init_ml_scheduler()
+            logging.info("✓ ML training scheduler initialized")
+        except Exception as e:
+            logging.warning(f"⚠️ ML training scheduler initialization failed: {e}")
+    
+        # Initialize automated report scheduler
+        try:
+            from reports.scheduler import init_report_scheduler
+            init_report_scheduler(app)
+            logging.info("✓ Report scheduler initialized")
+        except Exception as e:
+            logging.warning(f"⚠️ Report scheduler initialization failed: {e}")
+    
+        # Sample system and database metrics in the background for the monitoring dashboard
+        try:
+            from monitoring.sampler import system_sampler
+            system_sampler.start(app)
+            logging.info("✓ System metrics sampler started")
+        except Exception as e:
+            logging.warning(f"⚠️ System metrics sampler failed to start: {e}")
+    
+        # Write audit log entries in batches on a background flusher
+        try:
+            from audit.pipeline import audit_pipeline
+            audit_pipeline.start(app)
+            logging.info("✓ Audit log pipeline started")
+        except Exception as e:
+            logging.warning(f"⚠️ Audit log pipeline failed to start: {e}")
+    
+        # Build and send hourly/daily/weekly notification digests from the outbox
+        try:
+            from notifications.digest import digest_service
+            digest_service.start(app)
+            logging.info("✓ Notification digest flusher started")
+        except Exception as e:
+            logging.warning(f"⚠️ Notification digest flusher failed to start: {e}")
+    
+        # Fail import jobs left 'Importing' by a worker that stopped mid-import
+        try:
+            from admin.import_service import ImportService
+            with app.app_context():
+                ImportService.fail_stale_imports()
+        except Exception as e:
+            logging.warning(f"⚠️ Stale import job recovery failed: {e}")
+    
+        # Reconcile badge counters at startup and periodically (catches bulk updates outside the ORM)
+        try:
+            from services.badge_counters import badge_counters
+            badge_counters.start_reconciler(app)
+            logging.info("✓ Badge counter reconciler started")
+        except Exception as e:
+            logging.warning(f"⚠️ Badge counter reconciler failed to start: {e}")
+    else:
+        logging.info("✓ Background services disabled (BACKGROUND_SERVICES=false)")
     
     # Initialize notifications configuration check
     try:
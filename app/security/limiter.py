@@ -2,28 +2,28 @@
 Rate limiting and security headers implementation
 """
 import os
+import math
 import time
-from collections import defaultdict, deque
 from functools import wraps
 from flask import request, jsonify, current_app
 from flask_login import current_user
-
-
-# In-memory rate limit storage - use Redis in production
-rate_limit_storage = defaultdict(lambda: deque())
+from utils.rate_limit_store import create_rate_limit_store, parse_rate_limit
 
 
 class RateLimiter:
-    """Simple in-memory rate limiter"""
+    """GCRA rate limiter; state lives in a RateLimitStore shared by workers (see utils/rate_limit_store.py)"""
     
-    def __init__(self, app=None):
+    def __init__(self, app=None, store=None):
         self.app = app
+        self.store = store
         if app is not None:
             self.init_app(app)
     
     def init_app(self, app):
         """Initialize rate limiter with Flask app"""
         self.app = app
+        if self.store is None:
+            self.store = create_rate_limit_store()
         app.extensions = getattr(app, 'extensions', {})
         app.extensions['rate_limiter'] = self
     
@@ -39,38 +39,33 @@ class RateLimiter:
         def decorator(f):
             @wraps(f)
             def decorated_function(*args, **kwargs):
-                if not self._is_rate_limited(rate_limit, per_user, per_ip):
+                limited, retry_after = self._check(rate_limit, per_user, per_ip)
+                if not limited:
                     return f(*args, **kwargs)
                 else:
-                    return jsonify({
+                    response = jsonify({
                         'error': 'Rate limit exceeded',
                         'message': f'Request rate limit of {rate_limit} exceeded'
-                    }), 429
+                    })
+                    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                    return response, 429
             
             return decorated_function
         return decorator
     
     def _is_rate_limited(self, rate_limit, per_user, per_ip):
         """Check if request should be rate limited"""
+        return self._check(rate_limit, per_user, per_ip)[0]
+    
+    def _check(self, rate_limit, per_user, per_ip):
+        """Record the request against each key; returns (limited, retry_after_seconds)"""
         
         # Parse rate limit (e.g., "10/min" -> 10 requests per 60 seconds)
         try:
-            count, period = rate_limit.split('/')
-            count = int(count)
-            
-            if period == 'min':
-                window_seconds = 60
-            elif period == 'hour':
-                window_seconds = 3600
-            elif period == 'day':
-                window_seconds = 86400
-            else:
-                window_seconds = int(period)  # Assume seconds
-        except ValueError:
+            count, window_seconds = parse_rate_limit(rate_limit)
+        except (ValueError, KeyError):
             current_app.logger.error(f"Invalid rate limit format: {rate_limit}")
-            return False
-        
-        current_time = time.time()
+            return False, 0.0
         
         # Generate keys for rate limiting
         keys = []
@@ -84,22 +79,14 @@ class RateLimiter:
         if not keys:
             keys.append(f"ip:{request.remote_addr}")  # Fallback to IP
         
-        # Check rate limits for each key
+        # Check rate limits for each key (each limit has its own state per key)
+        now = time.time()
         for key in keys:
-            request_times = rate_limit_storage[key]
-            
-            # Remove old requests outside the time window
-            while request_times and request_times[0] < current_time - window_seconds:
-                request_times.popleft()
-            
-            # Check if we're over the limit
-            if len(request_times) >= count:
-                return True
-            
-            # Add current request
-            request_times.append(current_time)
+            allowed, retry_after = self.store.hit(f"{rate_limit}|{key}", count, window_seconds, now)
+            if not allowed:
+                return True, retry_after
         
-        return False
+        return False, 0.0
 
 
 def setup_security_headers(app):
@@ -4,9 +4,10 @@ Comprehensive audit logging system
 
 import json
 from datetime import datetime, timedelta
-from flask import request
+from flask import request, has_request_context
 from flask_login import current_user
 from models import db, AuditLog
+from audit.pipeline import audit_pipeline
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,6 +17,9 @@ def audit(event, obj_type, obj_id=None, before=None, after=None, actor_id=None,
     """
     Create an audit log entry
     
+    The entry is queued on the audit pipeline (audit/pipeline.py) and written in a batch on its own
+    connection; the caller's session is neither committed nor rolled back.
+    
     Args:
         event: Action performed (e.g., 'CREATE_USER', 'UPDATE_ROLE', 'DELETE_DEPARTMENT')
         obj_type: Type of object affected (e.g., 'User', 'Department', 'Organization')
@@ -24,48 +28,81 @@ def audit(event, obj_type, obj_id=None, before=None, after=None, actor_id=None,
         after: New state (dict or object)
         actor_id: User ID performing the action (defaults to current_user)
         details: Additional details about the action
+    
+    Returns:
+        The queued row (dict), or None if it could not be recorded
     """
     try:
         # Get actor information
-        if actor_id is None and current_user.is_authenticated:
+        actor_org_id = None
+        if actor_id is None and current_user and current_user.is_authenticated:
             actor_id = current_user.id
             actor_org_id = current_user.organization_id
-        else:
-            # Fallback for system actions
-            actor_org_id = None
         
-        # Serialize before/after states
-        before_json = _serialize_state(before) if before else None
-        after_json = _serialize_state(after) if after else None
+        if actor_id is None:
+            # audit_logs.user_id is required
+            logger.warning(f"Audit log skipped (no actor): {event} on {obj_type} {obj_id}")
+            return None
         
-        # Create audit log entry
-        audit_entry = AuditLog(
-            user_id=actor_id,
-            action=event,
-            object_type=obj_type,
-            object_id=obj_id,
-            before_state=before_json,
-            after_state=after_json,
-            details=details or f"{event} performed on {obj_type} {obj_id}",
-            ip_address=request.remote_addr if request else None,
-            user_agent=request.headers.get('User-Agent', '') if request else None,
-            organization_id=actor_org_id,
-            timestamp=datetime.utcnow()
-        )
+        if actor_org_id is None:
+            actor_org_id = _organization_of(actor_id)
         
-        db.session.add(audit_entry)
-        db.session.commit()
+        in_request = has_request_context()
+        entry = {
+            'user_id': actor_id,
+            'action': event,
+            'module': request.blueprint if in_request else None,
+            'target': obj_type,
+            'target_id': obj_id if isinstance(obj_id, int) else None,
+            'details': {
+                'message': details or f"{event} performed on {obj_type} {obj_id}",
+                'object_id': obj_id,
+                'organization_id': actor_org_id,
+                'before': _state_for_json(before),
+                'after': _state_for_json(after)
+            },
+            'ip_address': request.remote_addr if in_request else None,
+            'user_agent': (request.headers.get('User-Agent', '') or '')[:500] if in_request else None,
+            'timestamp': datetime.utcnow()
+        }
+        
+        audit_pipeline.record(entry)
         
-        logger.info(f"Audit log created: {event} on {obj_type} {obj_id} by user {actor_id}")
-        return audit_entry
+        logger.info(f"Audit log queued: {event} on {obj_type} {obj_id} by user {actor_id}")
+        return entry
         
     except Exception as e:
         logger.error(f"Failed to create audit log: {e}")
         # Don't let audit failures break the main operation
-        db.session.rollback()
         return None
 
 
+def _organization_of(user_id):
+    """Organization of an explicitly passed actor (identity map first; never flushes the caller's session)"""
+    if current_user and current_user.is_authenticated and current_user.id == user_id:
+        return current_user.organization_id
+    from models import User
+    with db.session.no_autoflush:
+        user = db.session.get(User, user_id)
+    return user.organization_id if user else None
+
+
+def flush_audit_log():
+    """Write all queued audit entries now (tests, scripts, shutdown)"""
+    return audit_pipeline.flush()
+
+
+def _state_for_json(state):
+    """Before/after state as a JSON value for AuditLog.details"""
+    serialized = _serialize_state(state) if state else None
+    if serialized is None:
+        return None
+    try:
+        return json.loads(serialized)
+    except ValueError:
+        return serialized
+
+
 def _serialize_state(state):
     """Serialize an object state to JSON for audit logging"""
     if state is None:
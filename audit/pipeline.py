@@ -0,0 +1,305 @@
+"""
+Asynchronous audit log pipeline
+audit() calls append a row to an in-process buffer and return immediately; a background flusher
+writes the buffer in batches with one multi-row INSERT per batch on its own connection, so audited
+actions neither commit nor roll back the caller's session and do not wait for the audit write.
+
+Each batch is recorded in audit_log_batches with a SHA-256 hash over its rows and the previous
+batch hash of the same writer (one chain per process), which verify_chain() recomputes.
+
+Configuration:
+- AUDIT_PIPELINE_MODE: 'async' (default) or 'sync' (every call is written before it returns;
+  the default when TESTING is set)
+- AUDIT_BUFFER_SIZE: rows held before a caller writes the buffer itself (backpressure; rows are
+  never dropped)
+- AUDIT_BATCH_SIZE / AUDIT_FLUSH_SECONDS: the flusher writes when a batch fills or the interval passes
+- AUDIT_RETRY_SECONDS / AUDIT_RETRY_MAX_SECONDS: backoff while the database is unavailable
+
+When the database is unreachable (OperationalError, or a dropped connection) the batch goes back to
+the front of the buffer and writing pauses with exponential backoff; the buffer keeps growing until
+the database is back. Only a row the database rejects (IntegrityError, e.g. its user was deleted,
+or DataError) is taken out of the buffer: it is logged in full and kept in dead_letters.
+
+flush() is the explicit sync point for tests, scripts and shutdown; it also runs at interpreter exit.
+"""
+
+import os
+import json
+import time
+import atexit
+import socket
+import hashlib
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError, InterfaceError, OperationalError
+
+logger = logging.getLogger(__name__)
+
+AUDIT_PIPELINE_MODE = os.getenv('AUDIT_PIPELINE_MODE', 'sync' if os.getenv('TESTING') else 'async')
+AUDIT_BUFFER_SIZE = int(os.getenv('AUDIT_BUFFER_SIZE', '10000'))
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '500'))
+AUDIT_FLUSH_SECONDS = float(os.getenv('AUDIT_FLUSH_SECONDS', '1.0'))
+AUDIT_RETRY_SECONDS = float(os.getenv('AUDIT_RETRY_SECONDS', '1.0'))
+AUDIT_RETRY_MAX_SECONDS = float(os.getenv('AUDIT_RETRY_MAX_SECONDS', '60.0'))
+AUDIT_DEAD_LETTERS = 1000  # Rejected rows kept for inspection
+
+AUDIT_COLUMNS = ('user_id', 'action', 'module', 'target', 'target_id', 'details',
+                 'ip_address', 'user_agent', 'timestamp')
+
+
+def row_digest(row):
+    """Canonical JSON of one audit row as stored (including its id)"""
+    values = {column: row.get(column) for column in ('id',) + AUDIT_COLUMNS}
+    if isinstance(values['timestamp'], datetime):
+        values['timestamp'] = values['timestamp'].isoformat()
+    return json.dumps(values, sort_keys=True, default=str)
+
+
+def is_unavailable(error):
+    """True if error means the database cannot be reached (retry later), not that a row is bad"""
+    return (isinstance(error, (OperationalError, InterfaceError))
+            or (isinstance(error, DBAPIError) and error.connection_invalidated))
+
+
+class DatabaseUnavailable(Exception):
+    """Raised by _write_batch with the rows it could not write, which go back in the buffer"""
+
+    def __init__(self, error, rows):
+        super().__init__(str(error))
+        self.rows = rows
+
+
+def batch_hash(prev_hash, rows):
+    """Hash of a batch: previous hash in the chain, then each row's canonical JSON in id order"""
+    digest = hashlib.sha256((prev_hash or '').encode('utf-8'))
+    for row in sorted(rows, key=lambda r: r['id']):
+        digest.update(b'\n')
+        digest.update(row_digest(row).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class AuditPipeline:
+    """Buffers audit rows and writes them in hash-chained batches"""
+
+    def __init__(self, mode=AUDIT_PIPELINE_MODE, capacity=AUDIT_BUFFER_SIZE, batch_size=AUDIT_BATCH_SIZE,
+                 interval=AUDIT_FLUSH_SECONDS):
+        self.mode = mode
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.interval = interval
+        self.chain = None
+        self._chain_pid = None
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # One writer at a time keeps the chain linear
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._app = None
+        self._prev_hash = None
+        self._retry_at = 0.0
+        self._retry_delay = 0.0
+        self.dead_letters = deque(maxlen=AUDIT_DEAD_LETTERS)
+        self.stats = {'written': 0, 'batches': 0, 'failed': 0, 'requeued': 0, 'last_batch_ms': None}
+        atexit.register(self.flush)
+
+    def record(self, row):
+        """Queue one audit row (a dict of AUDIT_COLUMNS)"""
+        row = dict(row)
+        row.setdefault('timestamp', datetime.utcnow())
+        with self._lock:
+            self._buffer.append(row)
+            pending = len(self._buffer)
+
+        if self.mode == 'sync' or self._thread is None or not self._thread.is_alive():
+            self.flush()
+        elif pending >= self.capacity:
+            # The flusher is behind: write on the caller's thread rather than grow or drop
+            self.flush()
+        elif pending >= self.batch_size:
+            self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """
+        Write everything buffered so far; returns the number of rows written
+
+        Stops early, leaving the rest buffered, while the database is unavailable.
+        """
+        written = 0
+        while time.monotonic() >= self._retry_at:
+            with self._lock:
+                if not self._buffer:
+                    return written
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            try:
+                written += self._write_batch(batch)
+            except DatabaseUnavailable as e:
+                self._requeue(e.rows, e)
+                break
+            self._retry_delay = 0.0
+        return written
+
+    def _requeue(self, rows, error):
+        """Put rows back at the front of the buffer (in order) and back off before the next write"""
+        with self._lock:
+            self._buffer.extendleft(reversed(rows))
+            pending = len(self._buffer)
+        self._retry_delay = min(max(self._retry_delay * 2, AUDIT_RETRY_SECONDS), AUDIT_RETRY_MAX_SECONDS)
+        self._retry_at = time.monotonic() + self._retry_delay
+        self.stats['requeued'] += len(rows)
+        logger.warning(f"⚠️ Audit database unavailable ({error}); {pending} rows buffered, "
+                       f"retrying in {self._retry_delay:.0f}s")
+
+    # ------------------------------------------------------------------ writing
+
+    def _engine(self):
+        from app import db, app
+        # db.engine needs an application context; the flusher thread and atexit have none
+        with (self._app or app).app_context():
+            return db.engine
+
+    def _write_batch(self, rows):
+        """
+        Write one batch and its hash record
+
+        Raises:
+            DatabaseUnavailable: with the rows that were not written; the caller puts them back
+        """
+        from models import AuditLog, AuditLogBatch
+
+        table = AuditLog.__table__
+        started = time.perf_counter()
+        with self._write_lock:
+            try:
+                engine = self._engine()
+                with engine.begin() as connection:
+                    result = connection.execute(
+                        table.insert().returning(table.c.id, sort_by_parameter_order=True),
+                        [{column: row.get(column) for column in AUDIT_COLUMNS} for row in rows]
+                    )
+                    written = [dict(row, id=inserted_id) for row, (inserted_id,) in zip(rows, result)]
+                    digest = self._record_batch(connection, AuditLogBatch.__table__, written)
+                self._prev_hash = digest
+            except Exception as e:
+                if is_unavailable(e) or not isinstance(e, DBAPIError):
+                    raise DatabaseUnavailable(e, rows) from e
+                # One bad row (e.g. a user deleted meanwhile) must not hold up the rest of the batch
+                logger.warning(f"⚠️ Audit batch of {len(rows)} failed ({e}); writing rows individually")
+                written, unwritten, error = self._write_rows(engine, table, rows)
+                if written:
+                    try:
+                        with engine.begin() as connection:
+                            digest = self._record_batch(connection, AuditLogBatch.__table__, written)
+                        self._prev_hash = digest
+                    except Exception as record_error:
+                        # The rows are stored; only their batch hash is missing from the chain
+                        logger.error(f"❌ Audit batch record for {len(written)} rows failed: {record_error}")
+                if unwritten:
+                    self.stats['written'] += len(written)
+                    raise DatabaseUnavailable(error, unwritten) from error
+
+            self.stats['written'] += len(written)
+            self.stats['batches'] += 1
+            self.stats['last_batch_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return len(written)
+
+    def _write_rows(self, engine, table, rows):
+        """
+        Write rows one at a time; rows the database rejects are dead-lettered
+
+        Returns:
+            (written rows, rows not attempted because the database became unavailable, that error)
+        """
+        written = []
+        for index, row in enumerate(rows):
+            try:
+                with engine.begin() as connection:
+                    inserted_id = connection.execute(
+                        table.insert().returning(table.c.id),
+                        {column: row.get(column) for column in AUDIT_COLUMNS}
+                    ).scalar()
+                written.append(dict(row, id=inserted_id))
+            except (IntegrityError, DataError) as row_error:
+                self.stats['failed'] += 1
+                self.dead_letters.append(row)
+                logger.error(f"❌ Audit row rejected: {row_digest(row)}: {row_error}")
+            except Exception as row_error:
+                return written, rows[index:], row_error
+        return written, [], None
+
+    def _record_batch(self, connection, batch_table, rows):
+        if self._chain_pid != os.getpid():
+            # A new process (including a forked worker) starts its own chain
+            self.chain = f"{socket.gethostname()}:{os.getpid()}:{int(time.time())}"
+            self._chain_pid = os.getpid()
+            self._prev_hash = None
+        digest = batch_hash(self._prev_hash, rows)
+        connection.execute(batch_table.insert(), {
+            'chain': self.chain,
+            'audit_ids': sorted(row['id'] for row in rows),
+            'row_count': len(rows),
+            'prev_hash': self._prev_hash,
+            'batch_hash': digest,
+            'created_at': datetime.utcnow()
+        })
+        return digest
+
+    # ------------------------------------------------------------------ flusher
+
+    def start(self, app):
+        """Start the background flusher (no-op in sync mode or if already running)"""
+        self._app = app
+        if self.mode == 'sync' or (self._thread is not None and self._thread.is_alive()):
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name='audit-flusher')
+        self._thread.start()
+        logger.info(f"📝 Audit pipeline started (batches of {self.batch_size}, every {self.interval}s)")
+        return True
+
+    def stop(self):
+        """Stop the flusher and write what is left"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Audit flush failed: {e}")
+
+
+def verify_chain(session, chain):
+    """
+    Recompute a writer's batch hashes from the stored audit rows
+
+    Returns:
+        (ok, first_bad_batch_id or None)
+    """
+    from models import AuditLog, AuditLogBatch
+
+    prev_hash = None
+    for batch in session.query(AuditLogBatch).filter_by(chain=chain).order_by(AuditLogBatch.id):
+        rows = session.query(AuditLog).filter(AuditLog.id.in_(batch.audit_ids)).all()
+        stored = [{'id': row.id, **{column: getattr(row, column) for column in AUDIT_COLUMNS}} for row in rows]
+        if (batch.prev_hash != prev_hash or len(stored) != batch.row_count
+                or batch_hash(prev_hash, stored) != batch.batch_hash):
+            return False, batch.id
+        prev_hash = batch.batch_hash
+    return True, None
+
+
+# Global audit pipeline
+audit_pipeline = AuditPipeline()
@@ -190,12 +190,7 @@ def new_case():
             db.session.flush()
             print(f"🔧 BusinessCase added to session and flushed, ID: {bc.id}")
             
-            # Generate unique code by finding the next available number
-            existing_codes = [int(c.code[1:]) for c in BusinessCase.query.filter(BusinessCase.code.isnot(None)).all() if c.code and c.code.startswith('C')]
-            next_code_num = 1
-            while next_code_num in existing_codes:
-                next_code_num += 1
-            bc.code = f"C{next_code_num:04d}"
+            # The code (C0001...) is allocated from code_sequences by the before_insert event
             print(f"🔧 Generated code: {bc.code}")
             
             bc.roi = ((bc.benefit_estimate - bc.cost_estimate) / bc.cost_estimate * 100) if bc.cost_estimate else None
@@ -421,10 +416,7 @@ def approve_case(id):
             priority=PriorityEnum.Medium
         )
         db.session.add(project)
-        db.session.flush()
-        
-        # Generate project code after creation
-        project.code = f"PRJ{project.id:04d}"
+        db.session.flush()  # Assigns project.id and its PRJ code (from code_sequences)
         
         # 2) Link existing Epics & Stories to project
         epics = Epic.query.filter_by(case_id=business_case.id, organization_id=current_user.organization_id).all()
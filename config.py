@@ -8,8 +8,10 @@ class Config:
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
         'pool_recycle': 300,
-        'connect_args': {'sslmode': 'prefer'}
     }
+    # sslmode is a libpq option; SQLite (local runs and tests) rejects it
+    if SQLALCHEMY_DATABASE_URI.startswith('postgres'):
+        SQLALCHEMY_ENGINE_OPTIONS['connect_args'] = {'sslmode': 'prefer'}
     
     # Feature flag for hybrid business cases
     ENABLE_HYBRID_CASES = os.getenv('ENABLE_HYBRID_CASES', 'False') == 'True'
@@ -205,7 +205,11 @@ def resource_utilization_demo():
     """Demo API endpoint for resource utilization - no auth required"""
     return _get_resource_utilization()
 
-def _get_problems_trend():
+def _scope(query, column, organization_id):
+    """Restrict a query to one organization when an explicit organization context is given"""
+    return query.filter(column == organization_id) if organization_id is not None else query
+
+def _get_problems_trend(organization_id=None):
     """API endpoint for problem creation trends over last 90 days"""
     
     end_date = datetime.now().date()
@@ -218,6 +222,7 @@ def _get_problems_trend():
     ).filter(
         Problem.created_at >= start_date
     )
+    trends = _scope(trends, Problem.organization_id, organization_id)
     
     # Apply filters directly to aggregation query
     if 'departments' in request.args and request.args.get('departments'):
@@ -261,7 +266,7 @@ def case_conversion():
     """API endpoint for Problem→BusinessCase conversion ratios by month"""
     return _get_case_conversion()
 
-def _get_case_conversion():
+def _get_case_conversion(organization_id=None):
     """API endpoint for Problem→BusinessCase conversion ratios by month"""
     
     # Get monthly data for the last 12 months
@@ -275,7 +280,8 @@ def _get_case_conversion():
         func.count(Problem.id).label('problem_count')
     ).filter(
         Problem.created_at >= start_date
-    ).group_by(
+    )
+    problems_by_month = _scope(problems_by_month, Problem.organization_id, organization_id).group_by(
         extract('year', Problem.created_at),
         extract('month', Problem.created_at)
     ).all()
@@ -290,7 +296,8 @@ def _get_case_conversion():
             BusinessCase.created_at >= start_date,
             BusinessCase.problem_id.isnot(None)  # Only reactive cases
         )
-    ).group_by(
+    )
+    cases_by_month = _scope(cases_by_month, BusinessCase.organization_id, organization_id).group_by(
         extract('year', BusinessCase.created_at),
         extract('month', BusinessCase.created_at)
     ).all()
@@ -332,11 +339,11 @@ def project_metrics():
     """API endpoint for project on-time vs delayed percentages"""
     return _get_project_metrics()
 
-def _get_project_metrics():
+def _get_project_metrics(organization_id=None):
     """API endpoint for project on-time vs delayed percentages"""
     
     # Get all projects with end dates
-    projects = Project.query.filter(Project.end_date != None).all()
+    projects = _scope(Project.query.filter(Project.end_date != None), Project.organization_id, organization_id).all()
     
     if not projects:
         return jsonify({
@@ -385,13 +392,13 @@ def status_breakdown():
     """API endpoint for status distribution across all entities"""
     return _get_status_breakdown()
 
-def _get_status_breakdown():
+def _get_status_breakdown(organization_id=None):
     """API endpoint for status distribution across all entities"""
     
     # Apply filters if provided
-    problem_query = Problem.query
-    case_query = BusinessCase.query  
-    project_query = Project.query
+    problem_query = _scope(Problem.query, Problem.organization_id, organization_id)
+    case_query = _scope(BusinessCase.query, BusinessCase.organization_id, organization_id)
+    project_query = _scope(Project.query, Project.organization_id, organization_id)
     
     if 'departments' in request.args:
         dept_ids = [int(d) for d in request.args.get('departments').split(',') if d.isdigit()]
@@ -686,7 +693,7 @@ def resource_utilization():
 
 # Duplicate removed - using the original at line 204
 
-def _get_department_heatmap():
+def _get_department_heatmap(organization_id=None):
     """Generate department heat-map data with filtering support"""
     filters = parse_filters()
     
@@ -697,6 +704,7 @@ def _get_department_heatmap():
     ).outerjoin(
         Problem, Problem.department_id == Department.id
     )
+    problem_query = _scope(problem_query, Department.organization_id, organization_id)
     problem_query = apply_problem_filters(problem_query, filters)
     problem_metrics = problem_query.group_by(Department.id, Department.name).all()
     
@@ -710,6 +718,7 @@ def _get_department_heatmap():
     ).outerjoin(
         BusinessCase, BusinessCase.problem_id == Problem.id
     )
+    case_query = _scope(case_query, Department.organization_id, organization_id)
     case_query = apply_case_filters(case_query, filters)
     case_metrics = case_query.group_by(Department.id, Department.name).all()
     
@@ -720,6 +729,7 @@ def _get_department_heatmap():
     ).outerjoin(
         Project, Project.department_id == Department.id
     )
+    project_query = _scope(project_query, Department.organization_id, organization_id)
     project_query = apply_project_filters(project_query, filters)
     project_metrics = project_query.group_by(Department.id, Department.name).all()
     
@@ -758,7 +768,7 @@ def _get_department_heatmap():
     
     return jsonify(heatmap_data)
 
-def _get_time_to_value():
+def _get_time_to_value(organization_id=None):
     """Calculate time-to-value distribution"""
     time_data = db.session.query(
         BusinessCase.created_at,
@@ -769,7 +779,8 @@ def _get_time_to_value():
         Project, Project.business_case_id == BusinessCase.id
     ).filter(
         Project.start_date is not None
-    ).all()
+    )
+    time_data = _scope(time_data, BusinessCase.organization_id, organization_id).all()
     
     approval_to_start = []
     start_to_completion = []
@@ -814,9 +825,9 @@ def _get_time_to_value():
         'start_to_completion': completion_buckets
     })
 
-def _get_risks_issues():
+def _get_risks_issues(organization_id=None):
     """Get risk and issue backlog data"""
-    projects = Project.query.all()
+    projects = _scope(Project.query, Project.organization_id, organization_id).all()
     risk_data = []
     
     for project in projects:
@@ -840,14 +851,14 @@ def _get_risks_issues():
     
     return jsonify(risk_data)
 
-def _get_milestone_burndown(project_id=None):
+def _get_milestone_burndown(project_id=None, organization_id=None):
     """Get milestone burn-down data"""
     if project_id:
         projects = [Project.query.get(project_id)] if Project.query.get(project_id) else []
     else:
-        projects = Project.query.filter(
+        projects = _scope(Project.query.filter(
             Project.status.in_([StatusEnum.Open, StatusEnum.InProgress])
-        ).limit(3).all()
+        ), Project.organization_id, organization_id).limit(3).all()
     
     burndown_data = []
     
@@ -884,12 +895,12 @@ def _get_milestone_burndown(project_id=None):
     
     return jsonify(burndown_data)
 
-def _get_roi_waterfall():
+def _get_roi_waterfall(organization_id=None):
     """Generate ROI waterfall chart data"""
-    cases = BusinessCase.query.filter(
+    cases = _scope(BusinessCase.query.filter(
         BusinessCase.cost_estimate > 0,
         BusinessCase.benefit_estimate > 0
-    ).order_by((BusinessCase.benefit_estimate - BusinessCase.cost_estimate).desc()).limit(10).all()
+    ), BusinessCase.organization_id, organization_id).order_by((BusinessCase.benefit_estimate - BusinessCase.cost_estimate).desc()).limit(10).all()
     
     waterfall_data = []
     for case in cases:
@@ -903,11 +914,11 @@ def _get_roi_waterfall():
     
     return jsonify(waterfall_data)
 
-def _get_problem_clusters():
+def _get_problem_clusters(organization_id=None):
     """Analyze problem clusters and resolution patterns"""
-    recent_problems = Problem.query.filter(
+    recent_problems = _scope(Problem.query.filter(
         Problem.created_at >= datetime.now() - timedelta(days=30)
-    ).all()
+    ), Problem.organization_id, organization_id).all()
     
     clusters = {}
     business_terms = ['cost', 'efficiency', 'process', 'quality', 'customer', 'system', 'performance', 'security', 'workflow', 'data']
@@ -943,17 +954,17 @@ def _get_problem_clusters():
     
     return jsonify(cluster_data)
 
-def _get_resource_utilization():
+def _get_resource_utilization(organization_id=None):
     """Calculate resource utilization for BAs/PMs"""
-    ba_pm_users = User.query.filter(
+    ba_pm_users = _scope(User.query.filter(
         User.role.in_([RoleEnum.BA, RoleEnum.PM])
-    ).all()
+    ), User.organization_id, organization_id).all()
     
     total_capacity_hours = len(ba_pm_users) * 40 * 4  # 40 hours/week * 4 weeks
     
-    active_projects = Project.query.filter(
+    active_projects = _scope(Project.query.filter(
         Project.status.in_([StatusEnum.Open, StatusEnum.InProgress])
-    ).all()
+    ), Project.organization_id, organization_id).all()
     
     assigned_hours = len(active_projects) * 20  # 20 hours per active project
     
@@ -189,8 +189,11 @@ def demonstrate_ml_training():
             if success:
                 print("✓ Models trained successfully")
                 
-                # Check model files
-                models_dir = trainer.models_dir
+                # Check model files of the published version
+                from analytics.model_registry import model_registry
+                version = model_registry.get_status()['manifest_version']
+                print(f"  Active model version: {version}")
+                models_dir = os.path.join(model_registry.versions_dir, version or '')
                 model_files = ['success_model.pkl', 'cycle_time_model.pkl', 'anomaly_model.pkl']
                 
                 for model_file in model_files:
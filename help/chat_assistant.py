@@ -1,13 +1,11 @@
 """
 Help Assistant Chat Widget
-Provides intelligent responses to user queries by indexing help article content
+Provides intelligent responses to user queries from the help article retrieval index
 """
 import os
 from flask import Blueprint, request, jsonify, render_template
-from models import HelpArticle, HelpCategory
 from openai import OpenAI
-import markdown
-import re
+from help.retrieval import help_index
 
 help_chat_bp = Blueprint('help_chat', __name__, url_prefix='/help/chat')
 
@@ -15,42 +13,42 @@ help_chat_bp = Blueprint('help_chat', __name__, url_prefix='/help/chat')
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
-def get_indexed_help_content():
-    """Get all help articles indexed for LLM processing"""
-    articles = HelpArticle.query.join(HelpCategory).order_by(
-        HelpCategory.sort_order, HelpArticle.sort_order
-    ).all()
-    
-    indexed_content = []
-    for article in articles:
-        # Convert markdown to plain text for better LLM processing
-        plain_content = markdown.markdown(article.content, extensions=['tables'])
-        # Remove HTML tags for cleaner text
-        clean_content = re.sub(r'<[^>]+>', '', plain_content)
-        clean_content = re.sub(r'\n+', '\n', clean_content).strip()
-        
-        indexed_content.append({
-            'title': article.title,
-            'slug': article.slug,
-            'category': article.category.name,
-            'content': clean_content
+HELP_CONTEXT_CHUNKS = int(os.environ.get('HELP_CHAT_CONTEXT_CHUNKS', '5'))
+MAX_RELEVANT_ARTICLES = 3
+
+def get_indexed_help_content(user_query, k=HELP_CONTEXT_CHUNKS):
+    """Get the help article passages most relevant to the question (BM25 over the help index)"""
+    return help_index.search(user_query, k=k)
+
+def _relevant_articles(help_content):
+    """Distinct articles in ranking order, for the links shown under the answer"""
+    articles, seen = [], set()
+    for chunk in help_content:
+        if chunk['slug'] in seen:
+            continue
+        seen.add(chunk['slug'])
+        articles.append({
+            'title': chunk['title'],
+            'slug': chunk['slug'],
+            'category': chunk['category']
         })
-    
-    return indexed_content
+    return articles[:MAX_RELEVANT_ARTICLES]
 
 def generate_help_response(user_query, help_content):
-    """Generate intelligent response using LLM with indexed help content"""
+    """Generate intelligent response using LLM with the retrieved help passages"""
+    relevant_articles = _relevant_articles(help_content)
+    
     if not openai_client:
         return {
             'response': 'I\'m sorry, but the AI assistant is currently unavailable. Please browse the help articles directly or contact support.',
-            'relevant_articles': []
+            'relevant_articles': relevant_articles
         }
     
-    # Create context from all help articles
+    # Create context from the top-ranked passages only
     context = "DeciFrame Help Articles:\n\n"
-    for article in help_content:
-        context += f"**{article['title']}** (Category: {article['category']})\n"
-        context += f"{article['content']}\n\n"
+    for chunk in help_content:
+        context += f"**{chunk['title']}** (Category: {chunk['category']})\n"
+        context += f"{chunk['content']}\n\n"
     
     # Create the prompt for intelligent response
     prompt = f"""You are DeciFrame's Help Assistant. Based on the help articles provided, answer the user's question with VERY BRIEF, actionable guidance.
@@ -86,20 +84,9 @@ See the help articles below for more details."""
         
         ai_response = response.choices[0].message.content
         
-        # Find relevant articles based on response content
-        relevant_articles = []
-        for article in help_content:
-            if (article['title'].lower() in ai_response.lower() or 
-                any(keyword in article['content'].lower() for keyword in user_query.lower().split())):
-                relevant_articles.append({
-                    'title': article['title'],
-                    'slug': article['slug'],
-                    'category': article['category']
-                })
-        
         return {
             'response': ai_response,
-            'relevant_articles': relevant_articles[:3]  # Limit to top 3 relevant articles
+            'relevant_articles': relevant_articles
         }
         
     except Exception as e:
@@ -121,12 +108,17 @@ def ask_assistant():
                 'error': 'Please provide a question'
             }), 400
         
-        # Get indexed help content
-        help_content = get_indexed_help_content()
+        # Retrieve the passages relevant to this question
+        help_content = get_indexed_help_content(user_query)
         
         if not help_content:
+            if not help_index.get_status()['articles_indexed']:
+                return jsonify({
+                    'response': 'No help articles are currently available. Please contact support for assistance.',
+                    'relevant_articles': []
+                })
             return jsonify({
-                'response': 'No help articles are currently available. Please contact support for assistance.',
+                'response': 'I couldn\'t find help articles matching your question. Try different keywords or browse the help articles directly.',
                 'relevant_articles': []
             })
         
@@ -149,7 +141,8 @@ def widget():
 @help_chat_bp.route('/status')
 def status():
     """Check help assistant availability status"""
-    help_articles_count = HelpArticle.query.count()
+    help_index.refresh()
+    help_articles_count = help_index.get_status()['articles_indexed']
     ai_available = bool(OPENAI_API_KEY)
     
     return jsonify({
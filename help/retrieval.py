@@ -0,0 +1,218 @@
+"""
+Help Article Retrieval Index
+BM25 ranking over pre-rendered help article chunks, so the help chat assistant sends only the
+few passages relevant to a question to the LLM instead of the whole help center.
+
+Article plain text (markdown rendered and stripped once) and its chunks are stored on disk in
+HELP_INDEX_DIR/help_index.json. Before each search the index compares article ids and
+updated_at stamps with the database and re-renders only articles that were created, edited or
+deleted since the last refresh, so admin edits are picked up by every worker without a rebuild.
+"""
+
+import os
+import re
+import json
+import math
+import html
+import uuid
+import logging
+import threading
+from collections import Counter
+import markdown
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.getenv('HELP_INDEX_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index'))
+CHUNK_WORDS = int(os.getenv('HELP_INDEX_CHUNK_WORDS', '120'))
+BM25_K1 = 1.5
+BM25_B = 0.75
+TITLE_WEIGHT = 2  # Title tokens are counted this many times in every chunk of the article
+
+STOPWORDS = frozenset("""
+    a an and are as at be by can do does for from how i in is it of on or that the this to
+    what when where which who why will with you your my me we our
+""".split())
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords removed and a light plural/verb suffix strip"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        for suffix in ('ing', 'ed', 'es', 's'):
+            if len(token) > len(suffix) + 3 and token.endswith(suffix):
+                token = token[:-len(suffix)]
+                break
+        tokens.append(token)
+    return tokens
+
+
+def render_plain_text(content):
+    """Markdown (or HTML) article content as plain text"""
+    rendered = markdown.markdown(content or '', extensions=['tables'])
+    text = html.unescape(re.sub(r'<[^>]+>', '', rendered))
+    return re.sub(r'\n+', '\n', text).strip()
+
+
+def split_chunks(text, chunk_words=CHUNK_WORDS):
+    """Split plain text into passages of about chunk_words words, keeping paragraphs together"""
+    chunks, current, size = [], [], 0
+    for paragraph in text.split('\n'):
+        words = len(paragraph.split())
+        if not words:
+            continue
+        if current and size + words > chunk_words:
+            chunks.append('\n'.join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += words
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+class HelpRetrievalIndex:
+    """BM25 index over help article chunks, refreshed incrementally from the database"""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_path = os.path.join(index_dir, 'help_index.json')
+        self._lock = threading.Lock()
+        self._articles = None       # article id (str) -> {'stamp', 'title', 'slug', 'category', 'chunks'}
+        self._postings = {}         # term -> [(chunk position, term frequency)]
+        self._chunks = []           # (article id, chunk text, chunk length)
+        self._avg_length = 0.0
+
+    # ------------------------------------------------------------------ building
+
+    def refresh(self):
+        """Re-render changed articles and drop deleted ones; returns the number of articles changed"""
+        from models import HelpArticle, HelpCategory
+        from app import db
+
+        stamps = {
+            str(article_id): f'{updated_at}|{category_name}'
+            for article_id, updated_at, category_name in db.session.query(
+                HelpArticle.id, HelpArticle.updated_at, HelpCategory.name
+            ).join(HelpCategory, HelpCategory.id == HelpArticle.category_id)
+        }
+
+        with self._lock:
+            if self._articles is None:
+                self._articles = self._load()
+                self._build_postings()
+
+            changed_ids = [int(aid) for aid, stamp in stamps.items()
+                           if self._articles.get(aid, {}).get('stamp') != stamp]
+            deleted_ids = [aid for aid in self._articles if aid not in stamps]
+            if not changed_ids and not deleted_ids:
+                return 0
+
+            for aid in deleted_ids:
+                del self._articles[aid]
+            if changed_ids:
+                for article in HelpArticle.query.filter(HelpArticle.id.in_(changed_ids)).all():
+                    aid = str(article.id)
+                    self._articles[aid] = {
+                        'stamp': stamps.get(aid),
+                        'title': article.title,
+                        'slug': article.slug,
+                        'category': article.category.name,
+                        'chunks': split_chunks(render_plain_text(article.content)) or [article.title]
+                    }
+
+            self._build_postings()
+            self._save()
+            changed = len(changed_ids) + len(deleted_ids)
+            logger.info(f"📚 Help index refreshed: {changed} article(s) updated, {len(self._articles)} indexed")
+            return changed
+
+    def _build_postings(self):
+        postings, chunks, total_length = {}, [], 0
+        for aid, article in self._articles.items():
+            title_tokens = tokenize(article['title']) * TITLE_WEIGHT
+            for text in article['chunks']:
+                tokens = title_tokens + tokenize(text)
+                position = len(chunks)
+                chunks.append((aid, text, len(tokens)))
+                total_length += len(tokens)
+                for term, frequency in Counter(tokens).items():
+                    postings.setdefault(term, []).append((position, frequency))
+        self._postings = postings
+        self._chunks = chunks
+        self._avg_length = total_length / len(chunks) if chunks else 0.0
+
+    def _load(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f).get('articles', {})
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logger.error(f"Unreadable help index {self.index_path}, rebuilding: {e}")
+            return {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = f'{self.index_path}.{uuid.uuid4().hex}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'articles': self._articles}, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not persist help index: {e}")
+
+    # ------------------------------------------------------------------ searching
+
+    def search(self, query, k=5):
+        """
+        Rank article chunks for a question with BM25
+
+        Returns:
+            Up to k dicts {'article_id', 'title', 'slug', 'category', 'content', 'score'}, best first
+        """
+        self.refresh()
+        terms = set(tokenize(query))
+        with self._lock:
+            n_chunks = len(self._chunks)
+            if not terms or not n_chunks:
+                return []
+            scores = Counter()
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+                for position, frequency in postings:
+                    length = self._chunks[position][2]
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self._avg_length)
+                    scores[position] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+            results = []
+            for position, score in scores.most_common(k):
+                aid, text, _ = self._chunks[position]
+                article = self._articles[aid]
+                results.append({
+                    'article_id': int(aid),
+                    'title': article['title'],
+                    'slug': article['slug'],
+                    'category': article['category'],
+                    'content': text,
+                    'score': round(score, 4)
+                })
+            return results
+
+    def get_status(self):
+        with self._lock:
+            return {
+                'articles_indexed': len(self._articles or {}),
+                'chunks': len(self._chunks),
+                'terms': len(self._postings),
+                'index_path': self.index_path
+            }
+
+
+# Global help retrieval index
+help_index = HelpRetrievalIndex()
@@ -0,0 +1,427 @@
+"""
+Shared metrics cache for the executive dashboard.
+
+Computed metrics are stored in a backend that every gunicorn worker can see, so an
+organization's metrics are computed once for the whole deployment rather than once per
+worker, and an invalidation in one worker is visible to all of them.
+
+Backends (METRICS_CACHE_BACKEND):
+- 'memory': in-process dict; per worker, for development and tests
+- 'sqlite': a shared SQLite file in the instance folder (or METRICS_CACHE_PATH), bounded to
+  METRICS_CACHE_MAXSIZE entries; the default
+- 'redis':  Redis at METRICS_CACHE_REDIS_URL / REDIS_URL (requires the redis package)
+
+MetricsCache layers the read policy on top of a backend:
+- single-flight: a per-key lock held in the backend, so only one worker recomputes a key
+- stale-while-revalidate: expired or invalidated entries are served while one worker
+  refreshes them in the background, so the dashboard is not blocked on a recompute
+- invalidation marks an entry stale (invalidated_at) instead of deleting it; entries
+  computed from a snapshot older than the invalidation are never treated as fresh
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from utils.local_state import instance_file
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv('METRICS_CACHE_BACKEND', 'sqlite')
+CACHE_REDIS_URL = os.getenv('METRICS_CACHE_REDIS_URL', os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+CACHE_TTL = int(os.getenv('METRICS_CACHE_TTL', '300'))
+CACHE_STALE_TTL = int(os.getenv('METRICS_CACHE_STALE_TTL', '3600'))
+CACHE_LOCK_TIMEOUT = int(os.getenv('METRICS_CACHE_LOCK_TIMEOUT', '30'))
+CACHE_MAXSIZE = int(os.getenv('METRICS_CACHE_MAXSIZE', '256'))
+
+
+class CacheEntry:
+    """A cached value with the time its data was read and the time it was last invalidated"""
+
+    __slots__ = ('value', 'stored_at', 'invalidated_at')
+
+    def __init__(self, value, stored_at, invalidated_at=0.0):
+        self.value = value
+        self.stored_at = stored_at
+        self.invalidated_at = invalidated_at or 0.0
+
+
+class CacheBackend:
+    """Storage interface for MetricsCache"""
+
+    name = 'base'
+
+    def get(self, key):
+        """Return the CacheEntry for key, or None"""
+        raise NotImplementedError
+
+    def set(self, key, value, stored_at):
+        """Store value; keeps any existing invalidated_at"""
+        raise NotImplementedError
+
+    def invalidate(self, key, invalidated_at):
+        """Mark key stale as of invalidated_at (visible to every worker sharing the backend)"""
+        raise NotImplementedError
+
+    def acquire_lock(self, key, timeout):
+        """Try to take the recompute lock for key; returns an owner token or None"""
+        raise NotImplementedError
+
+    def release_lock(self, key, token):
+        raise NotImplementedError
+
+    def size(self):
+        raise NotImplementedError
+
+
+class InProcessCacheBackend(CacheBackend):
+    """Per-process cache (no sharing between workers)"""
+
+    name = 'memory'
+
+    def __init__(self, maxsize=CACHE_MAXSIZE, retention=CACHE_TTL + CACHE_STALE_TTL):
+        self.maxsize = maxsize
+        self.retention = retention
+        self._entries = OrderedDict()
+        self._locks = {}
+        self._mutex = threading.Lock()
+
+    def get(self, key):
+        with self._mutex:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry.stored_at > self.retention:
+                del self._entries[key]
+                return None
+            return entry
+
+    def set(self, key, value, stored_at):
+        with self._mutex:
+            previous = self._entries.pop(key, None)
+            self._entries[key] = CacheEntry(value, stored_at, previous.invalidated_at if previous else 0.0)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key, invalidated_at):
+        with self._mutex:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.invalidated_at = invalidated_at
+
+    def acquire_lock(self, key, timeout):
+        now = time.time()
+        with self._mutex:
+            held = self._locks.get(key)
+            if held and held[1] > now:
+                return None
+            token = uuid.uuid4().hex
+            self._locks[key] = (token, now + timeout)
+            return token
+
+    def release_lock(self, key, token):
+        with self._mutex:
+            held = self._locks.get(key)
+            if held and held[0] == token:
+                del self._locks[key]
+
+    def size(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache shared by all workers on a host through a SQLite file in WAL mode"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=None, retention=CACHE_TTL + CACHE_STALE_TTL, maxsize=CACHE_MAXSIZE):
+        self.path = path or instance_file('metrics_cache.sqlite3', 'METRICS_CACHE_PATH')
+        self.retention = retention
+        self.maxsize = maxsize
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS metrics_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    stored_at REAL NOT NULL DEFAULT 0,
+                    invalidated_at REAL NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS metrics_cache_locks (
+                    key TEXT PRIMARY KEY,
+                    token TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        # One connection per thread, reopened after fork (connections must not cross processes)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value, stored_at, invalidated_at FROM metrics_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[0] is None or time.time() - row[1] > self.retention:
+            return None
+        return CacheEntry(json.loads(row[0]), row[1], row[2])
+
+    def set(self, key, value, stored_at):
+        conn = self._connect()
+        conn.execute("""
+            INSERT INTO metrics_cache (key, value, stored_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, stored_at = excluded.stored_at
+        """, (key, json.dumps(value, default=str), stored_at))
+        conn.execute("DELETE FROM metrics_cache WHERE stored_at < ? AND invalidated_at < ?",
+                     (time.time() - self.retention, time.time() - self.retention))
+        # Keep the most recently written or invalidated maxsize entries
+        conn.execute("""
+            DELETE FROM metrics_cache WHERE key IN (
+                SELECT key FROM metrics_cache ORDER BY MAX(stored_at, invalidated_at) DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.maxsize,))
+
+    def invalidate(self, key, invalidated_at):
+        self._connect().execute("""
+            INSERT INTO metrics_cache (key, invalidated_at) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET invalidated_at = excluded.invalidated_at
+        """, (key, invalidated_at))
+
+    def acquire_lock(self, key, timeout):
+        conn = self._connect()
+        now = time.time()
+        token = uuid.uuid4().hex
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM metrics_cache_locks WHERE key = ? AND expires_at < ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO metrics_cache_locks (key, token, expires_at) VALUES (?, ?, ?)",
+                (key, token, now + timeout)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return token if cursor.rowcount == 1 else None
+
+    def release_lock(self, key, token):
+        self._connect().execute("DELETE FROM metrics_cache_locks WHERE key = ? AND token = ?", (key, token))
+
+    def size(self):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM metrics_cache WHERE value IS NOT NULL"
+        ).fetchone()[0]
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache shared across hosts through Redis hashes"""
+
+    name = 'redis'
+    PREFIX = 'deciframe:'
+
+    # Delete the lock only if we still own it
+    _RELEASE_SCRIPT = """
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            return redis.call('del', KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, url=CACHE_REDIS_URL, retention=CACHE_TTL + CACHE_STALE_TTL):
+        self.client = redis.Redis.from_url(url)
+        self.retention = retention
+        self.client.ping()
+
+    def get(self, key):
+        data = self.client.hgetall(self.PREFIX + key)
+        if not data or b'value' not in data:
+            return None
+        return CacheEntry(json.loads(data[b'value']), float(data[b'stored_at']),
+                          float(data.get(b'invalidated_at', 0)))
+
+    def set(self, key, value, stored_at):
+        name = self.PREFIX + key
+        pipe = self.client.pipeline()
+        pipe.hset(name, mapping={'value': json.dumps(value, default=str), 'stored_at': stored_at})
+        pipe.expire(name, self.retention)
+        pipe.execute()
+
+    def invalidate(self, key, invalidated_at):
+        name = self.PREFIX + key
+        pipe = self.client.pipeline()
+        pipe.hset(name, 'invalidated_at', invalidated_at)
+        pipe.expire(name, self.retention)
+        pipe.execute()
+
+    def acquire_lock(self, key, timeout):
+        token = uuid.uuid4().hex
+        if self.client.set(self.PREFIX + 'lock:' + key, token, nx=True, ex=timeout):
+            return token
+        return None
+
+    def release_lock(self, key, token):
+        self.client.eval(self._RELEASE_SCRIPT, 1, self.PREFIX + 'lock:' + key, token)
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(self.PREFIX + 'metrics:*'))
+
+
+def create_cache_backend(name=CACHE_BACKEND):
+    """Build the configured backend, falling back to a per-process cache if it is unavailable"""
+    try:
+        if name == 'redis':
+            if not REDIS_AVAILABLE:
+                raise RuntimeError("redis package is not installed")
+            return RedisCacheBackend()
+        if name == 'sqlite':
+            return SQLiteCacheBackend()
+    except Exception as e:
+        print(f"⚠️ Metrics cache backend '{name}' unavailable ({e}); using in-process cache")
+    return InProcessCacheBackend()
+
+
+class MetricsCache:
+    """Single-flight, stale-while-revalidate cache on top of a CacheBackend"""
+
+    def __init__(self, backend=None, ttl=CACHE_TTL, stale_ttl=CACHE_STALE_TTL,
+                 lock_timeout=CACHE_LOCK_TIMEOUT):
+        self.backend = backend or create_cache_backend()
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.lock_timeout = lock_timeout
+        self._stats_lock = threading.Lock()
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0,
+                      'lock_waits': 0, 'errors': 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def is_fresh(self, entry, now=None):
+        now = now or time.time()
+        return entry.stored_at >= entry.invalidated_at and now - entry.stored_at < self.ttl
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """
+        Return the cached value for key, computing it at most once across workers.
+
+        compute() returns the value; cacheable(value) may veto storing it (e.g. error payloads).
+        Fresh entries are returned directly. Stale entries are returned immediately and one
+        worker refreshes them in a background thread. On a miss one worker computes while the
+        others wait for its result (up to lock_timeout) instead of recomputing in parallel.
+        """
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Metrics cache read failed for {key}: {e}")
+            self._count('errors')
+            return compute()
+
+        now = time.time()
+        if entry is not None and self.is_fresh(entry, now):
+            self._count('hits')
+            return entry.value
+
+        if entry is not None and now - entry.stored_at < self.ttl + self.stale_ttl:
+            self._count('stale_hits')
+            self._refresh_in_background(key, compute, cacheable)
+            return entry.value
+
+        self._count('misses')
+        token = self._acquire(key)
+        if token:
+            return self._compute_and_store(key, compute, cacheable, token)
+
+        # Another worker is computing this key: wait for its result rather than duplicating work
+        self._count('lock_waits')
+        deadline = time.time() + self.lock_timeout
+        while time.time() < deadline:
+            time.sleep(0.05)
+            entry = self._safe_get(key)
+            if entry is not None and entry.stored_at >= now - self.ttl:
+                return entry.value
+        return compute()
+
+    def invalidate(self, key):
+        try:
+            self.backend.invalidate(key, time.time())
+        except Exception as e:
+            logger.warning(f"Metrics cache invalidation failed for {key}: {e}")
+            self._count('errors')
+
+    def _safe_get(self, key):
+        try:
+            return self.backend.get(key)
+        except Exception:
+            return None
+
+    def _acquire(self, key):
+        try:
+            return self.backend.acquire_lock(key, self.lock_timeout)
+        except Exception as e:
+            logger.warning(f"Metrics cache lock failed for {key}: {e}")
+            self._count('errors')
+            return None
+
+    def _compute_and_store(self, key, compute, cacheable, token):
+        try:
+            # Stamp with the start time so an invalidation that lands mid-compute keeps the entry stale
+            started = time.time()
+            value = compute()
+            if cacheable is None or cacheable(value):
+                self.backend.set(key, value, started)
+            return value
+        finally:
+            try:
+                self.backend.release_lock(key, token)
+            except Exception as e:
+                logger.warning(f"Metrics cache unlock failed for {key}: {e}")
+
+    def _refresh_in_background(self, key, compute, cacheable):
+        token = self._acquire(key)
+        if not token:
+            return  # Another worker is already refreshing this key
+
+        def run():
+            try:
+                self._compute_and_store(key, compute, cacheable, token)
+                self._count('refreshes')
+            except Exception as e:
+                logger.error(f"Background metrics refresh failed for {key}: {e}")
+                self._count('errors')
+
+        threading.Thread(target=run, name=f'metrics-refresh-{key}', daemon=True).start()
+
+    def get_info(self):
+        try:
+            size = self.backend.size()
+        except Exception:
+            size = None
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {
+            'backend': self.backend.name,
+            'size': size,
+            'maxsize': getattr(self.backend, 'maxsize', None),
+            'ttl': self.ttl,
+            'stale_ttl': self.stale_ttl,
+            'lock_timeout': self.lock_timeout,
+            **stats
+        }
@@ -2,7 +2,6 @@ from flask import jsonify, request, Response
 from flask_login import login_required, current_user
 from . import metrics_bp
 from .service import get_metrics, invalidate_metrics, get_cache_info
-from app.flags import is_enabled
 from app import db
 import csv
 import io
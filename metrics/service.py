@@ -1,138 +1,149 @@
 import time
+import threading
 from collections import defaultdict
+from datetime import datetime, timedelta
 from typing import Any, Dict, Tuple, List
-from cachetools import TTLCache
+from flask import current_app, has_app_context
 from sqlalchemy import text
+from utils.local_state import deployment_namespace
+from .cache import MetricsCache
 
-# TTL cache for computed metrics (5 minutes)
-cache = TTLCache(maxsize=256, ttl=300)
+# Shared cache for computed metrics (see metrics/cache.py for backends and TTLs)
+cache = MetricsCache()
+
+# Status values as stored in the database (StatusEnum names)
+APPROVED_STATUS = 'Approved'
+DONE_STATUS = 'Resolved'
+CLOSED_STATUSES = ('Resolved', 'Rejected')
+
+STALLED_DAYS = 14
+RECENT_DAYS = 30
+
+# Per-query timings of compute_metrics: last run per organization plus running totals per query
+_timings_lock = threading.Lock()
+_last_timings: Dict[int, Dict[str, Any]] = {}
+_query_stats: Dict[str, Dict[str, float]] = defaultdict(lambda: {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
 
 def _key(org_id: int) -> str:
-    return f"metrics:org:{org_id}"
+    # The cache can be shared by several deployments on a host: key by database as well
+    return f"metrics:{deployment_namespace()}:org:{org_id}"
+
+def _days_between(dialect: str, end_col: str, start_col: str) -> str:
+    """SQL expression for the number of days between two timestamp columns"""
+    if dialect == 'sqlite':
+        return f"(julianday({end_col}) - julianday({start_col}))"
+    return f"(EXTRACT(EPOCH FROM ({end_col} - {start_col})) / 86400)"
+
+def _timed(timings: Dict[str, float], name: str, db, sql: str, params: Dict[str, Any]):
+    """Execute one metrics query and record its wall time in milliseconds"""
+    started = time.perf_counter()
+    result = db.session.execute(text(sql), params)
+    rows = result.fetchall()
+    timings[name] = round((time.perf_counter() - started) * 1000, 2)
+    return rows
+
+def _record_timings(org_id: int, timings: Dict[str, float]):
+    with _timings_lock:
+        _last_timings[org_id] = {"queries_ms": timings, "total_ms": round(sum(timings.values()), 2),
+                                 "computed_at": int(time.time())}
+        for name, ms in timings.items():
+            stats = _query_stats[name]
+            stats["calls"] += 1
+            stats["total_ms"] += ms
+            stats["max_ms"] = max(stats["max_ms"], ms)
 
 def compute_metrics(db, org_id: int) -> Dict[str, Any]:
     """
     Compute all executive metrics for an organization.
-    Uses real models and efficient queries for production data.
+    One conditional-aggregate scan per base table plus the department breakdown;
+    date cut-offs are bound as parameters so the SQL runs on PostgreSQL and SQLite.
     """
     try:
-        # Problems funnel & throughput - using actual models
-        problems_total = db.session.execute(
-            text("SELECT COUNT(*) FROM problems WHERE organization_id=:org_id"), 
-            {"org_id": org_id}
-        ).scalar() or 0
-        
-        cases_total = db.session.execute(
-            text("SELECT COUNT(*) FROM business_cases WHERE organization_id=:org_id"), 
-            {"org_id": org_id}
-        ).scalar() or 0
-        
-        approved_cases = db.session.execute(
-            text("SELECT COUNT(*) FROM business_cases WHERE organization_id=:org_id AND status='approved'"), 
-            {"org_id": org_id}
-        ).scalar() or 0
-        
-        projects_total = db.session.execute(
-            text("SELECT COUNT(*) FROM projects WHERE organization_id=:org_id"), 
-            {"org_id": org_id}
-        ).scalar() or 0
-        
-        projects_done = db.session.execute(
-            text("SELECT COUNT(*) FROM projects WHERE organization_id=:org_id AND status='completed'"), 
-            {"org_id": org_id}
-        ).scalar() or 0
-
-        # Lead-time calculation (days from creation to approval)
-        lt_result = db.session.execute(
-            text("""
-                SELECT AVG(EXTRACT(EPOCH FROM (approved_at - created_at))/86400) 
-                FROM business_cases 
-                WHERE organization_id=:org_id AND approved_at IS NOT NULL
-            """), 
-            {"org_id": org_id}
-        ).scalar()
-        lead_time_days = round(float(lt_result), 1) if lt_result is not None else None
-
-        # ROI calculations - using actual benefit tracking
-        projected_benefit = db.session.execute(
-            text("SELECT COALESCE(SUM(projected_benefit), 0) FROM business_cases WHERE organization_id=:org_id"), 
-            {"org_id": org_id}
-        ).scalar() or 0
-        
-        realized_benefit = db.session.execute(
-            text("SELECT COALESCE(SUM(actual_benefit), 0) FROM projects WHERE organization_id=:org_id"), 
-            {"org_id": org_id}
-        ).scalar() or 0
-
-        # Stalled items (no update in 14 days)
-        stalled = db.session.execute(
-            text("""
-                SELECT COUNT(*) FROM projects 
-                WHERE organization_id=:org_id 
-                AND updated_at < NOW() - INTERVAL '14 days' 
-                AND status NOT IN ('completed', 'cancelled')
-            """), 
-            {"org_id": org_id}
-        ).scalar() or 0
+        dialect = db.engine.dialect.name
+        now = datetime.utcnow()
+        params = {
+            "org_id": org_id,
+            "approved": APPROVED_STATUS,
+            "done": DONE_STATUS,
+            "closed_1": CLOSED_STATUSES[0],
+            "closed_2": CLOSED_STATUSES[1],
+            "recent_cutoff": now - timedelta(days=RECENT_DAYS),
+            "stalled_cutoff": now - timedelta(days=STALLED_DAYS)
+        }
+        timings: Dict[str, float] = {}
+
+        # Problems: funnel entry and 30-day activity
+        problems = _timed(timings, "problems", db, """
+            SELECT COUNT(*) AS total,
+                   SUM(CASE WHEN created_at >= :recent_cutoff THEN 1 ELSE 0 END) AS recent
+            FROM problems
+            WHERE organization_id = :org_id
+        """, params)[0]
+
+        # Business cases: funnel, approval lead time, projected benefit, 30-day activity
+        lead_time = _days_between(dialect, "approved_at", "created_at")
+        cases = _timed(timings, "business_cases", db, f"""
+            SELECT COUNT(*) AS total,
+                   SUM(CASE WHEN status = :approved THEN 1 ELSE 0 END) AS approved,
+                   AVG(CASE WHEN approved_at IS NOT NULL THEN {lead_time} END) AS lead_time_days,
+                   COALESCE(SUM(benefit_estimate), 0) AS projected_benefit,
+                   SUM(CASE WHEN created_at >= :recent_cutoff THEN 1 ELSE 0 END) AS recent
+            FROM business_cases
+            WHERE organization_id = :org_id
+        """, params)[0]
+
+        # Projects: funnel exit, stalled work, and benefit realized by completed projects
+        projects = _timed(timings, "projects", db, """
+            SELECT COUNT(*) AS total,
+                   SUM(CASE WHEN p.status = :done THEN 1 ELSE 0 END) AS done,
+                   SUM(CASE WHEN p.updated_at < :stalled_cutoff
+                             AND p.status NOT IN (:closed_1, :closed_2) THEN 1 ELSE 0 END) AS stalled,
+                   COALESCE(SUM(CASE WHEN p.status = :done THEN bc.benefit_estimate END), 0) AS realized_benefit
+            FROM projects p
+            LEFT JOIN business_cases bc ON bc.id = p.business_case_id
+            WHERE p.organization_id = :org_id
+        """, params)[0]
 
         # Department breakdown
-        dept_breakdown = db.session.execute(
-            text("""
-                SELECT d.name, COUNT(p.id) as problem_count
-                FROM departments d
-                LEFT JOIN problems p ON d.id = p.department_id AND p.organization_id = :org_id
-                WHERE d.organization_id = :org_id
-                GROUP BY d.id, d.name
-                ORDER BY problem_count DESC
-                LIMIT 5
-            """), 
-            {"org_id": org_id}
-        ).fetchall()
-
-        # Recent activity
-        recent_problems = db.session.execute(
-            text("""
-                SELECT COUNT(*) FROM problems 
-                WHERE organization_id=:org_id 
-                AND created_at >= NOW() - INTERVAL '30 days'
-            """), 
-            {"org_id": org_id}
-        ).scalar() or 0
-
-        recent_cases = db.session.execute(
-            text("""
-                SELECT COUNT(*) FROM business_cases 
-                WHERE organization_id=:org_id 
-                AND created_at >= NOW() - INTERVAL '30 days'
-            """), 
-            {"org_id": org_id}
-        ).scalar() or 0
+        dept_breakdown = _timed(timings, "department_breakdown", db, """
+            SELECT d.name, COUNT(p.id) as problem_count
+            FROM departments d
+            LEFT JOIN problems p ON d.id = p.department_id AND p.organization_id = :org_id
+            WHERE d.organization_id = :org_id
+            GROUP BY d.id, d.name
+            ORDER BY problem_count DESC
+            LIMIT 5
+        """, params)
+
+        _record_timings(org_id, timings)
 
+        lt_result = cases.lead_time_days
         data = {
             "funnel": {
-                "problems": problems_total,
-                "cases": cases_total,
-                "approved_cases": approved_cases,
-                "projects": projects_total,
-                "done": projects_done
+                "problems": problems.total or 0,
+                "cases": cases.total or 0,
+                "approved_cases": cases.approved or 0,
+                "projects": projects.total or 0,
+                "done": projects.done or 0
             },
-            "lead_time_days": lead_time_days,
+            "lead_time_days": round(float(lt_result), 1) if lt_result is not None else None,
             "roi": {
-                "projected": float(projected_benefit),
-                "realized": float(realized_benefit)
+                "projected": float(cases.projected_benefit or 0),
+                "realized": float(projects.realized_benefit or 0)
             },
-            "stalled": stalled,
+            "stalled": projects.stalled or 0,
             "department_breakdown": [{"name": row[0], "count": row[1]} for row in dept_breakdown],
             "recent_activity": {
-                "problems_30d": recent_problems,
-                "cases_30d": recent_cases
+                "problems_30d": problems.recent or 0,
+                "cases_30d": cases.recent or 0
             },
             "generated_at": int(time.time())
         }
-        
+
         return data
-        
+
     except Exception as e:
+        db.session.rollback()
         # Return minimal safe data on error
         return {
             "funnel": {"problems": 0, "cases": 0, "approved_cases": 0, "projects": 0, "done": 0},
@@ -146,24 +157,37 @@ def compute_metrics(db, org_id: int) -> Dict[str, Any]:
         }
 
 def get_metrics(db, org_id: int) -> Dict[str, Any]:
-    """Get metrics with caching"""
-    k = _key(org_id)
-    if k in cache:
-        return cache[k]
-    data = compute_metrics(db, org_id)
-    cache[k] = data
-    return data
+    """Get metrics with caching (shared across workers, single-flight, stale-while-revalidate)"""
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def compute():
+        # Background refreshes run outside the request, so give them their own app context
+        if app is not None and not has_app_context():
+            with app.app_context():
+                return compute_metrics(db, org_id)
+        return compute_metrics(db, org_id)
+
+    return cache.get_or_compute(_key(org_id), compute, cacheable=lambda data: "error" not in data)
 
 def invalidate_metrics(org_id: int):
-    """Invalidate cached metrics for an organization"""
-    cache.pop(_key(org_id), None)
+    """Invalidate cached metrics for an organization in every worker"""
+    cache.invalidate(_key(org_id))
 
 def get_cache_info():
-    """Get cache statistics for monitoring"""
+    """Get cache statistics and compute_metrics query timings for monitoring"""
+    with _timings_lock:
+        query_stats = {
+            name: {
+                "calls": int(stats["calls"]),
+                "avg_ms": round(stats["total_ms"] / stats["calls"], 2) if stats["calls"] else 0.0,
+                "max_ms": round(stats["max_ms"], 2)
+            }
+            for name, stats in _query_stats.items()
+        }
+        last_timings = {org_id: dict(entry) for org_id, entry in _last_timings.items()}
+
     return {
-        "size": len(cache),
-        "maxsize": cache.maxsize,
-        "ttl": cache.ttl,
-        "hits": getattr(cache, 'hits', 0),
-        "misses": getattr(cache, 'misses', 0)
-    }
\ No newline at end of file
+        **cache.get_info(),
+        "query_timings": query_stats,
+        "last_compute": last_timings
+    }
@@ -1,30 +1,54 @@
 """
 SQLAlchemy event hooks that invalidate the executive metrics cache when key models change.
+
+Invalidation is recorded on the session during flush and applied after commit, so a
+background refresh in another worker cannot cache pre-commit data as fresh. The metrics
+cache is shared between workers, so one invalidation reaches all of them.
 """
 from sqlalchemy import event
-from executive_metrics import invalidate_metrics, get_org_id_from_instance
+from sqlalchemy.orm import Session, object_session
+from executive_metrics import get_org_id_from_instance
+from metrics.service import invalidate_metrics
+
+_PENDING_KEY = 'pending_metrics_invalidations'
 
 def register_metrics_signals():
     """Register SQLAlchemy event listeners for cache invalidation"""
     try:
         # Import models - try different paths for flexibility
         from models import Problem, BusinessCase, Project
-        
+
         def _invalidate_for(mapper, connection, target):
             org_id = get_org_id_from_instance(target)
-            if org_id:
+            if not org_id:
+                return
+            session = object_session(target)
+            if session is None:
+                invalidate_metrics(org_id)
+                return
+            session.info.setdefault(_PENDING_KEY, set()).add(org_id)
+
+        def _after_commit(session):
+            for org_id in session.info.pop(_PENDING_KEY, ()):
                 invalidate_metrics(org_id)
                 print(f"🔄 Metrics cache invalidated for org {org_id}")
 
+        def _after_rollback(session):
+            # Rolled-back changes never reached the database; nothing to invalidate
+            session.info.pop(_PENDING_KEY, None)
+
         # Register listeners for all relevant models
         for model in (Problem, BusinessCase, Project):
             event.listen(model, "after_insert", _invalidate_for)
             event.listen(model, "after_update", _invalidate_for)
             event.listen(model, "after_delete", _invalidate_for)
-        
+
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
+
         print("✓ Metrics cache invalidation signals registered")
         return True
-        
+
     except ImportError as e:
         print(f"⚠️ Could not register metrics signals: {e}")
-        return False
\ No newline at end of file
+        return False
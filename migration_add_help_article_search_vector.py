@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the full-text search_vector column, index and trigger
+to help_articles (without touching the other tables' search columns)
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_migration():
+    """Add search_vector to help_articles, keep it updated by trigger and backfill existing rows"""
+
+    # Get database URL from environment
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        print("❌ DATABASE_URL environment variable not set")
+        return False
+
+    engine = create_engine(database_url)
+    if engine.dialect.name != 'postgresql':
+        print("ℹ️ Not a PostgreSQL database; help articles are indexed by the SQLite FTS5 search backend")
+        return True
+
+    Session = sessionmaker(bind=engine)
+    session = Session()
+
+    try:
+        print("🔧 Adding search_vector column to help_articles table...")
+        session.execute(text("""
+            ALTER TABLE help_articles
+            ADD COLUMN IF NOT EXISTS search_vector tsvector
+        """))
+        session.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_help_articles_search
+            ON help_articles USING GIN(search_vector)
+        """))
+
+        print("🔧 Creating search vector trigger on help_articles...")
+        session.execute(text("DROP TRIGGER IF EXISTS tsvectorupdate_help_articles ON help_articles"))
+        session.execute(text("""
+            CREATE TRIGGER tsvectorupdate_help_articles
+            BEFORE INSERT OR UPDATE ON help_articles
+            FOR EACH ROW EXECUTE FUNCTION
+            tsvector_update_trigger('search_vector', 'pg_catalog.english', 'title', 'content', 'tags')
+        """))
+
+        print("🔧 Populating search vectors for existing help articles...")
+        result = session.execute(text("""
+            UPDATE help_articles SET search_vector =
+            to_tsvector('pg_catalog.english',
+                COALESCE(title, '') || ' ' ||
+                COALESCE(content, '') || ' ' ||
+                COALESCE(tags, '')
+            )
+            WHERE search_vector IS NULL
+        """))
+
+        session.commit()
+        print(f"✅ Successfully added help article search vectors ({result.rowcount} articles backfilled)")
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    success = run_migration()
+    if success:
+        print("✅ Migration completed successfully")
+    else:
+        print("❌ Migration failed")
+        sys.exit(1)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the heartbeat_at column to import_jobs,
+used to detect imports interrupted by a worker restart
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_migration():
+    """Add heartbeat_at to import_jobs"""
+
+    # Get database URL from environment
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        print("❌ DATABASE_URL environment variable not set")
+        return False
+
+    engine = create_engine(database_url)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+
+    try:
+        print("🔧 Adding heartbeat_at column to import_jobs table...")
+        session.execute(text("""
+            ALTER TABLE import_jobs
+            ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP
+        """))
+
+        session.commit()
+        print("✅ Successfully added import job heartbeat column")
+
+        # Jobs already 'Importing' have no heartbeat; startup recovery falls back to created_at
+        result = session.execute(text("""
+            SELECT COUNT(*) AS count FROM import_jobs WHERE status = 'Importing'
+        """))
+        print(f"📊 Import jobs currently marked Importing: {result.scalar()}")
+
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    success = run_migration()
+    if success:
+        print("✅ Migration completed successfully")
+    else:
+        print("❌ Migration failed")
+        sys.exit(1)
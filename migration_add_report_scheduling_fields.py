@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Migration script to add report scheduling lease fields to report_templates
+and execution timing fields to report_runs
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_migration():
+    """Add next_run_at/lease columns to report_templates and timing columns to report_runs"""
+
+    # Get database URL from environment
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        print("❌ DATABASE_URL environment variable not set")
+        return False
+
+    engine = create_engine(database_url)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+
+    try:
+        print("🔧 Adding scheduling columns to report_templates table...")
+        session.execute(text("""
+            ALTER TABLE report_templates
+            ADD COLUMN IF NOT EXISTS next_run_at TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS lease_owner VARCHAR(100),
+            ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP
+        """))
+        session.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_report_templates_next_run_at
+            ON report_templates (next_run_at)
+        """))
+
+        print("🔧 Adding execution columns to report_runs table...")
+        session.execute(text("""
+            ALTER TABLE report_runs
+            ADD COLUMN IF NOT EXISTS emails_sent INTEGER DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS trigger VARCHAR(20) DEFAULT 'schedule',
+            ADD COLUMN IF NOT EXISTS scheduled_for TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS node VARCHAR(100),
+            ADD COLUMN IF NOT EXISTS completed_at TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS data_ms INTEGER,
+            ADD COLUMN IF NOT EXISTS render_ms INTEGER,
+            ADD COLUMN IF NOT EXISTS pdf_ms INTEGER,
+            ADD COLUMN IF NOT EXISTS email_ms INTEGER,
+            ADD COLUMN IF NOT EXISTS total_ms INTEGER
+        """))
+
+        session.commit()
+        print("✅ Successfully added report scheduling and timing columns")
+
+        # next_run_at is filled in by the scheduler on its first pass, counting from last_run_at
+        result = session.execute(text("""
+            SELECT COUNT(*) AS count FROM report_templates WHERE active AND next_run_at IS NULL
+        """))
+        print(f"📊 Active templates awaiting their first schedule: {result.scalar()}")
+
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    success = run_migration()
+    if success:
+        print("✅ Migration completed successfully")
+    else:
+        print("❌ Migration failed")
+        sys.exit(1)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Migration script to index the expires column of the session tables,
+used by the background session sweeper
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_migration():
+    """Add expires indexes to session_data and simple_sessions (where the tables exist)"""
+
+    # Get database URL from environment
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        print("❌ DATABASE_URL environment variable not set")
+        return False
+
+    engine = create_engine(database_url)
+    existing = set(inspect(engine).get_table_names())
+    Session = sessionmaker(bind=engine)
+    session = Session()
+
+    try:
+        for table in ('session_data', 'simple_sessions'):
+            if table not in existing:
+                print(f"ℹ️ {table} table not found, skipping (created with the index on first use)")
+                continue
+            print(f"🔧 Adding expires index to {table} table...")
+            session.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_expires ON {table} (expires)"))
+
+        session.commit()
+        print("✅ Successfully added session expiry indexes")
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    success = run_migration()
+    if success:
+        print("✅ Migration completed successfully")
+    else:
+        print("❌ Migration failed")
+        sys.exit(1)
@@ -279,41 +279,98 @@ class Department(db.Model):
     manager = db.relationship('User', foreign_keys=[manager_id])
     
     def get_descendant_ids(self, include_self=True):
-        """Get IDs of this department and all its sub-departments recursively"""
-        ids = [self.id] if include_self else []
-        for child in self.children:
-            ids.extend(child.get_descendant_ids(include_self=True))
+        """Get IDs of this department and all its sub-departments (one department_closure lookup)"""
+        query = db.session.query(DepartmentClosure.descendant_id).filter(
+            DepartmentClosure.ancestor_id == self.id
+        )
+        if not include_self:
+            query = query.filter(DepartmentClosure.depth > 0)
+        ids = [row[0] for row in query.order_by(DepartmentClosure.depth, DepartmentClosure.descendant_id)]
+        if include_self and not ids:
+            ids = [self.id]  # Not yet in the closure table (e.g. unflushed)
         return ids
     
     def get_hierarchy_level(self):
         """Return the depth level in the department hierarchy (0 = root)"""
-        level = 0
-        current = self.parent
-        while current:
-            level += 1
-            current = current.parent
-        return level
+        preloaded = getattr(self, '_hierarchy', None)
+        if preloaded is not None:
+            return preloaded[0]
+        level = db.session.query(db.func.max(DepartmentClosure.depth)).filter(
+            DepartmentClosure.descendant_id == self.id
+        ).scalar()
+        return level if level is not None else len(self._walk_ancestors())
     
     def get_full_path(self):
         """Return full departmental path (e.g., 'Company > IT > Development')"""
-        path = [self.name]
+        preloaded = getattr(self, '_hierarchy', None)
+        if preloaded is not None:
+            return preloaded[1]
+        names = [row[0] for row in db.session.query(Department.name).join(
+            DepartmentClosure, DepartmentClosure.ancestor_id == Department.id
+        ).filter(DepartmentClosure.descendant_id == self.id).order_by(DepartmentClosure.depth.desc())]
+        if not names:
+            names = [d.name for d in reversed(self._walk_ancestors())] + [self.name]
+        return ' > '.join(names)
+    
+    def get_all_descendants(self):
+        """Return all descendant departments, nearest levels first"""
+        return Department.query.join(
+            DepartmentClosure, DepartmentClosure.descendant_id == Department.id
+        ).filter(
+            DepartmentClosure.ancestor_id == self.id,
+            DepartmentClosure.depth > 0
+        ).order_by(DepartmentClosure.depth, Department.name).all()
+    
+    def _walk_ancestors(self):
+        ancestors = []
         current = self.parent
         while current:
-            path.insert(0, current.name)
+            ancestors.append(current)
             current = current.parent
-        return ' > '.join(path)
+        return ancestors
     
-    def get_all_descendants(self):
-        """Return all descendant departments recursively"""
-        descendants = []
-        for child in self.children:
-            descendants.append(child)
-            descendants.extend(child.get_all_descendants())
-        return descendants
+    @staticmethod
+    def preload_hierarchy(departments):
+        """
+        Load level and full path for many departments in one query, so report loops calling
+        get_hierarchy_level() / get_full_path() per unit do not query per unit
+        """
+        departments = [d for d in departments if d.id is not None]
+        if not departments:
+            return departments
+        org_ids = {d.organization_id for d in departments}
+        descendant = db.aliased(Department)
+        rows = db.session.query(
+            DepartmentClosure.descendant_id, DepartmentClosure.depth, Department.name
+        ).join(
+            Department, Department.id == DepartmentClosure.ancestor_id
+        ).join(
+            descendant, descendant.id == DepartmentClosure.descendant_id
+        ).filter(
+            descendant.organization_id.in_(org_ids)
+        ).order_by(DepartmentClosure.descendant_id, DepartmentClosure.depth.desc()).all()
+        
+        paths = {}
+        for descendant_id, depth, name in rows:
+            entry = paths.setdefault(descendant_id, [depth, []])
+            entry[1].append(name)
+        for dept in departments:
+            level, names = paths.get(dept.id, (0, [dept.name]))
+            dept._hierarchy = (level, ' > '.join(names))
+        return departments
     
     @staticmethod
     def get_hierarchical_choices(organization_id=None):
         """Get all departments formatted for dropdown with hierarchy indentation"""
+        query = Department.query
+        if organization_id:
+            query = query.filter_by(organization_id=organization_id)
+        departments = query.order_by(Department.name).all()
+        
+        children = {}
+        for dept in departments:
+            children.setdefault(dept.parent_id, []).append(dept)
+        
         def build_hierarchy(dept, level=0):
             """Recursively build hierarchical list"""
             indent = "—" * level
@@ -321,18 +378,13 @@ class Department(db.Model):
             choices = [(dept.id, display_name)]
             
             # Add children sorted by name
-            for child in sorted(dept.children, key=lambda x: x.name):
+            for child in children.get(dept.id, []):
                 choices.extend(build_hierarchy(child, level + 1))
             return choices
         
-        # Get all top-level departments (no parent) - filter by organization if provided
-        query = Department.query.filter_by(parent_id=None)
-        if organization_id:
-            query = query.filter_by(organization_id=organization_id)
-        top_level = query.order_by(Department.name).all()
-        
+        # Top-level departments (no parent) - filtered by organization if provided
         choices = []
-        for dept in top_level:
+        for dept in children.get(None, []):
             choices.extend(build_hierarchy(dept))
         
         return choices
@@ -340,6 +392,21 @@ class Department(db.Model):
     def __repr__(self):
         return f'<Department {self.id}: {self.name}>'
 
+class DepartmentClosure(db.Model):
+    """Closure table of the department hierarchy: one row per (ancestor, descendant) pair, including depth-0 self rows"""
+    __tablename__ = 'department_closure'
+    
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('departments.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('departments.id', ondelete='CASCADE'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_department_closure_descendant', 'descendant_id', 'depth'),
+    )
+    
+    def __repr__(self):
+        return f'<DepartmentClosure {self.ancestor_id} -> {self.descendant_id} ({self.depth})>'
+
 class Problem(db.Model):
     __tablename__ = 'problems'
     
@@ -584,14 +651,17 @@ class ProjectComment(db.Model):
 from sqlalchemy import event
 
 @event.listens_for(Problem, 'before_insert')
-def generate_problem_code(mapper, connection, target):
-    """Auto-generate problem code in format P0001, P0002, etc."""
+@event.listens_for(BusinessCase, 'before_insert')
+@event.listens_for(Project, 'before_insert')
+def generate_record_code(mapper, connection, target):
+    """Auto-generate codes in format P0001, C0001, PRJ0001 from the code_sequences counters"""
+    from services.code_sequences import code_allocator, code_number
+    kind = mapper.class_.__name__
     if not target.code:
-        # Get the next sequence number based on existing problems
-        result = connection.execute(
-            db.text("SELECT COUNT(*) + 1 FROM problems")
-        ).scalar()
-        target.code = "P%04d" % result
+        target.code = code_allocator.next_code(kind, connection)
+    else:
+        # An explicit code moves the counter past it, so it is not allocated again later
+        code_allocator.reserve_through(kind, code_number(code_allocator.prefix_for(kind), target.code), connection)
 
 # Notification Models
 class NotificationTemplate(db.Model):
@@ -672,6 +742,11 @@ class ReportTemplate(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     active = db.Column(db.Boolean, default=True)
     
+    # Scheduling: next due slot (server local time) and the lease held by the node running it
+    next_run_at = db.Column(db.DateTime, nullable=True, index=True)
+    lease_owner = db.Column(db.String(100), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    
     creator = db.relationship('User', foreign_keys=[created_by])
     
     def __repr__(self):
@@ -708,6 +783,22 @@ class ReportRun(db.Model):
     file_path = db.Column(db.String(500), nullable=True)
     email_recipients = db.Column(db.Text, nullable=True)
     error_message = db.Column(db.Text, nullable=True)
+    emails_sent = db.Column(db.Integer, default=0)
+    
+    # Execution details: the schedule slot covered, who ran it and how long each stage took
+    trigger = db.Column(db.String(20), default='schedule')  # schedule, manual
+    scheduled_for = db.Column(db.DateTime, nullable=True)
+    node = db.Column(db.String(100), nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    data_ms = db.Column(db.Integer, nullable=True)
+    render_ms = db.Column(db.Integer, nullable=True)
+    pdf_ms = db.Column(db.Integer, nullable=True)
+    email_ms = db.Column(db.Integer, nullable=True)
+    total_ms = db.Column(db.Integer, nullable=True)
+    
+    # Names used by the report service and routes
+    run_at = db.synonym('run_date')
+    pdf_path = db.synonym('file_path')
     
     template = db.relationship('ReportTemplate', backref='runs')
     
@@ -1160,6 +1251,38 @@ class WorkflowExecution(db.Model):
     
     workflow_template = db.relationship('WorkflowTemplate', backref='executions')
 
+class WorkflowEvent(db.Model):
+    """Durable workflow event waiting to be claimed by a queue worker"""
+    __tablename__ = 'workflow_events'
+    id = db.Column(db.Integer, primary_key=True)
+    event_name = db.Column(db.String(100), nullable=False)
+    context_data = db.Column(db.JSON, nullable=True)
+    status = db.Column(db.String(20), default='Pending', nullable=False)  # Pending, Processing, Done
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # Retry backoff
+    locked_by = db.Column(db.String(100), nullable=True)  # Claim token of the worker processing it
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_workflow_events_status_available', 'status', 'available_at'),
+        db.Index('ix_workflow_events_locked_by', 'locked_by'),
+    )
+
+class WorkflowDeadLetter(db.Model):
+    """Workflow event that exhausted its retries"""
+    __tablename__ = 'workflow_dead_letters'
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, nullable=True)  # Original workflow_events.id
+    event_name = db.Column(db.String(100), nullable=False)
+    context_data = db.Column(db.JSON, nullable=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    enqueued_at = db.Column(db.DateTime, nullable=True)
+    failed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
 class ImportJob(db.Model):
     __tablename__ = 'import_jobs'
     id = db.Column(db.Integer, primary_key=True)
@@ -1172,6 +1295,7 @@ class ImportJob(db.Model):
     rows_failed = db.Column(db.Integer, default=0)
     error_details = db.Column(db.JSON, nullable=True)  # [{row: int, error: str}, ...]
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # Last progress write while Importing
     
     user = db.relationship('User', backref='import_jobs')
 
@@ -1210,7 +1334,8 @@ class HelpArticle(db.Model):
     role = db.Column(db.Enum(HelpArticleRoleEnum), nullable=False, default=HelpArticleRoleEnum.both)
     tags = db.Column(db.String(500), nullable=True)  # Comma-separated tags
     faq = db.Column(db.JSON, nullable=True)  # JSON for Q&A pairs: [{"question": "...", "answer": "..."}]
-    
+    search_vector = db.Column(db.Text)  # tsvector for full-text search
+
     # Feedback and analytics
     view_count = db.Column(db.Integer, default=0)
     helpful_count = db.Column(db.Integer, default=0)
@@ -1623,4 +1748,199 @@ class TriageRule(db.Model):
             'active': self.active,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'created_by': self.created_by
-        }
\ No newline at end of file
+        }
+
+
+class TriageRuleWatermark(db.Model):
+    """
+    Incremental watermark for bulk triage runs.
+    Records when a rule last ran so the next run only examines rows changed since then.
+    """
+    __tablename__ = 'triage_rule_watermarks'
+
+    rule_id = db.Column(db.Integer, db.ForeignKey('triage_rules.id', ondelete='CASCADE'), primary_key=True)
+    rule_signature = db.Column(db.String(255), nullable=False)  # Watermark resets when the rule is edited
+    last_run_at = db.Column(db.DateTime, nullable=False)
+    last_matched = db.Column(db.Integer, default=0)
+
+    def to_dict(self):
+        """Convert watermark to dictionary for JSON serialization"""
+        return {
+            'rule_id': self.rule_id,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+            'last_matched': self.last_matched
+        }
+
+class BadgeCounter(db.Model):
+    """
+    Materialized navigation badge counts (pending reviews per organization, unread notifications per user).
+    Maintained incrementally by services/badge_counters.py and reconciled periodically.
+    """
+    __tablename__ = 'badge_counters'
+
+    id = db.Column(db.Integer, primary_key=True)
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
+    user_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = organization-wide counter
+    counter = db.Column(db.String(50), nullable=False)  # pending_epics, pending_cases, unread_notifications, ...
+    value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('organization_id', 'user_id', 'counter', name='_badge_counter_uc'),
+    )
+
+    def __repr__(self):
+        return f'<BadgeCounter org={self.organization_id} user={self.user_id} {self.counter}={self.value}>'
+
+class ReviewInsight(db.Model):
+    """
+    Precomputed AI review insights for an Epic, BusinessCase or Project, keyed by a hash of the
+    reviewed content so an edit produces a new row. Computed in the background by
+    services/review_insights.py.
+    """
+    __tablename__ = 'review_insights'
+
+    id = db.Column(db.Integer, primary_key=True)
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=True)
+    entity_type = db.Column(db.String(20), nullable=False)  # epic, business_case, project
+    entity_id = db.Column(db.Integer, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, ready, failed
+    confidence_score = db.Column(db.Integer, nullable=True)
+    risks = db.Column(db.JSON, nullable=True)
+    recommendation = db.Column(db.Text, nullable=True)
+    raw_output = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    requested_at = db.Column(db.DateTime, default=datetime.utcnow)
+    computed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('entity_type', 'entity_id', 'content_hash', name='_review_insight_content_uc'),
+        db.Index('ix_review_insights_entity', 'entity_type', 'entity_id'),
+    )
+
+    def to_dict(self):
+        """Same shape as get_ai_review_insights() plus the computation status"""
+        return {
+            'status': self.status,
+            'confidence_score': self.confidence_score,
+            'risks': self.risks or [],
+            'recommendation': self.recommendation,
+            'raw_output': self.raw_output,
+            'success': self.status == 'ready',
+            'error': self.error,
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None
+        }
+
+    def __repr__(self):
+        return f'<ReviewInsight {self.entity_type}:{self.entity_id} {self.status}>'
+
+class NotificationOutbox(db.Model):
+    """
+    Pending notification emails for events whose NotificationSetting frequency is hourly, daily or
+    weekly. Items are grouped per user into a NotificationDigest once their window has closed, and
+    delivered by notifications/digest.py.
+    """
+    __tablename__ = 'notification_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    event_name = db.Column(db.String(100), nullable=False)
+    frequency = db.Column(db.Enum(FrequencyEnum), nullable=False)
+    window_start = db.Column(db.DateTime, nullable=False)  # Start of the hour/day/week the item belongs to
+    context = db.Column(db.JSON, nullable=True)
+    dedupe_key = db.Column(db.String(64), nullable=False, unique=True)  # Same event and context within a window
+    digest_id = db.Column(db.Integer, db.ForeignKey('notification_digests.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_notification_outbox_window', 'digest_id', 'window_start'),
+    )
+
+    def __repr__(self):
+        return f'<NotificationOutbox {self.event_name} user={self.user_id} {self.frequency.value}>'
+
+class NotificationDigest(db.Model):
+    """One digest email per user, frequency and window; digest_key makes building and delivery idempotent"""
+    __tablename__ = 'notification_digests'
+
+    id = db.Column(db.Integer, primary_key=True)
+    organization_id = db.Column(db.Integer, db.ForeignKey('organizations.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    frequency = db.Column(db.Enum(FrequencyEnum), nullable=False)
+    window_start = db.Column(db.DateTime, nullable=False)
+    window_end = db.Column(db.DateTime, nullable=False)
+    digest_key = db.Column(db.String(100), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    transport = db.Column(db.String(20), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    items = db.relationship('NotificationOutbox', backref='digest', lazy='dynamic')
+
+    __table_args__ = (
+        db.Index('ix_notification_digests_status', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<NotificationDigest {self.digest_key} {self.status}>'
+
+class AuditLogBatch(db.Model):
+    """
+    One batch of audit_logs rows written by the audit pipeline (audit/pipeline.py). Each batch hashes
+    its rows together with the previous batch's hash from the same writer (chain), so editing or
+    deleting an audit row breaks every later hash in that chain.
+    """
+    __tablename__ = 'audit_log_batches'
+
+    id = db.Column(db.Integer, primary_key=True)
+    chain = db.Column(db.String(100), nullable=False)  # Writer: host:pid:start time
+    audit_ids = db.Column(db.JSON, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    prev_hash = db.Column(db.String(64), nullable=True)
+    batch_hash = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_audit_log_batches_chain', 'chain', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<AuditLogBatch {self.chain} rows={self.row_count}>'
+
+class CodeSequence(db.Model):
+    """
+    Last allocated number per code prefix (P for problems, C for business cases, PRJ for projects).
+    Codes are handed out by services/code_sequences.py, which increments the row in one statement
+    so concurrent creates never compute the same code.
+    """
+    __tablename__ = 'code_sequences'
+
+    prefix = db.Column(db.String(10), primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CodeSequence {self.prefix}={self.last_value}>'
+
+class JobLease(db.Model):
+    """
+    Named lease for work that must run in one process at a time across all nodes and workers
+    (e.g. ML training). Taken and released by services/job_leases.py; an expired lease can be
+    taken over, so a crashed holder never blocks the job for longer than its lease.
+    """
+    __tablename__ = 'job_leases'
+
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(100), nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True)
+    acquired_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<JobLease {self.name} owner={self.owner}>'
@@ -3,13 +3,10 @@ Monitoring Dashboard Module
 Provides real-time monitoring insights and system health visualization
 """
 
-import psutil
-from datetime import datetime, timedelta
-from flask import Blueprint, render_template, jsonify
-from sqlalchemy import text, func
-from app import db
-from models import AuditLog, User, Problem, BusinessCase, Project
+from datetime import datetime
+from flask import Blueprint, render_template, jsonify, request, current_app
 from monitoring.config import monitoring_config
+from monitoring.sampler import system_sampler
 
 monitoring_bp = Blueprint('monitoring', __name__, url_prefix='/monitoring')
 
@@ -31,39 +28,36 @@ def api_system_stats():
     """API endpoint for real-time system statistics"""
     return jsonify(get_system_stats())
 
+@monitoring_bp.route('/api/system-stats/history')
+def api_system_stats_history():
+    """API endpoint for recent system samples from the background sampler (oldest first)"""
+    limit = request.args.get('limit', 60, type=int)
+    samples = system_sampler.history(limit)
+    return jsonify({
+        'interval_seconds': system_sampler.interval,
+        'samples': [
+            {'sampled_at': s['sampled_at'], 'system': s['system'], 'pool': s.get('database', {}).get('pool')}
+            for s in samples
+        ]
+    })
+
 @monitoring_bp.route('/api/alerts')
 def api_alerts():
     """API endpoint for system alerts and notifications"""
     alerts = check_system_alerts()
     return jsonify({'alerts': alerts, 'count': len(alerts)})
 
+def _latest_sample():
+    """Latest background sample, collecting one inline if the sampler has not produced any yet"""
+    sample = system_sampler.latest()
+    if sample is None:
+        sample = system_sampler.sample_once(current_app._get_current_object())
+    return sample
+
 def get_system_stats():
     """Get comprehensive system performance statistics"""
     try:
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-        
-        return {
-            'cpu': {
-                'usage_percent': cpu_percent,
-                'count': psutil.cpu_count(),
-                'load_average': psutil.getloadavg() if hasattr(psutil, 'getloadavg') else [0, 0, 0]
-            },
-            'memory': {
-                'total_gb': round(memory.total / (1024**3), 2),
-                'used_gb': round(memory.used / (1024**3), 2),
-                'usage_percent': memory.percent,
-                'available_gb': round(memory.available / (1024**3), 2)
-            },
-            'disk': {
-                'total_gb': round(disk.total / (1024**3), 2),
-                'used_gb': round(disk.used / (1024**3), 2),
-                'usage_percent': round((disk.used / disk.total) * 100, 1),
-                'free_gb': round(disk.free / (1024**3), 2)
-            },
-            'timestamp': datetime.now().isoformat()
-        }
+        return _latest_sample()['system']
     except Exception as e:
         return {
             'error': str(e),
@@ -71,45 +65,10 @@ def get_system_stats():
         }
 
 def get_database_stats():
-    """Get database performance and usage statistics"""
+    """Get database performance and usage statistics (table sizes are planner estimates)"""
     try:
-        # Database connection test
-        db_status = db.session.execute(text('SELECT 1')).scalar()
-        
-        # Table statistics
-        tables_stats = []
-        for model_class in [User, Problem, BusinessCase, Project, AuditLog]:
-            try:
-                count = db.session.query(func.count(model_class.id)).scalar()
-                tables_stats.append({
-                    'table': model_class.__tablename__,
-                    'count': count
-                })
-            except Exception:
-                tables_stats.append({
-                    'table': model_class.__tablename__,
-                    'count': 0
-                })
-        
-        # Recent activity (last 24 hours)
-        try:
-            yesterday = datetime.now() - timedelta(hours=24)
-            recent_audit_logs = db.session.query(func.count(AuditLog.id)).filter(
-                AuditLog.timestamp >= yesterday
-            ).scalar()
-        except Exception:
-            recent_audit_logs = 0
-        
-        return {
-            'status': 'connected' if db_status == 1 else 'error',
-            'tables': tables_stats,
-            'recent_activity': {
-                'audit_logs_24h': recent_audit_logs
-            },
-            'timestamp': datetime.now().isoformat()
-        }
+        return _latest_sample()['database']
     except Exception as e:
-        db.session.rollback()  # Rollback failed transaction
         return {
             'status': 'error',
             'error': str(e),
@@ -119,56 +78,10 @@ def get_database_stats():
 def get_application_stats():
     """Get application-specific performance metrics"""
     try:
-        # User activity statistics
-        try:
-            total_users = db.session.query(func.count(User.id)).scalar()
-        except Exception:
-            total_users = 0
-            
-        try:
-            active_users_today = db.session.query(func.count(User.id)).filter(
-                User.last_login >= datetime.now().date()
-            ).scalar() if hasattr(User, 'last_login') else 0
-        except Exception:
-            active_users_today = 0
-        
-        # Content statistics
-        try:
-            open_problems = db.session.query(func.count(Problem.id)).filter(
-                Problem.status.in_(['Open', 'In_Progress'])
-            ).scalar()
-        except Exception:
-            open_problems = 0
-        
-        try:
-            pending_cases = db.session.query(func.count(BusinessCase.id)).filter(
-                BusinessCase.status == 'Pending'
-            ).scalar()
-        except Exception:
-            pending_cases = 0
-        
-        try:
-            active_projects = db.session.query(func.count(Project.id)).filter(
-                Project.status.in_(['Open', 'In_Progress'])
-            ).scalar()
-        except Exception:
-            active_projects = 0
-        
-        return {
-            'users': {
-                'total': total_users,
-                'active_today': active_users_today
-            },
-            'content': {
-                'open_problems': open_problems,
-                'pending_cases': pending_cases,
-                'active_projects': active_projects
-            },
-            'monitoring': monitoring_config.monitoring_status,
-            'timestamp': datetime.now().isoformat()
-        }
+        stats = dict(_latest_sample()['application'])
+        stats['monitoring'] = monitoring_config.monitoring_status
+        return stats
     except Exception as e:
-        db.session.rollback()  # Rollback failed transaction
         return {
             'error': str(e),
             'timestamp': datetime.now().isoformat()
@@ -0,0 +1,282 @@
+"""
+System Metrics Sampler
+Collects CPU, memory, disk, DB pool, table size and application counters on a background thread
+at a fixed interval into a fixed-size ring buffer, so monitoring endpoints read the latest sample
+(or a short history) without blocking a worker on psutil or per-model COUNT queries.
+
+Table sizes are planner estimates (pg_class.reltuples on PostgreSQL, sqlite_stat1 on SQLite)
+rather than full counts. Each sample is also exported as Prometheus gauges when a registry is
+registered through the app's PrometheusMetrics setup.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+import psutil
+from sqlalchemy import text, func
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL_SECONDS = int(os.getenv('MONITORING_SAMPLE_SECONDS', '15'))
+SAMPLE_HISTORY = int(os.getenv('MONITORING_SAMPLE_HISTORY', '240'))  # 1 hour at 15s
+
+try:
+    from prometheus_client import Gauge
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+
+def _tracked_models():
+    from models import User, Problem, BusinessCase, Project, AuditLog
+    return [User, Problem, BusinessCase, Project, AuditLog]
+
+
+def collect_system_stats():
+    """CPU, memory and disk usage; cpu_percent is measured since the previous call, so it never sleeps"""
+    memory = psutil.virtual_memory()
+    disk = psutil.disk_usage('/')
+    return {
+        'cpu': {
+            'usage_percent': psutil.cpu_percent(interval=None),
+            'count': psutil.cpu_count(),
+            'load_average': list(psutil.getloadavg()) if hasattr(psutil, 'getloadavg') else [0, 0, 0]
+        },
+        'memory': {
+            'total_gb': round(memory.total / (1024**3), 2),
+            'used_gb': round(memory.used / (1024**3), 2),
+            'usage_percent': memory.percent,
+            'available_gb': round(memory.available / (1024**3), 2)
+        },
+        'disk': {
+            'total_gb': round(disk.total / (1024**3), 2),
+            'used_gb': round(disk.used / (1024**3), 2),
+            'usage_percent': round((disk.used / disk.total) * 100, 1),
+            'free_gb': round(disk.free / (1024**3), 2)
+        },
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+def collect_pool_stats(engine):
+    """Connection pool occupancy (QueuePool); other pool classes report what they support"""
+    pool = engine.pool
+    stats = {'class': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            try:
+                stats[name] = method()
+            except Exception:
+                stats[name] = None
+    return stats
+
+
+def estimate_table_rows(session, table_names):
+    """
+    Approximate row counts from planner statistics instead of COUNT(*)
+
+    Returns:
+        {table name: estimated rows, or None when the database has no statistics for it yet}
+    """
+    dialect = session.get_bind().dialect.name
+    estimates = dict.fromkeys(table_names)
+    if dialect == 'postgresql':
+        rows = session.execute(text(
+            "SELECT relname, reltuples::bigint FROM pg_class "
+            "WHERE relkind = 'r' AND relname = ANY(:names) AND pg_table_is_visible(oid)"
+        ), {'names': list(table_names)})
+        for name, reltuples in rows:
+            # reltuples is -1 until the table has been vacuumed or analyzed
+            estimates[name] = int(reltuples) if reltuples is not None and reltuples >= 0 else None
+    elif dialect == 'sqlite':
+        has_stats = session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        )).scalar()
+        if has_stats:
+            for name, stat in session.execute(text("SELECT tbl, stat FROM sqlite_stat1")):
+                if name in estimates and stat and estimates[name] is None:
+                    estimates[name] = int(stat.split()[0])
+    return estimates
+
+
+def collect_database_stats(session, engine):
+    from models import AuditLog
+
+    status = 'connected' if session.execute(text('SELECT 1')).scalar() == 1 else 'error'
+    tables = [model.__tablename__ for model in _tracked_models()]
+    estimates = estimate_table_rows(session, tables)
+
+    try:
+        yesterday = datetime.now() - timedelta(hours=24)
+        recent_audit_logs = session.query(func.count(AuditLog.id)).filter(
+            AuditLog.timestamp >= yesterday
+        ).scalar()
+    except Exception:
+        session.rollback()
+        recent_audit_logs = 0
+
+    return {
+        'status': status,
+        'tables': [{'table': name, 'count': estimates[name], 'estimated': True} for name in tables],
+        'pool': collect_pool_stats(engine),
+        'recent_activity': {
+            'audit_logs_24h': recent_audit_logs
+        },
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+def collect_application_stats(session):
+    from models import User, Problem, BusinessCase, Project
+
+    def scalar(query):
+        try:
+            return query.scalar()
+        except Exception:
+            session.rollback()
+            return 0
+
+    return {
+        'users': {
+            'total': scalar(session.query(func.count(User.id))),
+            'active_today': scalar(session.query(func.count(User.id)).filter(
+                User.last_login >= datetime.now().date()
+            )) if hasattr(User, 'last_login') else 0
+        },
+        'content': {
+            'open_problems': scalar(session.query(func.count(Problem.id)).filter(
+                Problem.status.in_(['Open', 'In_Progress'])
+            )),
+            'pending_cases': scalar(session.query(func.count(BusinessCase.id)).filter(
+                BusinessCase.status == 'Pending'
+            )),
+            'active_projects': scalar(session.query(func.count(Project.id)).filter(
+                Project.status.in_(['Open', 'In_Progress'])
+            ))
+        },
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+class SystemMetricsSampler:
+    """Background sampler with a fixed-size ring buffer of recent samples"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL_SECONDS, history=SAMPLE_HISTORY):
+        self.interval = interval
+        self._samples = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._gauges = None
+
+    def start(self, app):
+        """Start sampling on a daemon thread (no-op if already running)"""
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        psutil.cpu_percent(interval=None)  # Prime the CPU counter; the first reading is meaningless
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(app,), daemon=True, name='metrics-sampler')
+        self._thread.start()
+        logger.info(f"📈 System metrics sampler started (every {self.interval}s, {self._samples.maxlen} samples)")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, app):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.sample_once(app)
+            except Exception as e:
+                logger.error(f"❌ Metrics sample failed: {e}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def sample_once(self, app):
+        """Collect one sample, append it to the ring buffer and update the gauges"""
+        from app import db
+
+        started = time.perf_counter()
+        sample = {'system': collect_system_stats()}
+        with app.app_context():
+            try:
+                sample['database'] = collect_database_stats(db.session, db.engine)
+                sample['application'] = collect_application_stats(db.session)
+            except Exception as e:
+                db.session.rollback()
+                sample['database'] = {'status': 'error', 'error': str(e), 'timestamp': datetime.now().isoformat()}
+                sample['application'] = {'error': str(e), 'timestamp': datetime.now().isoformat()}
+            finally:
+                db.session.remove()
+        sample['sampled_at'] = datetime.now().isoformat()
+        sample['sample_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+        with self._lock:
+            self._samples.append(sample)
+        self._export(sample)
+        return sample
+
+    def latest(self):
+        """Most recent sample, or None before the first one is collected"""
+        with self._lock:
+            return self._samples[-1] if self._samples else None
+
+    def history(self, limit=None):
+        """Recent samples, oldest first"""
+        with self._lock:
+            samples = list(self._samples)
+        return samples[-limit:] if limit else samples
+
+    # ------------------------------------------------------------------ Prometheus
+
+    def register_prometheus(self, registry):
+        """Create the sampler's gauges on the PrometheusMetrics registry"""
+        if not PROMETHEUS_AVAILABLE or self._gauges is not None:
+            return False
+        self._gauges = {
+            'cpu': Gauge('deciframe_system_cpu_percent', 'Host CPU usage percent', registry=registry),
+            'memory': Gauge('deciframe_system_memory_percent', 'Host memory usage percent', registry=registry),
+            'disk': Gauge('deciframe_system_disk_percent', 'Root disk usage percent', registry=registry),
+            'load': Gauge('deciframe_system_load1', 'One-minute load average', registry=registry),
+            'pool': Gauge('deciframe_db_pool_connections', 'DB pool connections by state',
+                          ['state'], registry=registry),
+            'rows': Gauge('deciframe_db_table_rows_estimate', 'Estimated table rows from planner statistics',
+                          ['table'], registry=registry),
+            'sample_ms': Gauge('deciframe_metrics_sample_duration_ms', 'Time taken to collect one sample',
+                               registry=registry),
+            'sampled_at': Gauge('deciframe_metrics_last_sample_timestamp', 'Unix time of the last sample',
+                                registry=registry)
+        }
+        latest = self.latest()
+        if latest:
+            self._export(latest)
+        return True
+
+    def _export(self, sample):
+        gauges = self._gauges
+        if gauges is None:
+            return
+        system = sample.get('system', {})
+        if 'cpu' in system:
+            gauges['cpu'].set(system['cpu']['usage_percent'])
+            gauges['load'].set(system['cpu']['load_average'][0])
+            gauges['memory'].set(system['memory']['usage_percent'])
+            gauges['disk'].set(system['disk']['usage_percent'])
+        database = sample.get('database', {})
+        for state in ('size', 'checkedin', 'checkedout', 'overflow'):
+            value = database.get('pool', {}).get(state)
+            if value is not None:
+                gauges['pool'].labels(state=state).set(value)
+        for table in database.get('tables', []):
+            if table['count'] is not None:
+                gauges['rows'].labels(table=table['table']).set(table['count'])
+        gauges['sample_ms'].set(sample['sample_ms'])
+        gauges['sampled_at'].set(time.time())
+
+
+# Global system metrics sampler
+system_sampler = SystemMetricsSampler()
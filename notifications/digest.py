@@ -0,0 +1,471 @@
+"""
+Notification Digest Engine
+Emails for events whose NotificationSetting frequency is hourly, daily or weekly are written to the
+notification_outbox table instead of being sent one by one. Bulk senders (workflow fan-out) also
+queue immediate emails here; they use one-minute windows. A background flusher:
+
+1. builds digests: once an item's window (the UTC minute, hour, day or Monday-starting week it was
+   queued in) has closed, the pending items of each user, frequency and window are attached to a single
+   NotificationDigest row;
+2. delivers due digests in batches of NOTIFICATION_DIGEST_BATCH_SIZE through the configured
+   transport (notifications/transports.py), one email per user per window with the items grouped
+   by event.
+
+Idempotency: the outbox dedupe_key drops an identical event queued twice in one window; an item is
+attached to exactly one digest (digest_id IS NULL guard); digest_key is unique, so flushers in
+several workers build the same digest once; and a digest is delivered only after a worker claims it
+with an atomic status update and lease.
+
+Delivery is at-least-once: a worker that dies (or loses its lease) after the transport accepted a
+digest but before it was marked sent leaves the lease to expire, and the digest is sent again. The
+retry carries the same Message-ID (the digest_key), so mail clients and downstream systems can
+discard the duplicate; the transports themselves cannot tell that the first send succeeded.
+
+Failed deliveries are retried with exponential backoff up to NOTIFICATION_DIGEST_MAX_ATTEMPTS.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, or_, and_
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import NotificationOutbox, NotificationDigest, FrequencyEnum, User
+from notifications.transports import create_transport
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = int(os.getenv('NOTIFICATION_DIGEST_FLUSH_SECONDS', '60'))
+DIGEST_BATCH_SIZE = int(os.getenv('NOTIFICATION_DIGEST_BATCH_SIZE', '50'))
+DIGEST_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_DIGEST_MAX_ATTEMPTS', '5'))
+DIGEST_LEASE_SECONDS = int(os.getenv('NOTIFICATION_DIGEST_LEASE_SECONDS', '300'))
+
+WINDOW_LENGTHS = {
+    FrequencyEnum.immediate: timedelta(minutes=1),
+    FrequencyEnum.hourly: timedelta(hours=1),
+    FrequencyEnum.daily: timedelta(days=1),
+    FrequencyEnum.weekly: timedelta(weeks=1)
+}
+
+try:
+    from prometheus_client import Gauge, Histogram, Counter
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+DIGEST_TEMPLATE = """
+<h3>{% if frequency == 'immediate' %}New DeciFrame notifications{% else %}Your {{ frequency }} DeciFrame digest{% endif %}</h3>
+<p>Hello {{ user_name }},</p>
+<p>Here {{ 'is' if total == 1 else 'are' }} {{ total }} update{{ '' if total == 1 else 's' }} from {{ window_start.strftime('%b %d, %Y %H:%M') }} UTC.</p>
+{% for event, items in events %}
+<h4>{{ event }} ({{ items|length }})</h4>
+<ul>
+  {% for item in items %}
+  <li>{% if item.link %}<a href="{{ item.link }}">{{ item.label }}</a>{% else %}{{ item.label }}{% endif %}
+    <small>{{ item.created_at.strftime('%H:%M') }}</small></li>
+  {% endfor %}
+</ul>
+{% endfor %}
+<p>Best regards,<br>DeciFrame Team</p>
+"""
+
+
+def window_bounds(frequency, at):
+    """(start, end) of the UTC minute, hour, day or Monday-starting week containing at"""
+    if frequency == FrequencyEnum.immediate:
+        start = at.replace(second=0, microsecond=0)
+    elif frequency == FrequencyEnum.hourly:
+        start = at.replace(minute=0, second=0, microsecond=0)
+    elif frequency == FrequencyEnum.daily:
+        start = at.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif frequency == FrequencyEnum.weekly:
+        start = at.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=at.weekday())
+    else:
+        raise ValueError(f"No digest window for frequency {frequency}")
+    return start, start + WINDOW_LENGTHS[frequency]
+
+
+def outbox_entry(user_id, organization_id, event_name, frequency, context=None, now=None):
+    """
+    Build one notification_outbox row (a dict for enqueue_outbox)
+
+    The context is stored as JSON; values that are not JSON types (dates, decimals) become strings.
+    """
+    return outbox_entries([(user_id, organization_id)], event_name, frequency, context, now)[0]
+
+
+def outbox_entries(recipients, event_name, frequency, context=None, now=None):
+    """outbox_entry for many (user_id, organization_id) pairs sharing one event and context"""
+    now = now or datetime.utcnow()
+    context_json = json.dumps(context or {}, default=str, sort_keys=True)
+    stored_context = json.loads(context_json)
+    window_start, _ = window_bounds(frequency, now)
+    suffix = f"|{event_name}|{frequency.name}|{window_start.isoformat()}|{context_json}"
+    return [{
+        'organization_id': organization_id,
+        'user_id': user_id,
+        'event_name': event_name,
+        'frequency': frequency,
+        'window_start': window_start,
+        'context': stored_context,
+        'dedupe_key': hashlib.sha256(f"{user_id}{suffix}".encode('utf-8')).hexdigest(),
+        'created_at': now
+    } for user_id, organization_id in recipients]
+
+
+def enqueue_outbox(entries):
+    """
+    Insert outbox rows in one statement, skipping duplicates of rows already queued
+
+    Runs in the caller's transaction; the caller commits. Returns the number of rows submitted
+    (duplicates skipped by the database are included on PostgreSQL and SQLite).
+    """
+    if not entries:
+        return 0
+    table = NotificationOutbox.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        db.session.execute(insert(table).on_conflict_do_nothing(index_elements=['dedupe_key']), entries)
+        return len(entries)
+
+    existing = {key for (key,) in db.session.query(NotificationOutbox.dedupe_key).filter(
+        NotificationOutbox.dedupe_key.in_([entry['dedupe_key'] for entry in entries])
+    )}
+    entries = list({entry['dedupe_key']: entry for entry in entries if entry['dedupe_key'] not in existing}.values())
+    if entries:
+        db.session.execute(table.insert(), entries)
+    return len(entries)
+
+
+def digest_key(user_id, frequency, window_start, first_item_id):
+    # first_item_id separates items that arrive after the window's digest was already built
+    return f"{user_id}:{frequency.name}:{window_start:%Y%m%d%H}:{first_item_id}"
+
+
+class NotificationDigestService:
+    """Builds and delivers notification digests from the outbox"""
+
+    def __init__(self, transport=None, batch_size=DIGEST_BATCH_SIZE, interval=FLUSH_INTERVAL_SECONDS,
+                 max_attempts=DIGEST_MAX_ATTEMPTS, lease_seconds=DIGEST_LEASE_SECONDS):
+        self._transport = transport
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = None
+        self._metrics = None
+        self.last_flush = None
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            self._transport = create_transport()
+        return self._transport
+
+    def enqueue(self, user, event_name, frequency, context=None):
+        """Queue one event email for user's next digest (caller commits)"""
+        return enqueue_outbox([outbox_entry(user.id, user.organization_id, event_name, frequency, context)])
+
+    # ------------------------------------------------------------------ Building
+
+    def build_due_digests(self, now=None):
+        """Attach pending items whose window has closed to one digest per user, frequency and window"""
+        now = now or datetime.utcnow()
+        closed = or_(*[
+            and_(NotificationOutbox.frequency == frequency, NotificationOutbox.window_start <= now - length)
+            for frequency, length in WINDOW_LENGTHS.items()
+        ])
+        groups = db.session.query(
+            NotificationOutbox.organization_id,
+            NotificationOutbox.user_id,
+            NotificationOutbox.frequency,
+            NotificationOutbox.window_start,
+            func.min(NotificationOutbox.id)
+        ).filter(NotificationOutbox.digest_id.is_(None), closed).group_by(
+            NotificationOutbox.organization_id,
+            NotificationOutbox.user_id,
+            NotificationOutbox.frequency,
+            NotificationOutbox.window_start
+        ).all()
+
+        built = 0
+        for organization_id, user_id, frequency, window_start, first_item_id in groups:
+            try:
+                built += self._build_digest(organization_id, user_id, frequency, window_start, first_item_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"❌ Failed to build digest for user {user_id} ({frequency.value}): {e}")
+        return built
+
+    def _build_digest(self, organization_id, user_id, frequency, window_start, first_item_id):
+        key = digest_key(user_id, frequency, window_start, first_item_id)
+        digest = NotificationDigest.query.filter_by(digest_key=key).first()
+        created = 0
+        if digest is None:
+            digest = NotificationDigest(
+                organization_id=organization_id,
+                user_id=user_id,
+                frequency=frequency,
+                window_start=window_start,
+                window_end=window_start + WINDOW_LENGTHS[frequency],
+                digest_key=key,
+                status='pending'
+            )
+            db.session.add(digest)
+            try:
+                db.session.flush()
+                created = 1
+            except IntegrityError:
+                # Another worker built it first; attach whatever it left unassigned
+                db.session.rollback()
+                digest = NotificationDigest.query.filter_by(digest_key=key).first()
+                if digest is None:
+                    return 0
+
+        NotificationOutbox.query.filter(
+            NotificationOutbox.user_id == user_id,
+            NotificationOutbox.frequency == frequency,
+            NotificationOutbox.window_start == window_start,
+            NotificationOutbox.digest_id.is_(None)
+        ).update({NotificationOutbox.digest_id: digest.id}, synchronize_session=False)
+        digest.item_count = db.session.query(func.count(NotificationOutbox.id)).filter(
+            NotificationOutbox.digest_id == digest.id
+        ).scalar()
+        db.session.commit()
+        return created
+
+    # ------------------------------------------------------------------ Delivery
+
+    def deliver_due_digests(self, now=None):
+        """
+        Claim and send up to batch_size due digests through the transport
+
+        Returns:
+            (sent, failed) counts for this batch
+        """
+        now = now or datetime.utcnow()
+        candidates = [digest_id for (digest_id,) in db.session.query(NotificationDigest.id).filter(
+            self._due_filter(now)
+        ).order_by(NotificationDigest.window_end, NotificationDigest.id).limit(self.batch_size)]
+        claimed = [digest_id for digest_id in candidates if self._claim(digest_id, now)]
+        if not claimed:
+            return 0, 0
+
+        digests = NotificationDigest.query.filter(NotificationDigest.id.in_(claimed)).all()
+        users = {user.id: user for user in User.query.filter(User.id.in_({d.user_id for d in digests}))}
+        items = OrderedDict((d.id, []) for d in digests)
+        for item in NotificationOutbox.query.filter(NotificationOutbox.digest_id.in_(claimed)).order_by(
+                NotificationOutbox.created_at, NotificationOutbox.id):
+            items[item.digest_id].append(item)
+
+        messages, sendable = [], []
+        results = {}
+        for digest in digests:
+            user = users.get(digest.user_id)
+            if user is None or not user.email or not items[digest.id]:
+                results[digest.id] = (False, 'Recipient or items missing')
+                continue
+            try:
+                messages.append(self.render_digest(digest, user, items[digest.id]))
+                sendable.append(digest)
+            except Exception as e:
+                results[digest.id] = (False, f"Render failed: {e}")
+
+        started = time.perf_counter()
+        if messages:
+            for digest, result in zip(sendable, self.transport.send_batch(messages)):
+                results[digest.id] = result
+        send_seconds = time.perf_counter() - started
+
+        sent = failed = 0
+        sent_at = datetime.utcnow()
+        for digest in digests:
+            ok, error = results[digest.id]
+            if ok:
+                digest.status = 'sent'
+                digest.sent_at = sent_at
+                digest.transport = self.transport.name
+                digest.last_error = None
+                sent += 1
+                self._observe('lag', (sent_at - digest.window_end).total_seconds())
+            else:
+                digest.last_error = error
+                if digest.attempts >= self.max_attempts:
+                    digest.status = 'failed'
+                else:
+                    digest.status = 'pending'
+                    digest.next_attempt_at = sent_at + timedelta(minutes=2 ** digest.attempts)
+                failed += 1
+            digest.lease_expires_at = None
+        db.session.commit()
+
+        if messages:
+            self._observe('send', send_seconds)
+        self._count('sent', sent)
+        self._count('failed', failed)
+        if failed:
+            logger.warning(f"⚠️ {failed} notification digest(s) failed to send via {self.transport.name}")
+        return sent, failed
+
+    def _due_filter(self, now):
+        return or_(
+            and_(NotificationDigest.status == 'pending',
+                 or_(NotificationDigest.next_attempt_at.is_(None), NotificationDigest.next_attempt_at <= now)),
+            and_(NotificationDigest.status == 'sending', NotificationDigest.lease_expires_at < now)
+        )
+
+    def _claim(self, digest_id, now):
+        """Take a due digest for sending; False if another worker claimed it first"""
+        claimed = NotificationDigest.query.filter(
+            NotificationDigest.id == digest_id,
+            self._due_filter(now)
+        ).update({
+            NotificationDigest.status: 'sending',
+            NotificationDigest.lease_expires_at: now + timedelta(seconds=self.lease_seconds),
+            NotificationDigest.attempts: NotificationDigest.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def render_digest(self, digest, user, items):
+        """Transport message for one digest, with items grouped by event"""
+        events = OrderedDict()
+        for item in items:
+            context = item.context or {}
+            label = context.get('title') or context.get('name') or item.event_name.replace('_', ' ').title()
+            events.setdefault(item.event_name.replace('_', ' ').title(), []).append({
+                'label': label,
+                'link': context.get('link'),
+                'created_at': item.created_at
+            })
+        total = len(items)
+        # Rendered without the request context processors: the flusher has no request or user
+        html = current_app.jinja_env.from_string(DIGEST_TEMPLATE).render(
+            frequency=digest.frequency.value,
+            user_name=user.name,
+            total=total,
+            window_start=digest.window_start,
+            events=list(events.items())
+        )
+        return {
+            'key': digest.digest_key,
+            'to_email': user.email,
+            'to_name': user.name,
+            'subject': (f"DeciFrame: {total} new notification{'' if total == 1 else 's'}"
+                        if digest.frequency == FrequencyEnum.immediate else
+                        f"DeciFrame {digest.frequency.value} digest: {total} update{'' if total == 1 else 's'}"),
+            'html': html
+        }
+
+    # ------------------------------------------------------------------ Flushing
+
+    def flush(self, now=None):
+        """Build closed windows' digests, then deliver due digests batch by batch (in an app context)"""
+        started = time.perf_counter()
+        built = self.build_due_digests(now)
+        sent = failed = 0
+        while True:
+            batch_sent, batch_failed = self.deliver_due_digests(now)
+            sent += batch_sent
+            failed += batch_failed
+            if batch_sent + batch_failed < self.batch_size or self._stop.is_set():
+                break
+        depth = self.queue_depth()
+        self._export_depth(depth)
+        self.last_flush = {
+            'at': datetime.utcnow().isoformat(),
+            'built': built,
+            'sent': sent,
+            'failed': failed,
+            'queue_depth': depth,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+        if built or sent or failed:
+            logger.info(f"📬 Notification digests: {built} built, {sent} sent, {failed} failed")
+        return self.last_flush
+
+    def queue_depth(self):
+        """Items waiting for a digest, by frequency, and digests waiting to be sent"""
+        depth = {frequency.value: 0 for frequency in WINDOW_LENGTHS}
+        for frequency, count in db.session.query(
+                NotificationOutbox.frequency, func.count(NotificationOutbox.id)
+        ).filter(NotificationOutbox.digest_id.is_(None)).group_by(NotificationOutbox.frequency):
+            depth[frequency.value] = count
+        depth['digests_pending'] = db.session.query(func.count(NotificationDigest.id)).filter(
+            NotificationDigest.status.in_(['pending', 'sending'])
+        ).scalar()
+        return depth
+
+    def start(self, app):
+        """Flush every interval seconds on a daemon thread (no-op if already running)"""
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(app,), daemon=True, name='notification-digests')
+        self._thread.start()
+        logger.info(f"📬 Notification digest flusher started (every {self.interval}s, via {self.transport.name})")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, app):
+        while not self._stop.wait(self.interval):
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"❌ Notification digest flush failed: {e}")
+                finally:
+                    db.session.remove()
+
+    # ------------------------------------------------------------------ Prometheus
+
+    def register_prometheus(self, registry):
+        """Create queue depth and send latency metrics on the PrometheusMetrics registry"""
+        if not PROMETHEUS_AVAILABLE or self._metrics is not None:
+            return False
+        self._metrics = {
+            'depth': Gauge('deciframe_notification_outbox_pending', 'Outbox items waiting for a digest',
+                           ['frequency'], registry=registry),
+            'digests_pending': Gauge('deciframe_notification_digests_pending', 'Digests waiting to be sent',
+                                     registry=registry),
+            'send': Histogram('deciframe_notification_digest_send_seconds', 'Transport time per digest batch',
+                              registry=registry),
+            'lag': Histogram('deciframe_notification_digest_lag_seconds', 'Delay from window close to delivery',
+                             buckets=(1, 10, 60, 300, 900, 3600, 4 * 3600, 24 * 3600), registry=registry),
+            'sent': Counter('deciframe_notification_digests_sent', 'Digests delivered', registry=registry),
+            'failed': Counter('deciframe_notification_digest_failures', 'Digest delivery failures', registry=registry)
+        }
+        return True
+
+    def _observe(self, name, value):
+        if self._metrics is not None:
+            self._metrics[name].observe(value)
+
+    def _count(self, name, value):
+        if self._metrics is not None and value:
+            self._metrics[name].inc(value)
+
+    def _export_depth(self, depth):
+        if self._metrics is None:
+            return
+        for frequency in WINDOW_LENGTHS:
+            self._metrics['depth'].labels(frequency=frequency.value).set(depth[frequency.value])
+        self._metrics['digests_pending'].set(depth['digests_pending'])
+
+
+# Global notification digest service
+digest_service = NotificationDigestService()
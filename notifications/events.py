@@ -5,6 +5,7 @@ Handles automated notification triggers for business workflow events
 
 from datetime import date, timedelta
 from flask import url_for
+from app import db
 from models import (
     BusinessCase, Problem, Project, ProjectMilestone, User, Department,
     NotificationEventEnum
@@ -199,11 +200,14 @@ class NotificationEvents:
                 ):
                     notifications_sent += 1
             
+            # send_notification adds its rows to this transaction; the batch commits them once
+            db.session.commit()
             print(f"✓ Sent {notifications_sent} overdue milestone notifications")
             return notifications_sent
             
         except Exception as e:
             print(f"❌ Overdue milestone check failed: {e}")
+            db.session.rollback()
             return 0
     
     @staticmethod
@@ -224,11 +228,14 @@ class NotificationEvents:
                 if NotificationEvents.on_milestone_due_soon(milestone.id, days_ahead):
                     notifications_sent += 1
             
+            # send_notification adds its rows to this transaction; the batch commits them once
+            db.session.commit()
             print(f"✓ Sent {notifications_sent} upcoming milestone notifications")
             return notifications_sent
             
         except Exception as e:
             print(f"❌ Upcoming milestone check failed: {e}")
+            db.session.rollback()
             return 0
 
 
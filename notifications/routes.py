@@ -4,6 +4,7 @@ Notifications blueprint routes
 
 from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy import or_
 import logging
 
 # Create the blueprint (matches __init__.py)
@@ -12,6 +13,21 @@ notifications_bp = Blueprint('notifications', __name__, url_prefix='/notificatio
 logger = logging.getLogger(__name__)
 
 
+def _mark_unread_as_read(query):
+    """Bulk-mark unread notifications as read and move the unread badge counter in the same transaction"""
+    from models import Notification, db
+    from services.badge_counters import badge_counters, UNREAD_NOTIFICATIONS
+
+    updated = query.filter(
+        or_(Notification.read_flag == False, Notification.read_flag.is_(None))
+    ).update({'read_flag': True}, synchronize_session=False)
+    # Query.update bypasses mapper events, so adjust the counter explicitly
+    badge_counters.adjust(db.session.connection(), current_user.organization_id, current_user.id,
+                          UNREAD_NOTIFICATIONS, -updated)
+    db.session.commit()
+    return updated
+
+
 @notifications_bp.route('/')
 @login_required
 def index():
@@ -25,11 +41,8 @@ def index():
             organization_id=current_user.organization_id
         ).order_by(Notification.created_at.desc()).limit(50).all()
         
-        unread_count = Notification.query.filter_by(
-            user_id=current_user.id,
-            organization_id=current_user.organization_id,
-            read=False
-        ).count()
+        from services.badge_counters import badge_counters
+        unread_count = badge_counters.get_unread_count(current_user.organization_id, current_user.id)
         
         return render_template('notifications/index.html', 
                              notifications=notifications,
@@ -48,7 +61,7 @@ def index():
 def mark_read():
     """Mark specific notifications as read."""
     try:
-        from models import Notification, db
+        from models import Notification
         
         data = request.get_json() or {}
         notification_ids = data.get('ids', [])
@@ -63,13 +76,11 @@ def mark_read():
             return jsonify({'error': 'Invalid notification IDs'}), 400
         
         # Update notifications for the current user only
-        updated = Notification.query.filter(
+        updated = _mark_unread_as_read(Notification.query.filter(
             Notification.id.in_(notification_ids),
             Notification.user_id == current_user.id,
             Notification.organization_id == current_user.organization_id
-        ).update({'read': True}, synchronize_session=False)
-        
-        db.session.commit()
+        ))
         
         return jsonify({
             'marked': notification_ids,
@@ -86,15 +97,12 @@ def mark_read():
 def mark_all_read():
     """Mark all notifications as read for the current user."""
     try:
-        from models import Notification, db
+        from models import Notification
         
-        updated = Notification.query.filter_by(
+        updated = _mark_unread_as_read(Notification.query.filter_by(
             user_id=current_user.id,
-            organization_id=current_user.organization_id,
-            read=False
-        ).update({'read': True}, synchronize_session=False)
-        
-        db.session.commit()
+            organization_id=current_user.organization_id
+        ))
         
         return jsonify({
             'marked': 'all',
@@ -111,13 +119,9 @@ def mark_all_read():
 def notification_count():
     """Get unread notification count for the current user."""
     try:
-        from models import Notification
+        from services.badge_counters import badge_counters
         
-        count = Notification.query.filter_by(
-            user_id=current_user.id,
-            organization_id=current_user.organization_id,
-            read=False
-        ).count()
+        count = badge_counters.get_unread_count(current_user.organization_id, current_user.id)
         
         return jsonify({'unread_count': count})
         
@@ -33,6 +33,9 @@ class NotificationService:
             event_name: String name of the event (e.g., 'problem_created')
             user: User object or user_id to receive notification
             **context: Additional context data for template rendering
+
+        In-app notifications and outbox rows are added to the caller's transaction (each in a
+        savepoint, so a failure here does not undo the caller's changes); the caller commits.
         """
         # Get notification settings for this event
         setting = get_setting(event_name)
@@ -81,18 +84,21 @@ class NotificationService:
     def _queue_notification(self, setting, user, event_name, context):
         """Queue notification for batch processing based on frequency"""
         try:
-            # For now, store in-app notification immediately and queue email
+            # In-app notifications are not batched
             if setting.channel_in_app:
                 self._create_in_app_notification_with_setting(user.id, event_name, context)
-            
-            # TODO: Implement actual queue system for batch email processing
-            # For demonstration, we'll send email immediately but log the intended frequency
-            if setting.channel_email and self.sendgrid_client:
-                print(f"📧 Queuing email for {setting.frequency.value} batch processing - Event: {event_name}, User: {user.name}")
-                self._send_email_with_setting(user, event_name, context)
-            
+
+            # Email goes to the outbox and is sent in the user's hourly/daily/weekly digest.
+            # The outbox row commits with the caller's transaction, so an event that rolls back
+            # is never mailed
+            if setting.channel_email:
+                from notifications.digest import digest_service
+                with db.session.begin_nested():
+                    digest_service.enqueue(user, event_name, setting.frequency, context)
+                print(f"📧 Queued email for {setting.frequency.value} digest - Event: {event_name}, User: {user.name}")
+
             return True
-            
+
         except Exception as e:
             print(f"❌ Failed to queue notification: {e}")
             return False
@@ -126,13 +132,13 @@ class NotificationService:
                 event_type=None,  # We don't have enum mapping for string event names
                 read_flag=False
             )
-            db.session.add(notification)
-            db.session.commit()
+            # Part of the caller's transaction; the savepoint keeps a failure from undoing it
+            with db.session.begin_nested():
+                db.session.add(notification)
             return True
             
         except Exception as e:
             print(f"❌ Failed to create in-app notification: {e}")
-            db.session.rollback()
             return False
     
     def _send_email_with_setting(self, user, event_name, context):
@@ -190,6 +196,9 @@ class NotificationService:
             event_type: NotificationEventEnum value
             user_id: Target user ID
             context_data: Dictionary with template variables
+        
+        Like dispatch(), notification rows are part of the caller's transaction: the caller
+        commits (once, after a loop of sends in a batch job).
         """
         try:
             # Get notification template
@@ -398,7 +407,7 @@ notification_service = NotificationService()
 
 
 def send_notification(event_type, user_id, context_data=None):
-    """Convenience function for sending notifications"""
+    """Convenience function for sending notifications; the caller commits (see NotificationService.send_notification)"""
     return notification_service.send_notification(event_type, user_id, context_data)
 
 
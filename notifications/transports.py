@@ -0,0 +1,170 @@
+"""
+Email Transports for Notification Digests
+Pluggable delivery for digest emails, selected with NOTIFICATION_TRANSPORT:
+- 'sendgrid': SendGrid API (SENDGRID_API_KEY); the default when the key is set
+- 'smtp':     SMTP server (SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_USE_TLS);
+              one connection per batch
+- 'file':     writes each message as an .eml file under NOTIFICATION_OUTBOX_DIR, by default the
+              outbox folder of the instance folder (tests, staging)
+- 'console':  logs each message; the fallback when nothing else is configured
+
+Messages are dicts with key, to_email, to_name, subject and html. The key is the digest key: it is
+sent as the Message-ID (and a SendGrid custom arg) so a retried delivery is recognisable downstream.
+"""
+
+import os
+import smtplib
+import logging
+from email.message import EmailMessage
+from email.utils import formataddr
+from utils.local_state import instance_path
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_TRANSPORT = os.getenv('NOTIFICATION_TRANSPORT', 'sendgrid' if os.getenv('SENDGRID_API_KEY') else 'console')
+FROM_EMAIL = os.getenv('FROM_EMAIL', 'noreply@deciframe.com')
+
+
+def build_email_message(message, from_email=FROM_EMAIL):
+    """MIME message for SMTP and file delivery"""
+    email = EmailMessage()
+    email['From'] = from_email
+    email['To'] = formataddr((message.get('to_name') or '', message['to_email']))
+    email['Subject'] = message['subject']
+    email['Message-ID'] = f"<{message['key']}@deciframe>"
+    email.set_content("This message is best viewed in an HTML-capable email client.")
+    email.add_alternative(message['html'], subtype='html')
+    return email
+
+
+class DigestTransport:
+    """Delivery interface for NotificationDigestService"""
+
+    name = 'base'
+
+    def send_batch(self, messages):
+        """
+        Deliver a batch of messages
+
+        Returns:
+            list of (success, error) in the order of messages
+        """
+        raise NotImplementedError
+
+
+class SendGridTransport(DigestTransport):
+    name = 'sendgrid'
+
+    def __init__(self, api_key=None, from_email=FROM_EMAIL):
+        from sendgrid import SendGridAPIClient
+        api_key = api_key or os.environ.get('SENDGRID_API_KEY')
+        if not api_key:
+            raise RuntimeError("SENDGRID_API_KEY not set")
+        self.client = SendGridAPIClient(api_key)
+        self.from_email = from_email
+
+    def send_batch(self, messages):
+        from sendgrid.helpers.mail import Mail, Email, To, Content, CustomArg
+
+        results = []
+        for message in messages:
+            try:
+                mail = Mail(
+                    from_email=Email(self.from_email),
+                    to_emails=To(message['to_email'], message.get('to_name')),
+                    subject=message['subject'],
+                    html_content=Content("text/html", message['html'])
+                )
+                mail.custom_arg = CustomArg('digest_key', message['key'])
+                response = self.client.send(mail)
+                ok = response.status_code in [200, 202]
+                results.append((ok, None if ok else f"SendGrid status {response.status_code}"))
+            except Exception as e:
+                results.append((False, str(e)))
+        return results
+
+
+class SMTPTransport(DigestTransport):
+    name = 'smtp'
+
+    def __init__(self, host=None, port=None, username=None, password=None, use_tls=None, from_email=FROM_EMAIL):
+        self.host = host or os.getenv('SMTP_HOST', 'localhost')
+        self.port = int(port or os.getenv('SMTP_PORT', '587'))
+        self.username = username or os.getenv('SMTP_USERNAME')
+        self.password = password or os.getenv('SMTP_PASSWORD')
+        self.use_tls = use_tls if use_tls is not None else os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
+        self.from_email = from_email
+
+    def send_batch(self, messages):
+        try:
+            server = smtplib.SMTP(self.host, self.port, timeout=30)
+        except Exception as e:
+            return [(False, f"SMTP connect failed: {e}")] * len(messages)
+
+        results = []
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password or '')
+            for message in messages:
+                try:
+                    server.send_message(build_email_message(message, self.from_email))
+                    results.append((True, None))
+                except Exception as e:
+                    results.append((False, str(e)))
+        except Exception as e:
+            results.extend([(False, str(e))] * (len(messages) - len(results)))
+        finally:
+            try:
+                server.quit()
+            except Exception:
+                pass
+        return results
+
+
+class FileTransport(DigestTransport):
+    """Writes <key>.eml files; a redelivered digest overwrites its own file"""
+
+    name = 'file'
+
+    def __init__(self, directory=None, from_email=FROM_EMAIL):
+        # Messages contain organization data: keep them out of the shared temp directory
+        self.directory = directory or os.getenv('NOTIFICATION_OUTBOX_DIR') or os.path.join(instance_path(), 'outbox')
+        self.from_email = from_email
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def send_batch(self, messages):
+        results = []
+        for message in messages:
+            try:
+                filename = message['key'].replace(':', '_').replace('/', '_') + '.eml'
+                with open(os.path.join(self.directory, filename), 'wb') as f:
+                    f.write(bytes(build_email_message(message, self.from_email)))
+                results.append((True, None))
+            except Exception as e:
+                results.append((False, str(e)))
+        return results
+
+
+class ConsoleTransport(DigestTransport):
+    name = 'console'
+
+    def send_batch(self, messages):
+        for message in messages:
+            logger.info(f"📧 Digest {message['key']} to {message['to_email']}: {message['subject']}")
+        return [(True, None)] * len(messages)
+
+
+def create_transport(name=NOTIFICATION_TRANSPORT):
+    """Build the configured transport, falling back to the console if it cannot be set up"""
+    try:
+        if name == 'sendgrid':
+            return SendGridTransport()
+        if name == 'smtp':
+            return SMTPTransport()
+        if name == 'file':
+            return FileTransport()
+    except Exception as e:
+        print(f"⚠️ Notification transport '{name}' unavailable ({e}); logging digests to the console")
+    return ConsoleTransport()
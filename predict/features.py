@@ -0,0 +1,165 @@
+"""
+Batch Feature Extraction for DeciFrame Predictive Analytics
+Loads projects, their business cases and milestone/team aggregates in one SQL query and
+derives model features as vectorized column expressions, so any number of projects can be
+scored with a single scaler.transform / model call.
+"""
+
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+from app import db
+
+PRIORITY_CODES = {'Low': 1, 'Medium': 2, 'High': 3}
+ON_HOLD_STATUSES = ('OnHold', 'On_Hold')
+
+# Simple risk scoring based on department ID; in practice this would come from historical success rates
+DEPARTMENT_RISK = {1: 3, 2: 4, 3: 6, 4: 5, 5: 7}
+DEFAULT_DEPARTMENT_RISK = 5
+
+_FEATURE_SQL = """
+    WITH scope AS (
+        SELECT p.id
+        FROM projects p
+        JOIN business_cases bc ON bc.id = p.business_case_id
+        WHERE 1 = 1 {filters}
+    )
+    SELECT p.id AS project_id,
+           p.name,
+           p.organization_id,
+           p.created_at,
+           p.status,
+           p.priority,
+           p.start_date,
+           p.end_date,
+           bc.id AS business_case_id,
+           bc.cost_estimate,
+           bc.roi,
+           bc.dept_id,
+           bc.approved_at,
+           COALESCE(ms.milestone_count, 0) AS milestone_count,
+           COALESCE(ms.completed_milestones, 0) AS completed_milestones,
+           COALESCE(ms.overdue_milestones, 0) AS overdue_milestones,
+           COALESCE(team.team_size, 0) AS team_size
+    FROM scope s
+    JOIN projects p ON p.id = s.id
+    JOIN business_cases bc ON bc.id = p.business_case_id
+    LEFT JOIN (
+        SELECT m.project_id,
+               COUNT(*) AS milestone_count,
+               SUM(CASE WHEN m.completed THEN 1 ELSE 0 END) AS completed_milestones,
+               SUM(CASE WHEN m.due_date < :today AND NOT COALESCE(m.completed, FALSE) THEN 1 ELSE 0 END)
+                   AS overdue_milestones
+        FROM project_milestones m
+        JOIN scope s ON s.id = m.project_id
+        GROUP BY m.project_id
+    ) ms ON ms.project_id = p.id
+    LEFT JOIN (
+        SELECT members.project_id, COUNT(DISTINCT members.member_id) AS team_size
+        FROM (
+            SELECT p2.id AS project_id, p2.project_manager_id AS member_id
+            FROM projects p2 JOIN scope s ON s.id = p2.id
+            UNION
+            SELECT p2.id, bc2.assigned_ba
+            FROM projects p2 JOIN scope s ON s.id = p2.id
+            JOIN business_cases bc2 ON bc2.id = p2.business_case_id
+            UNION
+            SELECT m.project_id, m.owner_id
+            FROM project_milestones m JOIN scope s ON s.id = m.project_id
+        ) members
+        WHERE members.member_id IS NOT NULL
+        GROUP BY members.project_id
+    ) team ON team.project_id = p.id
+    ORDER BY p.id
+"""
+
+
+def load_project_features(project_ids=None, organization_id=None, since=None, chunksize=None):
+    """
+    Load raw columns and derived features for projects that have a business case
+
+    Args:
+        project_ids: Restrict to these project IDs (optional)
+        organization_id: Restrict to one organization (optional)
+        since: Only projects created on or after this date (optional)
+        chunksize: Read the result in chunks of this many rows (optional)
+
+    Returns:
+        DataFrame indexed by project_id (empty if nothing matches)
+    """
+    filters = []
+    params = {'today': datetime.utcnow().date()}
+    if project_ids is not None:
+        if not project_ids:
+            return _empty_frame()
+        filters.append("AND p.id IN :project_ids")
+        params['project_ids'] = [int(pid) for pid in project_ids]
+    if organization_id is not None:
+        filters.append("AND p.organization_id = :organization_id")
+        params['organization_id'] = organization_id
+    if since is not None:
+        filters.append("AND p.created_at >= :since")
+        params['since'] = since
+
+    statement = text(_FEATURE_SQL.format(filters=' '.join(filters)))
+    if project_ids is not None:
+        statement = statement.bindparams(bindparam('project_ids', expanding=True))
+
+    connection = db.session.connection()
+    if chunksize:
+        chunks = list(pd.read_sql(statement, connection, params=params, chunksize=chunksize))
+        df = pd.concat(chunks, ignore_index=True) if chunks else _empty_frame().reset_index()
+    else:
+        df = pd.read_sql(statement, connection, params=params)
+
+    if df.empty:
+        return _empty_frame()
+    return derive_features(df).set_index('project_id', drop=False)
+
+
+def derive_features(df):
+    """Add model features to a raw project frame using vectorized column expressions"""
+    cost = pd.to_numeric(df['cost_estimate'], errors='coerce').fillna(0.0)
+    roi = pd.to_numeric(df['roi'], errors='coerce').fillna(0.0)
+    milestones = df['milestone_count'].astype(int)
+    on_hold = df['status'].isin(ON_HOLD_STATUSES)
+
+    df['cost_estimate'] = cost
+    # No actual-cost column exists yet, so actual cost falls back to the estimate (variance 1.0)
+    df['actual_cost'] = cost
+    df['cost_variance'] = 1.0
+    df['priority'] = df['priority'].map(PRIORITY_CODES).fillna(2).astype(int)
+    df['roi_estimate'] = roi
+    df['team_size'] = np.maximum(df['team_size'].astype(int), 1)
+    df['department_risk'] = df['dept_id'].map(DEPARTMENT_RISK).fillna(DEFAULT_DEPARTMENT_RISK).astype(int)
+
+    complexity = (milestones * 2
+                  + np.where(cost > 50000, 3, 0)
+                  + np.where(roi > 100, 2, 0)
+                  + np.where(on_hold, 5, 0))
+    df['complexity_score'] = np.minimum(complexity, 20)
+
+    # Cycle time: approval to start when both are known, otherwise estimated from complexity and priority
+    start = pd.to_datetime(df['start_date'], errors='coerce')
+    approved = pd.to_datetime(df['approved_at'], errors='coerce').dt.normalize()
+    actual_cycle = (start - approved).dt.days
+    estimated_cycle = (30 * (df['complexity_score'] / 10) * (2.0 - df['priority'] / 3.0)).astype(int)
+    df['cycle_time'] = actual_cycle.fillna(estimated_cycle).astype(int)
+
+    today = pd.Timestamp(datetime.utcnow().date())
+    df['days_since_start'] = (today - start).dt.days.fillna(0).astype(int)
+    df['created_at'] = pd.to_datetime(df['created_at'], errors='coerce')
+    return df
+
+
+def feature_matrix(df, feature_names):
+    """Build the (n_projects, n_features) matrix in model feature order; missing features are 0"""
+    columns = [df[name].astype(float).to_numpy() if name in df else np.zeros(len(df)) for name in feature_names]
+    if not columns:
+        return np.zeros((len(df), 0))
+    return np.column_stack(columns)
+
+
+def _empty_frame():
+    return pd.DataFrame(columns=['project_id']).set_index('project_id', drop=False)
@@ -9,125 +9,85 @@ import logging
 from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-import joblib
 import numpy as np
+import pandas as pd
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import db
-from models import Project, BusinessCase, PredictionFeedback, RoleEnum, StatusEnum, PriorityEnum
+from models import Project, BusinessCase, PredictionFeedback, RoleEnum
+from predict.features import load_project_features, feature_matrix
+from analytics.model_registry import model_registry, MODEL_TYPES
 
 predict_bp = Blueprint('predict', __name__, url_prefix='/api/predict')
 
-# Global model cache
-MODEL_CACHE = {}
-
 def load_model(model_type):
-    """Load ML model from disk with caching"""
-    if model_type in MODEL_CACHE:
-        return MODEL_CACHE[model_type]
-    
-    models_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'analytics', 'models')
-    
+    """
+    Load the active version of an ML model from the model registry
+
+    The registry re-checks the manifest periodically, so a newly published version is picked
+    up without restarting the worker; artifacts are memory-mapped and shared between workers.
+    """
     try:
-        model_path = os.path.join(models_dir, f'{model_type}_model.pkl')
-        scaler_path = os.path.join(models_dir, f'{model_type}_scaler.pkl')
-        features_path = os.path.join(models_dir, f'{model_type}_features.pkl')
-        
-        if not all(os.path.exists(p) for p in [model_path, scaler_path, features_path]):
-            return None
-        
-        model = joblib.load(model_path)
-        scaler = joblib.load(scaler_path)
-        features = joblib.load(features_path)
-        
-        MODEL_CACHE[model_type] = {
-            'model': model,
-            'scaler': scaler,
-            'features': features
-        }
-        
-        return MODEL_CACHE[model_type]
-        
+        return model_registry.get(model_type)
     except Exception as e:
         logging.error(f"Error loading {model_type} model: {str(e)}")
         return None
 
+# Upper bound on project IDs accepted by the bulk endpoints
+MAX_BULK_PROJECTS = 500
+
 def extract_project_features(project):
     """Extract features from a project for ML prediction"""
-    if not project.business_case:
+    if not project.business_case_id:
         return None
     
-    # Calculate complexity score
-    complexity = len(project.milestones) * 2
-    if project.business_case.cost_estimate and project.business_case.cost_estimate > 50000:
-        complexity += 3
-    if project.business_case.roi_percentage and project.business_case.roi_percentage > 100:
-        complexity += 2
-    if project.status == StatusEnum.OnHold:
-        complexity += 5
-    complexity = min(complexity, 20)
-    
-    # Calculate team size
-    team_members = set()
-    if project.project_manager_id:
-        team_members.add(project.project_manager_id)
-    if project.business_case.business_analyst_id:
-        team_members.add(project.business_case.business_analyst_id)
-    for milestone in project.milestones:
-        if milestone.assigned_to:
-            team_members.add(milestone.assigned_to)
-    team_size = max(len(team_members), 1)
-    
-    # Priority encoding
-    priority_map = {PriorityEnum.Low: 1, PriorityEnum.Medium: 2, PriorityEnum.High: 3}
-    priority = priority_map.get(project.priority, 2)
-    
-    # Department risk
-    dept_risk_scores = {1: 3, 2: 4, 3: 6, 4: 5, 5: 7}
-    dept_risk = dept_risk_scores.get(project.business_case.department_id, 5)
-    
-    return {
-        'cost_estimate': project.business_case.cost_estimate or 0,
-        'actual_cost': project.business_case.actual_cost or project.business_case.cost_estimate or 0,
-        'priority': priority,
-        'complexity_score': complexity,
-        'team_size': team_size,
-        'milestone_count': len(project.milestones),
-        'department_risk': dept_risk,
-        'roi_estimate': project.business_case.roi_percentage or 0,
-        'cycle_time': calculate_cycle_time(project),
-        'cost_variance': calculate_cost_variance(project)
-    }
+    df = load_project_features(project_ids=[project.id])
+    if df.empty:
+        return None
+    return {name: value.item() if isinstance(value, np.generic) else value
+            for name, value in df.iloc[0].to_dict().items()}
 
-def calculate_cycle_time(project):
-    """Calculate or estimate cycle time"""
-    if project.business_case and project.business_case.approval_date and project.start_date:
-        return (project.start_date - project.business_case.approval_date).days
-    
-    # Estimate based on complexity and priority
-    base_days = 30
-    complexity = len(project.milestones) * 2
-    priority_map = {PriorityEnum.Low: 1, PriorityEnum.Medium: 2, PriorityEnum.High: 3}
-    priority = priority_map.get(project.priority, 2)
-    complexity_factor = complexity / 10
-    priority_factor = 2.0 - (priority / 3.0)
-    
-    return int(base_days * complexity_factor * priority_factor)
+def score_features(model_data, df):
+    """Scale the feature matrix for every row of df in a single transform call"""
+    X = feature_matrix(df, model_data['features'])
+    return model_data['scaler'].transform(X)
 
-def calculate_cost_variance(project):
-    """Calculate cost variance ratio"""
-    if not project.business_case:
-        return 1.0
-    
-    actual = project.business_case.actual_cost
-    estimated = project.business_case.cost_estimate
-    
-    if actual and estimated and estimated > 0:
-        return actual / estimated
-    
-    return 1.0
+def success_probabilities(model_data, X_scaled):
+    """Probability of success for each row of X_scaled"""
+    try:
+        return model_data['model'].predict_proba(X_scaled)[:, 1]
+    except Exception:
+        # Fallback to binary prediction if predict_proba fails
+        return model_data['model'].predict(X_scaled).astype(float)
+
+def cycle_time_days(model_data, X_scaled):
+    """Estimated cycle time in days for each row of X_scaled, bounded to 1..365"""
+    return np.clip(model_data['model'].predict(X_scaled).astype(int), 1, 365)
+
+def record_predictions(prediction_type, project_ids, values):
+    """Store predictions for feedback tracking"""
+    db.session.add_all([
+        PredictionFeedback(
+            organization_id=current_user.organization_id,
+            prediction_type=prediction_type,
+            entity_id=int(project_id),
+            predicted_value=float(value),
+            created_by=current_user.id
+        )
+        for project_id, value in zip(project_ids, values)
+    ])
+    db.session.commit()
+
+def _bulk_project_ids():
+    """Read project IDs from a JSON body ({"project_ids": [...]}) or ?project_ids=1,2,3"""
+    data = request.get_json(silent=True) or {}
+    ids = data.get('project_ids')
+    if ids is None:
+        raw = request.args.get('project_ids', '')
+        ids = [part for part in raw.split(',') if part.strip()]
+    return list(dict.fromkeys(int(pid) for pid in ids))
 
 @predict_bp.route('/project-success')
 @login_required
@@ -153,32 +113,12 @@ def predict_project_success():
         if not features_dict:
             return jsonify({'error': 'Insufficient project data for prediction'}), 400
         
-        # Prepare feature vector
-        feature_names = model_data['features']
-        feature_vector = []
-        for feature in feature_names:
-            feature_vector.append(features_dict.get(feature, 0))
-        
         # Scale features and predict
-        X = np.array(feature_vector).reshape(1, -1)
-        X_scaled = model_data['scaler'].transform(X)
-        
-        # Get probability prediction
-        try:
-            probability = model_data['model'].predict_proba(X_scaled)[0][1]  # Probability of success
-        except:
-            # Fallback to binary prediction if predict_proba fails
-            prediction = model_data['model'].predict(X_scaled)[0]
-            probability = float(prediction)
+        X_scaled = score_features(model_data, pd.DataFrame([features_dict]))
+        probability = float(success_probabilities(model_data, X_scaled)[0])
         
         # Store prediction for feedback
-        feedback = PredictionFeedback()
-        feedback.prediction_type = 'project-success'
-        feedback.entity_id = project.id
-        feedback.predicted_value = probability
-        feedback.user_id = current_user.id if current_user.is_authenticated else None
-        db.session.add(feedback)
-        db.session.commit()
+        record_predictions('project-success', [project.id], [probability])
         
         # Trigger AI workflow actions
         from analytics.ai_workflows import AIWorkflowEngine
@@ -233,28 +173,12 @@ def predict_cycle_time():
         if not features_dict:
             return jsonify({'error': 'Insufficient project data for prediction'}), 400
         
-        # Prepare feature vector
-        feature_names = model_data['features']
-        feature_vector = []
-        for feature in feature_names:
-            feature_vector.append(features_dict.get(feature, 0))
-        
-        # Scale features and predict
-        X = np.array(feature_vector).reshape(1, -1)
-        X_scaled = model_data['scaler'].transform(X)
-        estimated_days = model_data['model'].predict(X_scaled)[0]
-        
-        # Ensure reasonable bounds
-        estimated_days = max(1, min(int(estimated_days), 365))
+        # Scale features and predict (bounded to 1..365 days)
+        X_scaled = score_features(model_data, pd.DataFrame([features_dict]))
+        estimated_days = int(cycle_time_days(model_data, X_scaled)[0])
         
         # Store prediction for feedback
-        feedback = PredictionFeedback()
-        feedback.prediction_type = 'cycle-time'
-        feedback.entity_id = project.id
-        feedback.predicted_value = estimated_days
-        feedback.user_id = current_user.id if current_user.is_authenticated else None
-        db.session.add(feedback)
-        db.session.commit()
+        record_predictions('cycle-time', [project.id], [estimated_days])
         
         # Trigger AI milestone rescheduling workflow
         from analytics.ai_workflows import AIWorkflowEngine
@@ -276,6 +200,108 @@ def predict_cycle_time():
         logging.error(f"Error in cycle time prediction: {str(e)}")
         return jsonify({'error': 'Prediction service error'}), 500
 
+@predict_bp.route('/project-success/bulk', methods=['GET', 'POST'])
+@login_required
+def predict_project_success_bulk():
+    """
+    Predict success probability for many projects in one request
+    Accepts {"project_ids": [...]} as JSON or ?project_ids=1,2,3. Predictions are recorded
+    for feedback; per-project AI workflow actions are left to the single-project endpoint.
+    """
+    try:
+        project_ids = _bulk_project_ids()
+    except (TypeError, ValueError):
+        return jsonify({'error': 'project_ids must be a list of integers'}), 400
+    
+    if not project_ids:
+        return jsonify({'error': 'project_ids parameter required'}), 400
+    if len(project_ids) > MAX_BULK_PROJECTS:
+        return jsonify({'error': f'At most {MAX_BULK_PROJECTS} project_ids per request'}), 400
+    
+    try:
+        model_data = load_model('success')
+        if not model_data:
+            return jsonify({'error': 'Success prediction model not available'}), 503
+        
+        df = load_project_features(project_ids=project_ids, organization_id=current_user.organization_id)
+        predictions = {}
+        if not df.empty:
+            probabilities = success_probabilities(model_data, score_features(model_data, df))
+            record_predictions('project-success', df['project_id'], probabilities)
+            
+            for (project_id, row), probability in zip(df.iterrows(), probabilities):
+                probability = float(probability)
+                predictions[str(project_id)] = {
+                    'probability': round(probability, 3),
+                    'confidence': 'high' if abs(probability - 0.5) > 0.3 else 'medium',
+                    'factors': {
+                        'complexity': int(row['complexity_score']),
+                        'team_size': int(row['team_size']),
+                        'cost_estimate': float(row['cost_estimate']),
+                        'priority': int(row['priority'])
+                    }
+                }
+        
+        return jsonify({
+            'predictions': predictions,
+            'missing': [pid for pid in project_ids if str(pid) not in predictions]
+        })
+        
+    except Exception as e:
+        logging.error(f"Error in bulk project success prediction: {str(e)}")
+        return jsonify({'error': 'Prediction service error'}), 500
+
+@predict_bp.route('/cycle-time/bulk', methods=['GET', 'POST'])
+@login_required
+def predict_cycle_time_bulk():
+    """
+    Predict cycle time for many projects in one request
+    Accepts {"project_ids": [...]} as JSON or ?project_ids=1,2,3. Predictions are recorded
+    for feedback; milestone rescheduling is left to the single-project endpoint.
+    """
+    try:
+        project_ids = _bulk_project_ids()
+    except (TypeError, ValueError):
+        return jsonify({'error': 'project_ids must be a list of integers'}), 400
+    
+    if not project_ids:
+        return jsonify({'error': 'project_ids parameter required'}), 400
+    if len(project_ids) > MAX_BULK_PROJECTS:
+        return jsonify({'error': f'At most {MAX_BULK_PROJECTS} project_ids per request'}), 400
+    
+    try:
+        model_data = load_model('cycle_time')
+        if not model_data:
+            return jsonify({'error': 'Cycle time prediction model not available'}), 503
+        
+        df = load_project_features(project_ids=project_ids, organization_id=current_user.organization_id)
+        predictions = {}
+        if not df.empty:
+            days = cycle_time_days(model_data, score_features(model_data, df))
+            record_predictions('cycle-time', df['project_id'], days)
+            
+            for (project_id, row), estimated_days in zip(df.iterrows(), days):
+                estimated_days = int(estimated_days)
+                predictions[str(project_id)] = {
+                    'estimated_days': estimated_days,
+                    'estimated_weeks': round(estimated_days / 7, 1),
+                    'confidence': 'high' if row['milestone_count'] > 2 else 'medium',
+                    'factors': {
+                        'complexity': int(row['complexity_score']),
+                        'priority': int(row['priority']),
+                        'milestone_count': int(row['milestone_count'])
+                    }
+                }
+        
+        return jsonify({
+            'predictions': predictions,
+            'missing': [pid for pid in project_ids if str(pid) not in predictions]
+        })
+        
+    except Exception as e:
+        logging.error(f"Error in bulk cycle time prediction: {str(e)}")
+        return jsonify({'error': 'Prediction service error'}), 500
+
 @predict_bp.route('/anomalies')
 @login_required
 def detect_anomalies():
@@ -296,46 +322,30 @@ def detect_anomalies():
         if not model_data:
             return jsonify({'error': 'Anomaly detection model not available'}), 503
         
-        # Get projects to analyze
-        query = Project.query.join(BusinessCase)
-        if since_date:
-            query = query.filter(Project.created_at >= since_date)
-        
-        projects = query.all()
+        # Load every project with its business case and milestone aggregates in one query
+        df = load_project_features(organization_id=current_user.organization_id, since=since_date)
         
         anomalies = []
-        for project in projects:
-            features_dict = extract_project_features(project)
-            if not features_dict:
-                continue
-            
-            # Prepare feature vector
-            feature_names = model_data['features']
-            feature_vector = []
-            for feature in feature_names:
-                feature_vector.append(features_dict.get(feature, 0))
-            
-            # Scale features and detect anomaly
-            X = np.array(feature_vector).reshape(1, -1)
-            X_scaled = model_data['scaler'].transform(X)
-            
-            # Get anomaly score and prediction
-            anomaly_score = model_data['model'].decision_function(X_scaled)[0]
-            is_anomaly = model_data['model'].predict(X_scaled)[0] == -1
+        if not df.empty:
+            # Score the whole batch with one transform / decision_function / predict call each
+            X_scaled = score_features(model_data, df)
+            scores = model_data['model'].decision_function(X_scaled)
+            flagged = model_data['model'].predict(X_scaled) == -1
             
-            if is_anomaly:
+            for position in np.flatnonzero(flagged):
+                row = df.iloc[position]
                 anomalies.append({
-                    'id': project.id,
-                    'name': project.name,
+                    'id': int(row['project_id']),
+                    'name': row['name'],
                     'type': 'project',
-                    'anomaly_score': round(anomaly_score, 3),
-                    'reasons': analyze_anomaly_reasons(features_dict),
-                    'created_at': project.created_at.isoformat()
+                    'anomaly_score': round(float(scores[position]), 3),
+                    'reasons': analyze_anomaly_reasons(row),
+                    'created_at': row['created_at'].isoformat() if pd.notna(row['created_at']) else None
                 })
         
         return jsonify({
             'anomalies': anomalies,
-            'total_analyzed': len(projects),
+            'total_analyzed': len(df),
             'anomaly_count': len(anomalies),
             'analysis_date': datetime.utcnow().isoformat()
         })
@@ -428,14 +438,14 @@ def get_model_stats():
     try:
         stats = {}
         
-        # Model availability
-        models_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'analytics', 'models')
-        stats['models_available'] = {
-            'success': os.path.exists(os.path.join(models_dir, 'success_model.pkl')),
-            'cycle_time': os.path.exists(os.path.join(models_dir, 'cycle_time_model.pkl')),
-            'anomaly': os.path.exists(os.path.join(models_dir, 'anomaly_model.pkl'))
+        # Model availability and versions
+        registry_status = model_registry.get_status()
+        stats['models_available'] = registry_status['models_available'] or {
+            model_type: load_model(model_type) is not None for model_type in MODEL_TYPES
         }
-        
+        stats['active_version'] = registry_status['manifest_version']
+        stats['model_registry'] = registry_status
+
         # Feedback statistics
         feedback_counts = db.session.query(
             PredictionFeedback.prediction_type,
@@ -446,20 +456,14 @@ def get_model_stats():
         
         # Recent predictions
         recent_predictions = PredictionFeedback.query.filter(
-            PredictionFeedback.feedback_date >= datetime.utcnow() - timedelta(days=7)
+            PredictionFeedback.created_at >= datetime.utcnow() - timedelta(days=7)
         ).count()
         
         stats['recent_predictions'] = recent_predictions
         
         # Training metadata
-        try:
-            metadata_path = os.path.join(models_dir, 'training_metadata.pkl')
-            if os.path.exists(metadata_path):
-                metadata = joblib.load(metadata_path)
-                stats['last_training'] = metadata
-        except:
-            stats['last_training'] = None
-        
+        stats['last_training'] = model_registry.get_metadata()
+
         return jsonify(stats)
         
     except Exception as e:
@@ -157,26 +157,6 @@ def create():
             'OnHold': StatusEnum.OnHold
         }
         
-        # Generate next available problem code
-        def get_next_problem_code():
-            from sqlalchemy import text
-            # Get the highest existing code number
-            result = db.session.execute(
-                text("SELECT code FROM problems WHERE code IS NOT NULL AND code LIKE 'P%' ORDER BY code DESC LIMIT 1")
-            ).fetchone()
-            
-            if result and result[0]:
-                # Extract number from code like 'P0057' -> 57
-                try:
-                    latest_num = int(result[0][1:])
-                    next_num = latest_num + 1
-                except (ValueError, IndexError):
-                    next_num = 1
-            else:
-                next_num = 1
-            
-            return f"P{next_num:04d}"
-        
         prob = Problem(
             title=form.title.data,
             description=form.description.data,
@@ -187,10 +167,9 @@ def create():
             created_by=user.id,
             organization_id=user.organization_id,  # Add organization_id for multi-tenant security
             issue_type=issue_type,
-            code=get_next_problem_code(),  # Generate code before insert
             ai_confidence=ai_confidence
         )
-        db.session.add(prob)
+        db.session.add(prob)  # The P code is allocated from code_sequences by the before_insert event
         db.session.commit()
         
         # Trigger workflow events asynchronously
@@ -126,10 +126,7 @@ def new_project():
         )
         
         db.session.add(project)
-        db.session.flush()
-        
-        # Auto-generate project code
-        project.code = f"PRJ{project.id:04d}"
+        db.session.flush()  # Assigns project.id and its PRJ code (from code_sequences)
         
         db.session.commit()
         
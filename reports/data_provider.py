@@ -0,0 +1,120 @@
+"""
+Report Data Provider for DeciFrame
+Collects dashboard sections for report generation in-process instead of calling the
+/admin/api/dashboard/* endpoints over HTTP.
+
+Each section calls the dashboard/routes._get_* function directly with an explicit organization
+and the template's filters as the request query string. Sections are independent, so they run
+concurrently on a thread pool, each in its own app context and DB session. Results are memoized
+per (organization, filters, minute) so templates scheduled at the same time share one
+computation; identical requests that arrive while it is running wait for it.
+"""
+
+import os
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor, Future
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+REPORT_DATA_WORKERS = int(os.getenv('REPORT_DATA_WORKERS', '4'))
+
+# Report data key -> dashboard/routes helper name
+SECTIONS = {
+    'problems_trend': '_get_problems_trend',
+    'case_conversion': '_get_case_conversion',
+    'project_metrics': '_get_project_metrics',
+    'status_breakdown': '_get_status_breakdown',
+    'department_heatmap': '_get_department_heatmap',
+    'time_to_value': '_get_time_to_value',
+    'risks_issues': '_get_risks_issues',
+    'roi_waterfall': '_get_roi_waterfall',
+    'problem_clusters': '_get_problem_clusters',
+    'milestone_burndown': '_get_milestone_burndown',
+    'resource_utilization': '_get_resource_utilization'
+}
+
+
+def filter_query_string(filters):
+    """Template filters (JSON dict) as the query string the dashboard helpers read"""
+    params = []
+    for key, value in sorted((filters or {}).items()):
+        if value:
+            if isinstance(value, list):
+                params.append((key, ','.join(map(str, value))))
+            else:
+                params.append((key, str(value)))
+    return urlencode(params)
+
+
+class ReportDataProvider:
+    """Computes dashboard sections for an organization concurrently, memoized per minute"""
+
+    def __init__(self, max_workers=REPORT_DATA_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-data')
+        self._memo = {}  # (org id, query string, minute) -> Future of {section: data}
+        self._lock = threading.Lock()
+
+    def collect(self, organization_id, filters=None):
+        """
+        Dashboard data for every report section
+
+        Returns:
+            {section key: JSON-ready data}; a section that fails is logged and returned as {}
+        """
+        query_string = filter_query_string(filters)
+        key = (organization_id, query_string, datetime.utcnow().strftime('%Y-%m-%d %H:%M'))
+
+        with self._lock:
+            # Entries from earlier minutes can no longer be hit
+            for stale in [k for k in self._memo if k[2] != key[2]]:
+                del self._memo[stale]
+            future = self._memo.get(key)
+            owner = future is None
+            if owner:
+                future = self._memo[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            future.set_result(self._compute(organization_id, query_string))
+        except Exception as e:
+            with self._lock:
+                self._memo.pop(key, None)
+            future.set_exception(e)
+        return future.result()
+
+    def _compute(self, organization_id, query_string):
+        app = current_app._get_current_object()
+        futures = {
+            section: self.executor.submit(self._run_section, app, section, organization_id, query_string)
+            for section in SECTIONS
+        }
+        return {section: future.result() for section, future in futures.items()}
+
+    def _run_section(self, app, section, organization_id, query_string):
+        from app import db
+        from dashboard import routes as dashboard_routes
+
+        helper = getattr(dashboard_routes, SECTIONS[section])
+        with app.test_request_context('/', query_string=query_string):
+            try:
+                return helper(organization_id=organization_id).get_json()
+            except Exception as e:
+                logger.error(f"❌ Report section {section} failed for org {organization_id}: {e}")
+                db.session.rollback()
+                return {}
+            finally:
+                db.session.remove()
+
+    def clear(self):
+        with self._lock:
+            self._memo.clear()
+
+
+# Global report data provider
+report_data_provider = ReportDataProvider()
@@ -0,0 +1,86 @@
+"""
+PDF Rendering Pool for DeciFrame Reports
+WeasyPrint rendering is CPU-bound and holds the GIL for seconds on large reports, so report PDFs
+are rendered in separate processes instead of on web worker threads.
+
+Each render runs `python -m reports.pdf_renderer <pdf_path>` with the HTML on stdin. At most
+REPORT_PDF_WORKERS renders run at once; further callers wait for a slot. A fresh process per
+render keeps WeasyPrint's memory growth out of long-lived workers and never imports the Flask
+app. Set REPORT_PDF_WORKERS=0 to render in-process.
+
+This module must not import the Flask app: the render process runs it as a script.
+"""
+
+import os
+import sys
+import logging
+import threading
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+PDF_WORKERS = int(os.getenv('REPORT_PDF_WORKERS', '2'))
+PDF_TIMEOUT_SECONDS = int(os.getenv('REPORT_PDF_TIMEOUT_SECONDS', '300'))
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# CSS for PDF styling
+PDF_CSS = """
+body { font-family: Arial, sans-serif; margin: 40px; }
+.header { border-bottom: 2px solid #0d6efd; padding-bottom: 20px; margin-bottom: 30px; }
+.metric-card { border: 1px solid #ddd; padding: 15px; margin: 10px 0; border-radius: 5px; }
+.chart-section { margin: 20px 0; page-break-inside: avoid; }
+table { width: 100%; border-collapse: collapse; margin: 10px 0; }
+th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+th { background-color: #f8f9fa; }
+.footer { margin-top: 40px; padding-top: 20px; border-top: 1px solid #ddd; font-size: 12px; color: #666; }
+"""
+
+
+def render_pdf(html_content, pdf_path, css_content=PDF_CSS):
+    """Convert HTML to a PDF file with WeasyPrint"""
+    import weasyprint
+    weasyprint.HTML(string=html_content).write_pdf(
+        pdf_path,
+        stylesheets=[weasyprint.CSS(string=css_content)]
+    )
+    return pdf_path
+
+
+class PDFRenderPool:
+    """Runs WeasyPrint renders in at most max_workers concurrent child processes"""
+
+    def __init__(self, max_workers=PDF_WORKERS, timeout=PDF_TIMEOUT_SECONDS):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(max_workers, 1))
+
+    def render(self, html_content, pdf_path):
+        """Render a PDF to pdf_path, blocking the calling thread (not the GIL) until it is written"""
+        if self.max_workers <= 0:
+            return render_pdf(html_content, pdf_path)
+
+        with self._slots:
+            try:
+                subprocess.run(
+                    [sys.executable, '-m', 'reports.pdf_renderer', pdf_path],
+                    input=html_content.encode('utf-8'),
+                    cwd=PROJECT_ROOT,
+                    capture_output=True,
+                    timeout=self.timeout,
+                    check=True
+                )
+            except subprocess.TimeoutExpired:
+                raise RuntimeError(f"PDF rendering timed out after {self.timeout}s")
+            except subprocess.CalledProcessError as e:
+                error = e.stderr.decode('utf-8', 'replace').strip().splitlines()
+                raise RuntimeError(f"PDF rendering failed: {error[-1] if error else e.returncode}")
+        return pdf_path
+
+
+# Global PDF render pool
+pdf_render_pool = PDFRenderPool()
+
+
+if __name__ == '__main__':
+    render_pdf(sys.stdin.buffer.read().decode('utf-8'), sys.argv[1])
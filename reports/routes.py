@@ -9,7 +9,7 @@ from flask_login import login_required, current_user
 from app import db
 from models import ReportTemplate, ReportRun, User, RoleEnum, ReportFrequencyEnum, ReportTypeEnum
 from reports.service import ReportService
-from reports.scheduler import report_scheduler
+from reports.scheduler import report_scheduler, schedule_next_run
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/admin/reports')
 
@@ -92,6 +92,7 @@ def edit_template(template_id):
     if request.method == 'POST':
         try:
             # Update template
+            was_scheduled = (template.frequency, template.active)
             template.name = request.form.get('name')
             template.description = request.form.get('description')
             template.frequency = ReportFrequencyEnum(request.form.get('frequency'))
@@ -100,6 +101,10 @@ def edit_template(template_id):
             template.filters = request.form.get('filters', '{}')
             template.active = request.form.get('active') == 'on'
             
+            # A new frequency or reactivation starts from the next slot rather than catching up
+            if (template.frequency, template.active) != was_scheduled:
+                schedule_next_run(template)
+            
             db.session.commit()
             
             flash(f'Report template "{template.name}" updated successfully', 'success')
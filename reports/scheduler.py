@@ -1,156 +1,206 @@
 """
 Report Scheduler for DeciFrame
 Handles automated scheduling and execution of report generation
+
+Each ReportTemplate stores its next due slot (next_run_at, server local time). The scheduler
+sleeps until the earliest slot (or the poll interval), then claims each due template with a
+database lease so that only one node or worker process runs it, even though every process runs
+a scheduler. A slot missed because the app was down or busy is caught up on the next wake-up:
+one run covers all missed slots, then next_run_at moves to the first slot after now.
 """
 
+import os
+import uuid
+import socket
 import threading
-import time
 import logging
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import or_
+from app import db
 from models import ReportTemplate, ReportFrequencyEnum
 from reports.service import ReportService
 
+SCHEDULE_HOUR = int(os.getenv('REPORT_SCHEDULE_HOUR', '7'))
+POLL_SECONDS = int(os.getenv('REPORT_SCHEDULER_POLL_SECONDS', '60'))
+LEASE_SECONDS = int(os.getenv('REPORT_LEASE_SECONDS', '1800'))
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '2'))
+
+
+def next_slot(frequency: ReportFrequencyEnum, after: datetime) -> datetime:
+    """First scheduled slot strictly after `after`: daily 7 AM, Mondays 7 AM, or the 1st at 7 AM"""
+    slot = after.replace(hour=SCHEDULE_HOUR, minute=0, second=0, microsecond=0)
+    if frequency == ReportFrequencyEnum.Weekly:
+        slot += timedelta(days=-slot.weekday() % 7)
+        if slot <= after:
+            slot += timedelta(days=7)
+    elif frequency == ReportFrequencyEnum.Monthly:
+        slot = slot.replace(day=1)
+        if slot <= after:
+            slot = (slot + timedelta(days=32)).replace(day=1)
+    else:
+        if slot <= after:
+            slot += timedelta(days=1)
+    return slot
+
+
+def schedule_next_run(template: ReportTemplate, after: datetime = None):
+    """Set the template's next slot after `after` (default now), e.g. when its frequency changes"""
+    template.next_run_at = next_slot(template.frequency, after or datetime.now())
+
+
 class ReportScheduler:
     def __init__(self):
         self.report_service = ReportService()
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.app = None
         self.running = False
         self.scheduler_thread = None
-        
-    def start(self):
+        self.executor = None
+        self._wake = threading.Event()
+
+    def start(self, app=None):
         """Start the report scheduler"""
         if not self.running:
+            if app is None:
+                from flask import current_app
+                app = current_app._get_current_object()
+            self.app = app
             self.running = True
+            self.executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix='report-run')
             self.scheduler_thread = threading.Thread(target=self._scheduler_loop, daemon=True)
             self.scheduler_thread.start()
-            logging.info("📊 Report scheduler started")
-    
+            logging.info(f"📊 Report scheduler started ({self.node_id})")
+
     def stop(self):
         """Stop the report scheduler"""
         self.running = False
+        self._wake.set()
         if self.scheduler_thread:
             self.scheduler_thread.join(timeout=5)
+        if self.executor:
+            self.executor.shutdown(wait=False)
         logging.info("📊 Report scheduler stopped")
-    
+
+    def wake(self):
+        """Re-check schedules now instead of at the next poll"""
+        self._wake.set()
+
     def _scheduler_loop(self):
-        """Main scheduler loop"""
+        """Main scheduler loop: dispatch due reports, then sleep until the next slot"""
         while self.running:
-            try:
-                current_time = datetime.now()
-                
-                # Check for due reports every minute
-                if current_time.second == 0:  # Run at the top of each minute
-                    self._check_and_run_due_reports(current_time)
-                
-                time.sleep(1)  # Check every second
-                
-            except Exception as e:
-                logging.error(f"Error in report scheduler: {str(e)}")
-                time.sleep(60)  # Wait a minute before retrying on error
-    
-    def _check_and_run_due_reports(self, current_time: datetime):
-        """Check for reports that are due to run"""
-        
-        # Daily reports - run at 7 AM
-        if current_time.hour == 7 and current_time.minute == 0:
-            self._run_daily_reports()
-        
-        # Weekly reports - run on Monday at 7 AM
-        if (current_time.weekday() == 0 and  # Monday
-            current_time.hour == 7 and 
-            current_time.minute == 0):
-            self._run_weekly_reports()
-        
-        # Monthly reports - run on 1st of month at 7 AM
-        if (current_time.day == 1 and 
-            current_time.hour == 7 and 
-            current_time.minute == 0):
-            self._run_monthly_reports()
-    
-    def _run_daily_reports(self):
-        """Execute all daily reports"""
-        daily_templates = ReportTemplate.query.filter_by(
-            frequency=ReportFrequencyEnum.Daily,
-            active=True
-        ).all()
-        
-        for template in daily_templates:
-            if self._should_run_report(template, ReportFrequencyEnum.Daily):
-                self._execute_report_async(template)
-    
-    def _run_weekly_reports(self):
-        """Execute all weekly reports"""
-        weekly_templates = ReportTemplate.query.filter_by(
-            frequency=ReportFrequencyEnum.Weekly,
-            active=True
+            delay = POLL_SECONDS
+            with self.app.app_context():
+                try:
+                    self._initialize_schedules()
+                    self._dispatch_due_reports(datetime.now())
+                    delay = self._seconds_until_next_due(datetime.now())
+                except Exception as e:
+                    logging.error(f"Error in report scheduler: {str(e)}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def _initialize_schedules(self):
+        """Give templates without a schedule their next slot, counting from their last run"""
+        templates = ReportTemplate.query.filter(
+            ReportTemplate.active == True,
+            ReportTemplate.next_run_at.is_(None)
         ).all()
-        
-        for template in weekly_templates:
-            if self._should_run_report(template, ReportFrequencyEnum.Weekly):
-                self._execute_report_async(template)
-    
-    def _run_monthly_reports(self):
-        """Execute all monthly reports"""
-        monthly_templates = ReportTemplate.query.filter_by(
-            frequency=ReportFrequencyEnum.Monthly,
-            active=True
+        for template in templates:
+            # A slot that passed since the last run is due immediately (catch-up)
+            schedule_next_run(template, template.last_run_at or template.created_at)
+        if templates:
+            db.session.commit()
+
+    def _dispatch_due_reports(self, now: datetime):
+        """Claim every due template this node can lease and run it on the report pool"""
+        due = db.session.query(ReportTemplate.id, ReportTemplate.next_run_at).filter(
+            ReportTemplate.active == True,
+            ReportTemplate.next_run_at <= now,
+            or_(ReportTemplate.lease_expires_at.is_(None), ReportTemplate.lease_expires_at < now)
         ).all()
-        
-        for template in monthly_templates:
-            if self._should_run_report(template, ReportFrequencyEnum.Monthly):
-                self._execute_report_async(template)
-    
-    def _should_run_report(self, template: ReportTemplate, frequency: ReportFrequencyEnum) -> bool:
-        """Check if a report should run based on last execution time"""
-        if not template.last_run_at:
-            return True
-        
-        now = datetime.now()
-        time_since_last_run = now - template.last_run_at
-        
-        if frequency == ReportFrequencyEnum.Daily:
-            return time_since_last_run >= timedelta(hours=23)  # Allow slight variance
-        elif frequency == ReportFrequencyEnum.Weekly:
-            return time_since_last_run >= timedelta(days=6, hours=23)
-        elif frequency == ReportFrequencyEnum.Monthly:
-            return time_since_last_run >= timedelta(days=29, hours=23)
-        
-        return False
-    
-    def _execute_report_async(self, template: ReportTemplate):
-        """Execute report generation in a separate thread"""
-        def run_report():
+        for template_id, scheduled_for in due:
+            if self._claim(template_id, now):
+                self.executor.submit(self._run_claimed, template_id, scheduled_for)
+
+    def _claim(self, template_id: int, now: datetime) -> bool:
+        """Take the lease on a due template; False if another node holds it or already ran it"""
+        claimed = ReportTemplate.query.filter(
+            ReportTemplate.id == template_id,
+            ReportTemplate.next_run_at <= now,
+            or_(ReportTemplate.lease_expires_at.is_(None), ReportTemplate.lease_expires_at < now)
+        ).update({
+            ReportTemplate.lease_owner: self.node_id,
+            ReportTemplate.lease_expires_at: now + timedelta(seconds=LEASE_SECONDS)
+        }, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _run_claimed(self, template_id: int, scheduled_for: datetime):
+        """Run a leased report, then advance its schedule past now and release the lease"""
+        with self.app.app_context():
             try:
-                logging.info(f"📊 Running scheduled report: {template.name}")
-                result = self.report_service.generate_report(template.id)
-                
+                logging.info(f"📊 Running scheduled report {template_id} (slot {scheduled_for})")
+                result = self.report_service.generate_report(
+                    template_id, scheduled_for=scheduled_for, node=self.node_id
+                )
+
                 if result['success']:
-                    logging.info(f"✅ Report '{template.name}' completed successfully. "
+                    logging.info(f"✅ Report {template_id} completed in {result.get('total_ms')}ms. "
                                f"Emails sent: {result.get('emails_sent', 0)}")
                 else:
-                    logging.error(f"❌ Report '{template.name}' failed: {result.get('error', 'Unknown error')}")
-                    
+                    logging.error(f"❌ Report {template_id} failed: {result.get('error', 'Unknown error')}")
+
             except Exception as e:
-                logging.error(f"❌ Exception running report '{template.name}': {str(e)}")
-        
-        # Run in separate thread to avoid blocking scheduler
-        report_thread = threading.Thread(target=run_report, daemon=True)
-        report_thread.start()
-    
+                logging.error(f"❌ Exception running report {template_id}: {str(e)}")
+                db.session.rollback()
+            finally:
+                try:
+                    self._release(template_id)
+                except Exception as e:
+                    logging.error(f"❌ Failed to release report lease {template_id}: {str(e)}")
+                    db.session.rollback()
+                db.session.remove()
+                self._wake.set()
+
+    def _release(self, template_id: int):
+        template = db.session.get(ReportTemplate, template_id)
+        if template is None or template.lease_owner != self.node_id:
+            return
+        # Missed slots were covered by this run, so the next one is the first after now
+        schedule_next_run(template)
+        template.lease_owner = None
+        template.lease_expires_at = None
+        db.session.commit()
+
+    def _seconds_until_next_due(self, now: datetime) -> float:
+        """Seconds until the earliest unleased slot, capped at the poll interval"""
+        next_due = db.session.query(db.func.min(ReportTemplate.next_run_at)).filter(
+            ReportTemplate.active == True,
+            or_(ReportTemplate.lease_expires_at.is_(None), ReportTemplate.lease_expires_at < now)
+        ).scalar()
+        if next_due is None:
+            return POLL_SECONDS
+        return min(POLL_SECONDS, max(1.0, (next_due - now).total_seconds()))
+
     def run_report_now(self, template_id: int) -> dict:
         """Manually trigger a report run immediately"""
         try:
             template = ReportTemplate.query.get(template_id)
             if not template:
                 return {"success": False, "error": "Template not found"}
-            
+
             if not template.active:
                 return {"success": False, "error": "Template is inactive"}
-            
+
             logging.info(f"📊 Manual report execution: {template.name}")
-            result = self.report_service.generate_report(template_id, manual_run=True)
-            
+            result = self.report_service.generate_report(template_id, manual_run=True, node=self.node_id)
+
             return result
-            
+
         except Exception as e:
             logging.error(f"Error in manual report execution: {str(e)}")
             return {"success": False, "error": str(e)}
@@ -158,10 +208,10 @@ class ReportScheduler:
 # Global scheduler instance
 report_scheduler = ReportScheduler()
 
-def init_report_scheduler():
+def init_report_scheduler(app=None):
     """Initialize and start the report scheduler"""
     try:
-        report_scheduler.start()
+        report_scheduler.start(app)
         return True
     except Exception as e:
         logging.error(f"Failed to start report scheduler: {str(e)}")
@@ -174,4 +224,4 @@ def stop_report_scheduler():
         return True
     except Exception as e:
         logging.error(f"Failed to stop report scheduler: {str(e)}")
-        return False
\ No newline at end of file
+        return False
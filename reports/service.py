@@ -5,23 +5,24 @@ Handles automated report generation, PDF conversion, and email distribution
 
 import os
 import json
+import time
 import logging
 from datetime import datetime
 from typing import Dict, Any
-import requests
 from jinja2 import Template
-import weasyprint
 from app import db
 from models import ReportTemplate, ReportRun, User, RoleEnum
 from notifications.service import NotificationService
+from reports.data_provider import report_data_provider
+from reports.pdf_renderer import pdf_render_pool
 
 class ReportService:
     def __init__(self):
         self.notification_service = NotificationService()
-        self.base_url = "http://0.0.0.0:5000"
         
-    def generate_report(self, template_id: int, manual_run: bool = False) -> Dict[str, Any]:
-        """Generate a report from a template"""
+    def generate_report(self, template_id: int, manual_run: bool = False,
+                        scheduled_for: datetime = None, node: str = None) -> Dict[str, Any]:
+        """Generate a report from a template, recording per-stage timings on the ReportRun"""
         template = ReportTemplate.query.get(template_id)
         if not template or not template.active:
             return {"success": False, "error": "Template not found or inactive"}
@@ -29,28 +30,48 @@ class ReportService:
         # Create report run record
         run = ReportRun()
         run.template_id = template_id
+        run.organization_id = template.organization_id
         run.status = 'running'
+        run.trigger = 'manual' if manual_run else 'schedule'
+        run.scheduled_for = scheduled_for
+        run.node = node
         db.session.add(run)
         db.session.commit()
         
+        started = time.perf_counter()
+        timings = {}
+        
+        def timed(stage, fn, *args):
+            stage_started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                timings[stage] = int((time.perf_counter() - stage_started) * 1000)
+        
+        def record_timings():
+            for stage, ms in timings.items():
+                setattr(run, stage, ms)
+            run.total_ms = int((time.perf_counter() - started) * 1000)
+            run.completed_at = datetime.utcnow()
+        
         try:
             # Gather dashboard data
-            dashboard_data = self._collect_dashboard_data(template)
+            dashboard_data = timed('data_ms', self._collect_dashboard_data, template)
             
             # Generate HTML report
-            html_content = self._render_html_report(template, dashboard_data)
+            html_content = timed('render_ms', self._render_html_report, template, dashboard_data)
             
             # Convert to PDF
-            pdf_path = self._generate_pdf(template, html_content, run.id)
+            pdf_path = timed('pdf_ms', self._generate_pdf, template, html_content, run.id)
             
             # Send emails
-            emails_sent = self._send_report_emails(template, pdf_path)
+            emails_sent = timed('email_ms', self._send_report_emails, template, pdf_path)
             
             # Update run record
             run.status = 'completed'
             run.pdf_path = pdf_path
             run.emails_sent = emails_sent
-            run.completed_at = datetime.utcnow()
+            record_timings()
             
             # Update template last run time
             template.last_run_at = datetime.utcnow()
@@ -61,21 +82,22 @@ class ReportService:
                 "success": True,
                 "run_id": run.id,
                 "pdf_path": pdf_path,
-                "emails_sent": emails_sent
+                "emails_sent": emails_sent,
+                "total_ms": run.total_ms
             }
             
         except Exception as e:
             logging.error(f"Report generation failed: {str(e)}")
+            db.session.rollback()
             run.status = 'failed'
             run.error_message = str(e)
-            run.completed_at = datetime.utcnow()
+            record_timings()
             db.session.commit()
             
-            return {"success": False, "error": str(e)}
+            return {"success": False, "run_id": run.id, "error": str(e)}
     
     def _collect_dashboard_data(self, template: ReportTemplate) -> Dict[str, Any]:
-        """Collect data from dashboard API endpoints"""
-        data = {}
+        """Collect dashboard section data for the template's organization and filters"""
         
         # Parse filters if any
         filters = {}
@@ -85,36 +107,8 @@ class ReportService:
             except (json.JSONDecodeError, TypeError):
                 pass
         
-        # Build filter query string
-        filter_params = self._build_filter_params(filters)
-        
-        # Core dashboard endpoints
-        endpoints = {
-            'problems_trend': f'/admin/api/dashboard/problems-trend{filter_params}',
-            'case_conversion': f'/admin/api/dashboard/case-conversion{filter_params}',
-            'project_metrics': f'/admin/api/dashboard/project-metrics{filter_params}',
-            'status_breakdown': f'/admin/api/dashboard/status-breakdown{filter_params}',
-            'department_heatmap': f'/admin/api/dashboard/department-heatmap{filter_params}',
-            'time_to_value': f'/admin/api/dashboard/time-to-value{filter_params}',
-            'risks_issues': f'/admin/api/dashboard/risks-issues{filter_params}',
-            'roi_waterfall': f'/admin/api/dashboard/roi-waterfall{filter_params}',
-            'problem_clusters': f'/admin/api/dashboard/problem-clusters{filter_params}',
-            'milestone_burndown': f'/admin/api/dashboard/milestone-burndown{filter_params}',
-            'resource_utilization': f'/admin/api/dashboard/resource-utilization{filter_params}'
-        }
-        
-        # Fetch data from each endpoint
-        for key, endpoint in endpoints.items():
-            try:
-                response = requests.get(f"{self.base_url}{endpoint}", timeout=30)
-                if response.status_code == 200:
-                    data[key] = response.json()
-                else:
-                    logging.warning(f"Failed to fetch {key}: {response.status_code}")
-                    data[key] = {}
-            except Exception as e:
-                logging.error(f"Error fetching {key}: {str(e)}")
-                data[key] = {}
+        # Sections are shared with other templates run in the same minute, so copy before adding keys
+        data = dict(report_data_provider.collect(template.organization_id, filters))
         
         # Add summary metrics
         data['summary'] = self._calculate_summary_metrics(data)
@@ -127,21 +121,6 @@ class ReportService:
         
         return data
     
-    def _build_filter_params(self, filters: Dict[str, Any]) -> str:
-        """Build query string from filters"""
-        if not filters:
-            return ""
-        
-        params = []
-        for key, value in filters.items():
-            if value:
-                if isinstance(value, list):
-                    params.append(f"{key}={','.join(map(str, value))}")
-                else:
-                    params.append(f"{key}={value}")
-        
-        return f"?{'&'.join(params)}" if params else ""
-    
     def _calculate_summary_metrics(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Calculate high-level summary metrics"""
         summary = {
@@ -222,25 +201,9 @@ class ReportService:
         filename = f"report_{template.id}_{run_id}_{timestamp}.pdf"
         pdf_path = os.path.join(reports_dir, filename)
         
-        # CSS for PDF styling
-        css_content = """
-        body { font-family: Arial, sans-serif; margin: 40px; }
-        .header { border-bottom: 2px solid #0d6efd; padding-bottom: 20px; margin-bottom: 30px; }
-        .metric-card { border: 1px solid #ddd; padding: 15px; margin: 10px 0; border-radius: 5px; }
-        .chart-section { margin: 20px 0; page-break-inside: avoid; }
-        table { width: 100%; border-collapse: collapse; margin: 10px 0; }
-        th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
-        th { background-color: #f8f9fa; }
-        .footer { margin-top: 40px; padding-top: 20px; border-top: 1px solid #ddd; font-size: 12px; color: #666; }
-        """
-        
-        # Generate PDF
+        # Render in the PDF process pool so WeasyPrint does not hold this process's GIL
         try:
-            weasyprint.HTML(string=html_content).write_pdf(
-                pdf_path,
-                stylesheets=[weasyprint.CSS(string=css_content)]
-            )
-            return pdf_path
+            return pdf_render_pool.render(html_content, pdf_path)
         except Exception as e:
             logging.error(f"PDF generation failed: {str(e)}")
             raise
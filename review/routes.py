@@ -9,7 +9,8 @@ from . import review_bp
 from models import db, Epic, EpicComment, User, BusinessCase, BusinessCaseComment, Notification, StatusEnum, Project, ProjectComment, NotificationEventEnum
 from auth.session_auth import require_role
 from utils.ai_helpers import generate_epic_insights, generate_business_case_insights, generate_project_insights
-from utils.ai_review_insights import get_ai_review_insights, get_confidence_badge_class, get_confidence_label
+from utils.ai_review_insights import get_confidence_badge_class, get_confidence_label
+from services.review_insights import review_insights
 
 
 def notify_reviewers_project_submitted(project):
@@ -58,13 +59,8 @@ def epic_detail(epic_id):
     # Generate AI reviewer insights (existing system)
     ai_insights = generate_epic_insights(epic)
     
-    # Generate enhanced AI review insights with confidence scoring
-    enhanced_ai_insights = get_ai_review_insights(
-        content_type="epic",
-        title=epic.title,
-        description=epic.description or "No description provided",
-        additional_context=f"Status: {epic.status}, Business Case: {epic.case_id if epic.case_id else 'No linked case'}"
-    )
+    # Enhanced AI review insights with confidence scoring (precomputed in the background)
+    enhanced_ai_insights = review_insights.get_for_display('epic', epic)
     
     return render_template('review/epic_detail.html', 
                          epic=epic, 
@@ -266,15 +262,8 @@ def business_case_detail(case_id):
     # Generate AI reviewer insights (existing system)
     ai_insights = generate_business_case_insights(case)
     
-    # Generate enhanced AI review insights with confidence scoring
-    enhanced_ai_insights = get_ai_review_insights(
-        content_type="business case",
-        title=case.title,
-        description=case.description or "No description provided",
-        cost=case.estimated_cost,
-        benefit=case.expected_benefit,
-        additional_context=f"Status: {case.status}, ROI: {case.roi if case.roi else 'Not calculated'}"
-    )
+    # Enhanced AI review insights with confidence scoring (precomputed in the background)
+    enhanced_ai_insights = review_insights.get_for_display('business_case', case)
     
     return render_template('review/business_case_detail.html', 
                          case=case, 
@@ -403,14 +392,8 @@ def project_detail(project_id):
     # Generate AI reviewer insights (existing system)
     ai_insights = generate_project_insights(project)
     
-    # Generate enhanced AI review insights with confidence scoring
-    enhanced_ai_insights = get_ai_review_insights(
-        content_type="project",
-        title=project.name,
-        description=project.description or "No description provided",
-        cost=project.budget,
-        additional_context=f"Status: {project.status}, Timeline: {project.end_date if project.end_date else 'Not specified'}"
-    )
+    # Enhanced AI review insights with confidence scoring (precomputed in the background)
+    enhanced_ai_insights = review_insights.get_for_display('project', project)
     
     return render_template('review/project_detail.html', 
                          project=project, 
@@ -517,4 +500,18 @@ def review_summary():
                          epics=epics, 
                          cases=cases, 
                          projects=projects,
-                         total_pending=total_pending)
\ No newline at end of file
+                         total_pending=total_pending)
+
+@review_bp.route('/insights/<entity_type>/<int:entity_id>')
+@login_required
+@require_role('Manager', 'Director', 'CEO', 'PM', 'BA', 'Admin')
+def insight_status(entity_type, entity_id):
+    """Stored AI review insights for an item (polled by review pages while insights are pending)"""
+    models = {'epic': Epic, 'business_case': BusinessCase, 'project': Project}
+    if entity_type not in models:
+        return jsonify({'error': 'Unknown item type'}), 404
+    
+    entity = models[entity_type].query.filter_by(
+        id=entity_id, organization_id=current_user.organization_id
+    ).first_or_404()
+    return jsonify(review_insights.get_for_display(entity_type, entity))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Backfill stored AI review insights for the existing review queue
+
+Computes insights for every submitted Epic, BusinessCase and Project that has no ready
+insight for its current content, so reviewers do not hit the pending state on first open.
+
+Usage:
+    python scripts/backfill_review_insights.py [--org ID] [--force] [--dry-run]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill AI review insights')
+    parser.add_argument('--org', type=int, default=None, help='Only this organization')
+    parser.add_argument('--force', action='store_true', help='Recompute insights that are already ready')
+    parser.add_argument('--dry-run', action='store_true', help='List the queue without computing')
+    args = parser.parse_args()
+
+    from app import app
+    from services.review_insights import review_insights
+
+    with app.app_context():
+        queue = review_insights.pending_entities(organization_id=args.org, force=args.force)
+        print(f"{len(queue)} submitted item(s) need review insights")
+        if args.dry_run:
+            for entity_type, entity_id in queue:
+                print(f"  {entity_type} {entity_id}")
+            return 0
+
+        counts = {'ready': 0, 'failed': 0, 'missing': 0}
+        started = time.perf_counter()
+        for index, (entity_type, entity_id) in enumerate(queue, 1):
+            insight = review_insights.compute(entity_type, entity_id, force=args.force)
+            status = insight.status if insight is not None else 'missing'
+            counts[status] = counts.get(status, 0) + 1
+            print(f"  [{index}/{len(queue)}] {entity_type} {entity_id}: {status}")
+
+        print(f"✅ Done in {time.perf_counter() - started:.1f}s: "
+              f"{counts['ready']} ready, {counts['failed']} failed, {counts['missing']} missing")
+        return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
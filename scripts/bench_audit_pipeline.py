@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-request latency of audited admin actions with and without the audit pipeline
+
+Registers a throwaway route that updates a Setting, commits, and writes one audit entry, then
+drives it through the Flask test client in three modes:
+  - inline: the previous audit() behaviour, AuditLog added to the request session and committed
+  - pipeline (sync): audit() with AUDIT_PIPELINE_MODE=sync, one batch written per call
+  - pipeline (async): audit() queued on the ring buffer, written by the background flusher
+
+The async figures exclude the flusher's work; the time to drain the buffer afterwards is printed
+separately. Everything the benchmark writes is deleted afterwards.
+
+Usage:
+    python scripts/bench_audit_pipeline.py [--requests 2000] [--audits-per-request 1] [--batch-size 500]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples (in ms)"""
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def report(label, samples):
+    print(f"{label:<20} mean={statistics.mean(samples):7.3f}ms  "
+          f"p50={percentile(samples, 50):7.3f}ms  p95={percentile(samples, 95):7.3f}ms  "
+          f"p99={percentile(samples, 99):7.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Audit pipeline latency benchmark')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--audits-per-request', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    from datetime import datetime
+    from app import app, db
+    from models import User, Setting, AuditLog, AuditLogBatch
+    from audit import log as audit_log
+    from audit.pipeline import AuditPipeline
+
+    logging.getLogger('audit').setLevel(logging.WARNING)
+
+    with app.app_context():
+        user = User.query.first()
+        if not user:
+            print("❌ Benchmark needs at least one user")
+            return 1
+        user_id = user.id
+        setting = Setting(key=f'bench_audit_{int(time.time())}', value='0', description='audit benchmark')
+        db.session.add(setting)
+        db.session.commit()
+        setting_key = setting.key
+
+    mode = {'name': 'inline'}
+
+    def audited_action(i):
+        setting = db.session.get(Setting, setting_key)
+        before = {'value': setting.value}
+        setting.value = str(i)
+        db.session.commit()
+        for _ in range(args.audits_per_request):
+            if mode['name'] == 'inline':
+                db.session.add(AuditLog(user_id=user_id, action='BENCH_AUDIT', target='Setting',
+                                        details={'before': before, 'after': {'value': str(i)}},
+                                        timestamp=datetime.utcnow()))
+                db.session.commit()
+            else:
+                audit_log.audit('BENCH_AUDIT', 'Setting', setting_key, before=before,
+                                after={'value': str(i)}, actor_id=user_id)
+        return 'ok'
+
+    app.add_url_rule('/__bench/audited/<int:i>', 'bench_audited_action', audited_action, methods=['POST'])
+    client = app.test_client()
+    pipelines = {
+        'pipeline (sync)': AuditPipeline(mode='sync', batch_size=args.batch_size),
+        'pipeline (async)': AuditPipeline(mode='async', batch_size=args.batch_size)
+    }
+
+    try:
+        print(f"{args.requests} requests, {args.audits_per_request} audit entr"
+              f"{'y' if args.audits_per_request == 1 else 'ies'} each")
+        for name in ('inline', 'pipeline (sync)', 'pipeline (async)'):
+            mode['name'] = name
+            pipeline = pipelines.get(name)
+            if pipeline is not None:
+                audit_log.audit_pipeline = pipeline
+                pipeline.start(app)
+            for i in range(min(50, args.requests)):  # Warm up
+                client.post(f'/__bench/audited/{i}')
+            samples = []
+            for i in range(args.requests):
+                started = time.perf_counter()
+                client.post(f'/__bench/audited/{i}')
+                samples.append((time.perf_counter() - started) * 1000)
+            report(name, samples)
+            if pipeline is not None:
+                started = time.perf_counter()
+                pending = pipeline.pending()
+                pipeline.stop()
+                print(f"{'':<20} drained {pending} buffered entries in {(time.perf_counter() - started) * 1000:.1f}ms; "
+                      f"{pipeline.stats['batches']} batches written")
+    finally:
+        with app.app_context():
+            db.session.query(AuditLog).filter(AuditLog.action == 'BENCH_AUDIT').delete(synchronize_session=False)
+            db.session.query(AuditLogBatch).filter(
+                AuditLogBatch.chain.in_([p.chain for p in pipelines.values() if p.chain])
+            ).delete(synchronize_session=False)
+            db.session.query(Setting).filter(Setting.key == setting_key).delete(synchronize_session=False)
+            db.session.commit()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
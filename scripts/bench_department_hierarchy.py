@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark department hierarchy lookups on a large org chart
+
+Seeds an N-unit org chart (default 5,000 units over 8 levels) inside a transaction that is
+rolled back at the end, then compares recursive parent/children traversal with the
+department_closure table for:
+  - descendant scoping: all unit IDs under the root (what list views filter on)
+  - org report: level, full path, manager, parent and direct reports for every unit
+    (what download_org_report renders)
+
+Usage:
+    python scripts/bench_department_hierarchy.py [--units 5000] [--levels 8] [--iterations 5]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def level_sizes(units, levels):
+    """Units per level: triples each level, remainder on the last level"""
+    sizes = [1]
+    while len(sizes) < levels - 1:
+        sizes.append(sizes[-1] * 3)
+    sizes.append(max(units - sum(sizes), 1))
+    return sizes
+
+
+class QueryCounter:
+    """Counts statements executed on the engine while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def legacy_descendant_ids(dept):
+    ids = [dept.id]
+    for child in dept.children:
+        ids.extend(legacy_descendant_ids(child))
+    return ids
+
+
+def legacy_level_and_path(dept):
+    path = [dept.name]
+    current = dept.parent
+    while current:
+        path.insert(0, current.name)
+        current = current.parent
+    return len(path) - 1, ' > '.join(path)
+
+
+def report(label, samples, queries):
+    print(f"{label:<34} mean={statistics.mean(samples):9.1f}ms  "
+          f"min={min(samples):9.1f}ms  queries={queries}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Department hierarchy benchmark')
+    parser.add_argument('--units', type=int, default=5000)
+    parser.add_argument('--levels', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    from app import app, db
+    from models import Department, Organization
+    from sqlalchemy.orm import joinedload, selectinload
+
+    logging.getLogger('services').setLevel(logging.WARNING)
+
+    with app.app_context():
+        org = Organization.query.first()
+        if not org:
+            print("❌ Benchmark needs at least one organization")
+            return 1
+
+        try:
+            started = time.perf_counter()
+            previous = []
+            for level, size in enumerate(level_sizes(args.units, args.levels)):
+                current = []
+                for i in range(size):
+                    parent = previous[i % len(previous)] if previous else None
+                    current.append(Department(
+                        name=f'bench-unit-{level}-{i}',
+                        organization_id=org.id,
+                        level=level + 1,
+                        parent=parent
+                    ))
+                db.session.add_all(current)
+                db.session.flush()
+                previous = current
+            root_id = Department.query.filter_by(name='bench-unit-0-0').first().id
+            print(f"Seeded {args.units} units over {args.levels} levels "
+                  f"in {time.perf_counter() - started:.1f}s (closure maintained on insert)")
+
+            engine = db.session.get_bind()
+
+            def timed(fn):
+                samples, queries = [], 0
+                for _ in range(args.iterations):
+                    db.session.expunge_all()  # Cold identity map, as in a fresh request
+                    with QueryCounter(engine) as counter:
+                        started = time.perf_counter()
+                        result = fn()
+                        samples.append((time.perf_counter() - started) * 1000)
+                    queries = counter.count
+                return samples, queries, result
+
+            def legacy_scope():
+                return legacy_descendant_ids(db.session.get(Department, root_id))
+
+            def closure_scope():
+                return db.session.get(Department, root_id).get_descendant_ids(include_self=True)
+
+            def legacy_org_report():
+                units = Department.query.filter_by(organization_id=org.id).all()
+                return [(legacy_level_and_path(u), u.manager, u.parent, len(u.children)) for u in units]
+
+            def closure_org_report():
+                units = Department.preload_hierarchy(
+                    Department.query.options(
+                        joinedload(Department.manager),
+                        selectinload(Department.children)
+                    ).filter_by(organization_id=org.id).all()
+                )
+                return [((u.get_hierarchy_level(), u.get_full_path()), u.manager, u.parent, len(u.children))
+                        for u in units]
+
+            print()
+            legacy, legacy_queries, legacy_ids = timed(legacy_scope)
+            report('descendant scope (recursive)', legacy, legacy_queries)
+            closure, closure_queries, closure_ids = timed(closure_scope)
+            report('descendant scope (closure)', closure, closure_queries)
+            assert sorted(legacy_ids) == sorted(closure_ids), "descendant sets differ"
+            print(f"{'':<34} speedup x{statistics.mean(legacy) / statistics.mean(closure):.1f}")
+
+            print()
+            legacy, legacy_queries, legacy_rows = timed(legacy_org_report)
+            report('org report (recursive)', legacy, legacy_queries)
+            closure, closure_queries, closure_rows = timed(closure_org_report)
+            report('org report (closure + preload)', closure, closure_queries)
+            assert sorted(r[0] for r in legacy_rows) == sorted(r[0] for r in closure_rows), "levels/paths differ"
+            print(f"{'':<34} speedup x{statistics.mean(legacy) / statistics.mean(closure):.1f}")
+        finally:
+            db.session.rollback()
+            print("\nRolled back benchmark data")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
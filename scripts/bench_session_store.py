@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark requests per second for authenticated page loads under each session backend
+
+Registers a throwaway login-required route and drives it through the Flask test client with a
+logged-in session, once per backend:
+  - cookie:   Flask's signed cookie sessions (the default)
+  - legacy:   the previous session_data behaviour, DELETE of expired rows and a commit on every
+              load and a write on every save
+  - database: ServerSideSessionInterface over the session_data table
+  - sqlite:   ServerSideSessionInterface over an on-disk SQLite key/value file
+
+--sessions other live sessions are seeded into each store first so the table is not trivially
+small. Everything the benchmark writes is deleted afterwards.
+
+Usage:
+    python scripts/bench_session_store.py [--requests 2000] [--sessions 5000] [--backends cookie,legacy,database,sqlite]
+"""
+import os
+import sys
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples (in ms)"""
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Session backend throughput benchmark')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--sessions', type=int, default=5000)
+    parser.add_argument('--backends', default='cookie,legacy,database,sqlite')
+    args = parser.parse_args()
+
+    from datetime import datetime, timedelta
+    from flask_login import login_required, current_user
+    from app import app, db
+    from models import User
+    from session_storage import (SessionData, ServerSideSessionInterface, DatabaseSessionStore,
+                                 SQLiteSessionStore)
+
+    logging.getLogger('session_storage').setLevel(logging.WARNING)
+
+    with app.app_context():
+        user = User.query.first()
+        if not user:
+            print("❌ Benchmark needs at least one user")
+            return 1
+        user_id = user.id
+
+    class LegacySessionInterface(ServerSideSessionInterface):
+        """Previous DatabaseSessionInterface: sweep + commit on every load, write on every save"""
+
+        def open_session(self, app, request):
+            with self.store.engine.begin() as connection:
+                connection.execute(SessionData.__table__.delete().where(SessionData.expires < datetime.utcnow()))
+            with self._cache_lock:
+                self._cache.clear()
+            return super().open_session(app, request)
+
+        def save_session(self, app, session, response):
+            session.payload = None  # Always write
+            super().save_session(app, session, response)
+
+    def authenticated_page():
+        return f"<h1>Dashboard</h1><p>{current_user.email}</p>"
+
+    app.add_url_rule('/__bench/session', 'bench_session_page', login_required(authenticated_page))
+    sqlite_path = os.path.join(tempfile.gettempdir(), f'bench_sessions_{uuid.uuid4().hex}.sqlite3')
+    default_interface = app.session_interface
+    prefix = 'bench-'
+    client_sids = []
+
+    def build(name):
+        if name == 'cookie':
+            return default_interface
+        if name == 'legacy':
+            return LegacySessionInterface(DatabaseSessionStore(app))
+        if name == 'database':
+            return ServerSideSessionInterface(DatabaseSessionStore(app))
+        if name == 'sqlite':
+            return ServerSideSessionInterface(SQLiteSessionStore(sqlite_path))
+        raise ValueError(f"Unknown backend: {name}")
+
+    try:
+        print(f"{args.requests} authenticated page loads, {args.sessions} other live sessions")
+        for name in args.backends.split(','):
+            interface = build(name)
+            app.session_interface = interface
+            store = getattr(interface, 'store', None)
+            if store is not None:
+                expires = datetime.utcnow() + timedelta(hours=12)
+                for i in range(args.sessions):
+                    store.save(f"{prefix}{i}", '{"_user_id": "0"}', expires)
+
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+                session['_fresh'] = True
+                if getattr(session, 'sid', None):
+                    client_sids.append(session.sid)
+            for _ in range(min(50, args.requests)):  # Warm up
+                client.get('/__bench/session')
+
+            samples = []
+            started_all = time.perf_counter()
+            for _ in range(args.requests):
+                started = time.perf_counter()
+                response = client.get('/__bench/session')
+                samples.append((time.perf_counter() - started) * 1000)
+            elapsed = time.perf_counter() - started_all
+            if response.status_code != 200:
+                print(f"⚠️ {name}: last response was {response.status_code}, not an authenticated page")
+            stats = getattr(interface, 'stats', {})
+            print(f"{name:<10} {args.requests / elapsed:8.0f} req/s  mean={statistics.mean(samples):6.3f}ms  "
+                  f"p95={percentile(samples, 95):6.3f}ms  "
+                  f"writes={stats.get('writes', '-')} touches={stats.get('touches', '-')} "
+                  f"store_reads={stats.get('store_reads', '-')} cache_hits={stats.get('cache_hits', '-')}")
+    finally:
+        app.session_interface = default_interface
+        with app.app_context():
+            if 'session_data' in db.inspect(db.engine).get_table_names():
+                table = SessionData.__table__
+                db.session.execute(table.delete().where(table.c.id.like(f'{prefix}%') | table.c.id.in_(client_sids)))
+                db.session.commit()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(sqlite_path + suffix):
+                os.remove(sqlite_path + suffix)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark the triage engine against a large business case table
+
+Seeds N business cases (default 100,000) and one auto_approve rule inside a
+transaction that is rolled back at the end, then times:
+  - per-row mode: TriageEngine._apply_single_rule (query.all() + per-row actions)
+  - bulk mode, full scan: UPDATE ... RETURNING id + multi-row audit insert
+  - bulk mode, incremental: second run that only examines rows changed since the watermark
+
+Usage:
+    python scripts/bench_triage_engine.py [--cases 100000] [--skip-per-row]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(label, func):
+    started = time.perf_counter()
+    try:
+        result = func()
+        error = None
+    except Exception as e:
+        result, error = None, e
+    elapsed = time.perf_counter() - started
+    suffix = f" (error: {str(error).splitlines()[0][:120]})" if error else f" -> {result}"
+    print(f"{label:<32} {elapsed * 1000:10.1f}ms{suffix}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Triage engine benchmark')
+    parser.add_argument('--cases', type=int, default=100000)
+    parser.add_argument('--skip-per-row', action='store_true', help='Skip the slow per-row mode')
+    args = parser.parse_args()
+
+    from sqlalchemy import insert
+    from app import app, db
+    from models import BusinessCase, TriageRule, Organization, User, Department, StatusEnum
+    from services.triage_engine import TriageEngine
+
+    # Per-rule INFO logging is not what we are measuring
+    logging.getLogger('services').setLevel(logging.WARNING)
+
+    with app.app_context():
+        org = Organization.query.first()
+        user = User.query.filter_by(organization_id=org.id).first() if org else None
+        dept = Department.query.filter_by(organization_id=org.id).first() if org else None
+        if not org or not user or not dept:
+            print("❌ Benchmark needs at least one organization with a user and a department")
+            return 1
+
+        try:
+            started = time.perf_counter()
+            now = datetime.utcnow()
+            rows = []
+            for i in range(args.cases):
+                created = now - timedelta(days=i % 60)
+                rows.append({
+                    'title': f'Bench case {i}',
+                    'description': 'Seeded by bench_triage_engine',
+                    'status': StatusEnum.Submitted,
+                    'cost_estimate': float(1000 + (i % 100) * 1000),
+                    'benefit_estimate': 50000.0,
+                    'created_by': user.id,
+                    'dept_id': dept.id,
+                    'organization_id': org.id,
+                    'created_at': created,
+                    'updated_at': created
+                })
+                if len(rows) == 5000:
+                    db.session.execute(insert(BusinessCase), rows)
+                    rows = []
+            if rows:
+                db.session.execute(insert(BusinessCase), rows)
+            print(f"Seeded {args.cases} business cases in {time.perf_counter() - started:.1f}s")
+
+            rule = TriageRule(
+                organization_id=org.id,
+                name='bench: approve small cases',
+                target='BusinessCase',
+                field='cost_estimate',
+                operator='<',
+                value='20000',
+                action='auto_approve',
+                message='Benchmark rule',
+                active=True,
+                created_by=user.id
+            )
+            db.session.add(rule)
+            db.session.flush()
+
+            if not args.skip_per_row:
+                savepoint = db.session.begin_nested()
+
+                def per_row():
+                    count = TriageEngine._apply_single_rule(rule)
+                    db.session.flush()
+                    return count
+
+                timed('per-row mode', per_row)
+                savepoint.rollback()
+
+            run_started = datetime.utcnow()
+
+            def bulk_full():
+                count = TriageEngine._apply_rule_bulk(rule, run_started, incremental=True)
+                db.session.flush()
+                return count
+
+            timed('bulk mode (full scan)', bulk_full)
+
+            def bulk_incremental():
+                count = TriageEngine._apply_rule_bulk(rule, datetime.utcnow(), incremental=True)
+                db.session.flush()
+                return count
+
+            timed('bulk mode (incremental)', bulk_incremental)
+        finally:
+            db.session.rollback()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark workflow dispatch latency with many active WorkflowTemplates
+
+Seeds N active templates (default 500) spread across a set of trigger events
+inside a transaction that is rolled back at the end, then compares:
+  - legacy lookup: load every active template and filter triggers in Python
+  - trigger index: single dict lookup in workflows.trigger_index
+
+Usage:
+    python scripts/bench_workflow_dispatch.py [--templates 500] [--events 25] [--iterations 2000]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples (in ms)"""
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def report(label, samples):
+    print(f"{label:<28} mean={statistics.mean(samples):8.3f}ms  "
+          f"p50={percentile(samples, 50):8.3f}ms  p95={percentile(samples, 95):8.3f}ms  "
+          f"p99={percentile(samples, 99):8.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Workflow dispatch latency benchmark')
+    parser.add_argument('--templates', type=int, default=500)
+    parser.add_argument('--events', type=int, default=25)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    from app import app, db
+    from models import WorkflowTemplate, Organization, User
+    from workflows.processor import workflow_processor
+    from workflows.trigger_index import trigger_index
+
+    # Per-step INFO logging would dominate the timings
+    logging.getLogger('workflows').setLevel(logging.WARNING)
+
+    with app.app_context():
+        org = Organization.query.first()
+        user = User.query.filter_by(organization_id=org.id).first() if org else None
+        if not org or not user:
+            print("❌ Benchmark needs at least one organization with a user")
+            return 1
+
+        event_names = [f'bench_event_{i}' for i in range(args.events)]
+        try:
+            for i in range(args.templates):
+                db.session.add(WorkflowTemplate(
+                    organization_id=org.id,
+                    name=f'bench-dispatch-{i}',
+                    definition={
+                        'triggers': [event_names[i % args.events], event_names[(i * 7) % args.events]],
+                        'steps': []
+                    },
+                    is_active=True,
+                    created_by=user.id
+                ))
+            db.session.flush()
+            print(f"Seeded {args.templates} active templates over {args.events} events")
+
+            def legacy_lookup(event_name):
+                templates = WorkflowTemplate.query.filter(WorkflowTemplate.is_active.is_(True)).all()
+                return [t for t in templates if event_name in t.definition.get('triggers', [])]
+
+            legacy = []
+            for i in range(max(1, args.iterations // 20)):
+                started = time.perf_counter()
+                legacy_lookup(event_names[i % args.events])
+                legacy.append((time.perf_counter() - started) * 1000)
+
+            trigger_index.invalidate()
+            started = time.perf_counter()
+            trigger_index.get(event_names[0])
+            cold_ms = (time.perf_counter() - started) * 1000
+
+            indexed = []
+            dispatch = []
+            for i in range(args.iterations):
+                event_name = event_names[i % args.events]
+                started = time.perf_counter()
+                trigger_index.get(event_name)
+                indexed.append((time.perf_counter() - started) * 1000)
+
+                started = time.perf_counter()
+                workflow_processor.dispatch_event(event_name, {})
+                dispatch.append((time.perf_counter() - started) * 1000)
+
+            print(f"Index cold build: {cold_ms:.2f}ms")
+            report('legacy lookup', legacy)
+            report('indexed lookup', indexed)
+            report('dispatch_event (indexed)', dispatch)
+            print(f"Index stats: {trigger_index.get_stats()}")
+        finally:
+            db.session.rollback()
+            trigger_index.invalidate()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
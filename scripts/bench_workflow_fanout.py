@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark workflow send_notification fan-out to large audiences
+
+For each audience size (default 10,000 and 100,000) seeds a throwaway organization with that many
+users and a workflow template, then times:
+  - legacy loop: load every User object, rebuild the notification context and write one
+    Notification per user with its own commit (the previous per-recipient path), measured on
+    --legacy-sample users and extrapolated to the full audience
+  - fan-out: workflows.actions.send_notification with target 'all_employees' (id-only recipient
+    query, context rendered once, chunked bulk inserts, email handed to the notification outbox)
+
+The email channel is enabled through a temporary 'workflow_notification' NotificationSetting
+(left untouched if one already exists). Everything the benchmark writes is deleted afterwards.
+
+Usage:
+    python scripts/bench_workflow_fanout.py [--sizes 10000 100000] [--legacy-sample 2000] [--chunk-size 1000]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Workflow notification fan-out benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--legacy-sample', type=int, default=2000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    from sqlalchemy import text
+    from app import app, db
+    from models import (Organization, User, UserRoleEnum, WorkflowTemplate, Notification,
+                        NotificationEventEnum, NotificationSetting, NotificationOutbox, FrequencyEnum)
+    from workflows import actions
+    from workflows.context import WorkflowContext
+
+    # Per-step INFO logging would dominate the timings
+    logging.getLogger('workflows').setLevel(logging.WARNING)
+    actions.NOTIFICATION_CHUNK_SIZE = args.chunk_size
+
+    with app.app_context():
+        setting = NotificationSetting.query.filter_by(event_name='workflow_notification').first()
+        created_setting = setting is None
+
+        for size in args.sizes:
+            org = Organization(name=f'bench-fanout-{size}', domain=f'bench-fanout-{size}-{int(time.time())}.test')
+            db.session.add(org)
+            db.session.flush()
+            if created_setting:
+                setting = NotificationSetting(organization_id=org.id, event_name='workflow_notification',
+                                              frequency=FrequencyEnum.daily, channel_email=True,
+                                              channel_in_app=True)
+                db.session.add(setting)
+            for start in range(0, size, 10000):
+                db.session.execute(User.__table__.insert(), [{
+                    'name': f'Bench User {i}',
+                    'email': f'bench{i}@{org.domain}',
+                    'organization_id': org.id,
+                    'role': UserRoleEnum.Director if i % 50 == 0 else UserRoleEnum.Staff
+                } for i in range(start, min(size, start + 10000))])
+            owner_id = db.session.query(User.id).filter_by(organization_id=org.id).order_by(User.id).first()[0]
+            template = WorkflowTemplate(organization_id=org.id, name=f'bench-fanout-{org.id}',
+                                        definition={'steps': []}, created_by=owner_id)
+            db.session.add(template)
+            db.session.commit()
+            org_id, template_id = org.id, template.id
+            context = WorkflowContext('problem_created', template, {
+                'problem': {'title': 'Benchmark problem', 'created_by': owner_id, 'priority': 'High'},
+                'link': '/problems/1'
+            })
+            print(f"\nAudience: {size:,} users")
+
+            try:
+                # Legacy: ORM users, per-recipient context and commit
+                sample = min(args.legacy_sample, size)
+                started = time.perf_counter()
+                users = User.query.filter_by(organization_id=org_id).order_by(User.id).limit(sample).all()
+                for user in users:
+                    notification_context = actions._build_notification_context(context)
+                    db.session.add(Notification(
+                        organization_id=org_id,
+                        user_id=user.id,
+                        message=actions._render_notification_message('workflow_notification', notification_context),
+                        link='/problems/1',
+                        event_type=NotificationEventEnum.TRIAGE_RULE_TRIGGERED,
+                        read_flag=False
+                    ))
+                    db.session.commit()
+                legacy_seconds = (time.perf_counter() - started) / sample * size
+                print(f"  legacy loop   {legacy_seconds:8.2f}s (extrapolated from {sample:,} users)")
+                db.session.execute(text("DELETE FROM notifications WHERE organization_id = :org"), {'org': org_id})
+                db.session.commit()
+
+                started = time.perf_counter()
+                result = actions.send_notification({'target': 'all_employees', 'template': 'default'}, context)
+                fanout_seconds = time.perf_counter() - started
+                queued = NotificationOutbox.query.filter_by(organization_id=org_id).count()
+                print(f"  fan-out       {fanout_seconds:8.2f}s  {result['recipients_count']:,} notifications, "
+                      f"{queued:,} emails queued ({size / fanout_seconds:,.0f} recipients/s, "
+                      f"{legacy_seconds / fanout_seconds:.0f}x)")
+            finally:
+                db.session.rollback()
+                for table in ('notification_outbox', 'notifications', 'badge_counters'):
+                    db.session.execute(text(f"DELETE FROM {table} WHERE organization_id = :org"), {'org': org_id})
+                if created_setting:
+                    db.session.execute(text("DELETE FROM notification_settings WHERE event_name = 'workflow_notification'"))
+                db.session.execute(text("DELETE FROM workflow_templates WHERE id = :id"), {'id': template_id})
+                db.session.execute(text("DELETE FROM users WHERE organization_id = :org"), {'org': org_id})
+                db.session.execute(text("DELETE FROM organizations WHERE id = :org"), {'org': org_id})
+                db.session.commit()
+                db.session.expunge_all()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
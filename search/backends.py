@@ -0,0 +1,389 @@
+"""
+Pluggable Search Backends for DeciFrame
+One ranked, organization-scoped query across Problems, Business Cases, Projects and
+Help Articles, with keyset (cursor) pagination.
+
+- PostgresSearchBackend: a single UNION ALL over the tsvector columns maintained by
+  setup_fulltext_search.py, with the page LIMIT pushed down into every branch.
+- SQLiteSearchBackend: an FTS5 virtual table (search_index) kept in sync by triggers
+  on the source tables and ranked with bm25().
+"""
+
+import base64
+import json
+import re
+import logging
+import threading
+from sqlalchemy import text
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+class SearchEntity:
+    """Describes how one source table is indexed and presented in search results"""
+
+    def __init__(self, type_name, table, type_code, title, body, ref, status, url):
+        self.type_name = type_name
+        self.table = table
+        self.type_code = type_code      # Low bits of the FTS5 rowid (rowid = id * 8 + type_code)
+        self.title = title              # Title column
+        self.body = body                # Columns concatenated into the searchable body
+        self.ref = ref                  # Human-readable reference (code or slug)
+        self.status = status            # Status column, or None
+        self.url = url                  # URL pattern formatted with id and ref
+
+
+SEARCH_ENTITIES = [
+    SearchEntity('problem', 'problems', 1, 'title', ('description',),
+                 'code', 'status', '/problems/{id}'),
+    SearchEntity('business_case', 'business_cases', 2, 'title', ('description', 'summary', 'initiative_name'),
+                 'code', 'status', '/business/cases/{id}'),
+    SearchEntity('project', 'projects', 3, 'name', ('description',),
+                 'code', 'status', '/projects/{id}'),
+    SearchEntity('help_article', 'help_articles', 4, 'title', ('content', 'tags'),
+                 'slug', None, '/help/{ref}'),
+]
+
+ENTITIES_BY_TYPE = {entity.type_name: entity for entity in SEARCH_ENTITIES}
+
+DESCRIPTION_LENGTH = 200
+
+
+def encode_cursor(rank, type_name, entity_id):
+    """Encode the sort key of the last result on a page as an opaque cursor"""
+    raw = json.dumps([rank, type_name, entity_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into (rank, type, id); returns None for missing or malformed cursors"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        rank, type_name, entity_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(rank), str(type_name), int(entity_id)
+    except (ValueError, TypeError):
+        logger.warning(f"Ignoring malformed search cursor: {cursor!r}")
+        return None
+
+
+def extract_terms(query):
+    """Split a free-text query into plain word terms (drops operators and punctuation)"""
+    return re.findall(r'\w+', query or '')[:20]
+
+
+class SearchBackend:
+    """Base class for search backends"""
+
+    name = 'base'
+
+    def search(self, query, organization_id, types=None, limit=20, cursor=None):
+        """
+        Ranked search across entity types
+
+        Args:
+            query: Free-text search query
+            organization_id: Only return rows belonging to this organization
+            types: Entity type names to include (default: all)
+            limit: Page size
+            cursor: Cursor returned as next_cursor by the previous page
+
+        Returns:
+            {'results': [...], 'next_cursor': str or None}
+        """
+        terms = extract_terms(query)
+        entities = [ENTITIES_BY_TYPE[t] for t in (types or ENTITIES_BY_TYPE) if t in ENTITIES_BY_TYPE]
+        if not terms or not entities or organization_id is None:
+            return {'results': [], 'next_cursor': None}
+
+        limit = max(1, int(limit))
+        rows = self._ranked_rows(terms, organization_id, entities, limit + 1, decode_cursor(cursor))
+
+        results = [self._to_result(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit and results:
+            last = results[-1]
+            next_cursor = encode_cursor(last['rank'], last['type'], last['id'])
+        return {'results': results, 'next_cursor': next_cursor}
+
+    def _ranked_rows(self, terms, organization_id, entities, limit, cursor):
+        raise NotImplementedError
+
+    def ensure_index(self):
+        """Create any index structures the backend needs (idempotent)"""
+
+    def stats(self):
+        raise NotImplementedError
+
+    def suggestions(self, query, organization_id, limit=5):
+        """Title suggestions for autocomplete (case-insensitive prefix/substring match)"""
+        from models import Problem, BusinessCase, Project
+
+        if not query or organization_id is None:
+            return []
+
+        pattern = f'%{query}%'
+        suggestions = []
+        for model, column, type_name in ((Problem, Problem.title, 'problem'),
+                                         (BusinessCase, BusinessCase.title, 'business_case'),
+                                         (Project, Project.name, 'project')):
+            rows = db.session.query(column).filter(
+                model.organization_id == organization_id,
+                column.ilike(pattern)
+            ).order_by(column).limit(limit).all()
+            suggestions.extend({'suggestion': row[0], 'type': type_name} for row in rows)
+        return suggestions[:limit * 3]
+
+    @staticmethod
+    def _cursor_condition(entity, rank_expr, id_expr, cursor):
+        """Keyset condition for ORDER BY rank DESC, type DESC, id DESC, specialised per branch"""
+        if cursor is None:
+            return ''
+        _, cursor_type, _ = cursor
+        if entity.type_name < cursor_type:
+            return f" AND {rank_expr} <= :cursor_rank"
+        if entity.type_name > cursor_type:
+            return f" AND {rank_expr} < :cursor_rank"
+        return f" AND ({rank_expr} < :cursor_rank OR ({rank_expr} = :cursor_rank AND {id_expr} < :cursor_id))"
+
+    @staticmethod
+    def _cursor_params(cursor):
+        if cursor is None:
+            return {}
+        return {'cursor_rank': cursor[0], 'cursor_id': cursor[2]}
+
+    @staticmethod
+    def _to_result(row):
+        entity = ENTITIES_BY_TYPE[row.type]
+        description = row.description or ''
+        if len(description) > DESCRIPTION_LENGTH:
+            description = description[:DESCRIPTION_LENGTH] + '...'
+        return {
+            'type': row.type,
+            'id': row.id,
+            'code': row.ref if entity.ref == 'code' else '',
+            'title': row.title or '',
+            'description': description,
+            'status': row.status,
+            'rank': float(row.rank or 0),
+            'url': entity.url.format(id=row.id, ref=row.ref)
+        }
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Single UNION ALL over tsvector columns with per-branch LIMIT push-down"""
+
+    name = 'postgresql'
+
+    def _ranked_rows(self, terms, organization_id, entities, limit, cursor):
+        rank_expr = "CAST(ts_rank(t.search_vector, q.tsq) AS DOUBLE PRECISION)"
+        branches = []
+        for index, entity in enumerate(entities):
+            body = " || ' ' || ".join(f"COALESCE(t.{column}, '')" for column in entity.body)
+            status = f"CAST(t.{entity.status} AS TEXT)" if entity.status else "NULL"
+            branches.append(f"""
+                (SELECT '{entity.type_name}' AS type, t.id AS id, t.{entity.ref} AS ref,
+                        t.{entity.title} AS title, LEFT({body}, {DESCRIPTION_LENGTH + 1}) AS description,
+                        {status} AS status, {rank_expr} AS rank
+                 FROM {entity.table} t, q
+                 WHERE t.search_vector @@ q.tsq AND t.organization_id = :organization_id
+                 {self._cursor_condition(entity, rank_expr, 't.id', cursor)}
+                 ORDER BY rank DESC, t.id DESC
+                 LIMIT :limit)""")
+
+        sql = text(f"""
+            WITH q AS (SELECT to_tsquery('english', :tsquery) AS tsq)
+            SELECT type, id, ref, title, description, status, rank
+            FROM ({' UNION ALL '.join(branches)}) ranked
+            ORDER BY rank DESC, type DESC, id DESC
+            LIMIT :limit
+        """)
+        params = {
+            'tsquery': ' | '.join(terms),
+            'organization_id': organization_id,
+            'limit': limit,
+            **self._cursor_params(cursor)
+        }
+        return db.session.execute(sql, params).fetchall()
+
+    def stats(self):
+        counts = {}
+        for entity in SEARCH_ENTITIES:
+            row = db.session.execute(text(f"""
+                SELECT COUNT(*) AS total, COUNT(search_vector) AS indexed FROM {entity.table}
+            """)).fetchone()
+            counts[entity.type_name] = (row.indexed, row.total)
+        return _format_stats(self.name, counts)
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 virtual table kept in sync by triggers, ranked with bm25()"""
+
+    name = 'sqlite_fts5'
+    INDEX_TABLE = 'search_index'
+
+    def __init__(self):
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _row_values(self, entity, alias):
+        body = " || ' ' || ".join(f"COALESCE({alias}.{column}, '')" for column in entity.body)
+        status = f"{alias}.{entity.status}" if entity.status else "NULL"
+        return (f"{alias}.id * 8 + {entity.type_code}, {alias}.{entity.title}, {body}, "
+                f"'{entity.type_name}', {alias}.id, {alias}.organization_id, {alias}.{entity.ref}, {status}")
+
+    def ensure_index(self):
+        """Create the FTS5 table and sync triggers; backfill on first creation"""
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+
+            columns = "rowid, title, body, entity_type, entity_id, organization_id, ref, status"
+            with db.engine.begin() as conn:
+                exists = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+                ), {'name': self.INDEX_TABLE}).first()
+
+                conn.execute(text(f"""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS {self.INDEX_TABLE} USING fts5(
+                        title, body,
+                        entity_type UNINDEXED, entity_id UNINDEXED, organization_id UNINDEXED,
+                        ref UNINDEXED, status UNINDEXED,
+                        tokenize = 'porter unicode61'
+                    )
+                """))
+
+                for entity in SEARCH_ENTITIES:
+                    watched = ', '.join(dict.fromkeys(
+                        [entity.title, *entity.body, entity.ref, 'organization_id']
+                        + ([entity.status] if entity.status else [])
+                    ))
+                    old_rowid = f"old.id * 8 + {entity.type_code}"
+                    conn.execute(text(f"""
+                        CREATE TRIGGER IF NOT EXISTS {self.INDEX_TABLE}_{entity.table}_ai
+                        AFTER INSERT ON {entity.table} BEGIN
+                            INSERT INTO {self.INDEX_TABLE}({columns}) VALUES ({self._row_values(entity, 'new')});
+                        END
+                    """))
+                    conn.execute(text(f"""
+                        CREATE TRIGGER IF NOT EXISTS {self.INDEX_TABLE}_{entity.table}_au
+                        AFTER UPDATE OF {watched} ON {entity.table} BEGIN
+                            DELETE FROM {self.INDEX_TABLE} WHERE rowid = {old_rowid};
+                            INSERT INTO {self.INDEX_TABLE}({columns}) VALUES ({self._row_values(entity, 'new')});
+                        END
+                    """))
+                    conn.execute(text(f"""
+                        CREATE TRIGGER IF NOT EXISTS {self.INDEX_TABLE}_{entity.table}_ad
+                        AFTER DELETE ON {entity.table} BEGIN
+                            DELETE FROM {self.INDEX_TABLE} WHERE rowid = {old_rowid};
+                        END
+                    """))
+
+                if not exists:
+                    self._backfill(conn, columns)
+                    logger.info("✓ SQLite FTS5 search index created and backfilled")
+
+            self._ready = True
+
+    def _backfill(self, conn, columns):
+        for entity in SEARCH_ENTITIES:
+            conn.execute(text(f"""
+                INSERT INTO {self.INDEX_TABLE}({columns})
+                SELECT {self._row_values(entity, 's')} FROM {entity.table} s
+            """))
+
+    def rebuild(self):
+        """Drop and repopulate the index contents from the source tables"""
+        self.ensure_index()
+        columns = "rowid, title, body, entity_type, entity_id, organization_id, ref, status"
+        with db.engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {self.INDEX_TABLE}"))
+            self._backfill(conn, columns)
+
+    def _ranked_rows(self, terms, organization_id, entities, limit, cursor):
+        self.ensure_index()
+
+        # Quote every term so user input cannot inject FTS5 query syntax
+        match = ' OR '.join('"' + term.replace('"', '') + '"' for term in terms)
+        type_params = {f'type_{i}': entity.type_name for i, entity in enumerate(entities)}
+        type_filter = ', '.join(f':{name}' for name in type_params)
+
+        cursor_sql = ''
+        if cursor is not None:
+            cursor_sql = """
+              WHERE rank < :cursor_rank
+                 OR (rank = :cursor_rank AND type < :cursor_type)
+                 OR (rank = :cursor_rank AND type = :cursor_type AND id < :cursor_id)"""
+
+        sql = text(f"""
+            SELECT type, id, ref, title, description, status, rank FROM (
+                SELECT entity_type AS type, entity_id AS id, ref, title,
+                       substr(body, 1, {DESCRIPTION_LENGTH + 1}) AS description, status,
+                       -bm25({self.INDEX_TABLE}, 5.0, 1.0) AS rank
+                FROM {self.INDEX_TABLE}
+                WHERE {self.INDEX_TABLE} MATCH :match
+                  AND organization_id = :organization_id
+                  AND entity_type IN ({type_filter})
+            ) ranked{cursor_sql}
+            ORDER BY rank DESC, type DESC, id DESC
+            LIMIT :limit
+        """)
+        params = {
+            'match': match,
+            'organization_id': organization_id,
+            'limit': limit,
+            **type_params
+        }
+        if cursor is not None:
+            params.update({'cursor_rank': cursor[0], 'cursor_type': cursor[1], 'cursor_id': cursor[2]})
+        return db.session.execute(sql, params).fetchall()
+
+    def stats(self):
+        self.ensure_index()
+        indexed = dict(db.session.execute(text(
+            f"SELECT entity_type, COUNT(*) FROM {self.INDEX_TABLE} GROUP BY entity_type"
+        )).fetchall())
+        counts = {}
+        for entity in SEARCH_ENTITIES:
+            total = db.session.execute(text(f"SELECT COUNT(*) FROM {entity.table}")).scalar()
+            counts[entity.type_name] = (indexed.get(entity.type_name, 0), total)
+        return _format_stats(self.name, counts)
+
+
+def _format_stats(backend_name, counts):
+    """Shape per-entity (indexed, total) counts into the stats payload used by the search views"""
+    problems, cases, projects, articles = (counts[e.type_name] for e in SEARCH_ENTITIES)
+    return {
+        'backend': backend_name,
+        'problems_indexed': problems[0],
+        'cases_indexed': cases[0],
+        'projects_indexed': projects[0],
+        'help_articles_indexed': articles[0],
+        'total_problems': problems[1],
+        'total_cases': cases[1],
+        'total_projects': projects[1],
+        'total_help_articles': articles[1],
+        'indexing_complete': all(indexed == total for indexed, total in counts.values())
+    }
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_search_backend():
+    """Return the search backend for the current database engine (one instance per engine)"""
+    engine = db.engine
+    key = str(engine.url)
+    backend = _backends.get(key)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(key)
+            if backend is None:
+                backend = SQLiteSearchBackend() if engine.dialect.name == 'sqlite' else PostgresSearchBackend()
+                _backends[key] = backend
+    return backend
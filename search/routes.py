@@ -13,6 +13,14 @@ logger = logging.getLogger(__name__)
 # Create search blueprint
 search_bp = Blueprint('search', __name__, url_prefix='/search')
 
+# Map the ?type= filter values used by the search UI to backend entity types
+SEARCH_TYPE_FILTERS = {
+    'problems': ['problem'],
+    'business_cases': ['business_case'],
+    'projects': ['project'],
+    'help_articles': ['help_article'],
+}
+
 @search_bp.route('/')
 @require_session_auth
 def search_page():
@@ -26,13 +34,13 @@ def search_page():
             user = get_current_session_user()
             
             if search_type == 'problems':
-                results = SearchService.search_problems(query, limit=20, user_id=user.id)
+                results = SearchService.search_problems(query, limit=20, organization_id=user.organization_id)
             elif search_type == 'business_cases':
-                results = SearchService.search_business_cases(query, limit=20, user_id=user.id)
+                results = SearchService.search_business_cases(query, limit=20, organization_id=user.organization_id)
             elif search_type == 'projects':
-                results = SearchService.search_projects(query, limit=20, user_id=user.id)
+                results = SearchService.search_projects(query, limit=20, organization_id=user.organization_id)
             else:
-                results = SearchService.search_all(query, limit=20, user_id=user.id)
+                results = SearchService.search_all(query, limit=20, organization_id=user.organization_id)
                 
         except Exception as e:
             logger.error(f"Search error: {e}")
@@ -61,22 +69,20 @@ def api_search():
     
     try:
         user = get_current_session_user()
-        
-        if search_type == 'problems':
-            results = SearchService.search_problems(query, limit=limit, user_id=user.id)
-        elif search_type == 'business_cases':
-            results = SearchService.search_business_cases(query, limit=limit, user_id=user.id)
-        elif search_type == 'projects':
-            results = SearchService.search_projects(query, limit=limit, user_id=user.id)
-        else:
-            results = SearchService.search_all(query, limit=limit, user_id=user.id)
+        page = SearchService.search(query,
+                                    organization_id=user.organization_id,
+                                    types=SEARCH_TYPE_FILTERS.get(search_type),
+                                    limit=limit,
+                                    cursor=request.args.get('cursor'))
+        results = page['results']
         
         return jsonify({
             'success': True,
             'query': query,
             'type': search_type,
             'results': results,
-            'total': len(results)
+            'total': len(results),
+            'next_cursor': page['next_cursor']
         })
         
     except Exception as e:
@@ -101,7 +107,8 @@ def api_suggestions():
         })
     
     try:
-        suggestions = SearchService.search_suggestions(query, limit=limit)
+        user = get_current_session_user()
+        suggestions = SearchService.search_suggestions(query, limit=limit, organization_id=user.organization_id)
         
         return jsonify({
             'success': True,
@@ -147,7 +154,7 @@ def quick_search():
     
     try:
         user = get_current_session_user()
-        results = SearchService.search_all(query, limit=5, user_id=user.id)
+        results = SearchService.search_all(query, limit=5, organization_id=user.organization_id)
         
         # If only one result, redirect directly to it
         if len(results) == 1:
@@ -0,0 +1,355 @@
+"""
+Badge Counter Service for DeciFrame
+Keeps navigation badge counts in the badge_counters table so rendering a badge is one
+indexed read per organization instead of COUNT(*) queries on every page view.
+
+Counters are adjusted inside the same flush that changes the underlying row (SQLAlchemy
+mapper events, like metrics_signals), so they commit or roll back together with it. A counter
+row that does not exist yet is seeded from its source table in before_flush, before the flush
+writes anything, so the per-row adjustments that follow are not counted twice. Rows written
+outside the ORM (bulk UPDATEs, imports, manual SQL) are corrected by a periodic reconcile that
+recomputes every counter from the source tables.
+"""
+
+import os
+import time
+import logging
+import threading
+from itertools import chain
+from datetime import datetime
+from sqlalchemy import event, inspect, text, bindparam
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL = int(os.getenv('BADGE_COUNTER_RECONCILE_SECONDS', '900'))
+
+PENDING_STATUS = 'Submitted'
+ORG_WIDE = 0  # user_id for organization-wide counters
+
+# Organization-wide pending-review counters: counter name -> source table
+PENDING_COUNTERS = {
+    'pending_epics': 'epics',
+    'pending_cases': 'business_cases',
+    'pending_projects': 'projects'
+}
+UNREAD_NOTIFICATIONS = 'unread_notifications'
+
+# Models whose status feeds a pending counter: model name -> counter name
+PENDING_MODELS = {'Epic': 'pending_epics', 'BusinessCase': 'pending_cases', 'Project': 'pending_projects'}
+
+# connection.info key: counters seeded from their source table during the current flush
+_SEEDED_IN_FLUSH = 'badge_counters_seeded'
+
+_UNREAD_CONDITION = "(read_flag IS NULL OR read_flag = :unread)"
+
+
+def _status_name(value):
+    """Status as stored: StatusEnum member name for enum columns, plain string for Epic"""
+    return getattr(value, 'name', value)
+
+
+class BadgeCounterService:
+    """Reads, adjusts and reconciles rows of the badge_counters table"""
+
+    def __init__(self, reconcile_interval=RECONCILE_INTERVAL):
+        self.reconcile_interval = reconcile_interval
+        self._reconciler = None
+        self._stop = threading.Event()
+        self.last_reconcile = None
+
+    # ------------------------------------------------------------------ reads
+
+    def get_pending_counts(self, organization_id):
+        """Pending review counts for navigation badges (one indexed query)"""
+        from app import db
+        rows = db.session.execute(text("""
+            SELECT counter, value FROM badge_counters
+            WHERE organization_id = :org AND user_id = :org_wide
+        """), {'org': organization_id, 'org_wide': ORG_WIDE}).fetchall()
+        values = {counter: value for counter, value in rows}
+        counts = {name: max(values.get(name, 0), 0) for name in PENDING_COUNTERS}
+        counts['total_pending'] = sum(counts.values())
+        return counts
+
+    def get_unread_count(self, organization_id, user_id):
+        """Unread notification count for one user, seeding the counter on first use"""
+        from app import db
+        params = {'org': organization_id, 'user': user_id, 'counter': UNREAD_NOTIFICATIONS}
+        value = db.session.execute(text("""
+            SELECT value FROM badge_counters
+            WHERE organization_id = :org AND user_id = :user AND counter = :counter
+        """), params).scalar()
+        if value is None:
+            self._seed(db.session.connection(), organization_id, user_id, UNREAD_NOTIFICATIONS)
+            db.session.commit()
+            value = db.session.execute(text("""
+                SELECT value FROM badge_counters
+                WHERE organization_id = :org AND user_id = :user AND counter = :counter
+            """), params).scalar()
+        return max(value or 0, 0)
+
+    # ------------------------------------------------------------------ writes
+
+    def adjust(self, connection, organization_id, user_id, counter, delta, phase=None):
+        """
+        Add delta to a counter on the given connection (i.e. inside the caller's transaction)
+
+        Args:
+            phase: 'save' or 'delete' when called from a flush event, None otherwise
+        """
+        if not delta or organization_id is None:
+            return
+        key = (organization_id, user_id, counter, phase)
+        seeded = connection.info.get(_SEEDED_IN_FLUSH)
+        if phase is not None and seeded and key in seeded:
+            # Seeded during this flush phase: the count already included every row it wrote
+            return
+        result = connection.execute(text("""
+            UPDATE badge_counters SET value = value + :delta, updated_at = :now
+            WHERE organization_id = :org AND user_id = :user AND counter = :counter
+        """), {'delta': delta, 'now': datetime.utcnow(), 'org': organization_id,
+               'user': user_id, 'counter': counter})
+        if result.rowcount == 0:
+            # Not seeded before the change was written (a bulk statement, or a counter whose key
+            # was unknown in before_flush, e.g. a new user's): the source table already includes it.
+            # A flush writes all of a mapper's inserts/updates (or deletes) before calling any of
+            # their events, so the rest of this phase's adjustments are included too
+            self._seed(connection, organization_id, user_id, counter)
+            if phase is not None:
+                connection.info.setdefault(_SEEDED_IN_FLUSH, set()).add(key)
+
+    def seed_missing(self, connection, keys):
+        """Create the (organization_id, user_id, counter) rows that do not exist yet from their source tables"""
+        for organization_id, user_id, counter in keys:
+            if organization_id is not None and user_id is not None:
+                self._seed(connection, organization_id, user_id, counter)
+
+    def adjust_users(self, connection, organization_id, user_ids, counter, delta):
+        """
+        Add delta to one per-user counter for many users in one UPDATE (bulk inserts outside the ORM)
+
+        Users without a counter row are skipped: their counter is seeded from the source table,
+        which already includes this change, the first time it is read.
+        """
+        if not delta or organization_id is None or not user_ids:
+            return
+        connection.execute(text("""
+            UPDATE badge_counters SET value = value + :delta, updated_at = :now
+            WHERE organization_id = :org AND counter = :counter AND user_id IN :users
+        """).bindparams(bindparam('users', expanding=True)),
+            {'delta': delta, 'now': datetime.utcnow(), 'org': organization_id,
+             'counter': counter, 'users': list(user_ids)})
+
+    def _seed(self, connection, organization_id, user_id, counter):
+        if counter == UNREAD_NOTIFICATIONS:
+            count_sql = f"""SELECT COUNT(*) FROM notifications
+                            WHERE organization_id = :org AND user_id = :user AND {_UNREAD_CONDITION}"""
+        else:
+            count_sql = f"""SELECT COUNT(*) FROM {PENDING_COUNTERS[counter]}
+                            WHERE organization_id = :org AND status = :pending"""
+        connection.execute(text(f"""
+            INSERT INTO badge_counters (organization_id, user_id, counter, value, updated_at)
+            VALUES (:org, :user, :counter, ({count_sql}), :now)
+            ON CONFLICT (organization_id, user_id, counter) DO NOTHING
+        """), {'org': organization_id, 'user': user_id, 'counter': counter, 'now': datetime.utcnow(),
+               'pending': PENDING_STATUS, 'unread': False})
+
+    def reconcile(self):
+        """Recompute every counter from the source tables; returns the number of counters corrected"""
+        from app import db
+        started = time.perf_counter()
+        params = {'pending': PENDING_STATUS, 'unread': False, 'org_wide': ORG_WIDE}
+        expected = {}
+
+        for counter, table in PENDING_COUNTERS.items():
+            rows = db.session.execute(text(f"""
+                SELECT organization_id, COUNT(*) FROM {table}
+                WHERE status = :pending AND organization_id IS NOT NULL
+                GROUP BY organization_id
+            """), params).fetchall()
+            for organization_id, count in rows:
+                expected[(organization_id, ORG_WIDE, counter)] = count
+
+        rows = db.session.execute(text(f"""
+            SELECT organization_id, user_id, COUNT(*) FROM notifications
+            WHERE {_UNREAD_CONDITION} GROUP BY organization_id, user_id
+        """), params).fetchall()
+        for organization_id, user_id, count in rows:
+            expected[(organization_id, user_id, UNREAD_NOTIFICATIONS)] = count
+
+        current = {
+            (organization_id, user_id, counter): value
+            for organization_id, user_id, counter, value in db.session.execute(text(
+                "SELECT organization_id, user_id, counter, value FROM badge_counters")).fetchall()
+        }
+
+        corrected = 0
+        now = datetime.utcnow()
+        connection = db.session.connection()
+        for key in set(expected) | set(current):
+            value = expected.get(key, 0)
+            if current.get(key) == value:
+                continue
+            organization_id, user_id, counter = key
+            if key in current:
+                # Set relative to the stored value so concurrent adjustments are not overwritten
+                connection.execute(text("""
+                    UPDATE badge_counters SET value = value + :delta, updated_at = :now
+                    WHERE organization_id = :org AND user_id = :user AND counter = :counter
+                """), {'delta': value - current[key], 'now': now, 'org': organization_id,
+                       'user': user_id, 'counter': counter})
+            else:
+                connection.execute(text("""
+                    INSERT INTO badge_counters (organization_id, user_id, counter, value, updated_at)
+                    VALUES (:org, :user, :counter, :value, :now)
+                    ON CONFLICT (organization_id, user_id, counter) DO NOTHING
+                """), {'org': organization_id, 'user': user_id, 'counter': counter, 'value': value, 'now': now})
+            corrected += 1
+        db.session.commit()
+
+        self.last_reconcile = {
+            'at': now.isoformat(),
+            'counters': len(expected),
+            'corrected': corrected,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+        if corrected:
+            logger.info(f"🔢 Badge counters reconciled: {corrected} corrected")
+        return corrected
+
+    def start_reconciler(self, app):
+        """Reconcile now and then every reconcile_interval seconds on a daemon thread"""
+        if self._reconciler is not None or self.reconcile_interval <= 0:
+            return
+
+        def loop():
+            while True:
+                try:
+                    with app.app_context():
+                        self.reconcile()
+                except Exception as e:
+                    logger.error(f"Badge counter reconcile failed: {e}")
+                if self._stop.wait(self.reconcile_interval):
+                    return
+
+        self._reconciler = threading.Thread(target=loop, name='badge-counter-reconciler', daemon=True)
+        self._reconciler.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+# Global badge counter service
+badge_counters = BadgeCounterService()
+
+
+def _status_changed(target):
+    return inspect(target).attrs.status.history.has_changes()
+
+
+def _read_flag_changed(target):
+    return inspect(target).attrs.read_flag.history.has_changes()
+
+
+def _counter_keys(session):
+    """Counters the pending flush may change, for before_flush seeding"""
+    keys = set()
+    dirty = session.dirty
+    for target in chain(session.new, dirty, session.deleted):
+        name = type(target).__name__
+        if name in PENDING_MODELS:
+            if target in dirty and not _status_changed(target):
+                continue
+            keys.add((target.organization_id, ORG_WIDE, PENDING_MODELS[name]))
+        elif name == 'Notification':
+            if target in dirty and not _read_flag_changed(target):
+                continue
+            keys.add((target.organization_id, target.user_id, UNREAD_NOTIFICATIONS))
+    return keys
+
+
+def _seed_before_flush(session, flush_context, instances):
+    keys = _counter_keys(session)
+    if not keys:
+        return
+    connection = session.connection()
+    connection.info.pop(_SEEDED_IN_FLUSH, None)
+    # Seeded from the rows as they are before this flush; its own changes are then added once each
+    badge_counters.seed_missing(connection, keys)
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+def _pending_inserted(mapper, connection, target):
+    if _status_name(target.status) == PENDING_STATUS:
+        badge_counters.adjust(connection, target.organization_id, ORG_WIDE,
+                              PENDING_MODELS[mapper.class_.__name__], 1, 'save')
+
+
+def _pending_updated(mapper, connection, target):
+    history = inspect(target).attrs.status.history
+    if not history.has_changes():
+        return
+    was_pending = any(_status_name(v) == PENDING_STATUS for v in history.deleted)
+    is_pending = _status_name(target.status) == PENDING_STATUS
+    if was_pending != is_pending:
+        badge_counters.adjust(connection, target.organization_id, ORG_WIDE,
+                              PENDING_MODELS[mapper.class_.__name__], 1 if is_pending else -1, 'save')
+
+
+def _pending_deleted(mapper, connection, target):
+    if _status_name(target.status) == PENDING_STATUS:
+        badge_counters.adjust(connection, target.organization_id, ORG_WIDE,
+                              PENDING_MODELS[mapper.class_.__name__], -1, 'delete')
+
+
+def _notification_inserted(mapper, connection, target):
+    if not target.read_flag:
+        badge_counters.adjust(connection, target.organization_id, target.user_id, UNREAD_NOTIFICATIONS, 1, 'save')
+
+
+def _notification_updated(mapper, connection, target):
+    history = inspect(target).attrs.read_flag.history
+    if not history.has_changes():
+        return
+    was_unread = any(not v for v in history.deleted)
+    is_unread = not target.read_flag
+    if was_unread != is_unread:
+        badge_counters.adjust(connection, target.organization_id, target.user_id, UNREAD_NOTIFICATIONS,
+                              1 if is_unread else -1, 'save')
+
+
+def _notification_deleted(mapper, connection, target):
+    if not target.read_flag:
+        badge_counters.adjust(connection, target.organization_id, target.user_id, UNREAD_NOTIFICATIONS, -1, 'delete')
+
+
+def _listen_once(target, identifier, fn, **kwargs):
+    # create_app() may run more than once per process (scripts import app, then build another)
+    if not event.contains(target, identifier, fn):
+        event.listen(target, identifier, fn, **kwargs)
+
+
+def register_badge_counter_signals():
+    """Adjust badge counters from SQLAlchemy events on status and read-flag transitions (idempotent)"""
+    from models import Epic, BusinessCase, Project, Notification
+
+    for model in (Epic, BusinessCase, Project):
+        # active_history loads the old status on assignment even when the attribute was expired
+        # (e.g. after a commit), so after_update can tell which transition happened
+        _listen_once(model.status, 'set', _load_previous_value, active_history=True, retval=True)
+        _listen_once(model, 'after_insert', _pending_inserted)
+        _listen_once(model, 'after_update', _pending_updated)
+        _listen_once(model, 'after_delete', _pending_deleted)
+
+    _listen_once(Notification.read_flag, 'set', _load_previous_value, active_history=True, retval=True)
+    _listen_once(Notification, 'after_insert', _notification_inserted)
+    _listen_once(Notification, 'after_update', _notification_updated)
+    _listen_once(Notification, 'after_delete', _notification_deleted)
+    _listen_once(Session, 'before_flush', _seed_before_flush)
+
+    print("✓ Badge counter signals registered")
+    return True
@@ -0,0 +1,164 @@
+"""
+Code Sequence Service for DeciFrame
+Hands out the human-readable codes of problems (P0001), business cases (C0001) and projects
+(PRJ0001) from one counter row per prefix in the code_sequences table. Each allocation is a
+single UPDATE ... SET last_value = last_value + n, so it is O(1), takes the counter's row lock
+and can never give two concurrent creates the same code. A bulk import reserves a whole block
+of codes with one statement.
+
+Codes are unique across organizations (the code columns are globally unique), so there is one
+counter per prefix rather than per organization.
+
+On PostgreSQL the counter is incremented in its own short transaction, so the row lock is not
+held for the rest of the caller's request; like a native sequence, a rolled-back create leaves a
+gap. Single-writer databases (SQLite) increment it on the caller's connection instead, which
+already holds the database write lock.
+
+A counter row is seeded on first use from the highest code already in its table. A record created
+with an explicit code (e.g. an imported P0900) raises its counter to that number with
+reserve_through(), so a later allocation never hands the same code out again.
+"""
+
+import logging
+from datetime import datetime
+from sqlalchemy import case, select, text
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+CODE_PREFIXES = {'Problem': 'P', 'BusinessCase': 'C', 'Project': 'PRJ'}
+CODE_TABLES = {'P': 'problems', 'C': 'business_cases', 'PRJ': 'projects'}
+
+
+def format_code(prefix, number):
+    """P + 57 -> P0057"""
+    return f"{prefix}{number:04d}"
+
+
+def code_number(prefix, code):
+    """P0057 -> 57; None for a code outside the prefix's P0001 format"""
+    if not code or not code.startswith(prefix) or not code[len(prefix):].isdigit():
+        return None
+    return int(code[len(prefix):])
+
+
+class CodeAllocator:
+    """Allocates codes from the code_sequences counters"""
+
+    @staticmethod
+    def prefix_for(kind):
+        """Prefix for a model name ('Problem') or a prefix itself ('P')"""
+        prefix = CODE_PREFIXES.get(kind, kind)
+        if prefix not in CODE_TABLES:
+            raise ValueError(f"Unknown code sequence: {kind}")
+        return prefix
+
+    def next_code(self, kind, connection=None):
+        """Allocate one code, e.g. next_code('Problem') -> 'P0058'"""
+        return self.allocate(kind, 1, connection)[0]
+
+    def allocate(self, kind, count, connection=None):
+        """
+        Allocate a block of count consecutive codes with one counter update
+
+        Args:
+            kind: model name or prefix
+            count: number of codes
+            connection: the caller's connection (e.g. in a mapper event); defaults to db.session's
+
+        Returns:
+            List of codes in ascending order
+        """
+        if count <= 0:
+            return []
+        prefix = self.prefix_for(kind)
+        last_value = self._run(connection, lambda conn: self._reserve(conn, prefix, count))
+        return [format_code(prefix, number) for number in range(last_value - count + 1, last_value + 1)]
+
+    def reserve_through(self, kind, number, connection=None):
+        """
+        Raise the counter to at least number (last_value = max(last_value, number)) so codes up to
+        number, e.g. ones supplied explicitly, are never allocated
+        """
+        if not number or number <= 0:
+            return
+        prefix = self.prefix_for(kind)
+        self._run(connection, lambda conn: self._raise_to(conn, prefix, number))
+
+    def _raise_to(self, connection, prefix, number):
+        from models import CodeSequence
+        table = CodeSequence.__table__
+        statement = table.update().where(table.c.prefix == prefix).values(
+            last_value=case((table.c.last_value < number, number), else_=table.c.last_value),
+            updated_at=datetime.utcnow()
+        )
+        if connection.execute(statement).rowcount == 0:
+            # Seeding already covers the new code if it is in the table; a pending one is raised to
+            self._seed(connection, prefix)
+            connection.execute(statement)
+
+    def _run(self, connection, operation):
+        from app import db
+        if connection is None:
+            connection = db.session.connection()
+        if connection.dialect.name != 'postgresql':
+            return operation(connection)
+        with connection.engine.begin() as own_connection:
+            return operation(own_connection)
+
+    def _reserve(self, connection, prefix, count):
+        """Add count to the prefix's counter and return its new value (the last number reserved)"""
+        value = self._increment(connection, prefix, count)
+        if value is None:
+            self._seed(connection, prefix)
+            value = self._increment(connection, prefix, count)
+        return value
+
+    @staticmethod
+    def _increment(connection, prefix, count):
+        from models import CodeSequence
+        table = CodeSequence.__table__
+        statement = table.update().where(table.c.prefix == prefix).values(
+            last_value=table.c.last_value + count, updated_at=datetime.utcnow()
+        )
+        if connection.dialect.update_returning:
+            return connection.execute(statement.returning(table.c.last_value)).scalar()
+        if connection.execute(statement).rowcount == 0:
+            return None
+        return connection.execute(select(table.c.last_value).where(table.c.prefix == prefix)).scalar()
+
+    @staticmethod
+    def highest_existing(connection, prefix):
+        """Highest number among the codes already in the prefix's table (one scan, at seeding time)"""
+        rows = connection.execute(
+            text(f"SELECT code FROM {CODE_TABLES[prefix]} WHERE code LIKE :pattern"),
+            {'pattern': f"{prefix}%"}
+        )
+        numbers = [code_number(prefix, code) for (code,) in rows]
+        return max((number for number in numbers if number is not None), default=0)
+
+    def _seed(self, connection, prefix):
+        """Create the prefix's counter row starting after the highest existing code"""
+        from models import CodeSequence
+        table = CodeSequence.__table__
+        values = {'prefix': prefix, 'last_value': self.highest_existing(connection, prefix),
+                  'updated_at': datetime.utcnow()}
+        dialect = connection.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            # A concurrent creator may seed the same row; either seed is correct
+            connection.execute(insert(table).values(**values).on_conflict_do_nothing(index_elements=['prefix']))
+        else:
+            try:
+                with connection.begin_nested():
+                    connection.execute(table.insert().values(**values))
+            except IntegrityError:
+                pass
+        logger.info(f"🔢 Code sequence {prefix} seeded at {values['last_value']}")
+
+
+# Global code allocator
+code_allocator = CodeAllocator()
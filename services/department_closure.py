@@ -0,0 +1,146 @@
+"""
+Department Closure Table Maintenance for DeciFrame
+Keeps department_closure in step with Department.parent_id so hierarchy questions (descendants,
+level, full path) are single indexed lookups instead of walking parent/children one lazy load
+at a time.
+
+Rows are written from SQLAlchemy mapper events on the flush connection, so the closure commits
+or rolls back together with the department change:
+    insert  self row (depth 0) plus one row per ancestor of the new parent
+    move    detach the subtree from its old ancestors, attach it under the new parent
+    delete  remove every row that references the department
+
+rebuild_department_closure() recomputes the table from parent_id; it runs at startup whenever
+the table is missing rows (first deploy, departments created with raw SQL).
+"""
+
+import logging
+from sqlalchemy import event, inspect, text
+
+logger = logging.getLogger(__name__)
+
+
+class DepartmentHierarchyError(ValueError):
+    """Raised when a move would make a department its own ancestor"""
+
+
+def _insert_node(connection, department_id, parent_id):
+    connection.execute(text("""
+        INSERT INTO department_closure (ancestor_id, descendant_id, depth)
+        VALUES (:id, :id, 0)
+    """), {'id': department_id})
+    if parent_id is not None:
+        connection.execute(text("""
+            INSERT INTO department_closure (ancestor_id, descendant_id, depth)
+            SELECT ancestor_id, :id, depth + 1 FROM department_closure WHERE descendant_id = :parent
+        """), {'id': department_id, 'parent': parent_id})
+
+
+def _current_parent(connection, department_id):
+    return connection.execute(text("""
+        SELECT ancestor_id FROM department_closure WHERE descendant_id = :id AND depth = 1
+    """), {'id': department_id}).scalar()
+
+
+def _move_subtree(connection, department_id, new_parent_id):
+    if new_parent_id is not None:
+        in_subtree = connection.execute(text("""
+            SELECT 1 FROM department_closure WHERE ancestor_id = :id AND descendant_id = :parent
+        """), {'id': department_id, 'parent': new_parent_id}).first()
+        if in_subtree:
+            raise DepartmentHierarchyError(
+                f"Department {new_parent_id} is inside the subtree of department {department_id}")
+
+    # Drop links between the subtree and its former ancestors (links inside the subtree stay)
+    connection.execute(text("""
+        DELETE FROM department_closure
+        WHERE descendant_id IN (SELECT descendant_id FROM department_closure WHERE ancestor_id = :id)
+          AND ancestor_id NOT IN (SELECT descendant_id FROM department_closure WHERE ancestor_id = :id)
+    """), {'id': department_id})
+
+    if new_parent_id is not None:
+        connection.execute(text("""
+            INSERT INTO department_closure (ancestor_id, descendant_id, depth)
+            SELECT a.ancestor_id, d.descendant_id, a.depth + d.depth + 1
+            FROM department_closure a
+            CROSS JOIN department_closure d
+            WHERE a.descendant_id = :parent AND d.ancestor_id = :id
+        """), {'id': department_id, 'parent': new_parent_id})
+
+
+def _department_inserted(mapper, connection, target):
+    _insert_node(connection, target.id, target.parent_id)
+
+
+def _department_updated(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if not (attrs.parent_id.history.has_changes() or attrs.parent.history.has_changes()):
+        return
+    if not connection.execute(text("SELECT 1 FROM department_closure WHERE descendant_id = :id AND depth = 0"),
+                              {'id': target.id}).first():
+        _insert_node(connection, target.id, target.parent_id)  # Created before the closure table existed
+        return
+    if _current_parent(connection, target.id) != target.parent_id:
+        _move_subtree(connection, target.id, target.parent_id)
+
+
+def _department_deleted(mapper, connection, target):
+    connection.execute(text("""
+        DELETE FROM department_closure WHERE ancestor_id = :id OR descendant_id = :id
+    """), {'id': target.id})
+
+
+def register_department_closure_signals():
+    """Maintain department_closure on Department insert, parent change and delete"""
+    from models import Department
+
+    event.listen(Department, 'after_insert', _department_inserted)
+    event.listen(Department, 'after_update', _department_updated)
+    event.listen(Department, 'before_delete', _department_deleted)
+
+    print("✓ Department closure signals registered")
+    return True
+
+
+def rebuild_department_closure(force=False):
+    """
+    Recompute department_closure from Department.parent_id
+
+    Args:
+        force: Rebuild even if every department already has its self row
+
+    Returns:
+        Number of closure rows written (0 if the table was already complete)
+    """
+    from app import db
+
+    if not force:
+        missing = db.session.execute(text("""
+            SELECT COUNT(*) FROM departments d
+            WHERE NOT EXISTS (SELECT 1 FROM department_closure c
+                              WHERE c.descendant_id = d.id AND c.depth = 0)
+        """)).scalar()
+        if not missing:
+            return 0
+
+    parents = dict(db.session.execute(text("SELECT id, parent_id FROM departments")).fetchall())
+    rows = []
+    for department_id in parents:
+        ancestor, depth, seen = department_id, 0, set()
+        while ancestor is not None and ancestor not in seen:
+            rows.append({'ancestor_id': ancestor, 'descendant_id': department_id, 'depth': depth})
+            seen.add(ancestor)
+            ancestor = parents.get(ancestor)
+            depth += 1
+        if ancestor is not None:
+            logger.warning(f"⚠️ Department {department_id} has a circular parent chain; path truncated")
+
+    db.session.execute(text("DELETE FROM department_closure"))
+    if rows:
+        db.session.execute(text("""
+            INSERT INTO department_closure (ancestor_id, descendant_id, depth)
+            VALUES (:ancestor_id, :descendant_id, :depth)
+        """), rows)
+    db.session.commit()
+    logger.info(f"🌳 Department closure rebuilt: {len(rows)} rows for {len(parents)} departments")
+    return len(rows)
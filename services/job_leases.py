@@ -0,0 +1,69 @@
+"""
+Job Lease Service for DeciFrame
+Makes sure a named job runs in one process at a time across every node and gunicorn worker, even
+though each worker runs its own scheduler. A lease is one row in job_leases; it is taken with a
+single conditional UPDATE (or the first INSERT) in its own transaction, so the caller's session is
+never committed. A holder that dies keeps the lease only until expires_at, then anyone can take it.
+"""
+
+import os
+import uuid
+import socket
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+
+class JobLeaseService:
+    """Acquire and release named leases in the job_leases table"""
+
+    def _engine(self):
+        from app import db, app
+        with app.app_context():
+            return db.engine
+
+    def acquire(self, name, seconds):
+        """
+        Take the lease called name for seconds
+
+        Returns:
+            An owner token to pass to release(), or None if another process holds the lease
+        """
+        from models import JobLease
+        table = JobLease.__table__
+        token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        now = datetime.utcnow()
+        values = {'owner': token, 'expires_at': now + timedelta(seconds=seconds), 'acquired_at': now}
+
+        with self._engine().begin() as connection:
+            taken = connection.execute(
+                table.update().where(
+                    table.c.name == name,
+                    or_(table.c.expires_at.is_(None), table.c.expires_at < now)
+                ).values(**values)
+            ).rowcount
+        if taken:
+            return token
+
+        try:
+            with self._engine().begin() as connection:
+                connection.execute(table.insert().values(name=name, **values))
+        except IntegrityError:
+            # The row exists and its lease is still held
+            return None
+        return token
+
+    def release(self, name, token):
+        """Give up the lease if token still holds it; returns True if it did"""
+        from models import JobLease
+        table = JobLease.__table__
+        with self._engine().begin() as connection:
+            released = connection.execute(
+                table.update().where(table.c.name == name, table.c.owner == token)
+                .values(owner=None, expires_at=None)
+            ).rowcount
+        return released == 1
+
+
+# Global job lease service
+job_leases = JobLeaseService()
@@ -0,0 +1,330 @@
+"""
+Review Insight Precomputation for DeciFrame
+AI review insights (confidence score, risks, recommendation) are computed in the background when
+an Epic, BusinessCase or Project is submitted for review, and again when its reviewed content
+changes, instead of blocking every review detail page on an LLM call.
+
+Results are stored in review_insights keyed by (entity, content hash). A review page looks up
+the row for the entity's current content: a ready row is rendered directly, a missing one is
+queued and the page shows a pending state until the worker stores the result.
+
+With BACKGROUND_SERVICES=false (scripts, tests, one-off processes) nothing is computed on commit;
+a review page computes its insight on the request instead.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session
+
+logger = logging.getLogger(__name__)
+
+INSIGHT_WORKERS = int(os.getenv('REVIEW_INSIGHT_WORKERS', '2'))
+INSIGHT_RETRY_SECONDS = int(os.getenv('REVIEW_INSIGHT_RETRY_SECONDS', '300'))
+INSIGHT_PENDING_TIMEOUT = int(os.getenv('REVIEW_INSIGHT_PENDING_TIMEOUT', '600'))
+INSIGHT_VERSION = 1  # Bump when the prompt changes so stored insights are recomputed
+
+PENDING_STATUS = 'Submitted'
+
+# Fields whose change makes a stored insight stale, per entity type
+WATCHED_FIELDS = {
+    'epic': ('title', 'description', 'case_id'),
+    'business_case': ('title', 'description', 'cost_estimate', 'benefit_estimate'),
+    'project': ('name', 'description', 'budget', 'end_date')
+}
+
+
+def _background_enabled():
+    from app import BACKGROUND_SERVICES
+    return BACKGROUND_SERVICES
+
+
+def _entity_models():
+    from models import Epic, BusinessCase, Project
+    return {'epic': Epic, 'business_case': BusinessCase, 'project': Project}
+
+
+def insight_inputs(entity_type, entity):
+    """Arguments for get_ai_review_insights; status is left out so approval does not invalidate the insight"""
+    if entity_type == 'epic':
+        return {
+            'content_type': 'epic',
+            'title': entity.title,
+            'description': entity.description or 'No description provided',
+            'additional_context': f"Business Case: {entity.case_id if entity.case_id else 'No linked case'}"
+        }
+    if entity_type == 'business_case':
+        return {
+            'content_type': 'business case',
+            'title': entity.title,
+            'description': entity.description or 'No description provided',
+            'cost': entity.cost_estimate,
+            'benefit': entity.benefit_estimate,
+            'additional_context': f"ROI: {entity.roi if entity.roi else 'Not calculated'}"
+        }
+    if entity_type == 'project':
+        return {
+            'content_type': 'project',
+            'title': entity.name,
+            'description': entity.description or 'No description provided',
+            'cost': float(entity.budget) if entity.budget is not None else None,
+            'additional_context': f"Timeline: {entity.end_date if entity.end_date else 'Not specified'}"
+        }
+    raise ValueError(f"Unknown review entity type: {entity_type}")
+
+
+def content_hash(inputs):
+    payload = json.dumps({'v': INSIGHT_VERSION, **inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _pending_result(status='pending'):
+    return {
+        'status': status,
+        'confidence_score': None,
+        'risks': [],
+        'recommendation': None,
+        'raw_output': None,
+        'success': False
+    }
+
+
+class ReviewInsightService:
+    """Queues, computes and serves stored review insights"""
+
+    def __init__(self, max_workers=INSIGHT_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='review-insights')
+        self._queued = set()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ reads
+
+    def get_for_display(self, entity_type, entity):
+        """
+        Stored insights for the entity's current content, queuing a computation if needed
+
+        Returns:
+            get_ai_review_insights()-shaped dict with 'status': ready, pending or failed
+        """
+        from models import ReviewInsight
+        from app import db
+
+        digest = content_hash(insight_inputs(entity_type, entity))
+        insight = ReviewInsight.query.filter_by(
+            entity_type=entity_type, entity_id=entity.id, content_hash=digest
+        ).first()
+
+        if insight is not None and insight.status == 'ready':
+            return insight.to_dict()
+
+        now = datetime.utcnow()
+        if not _background_enabled():
+            # No worker pool in this process: compute on the request, retrying failures like the worker
+            retry_due = (insight is not None and insight.status == 'failed'
+                         and insight.requested_at < now - timedelta(seconds=INSIGHT_RETRY_SECONDS))
+            if insight is None or insight.status == 'pending' or retry_due:
+                if retry_due:
+                    insight.requested_at = now
+                insight = self.compute(entity_type, entity.id)
+            return insight.to_dict() if insight is not None else _pending_result()
+
+        if insight is None:
+            insight = self._create_pending(entity_type, entity, digest)
+            self.enqueue(entity_type, entity.id)
+        elif insight.status == 'failed' and insight.requested_at < now - timedelta(seconds=INSIGHT_RETRY_SECONDS):
+            insight.status, insight.requested_at = 'pending', now
+            db.session.commit()
+            self.enqueue(entity_type, entity.id)
+        elif insight.status == 'pending' and insight.requested_at < now - timedelta(seconds=INSIGHT_PENDING_TIMEOUT):
+            insight.requested_at = now  # Worker was lost (e.g. restart); queue it again
+            db.session.commit()
+            self.enqueue(entity_type, entity.id)
+
+        return insight.to_dict() if insight is not None else _pending_result()
+
+    def _create_pending(self, entity_type, entity, digest):
+        from models import ReviewInsight
+        from app import db
+
+        insight = ReviewInsight(
+            organization_id=getattr(entity, 'organization_id', None),
+            entity_type=entity_type,
+            entity_id=entity.id,
+            content_hash=digest,
+            status='pending'
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(insight)
+            db.session.commit()
+            return insight
+        except IntegrityError:
+            # Another request or the worker created it first
+            return ReviewInsight.query.filter_by(
+                entity_type=entity_type, entity_id=entity.id, content_hash=digest
+            ).first()
+
+    # ------------------------------------------------------------------ computation
+
+    def enqueue(self, entity_type, entity_id, app=None):
+        """Compute insights for an entity on the background pool (no-op if it is already queued)"""
+        key = (entity_type, entity_id)
+        with self._lock:
+            if key in self._queued:
+                return False
+            self._queued.add(key)
+        app = app or current_app._get_current_object()
+        self.executor.submit(self._run, app, entity_type, entity_id)
+        return True
+
+    def _run(self, app, entity_type, entity_id):
+        from app import db
+        with app.app_context():
+            try:
+                self.compute(entity_type, entity_id)
+            except Exception as e:
+                logger.error(f"❌ Review insights for {entity_type} {entity_id} failed: {e}")
+                db.session.rollback()
+            finally:
+                with self._lock:
+                    self._queued.discard((entity_type, entity_id))
+                db.session.remove()
+
+    def compute(self, entity_type, entity_id, force=False):
+        """
+        Compute and store insights for the entity's current content (synchronously)
+
+        Returns:
+            The ReviewInsight row, or None if the entity no longer exists
+        """
+        from models import ReviewInsight
+        from app import db
+        from utils.ai_review_insights import get_ai_review_insights
+
+        entity = db.session.get(_entity_models()[entity_type], entity_id)
+        if entity is None:
+            return None
+
+        inputs = insight_inputs(entity_type, entity)
+        digest = content_hash(inputs)
+        insight = ReviewInsight.query.filter_by(
+            entity_type=entity_type, entity_id=entity_id, content_hash=digest
+        ).first()
+        if insight is not None and insight.status == 'ready' and not force:
+            return insight
+        if insight is None:
+            insight = self._create_pending(entity_type, entity, digest)
+
+        result = get_ai_review_insights(**inputs, organization_id=getattr(entity, 'organization_id', None))
+
+        insight.status = 'ready' if result.get('success') else 'failed'
+        insight.confidence_score = result.get('confidence_score')
+        insight.risks = result.get('risks') or []
+        insight.recommendation = result.get('recommendation')
+        insight.raw_output = result.get('raw_output')
+        insight.error = result.get('error')
+        insight.computed_at = datetime.utcnow()
+
+        # Rows for older content of this entity are no longer shown
+        ReviewInsight.query.filter(
+            ReviewInsight.entity_type == entity_type,
+            ReviewInsight.entity_id == entity_id,
+            ReviewInsight.content_hash != digest
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+        logger.info(f"🧠 Review insights for {entity_type} {entity_id}: {insight.status}")
+        return insight
+
+    def pending_entities(self, organization_id=None, force=False):
+        """(entity_type, id) of submitted entities without ready insights for their current content"""
+        from models import ReviewInsight
+        from app import db
+
+        ready = {
+            (row.entity_type, row.entity_id, row.content_hash)
+            for row in db.session.query(
+                ReviewInsight.entity_type, ReviewInsight.entity_id, ReviewInsight.content_hash
+            ).filter(ReviewInsight.status == 'ready')
+        }
+        queue = []
+        for entity_type, model in _entity_models().items():
+            query = model.query.filter(model.status == PENDING_STATUS)
+            if organization_id is not None:
+                query = query.filter(model.organization_id == organization_id)
+            for entity in query.all():
+                key = (entity_type, entity.id, content_hash(insight_inputs(entity_type, entity)))
+                if force or key not in ready:
+                    queue.append((entity_type, entity.id))
+        return queue
+
+
+# Global review insight service
+review_insights = ReviewInsightService()
+
+
+def _is_pending(target):
+    return getattr(target.status, 'name', target.status) == PENDING_STATUS
+
+
+def _entity_type(target):
+    for entity_type, model in _entity_models().items():
+        if isinstance(target, model):
+            return entity_type
+    return None
+
+
+def _queue(target):
+    object_session(target).info.setdefault('review_insights_queue', set()).add((_entity_type(target), target.id))
+
+
+def _entity_inserted(mapper, connection, target):
+    if _is_pending(target):
+        _queue(target)
+
+
+def _entity_updated(mapper, connection, target):
+    if not _is_pending(target):
+        return
+    attrs = inspect(target).attrs
+    fields = ('status',) + WATCHED_FIELDS[_entity_type(target)]
+    if any(attrs[field].history.has_changes() for field in fields):
+        _queue(target)
+
+
+def _submit_after_commit(session):
+    queued = session.info.pop('review_insights_queue', None)
+    if not queued or not has_app_context() or not _background_enabled():
+        return
+    app = current_app._get_current_object()
+    for entity_type, entity_id in queued:
+        review_insights.enqueue(entity_type, entity_id, app=app)
+
+
+def _discard_after_rollback(session):
+    session.info.pop('review_insights_queue', None)
+
+
+def _listen_once(target, identifier, fn):
+    # create_app() may run more than once per process (scripts import app, then build another)
+    if not event.contains(target, identifier, fn):
+        event.listen(target, identifier, fn)
+
+
+def register_review_insight_signals():
+    """Queue insight computation when an entity is submitted or its reviewed content changes (idempotent)"""
+    for model in _entity_models().values():
+        _listen_once(model, 'after_insert', _entity_inserted)
+        _listen_once(model, 'after_update', _entity_updated)
+    _listen_once(Session, 'after_commit', _submit_after_commit)
+    _listen_once(Session, 'after_rollback', _discard_after_rollback)
+
+    print("✓ Review insight signals registered")
+    return True
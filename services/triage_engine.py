@@ -4,12 +4,27 @@ Applies automated triage rules to trigger status updates, notifications, and esc
 """
 
 from datetime import datetime, timedelta
-from models import TriageRule, Epic, BusinessCase, Project, Notification, User, AuditLog, NotificationEventEnum
+from collections import defaultdict
+from sqlalchemy import select, update, insert, func, or_
+from sqlalchemy import Enum as SQLEnum
+from models import (TriageRule, TriageRuleWatermark, Epic, BusinessCase, Project, Notification, User,
+                    Department, AuditLog, NotificationEventEnum, UserRoleEnum)
 from app import db
+from services.badge_counters import badge_counters, ORG_WIDE, PENDING_STATUS, UNREAD_NOTIFICATIONS
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# Bulk mode pushes rule actions into set-based SQL; set TRIAGE_BULK_MODE=False for per-row legacy mode
+BULK_MODE = os.getenv('TRIAGE_BULK_MODE', 'True') == 'True'
+
+# Rows per multi-row INSERT for audit logs and notifications
+BULK_INSERT_CHUNK = 1000
+
+# Organization-wide badge counter of entities awaiting review, per target
+PENDING_BADGE_COUNTERS = {'Epic': 'pending_epics', 'BusinessCase': 'pending_cases', 'Project': 'pending_projects'}
+
 
 class TriageEngine:
     """
@@ -44,20 +59,33 @@ class TriageEngine:
     }
     
     @classmethod
-    def apply_all_rules(cls):
-        """Apply all active triage rules"""
-        logger.info("Starting triage rule application")
+    def apply_all_rules(cls, bulk=None, incremental=True):
+        """
+        Apply all active triage rules
+        
+        Args:
+            bulk: Use set-based SQL execution (defaults to TRIAGE_BULK_MODE)
+            incremental: In bulk mode, only examine rows changed since the rule's last run
+        """
+        bulk = BULK_MODE if bulk is None else bulk
+        logger.info(f"Starting triage rule application ({'bulk' if bulk else 'per-row'} mode)")
         
         try:
             rules = TriageRule.get_active_rules()
             applied_count = 0
+            run_started = datetime.utcnow()
+            status_changes = []
             
             for rule in rules:
-                count = cls._apply_single_rule(rule)
+                if bulk:
+                    count = cls._apply_rule_bulk(rule, run_started, incremental, status_changes)
+                else:
+                    count = cls._apply_single_rule(rule)
                 applied_count += count
                 logger.info(f"Applied rule '{rule.name}' to {count} entities")
             
             db.session.commit()
+            cls._after_bulk_commit(status_changes)
             logger.info(f"Triage rules completed. Applied {applied_count} actions total.")
             return applied_count
             
@@ -95,9 +123,301 @@ class TriageEngine:
             logger.error(f"Error applying rule '{rule.name}': {e}")
             return 0
     
+    # ------------------------------------------------------------------
+    # Bulk (set-based) execution
+    # ------------------------------------------------------------------
+    
+    @classmethod
+    def _apply_rule_bulk(cls, rule, run_started, incremental=True, status_changes=None):
+        """
+        Apply a single triage rule with set-based SQL
+        
+        Status actions become one UPDATE ... WHERE ... RETURNING id, audit rows are written
+        with one multi-row INSERT and notifications are grouped to one per recipient per rule.
+        Each rule runs in a savepoint so a failing rule does not roll back the others.
+        
+        Bulk statements skip ORM events, so badge counters are adjusted here in the same
+        savepoint; status changes are appended to status_changes for _after_bulk_commit.
+        """
+        Model = cls.TARGET_MODELS.get(rule.target)
+        if not Model:
+            logger.warning(f"Unknown target model: {rule.target}")
+            return 0
+        
+        condition = cls._build_condition(Model, rule)
+        if condition is None:
+            return 0
+        
+        where = [condition, Model.organization_id == rule.organization_id]
+        watermark = None
+        
+        try:
+            with db.session.begin_nested():
+                watermark = cls._get_watermark(rule) if incremental else None
+                if watermark is not None:
+                    where.append(cls._changed_since(Model, rule, watermark, run_started))
+                
+                if rule.action in ('auto_approve', 'flag'):
+                    entity_ids, new_status = cls._bulk_update_status(Model, rule, where)
+                else:
+                    entity_ids = db.session.execute(select(Model.id).where(*where)).scalars().all()
+                    new_status = None
+                
+                if entity_ids:
+                    changes = []
+                    if rule.action == 'notify_admin':
+                        cls._bulk_notify_admins(Model, rule, entity_ids)
+                        changes.append("admin notification sent")
+                    elif rule.action == 'escalate':
+                        cls._bulk_escalate_to_managers(Model, rule, entity_ids)
+                        changes.append("escalated to manager")
+                    elif new_status is not None:
+                        changes.append(f"status: → {cls._status_label(new_status)}")
+                    
+                    cls._bulk_log_triage_actions(rule, entity_ids, new_status, changes)
+                
+                cls._save_watermark(rule, run_started, len(entity_ids))
+            
+            if entity_ids and new_status is not None and status_changes is not None:
+                status_changes.append((rule.organization_id, Model, entity_ids, new_status))
+            
+            logger.info(f"TRIAGE AUDIT: Rule '{rule.name}' (#{rule.id}) applied '{rule.action}' "
+                        f"to {len(entity_ids)} {rule.target} row(s) in bulk"
+                        f"{' since ' + watermark.isoformat() if watermark else ''}")
+            return len(entity_ids)
+            
+        except Exception as e:
+            logger.error(f"Error applying rule '{rule.name}' in bulk: {e}")
+            return 0
+    
+    @classmethod
+    def _changed_since(cls, Model, rule, watermark, run_started):
+        """Restrict a rule to rows changed (or aged past a days_ago cutoff) since the watermark"""
+        changed = [Model.updated_at > watermark]
+        if rule.operator == 'days_ago':
+            # Rows can start matching without changing: include those that crossed the cutoff
+            days = timedelta(days=int(rule.value))
+            changed.append(getattr(Model, rule.field) >= watermark - days)
+        return or_(*changed)
+    
+    @classmethod
+    def _rule_signature(cls, rule):
+        """Identify the rule definition so edits reset the watermark"""
+        return f"{rule.target}|{rule.field}|{rule.operator}|{rule.value}|{rule.action}"[:255]
+    
+    @classmethod
+    def _get_watermark(cls, rule):
+        """Return the last run time for an unchanged rule, or None for a full scan"""
+        mark = db.session.get(TriageRuleWatermark, rule.id)
+        if mark and mark.rule_signature == cls._rule_signature(rule):
+            return mark.last_run_at
+        return None
+    
+    @classmethod
+    def _save_watermark(cls, rule, run_started, matched):
+        """Record this run so the next one is incremental"""
+        mark = db.session.get(TriageRuleWatermark, rule.id)
+        if mark is None:
+            mark = TriageRuleWatermark(rule_id=rule.id)
+            db.session.add(mark)
+        mark.rule_signature = cls._rule_signature(rule)
+        mark.last_run_at = run_started
+        mark.last_matched = matched
+    
+    @classmethod
+    def _status_value(cls, Model, status_name):
+        """Return the value to store for a status name, or None if the column cannot hold it"""
+        column_type = Model.__table__.c.status.type
+        if isinstance(column_type, SQLEnum) and column_type.enum_class is not None:
+            return column_type.enum_class.__members__.get(status_name)
+        return status_name
+    
+    @classmethod
+    def _status_label(cls, status):
+        return getattr(status, 'value', status)
+    
+    @classmethod
+    def _bulk_update_status(cls, Model, rule, where):
+        """Run one UPDATE ... WHERE ... RETURNING id for auto_approve / flag rules"""
+        status_name = 'Approved' if rule.action == 'auto_approve' else 'Flagged'
+        new_status = cls._status_value(Model, status_name)
+        
+        if new_status is None:
+            # e.g. 'Flagged' on StatusEnum columns: record the flag in the audit trail only
+            entity_ids = db.session.execute(select(Model.id).where(*where)).scalars().all()
+            return entity_ids, None
+        
+        values = {'status': new_status, 'updated_at': datetime.utcnow()}
+        if rule.action == 'auto_approve' and hasattr(Model, 'approved_at'):
+            values['approved_at'] = datetime.utcnow()
+        
+        pending = where + [or_(Model.status.is_(None), Model.status != new_status)]
+        
+        # Rows leaving the review queue lower its badge counter (ORM events do not see this UPDATE)
+        pending_status = cls._status_value(Model, PENDING_STATUS)
+        left_review = 0
+        if pending_status is not None and new_status != pending_status:
+            left_review = db.session.execute(
+                select(func.count()).select_from(Model).where(*pending, Model.status == pending_status)
+            ).scalar()
+        
+        if db.engine.dialect.update_returning:
+            entity_ids = db.session.execute(
+                update(Model).where(*pending).values(**values).returning(Model.id),
+                execution_options={'synchronize_session': False}
+            ).scalars().all()
+        else:
+            entity_ids = db.session.execute(select(Model.id).where(*pending)).scalars().all()
+            if entity_ids:
+                db.session.execute(
+                    update(Model).where(Model.id.in_(entity_ids)).values(**values),
+                    execution_options={'synchronize_session': False}
+                )
+        
+        if left_review:
+            badge_counters.adjust(db.session.connection(), rule.organization_id, ORG_WIDE,
+                                  PENDING_BADGE_COUNTERS[Model.__name__], -left_review)
+        
+        return entity_ids, new_status
+    
+    @classmethod
+    def _bulk_insert(cls, Model, rows):
+        """Write rows with multi-row INSERT statements in fixed-size chunks"""
+        for start in range(0, len(rows), BULK_INSERT_CHUNK):
+            db.session.execute(insert(Model), rows[start:start + BULK_INSERT_CHUNK])
+    
+    @classmethod
+    def _bulk_log_triage_actions(cls, rule, entity_ids, new_status, changes):
+        """Write one audit row per affected entity in a single multi-row insert"""
+        now = datetime.utcnow()
+        new_status_label = cls._status_label(new_status)
+        rows = [{
+            'user_id': rule.created_by,  # Rule owner; the action itself is automated
+            'action': f"triage:{rule.action}",
+            'module': 'triage_engine',
+            'target': rule.target,
+            'target_id': entity_id,
+            'details': {
+                'rule_id': rule.id,
+                'rule_name': rule.name,
+                'target_type': rule.target,
+                'target_id': entity_id,
+                'field_condition': f"{rule.field} {rule.operator} {rule.value}",
+                'action_type': rule.action,
+                'changes_made': changes,
+                'new_status': new_status_label,
+                'action_applied': True,
+                'rule_message': rule.message,
+                'bulk': True
+            },
+            'timestamp': now
+        } for entity_id in entity_ids]
+        cls._bulk_insert(AuditLog, rows)
+    
+    @classmethod
+    def _bulk_notify_admins(cls, Model, rule, entity_ids):
+        """Send each organization admin one notification summarizing the rule's matches"""
+        admin_ids = db.session.execute(
+            select(User.id).where(
+                User.role == UserRoleEnum.Admin,
+                User.organization_id == rule.organization_id
+            )
+        ).scalars().all()
+        
+        message = rule.message or f"Triage Rule '{rule.name}' triggered"
+        summary = cls._bulk_summary(Model, entity_ids)
+        link = cls._bulk_link(Model, entity_ids)
+        now = datetime.utcnow()
+        
+        cls._bulk_insert(Notification, [{
+            'organization_id': rule.organization_id,
+            'user_id': admin_id,
+            'message': f"{message} - {summary}",
+            'link': link,
+            'event_type': NotificationEventEnum.TRIAGE_RULE_TRIGGERED,
+            'read_flag': False,
+            'email_sent': False,
+            'created_at': now
+        } for admin_id in admin_ids])
+        badge_counters.adjust_users(db.session.connection(), rule.organization_id, admin_ids,
+                                    UNREAD_NOTIFICATIONS, 1)
+    
+    @classmethod
+    def _bulk_escalate_to_managers(cls, Model, rule, entity_ids):
+        """Send each department manager one escalation covering all their matched entities"""
+        owner_column = Model.created_by if hasattr(Model, 'created_by') else Model.submitted_by
+        rows = db.session.execute(
+            select(Department.manager_id, Model.id)
+            .join(User, User.id == owner_column)
+            .join(Department, Department.id == User.department_id)
+            .where(Model.id.in_(entity_ids), Department.manager_id.isnot(None))
+        ).all()
+        
+        by_manager = defaultdict(list)
+        for manager_id, entity_id in rows:
+            by_manager[manager_id].append(entity_id)
+        
+        now = datetime.utcnow()
+        notifications = []
+        for manager_id, ids in by_manager.items():
+            summary = cls._bulk_summary(Model, ids)
+            notifications.append({
+                'organization_id': rule.organization_id,
+                'user_id': manager_id,
+                'message': rule.message or f"Escalated for review: {summary}",
+                'link': cls._bulk_link(Model, ids),
+                'event_type': NotificationEventEnum.ESCALATION,
+                'read_flag': False,
+                'email_sent': False,
+                'created_at': now
+            })
+        cls._bulk_insert(Notification, notifications)
+        badge_counters.adjust_users(db.session.connection(), rule.organization_id, list(by_manager),
+                                    UNREAD_NOTIFICATIONS, 1)
+    
+    @classmethod
+    def _after_bulk_commit(cls, status_changes):
+        """Apply what ORM events would have done for committed bulk status changes"""
+        if not status_changes:
+            return
+        from metrics.service import invalidate_metrics
+        
+        # Bulk actions only approve or flag, so nothing enters review and no insights are queued
+        for organization_id in {change[0] for change in status_changes}:
+            invalidate_metrics(organization_id)
+    
+    @classmethod
+    def _bulk_summary(cls, Model, entity_ids):
+        if len(entity_ids) == 1:
+            return f"{Model.__name__} #{entity_ids[0]}"
+        return f"{len(entity_ids)} {Model.__name__} records"
+    
+    # Review queue per target, used when a notification covers several entities
+    REVIEW_LIST_URLS = {
+        'Epic': '/review/epics',
+        'BusinessCase': '/review/business-cases',
+        'Project': '/review/projects'
+    }
+    
+    @classmethod
+    def _bulk_link(cls, Model, entity_ids):
+        """Link to the entity for single matches, otherwise to the review queue"""
+        if len(entity_ids) == 1:
+            entity_path = {'Epic': 'epic', 'BusinessCase': 'business-case', 'Project': 'project'}
+            return f"/review/{entity_path[Model.__name__]}/{entity_ids[0]}"
+        return cls.REVIEW_LIST_URLS[Model.__name__]
+    
     @classmethod
     def _build_query(cls, Model, rule):
         """Build query based on rule conditions"""
+        condition = cls._build_condition(Model, rule)
+        if condition is None:
+            return None
+        return Model.query.filter(condition)
+    
+    @classmethod
+    def _build_condition(cls, Model, rule):
+        """Build the SQL filter expression for a rule's field condition"""
         try:
             # Check if the field exists on the model
             if not hasattr(Model, rule.field):
@@ -105,55 +425,37 @@ class TriageEngine:
                 return None
             
             field_attr = getattr(Model, rule.field)
-            query = Model.query
             
             # Apply operator-specific filtering
             if rule.operator == '=':
-                query = query.filter(field_attr == rule.value)
-            elif rule.operator == '>':
-                try:
-                    value = float(rule.value)
-                    query = query.filter(field_attr > value)
-                except ValueError:
-                    logger.warning(f"Invalid numeric value for > operator: {rule.value}")
-                    return None
-            elif rule.operator == '<':
-                try:
-                    value = float(rule.value)
-                    query = query.filter(field_attr < value)
-                except ValueError:
-                    logger.warning(f"Invalid numeric value for < operator: {rule.value}")
-                    return None
-            elif rule.operator == '>=':
+                return field_attr == rule.value
+            elif rule.operator in ('>', '<', '>=', '<='):
                 try:
                     value = float(rule.value)
-                    query = query.filter(field_attr >= value)
                 except ValueError:
-                    logger.warning(f"Invalid numeric value for >= operator: {rule.value}")
-                    return None
-            elif rule.operator == '<=':
-                try:
-                    value = float(rule.value)
-                    query = query.filter(field_attr <= value)
-                except ValueError:
-                    logger.warning(f"Invalid numeric value for <= operator: {rule.value}")
+                    logger.warning(f"Invalid numeric value for {rule.operator} operator: {rule.value}")
                     return None
+                if rule.operator == '>':
+                    return field_attr > value
+                elif rule.operator == '<':
+                    return field_attr < value
+                elif rule.operator == '>=':
+                    return field_attr >= value
+                return field_attr <= value
             elif rule.operator == 'contains':
-                query = query.filter(field_attr.like(f"%{rule.value}%"))
+                return field_attr.like(f"%{rule.value}%")
             elif rule.operator == 'days_ago':
                 try:
                     days = int(rule.value)
-                    cutoff = datetime.utcnow() - timedelta(days=days)
-                    query = query.filter(field_attr < cutoff)
                 except ValueError:
                     logger.warning(f"Invalid days value for days_ago operator: {rule.value}")
                     return None
+                cutoff = datetime.utcnow() - timedelta(days=days)
+                return field_attr < cutoff
             else:
                 logger.warning(f"Unsupported operator: {rule.operator}")
                 return None
             
-            return query
-            
         except Exception as e:
             logger.error(f"Error building query for rule: {e}")
             return None
@@ -284,14 +586,14 @@ class TriageEngine:
                 'field_condition': f"{rule.field} {rule.operator} {rule.value}",
                 'action_type': rule.action,
                 'changes_made': changes,
-                'previous_status': previous_status,
-                'new_status': current_status,
+                'previous_status': cls._status_label(previous_status),
+                'new_status': cls._status_label(current_status),
                 'action_applied': action_applied,
                 'rule_message': rule.message
             }
             
             log_entry = AuditLog(
-                user_id=None,  # System action
+                user_id=rule.created_by,  # Rule owner; the action itself is automated
                 action=f"triage:{rule.action}",
                 module='triage_engine',
                 target=f"{rule.target}",
@@ -312,7 +614,7 @@ class TriageEngine:
         """Log triage errors to audit trail"""
         try:
             log_entry = AuditLog(
-                user_id=None,  # System action
+                user_id=rule.created_by,  # Rule owner; the action itself is automated
                 action="triage:error",
                 module='triage_engine',
                 target=f"{rule.target}",
@@ -1,78 +1,443 @@
-"""Database-backed session storage for Flask"""
-import json
+"""
+Server-side session storage for Flask
+The session cookie carries only a signed session id and a short hash of the stored payload; the
+payload lives in a session store:
+- 'database': the session_data table (indexed on expires) through the app's engine, on its own
+  connection so session writes never commit the request's db.session
+- 'sqlite':   an on-disk key/value file in WAL mode in the instance folder (or SESSION_SQLITE_PATH),
+  shared by the workers on a host
+- 'cookie':   Flask's signed cookie sessions (no server-side store); the default
+
+Reads are served from an in-process cache while the cookie's payload hash matches the cached
+payload (rechecked against the store every SESSION_CACHE_SECONDS). A request writes only when the
+session payload changed, or to extend the expiry at most once per SESSION_TOUCH_SECONDS. Expired
+sessions are deleted by a background sweeper every SESSION_SWEEP_SECONDS instead of on each request.
+
+The session id is replaced whenever the logged-in user changes (login, logout), so an id known
+before login is never authenticated (session fixation). Writes to an existing session only update
+its row: a session deleted by another worker (e.g. logged out there) is never recreated from a
+stale cache entry, and its cookie is cleared instead.
+"""
+
+import os
+import time
 import uuid
-from datetime import datetime, timedelta
-from flask import request
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
+from itsdangerous import Signer, BadSignature
+from sqlalchemy import select
+from werkzeug.datastructures import CallbackDict
 from app import db
+from utils.local_state import instance_file
+
+logger = logging.getLogger(__name__)
+
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'cookie')
+SESSION_CACHE_SIZE = int(os.getenv('SESSION_CACHE_SIZE', '10000'))
+SESSION_CACHE_SECONDS = int(os.getenv('SESSION_CACHE_SECONDS', '60'))
+SESSION_TOUCH_SECONDS = int(os.getenv('SESSION_TOUCH_SECONDS', '300'))
+SESSION_SWEEP_SECONDS = int(os.getenv('SESSION_SWEEP_SECONDS', '300'))
+SESSION_SWEEP_BATCH = int(os.getenv('SESSION_SWEEP_BATCH', '1000'))
 
 class SessionData(db.Model):
     __tablename__ = 'session_data'
-    
+
     id = db.Column(db.String(255), primary_key=True)
     data = db.Column(db.Text, nullable=False)
-    expires = db.Column(db.DateTime, nullable=False)
+    expires = db.Column(db.DateTime, nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-class DatabaseSessionInterface:
-    """Database-backed session interface"""
-    
-    def __init__(self):
-        self.session_lifetime = timedelta(hours=1)
-        self._current_session_id = None
-    
-    def get_session_id(self):
-        """Get session ID from cookie or create new one (cached per request)"""
-        if self._current_session_id:
-            return self._current_session_id
-            
-        session_id = request.cookies.get('session_id')
-        if not session_id:
-            session_id = str(uuid.uuid4())
-        
-        self._current_session_id = session_id
-        print(f"🔧 Session ID from cookie: {request.cookies.get('session_id')}")
-        print(f"🔧 Using session ID: {session_id}")
-        return session_id
-    
-    def load_session(self):
-        """Load session data from database"""
-        session_id = self.get_session_id()
-        
-        # Clean up expired sessions
-        expired = datetime.utcnow()
-        SessionData.query.filter(SessionData.expires < expired).delete()
-        db.session.commit()
-        
-        # Load current session
-        session_record = SessionData.query.get(session_id)
-        if session_record and session_record.expires > datetime.utcnow():
+
+def payload_hash(payload):
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its id, the payload it was loaded with and whose session it was"""
+
+    def __init__(self, initial=None, sid=None, payload=None, expires=None, new=False):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.payload = payload
+        self.expires = expires
+        self.new = new
+        self.modified = False
+        self.user_id = self.get('_user_id')  # Flask-Login's key
+
+
+# ---------------------------------------------------------------------- stores
+
+class SessionStore:
+    """Storage interface for ServerSideSessionInterface; expires are naive UTC datetimes"""
+
+    name = 'base'
+
+    def load(self, sid):
+        """(payload, expires) or None"""
+        raise NotImplementedError
+
+    def save(self, sid, payload, expires):
+        """Create or replace a session"""
+        raise NotImplementedError
+
+    def update(self, sid, payload, expires):
+        """Replace an existing session's payload; False (and no write) if it no longer exists"""
+        raise NotImplementedError
+
+    def touch(self, sid, expires):
+        """Extend an existing session; False if it no longer exists"""
+        raise NotImplementedError
+
+    def delete(self, sid):
+        raise NotImplementedError
+
+    def sweep(self, now, batch_size=SESSION_SWEEP_BATCH):
+        """Delete expired sessions in batches; returns the number deleted"""
+        raise NotImplementedError
+
+
+class DatabaseSessionStore(SessionStore):
+    """session_data table, accessed on a separate connection from the request's db.session"""
+
+    name = 'database'
+
+    def __init__(self, app):
+        self.app = app
+        with app.app_context():
+            self.engine = db.engine
+            SessionData.__table__.create(self.engine, checkfirst=True)
+        self.dialect = self.engine.dialect.name
+
+    def load(self, sid):
+        table = SessionData.__table__
+        with self.engine.connect() as connection:
+            row = connection.execute(select(table.c.data, table.c.expires).where(table.c.id == sid)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def save(self, sid, payload, expires):
+        table = SessionData.__table__
+        values = {'id': sid, 'data': payload, 'expires': expires, 'created_at': datetime.utcnow()}
+        with self.engine.begin() as connection:
+            if self.dialect in ('postgresql', 'sqlite'):
+                if self.dialect == 'postgresql':
+                    from sqlalchemy.dialects.postgresql import insert
+                else:
+                    from sqlalchemy.dialects.sqlite import insert
+                statement = insert(table).values(**values)
+                connection.execute(statement.on_conflict_do_update(
+                    index_elements=[table.c.id],
+                    set_={'data': statement.excluded.data, 'expires': statement.excluded.expires}
+                ))
+            elif connection.execute(table.update().where(table.c.id == sid).values(data=payload, expires=expires)).rowcount == 0:
+                connection.execute(table.insert().values(**values))
+
+    def update(self, sid, payload, expires):
+        table = SessionData.__table__
+        with self.engine.begin() as connection:
+            return connection.execute(
+                table.update().where(table.c.id == sid).values(data=payload, expires=expires)
+            ).rowcount == 1
+
+    def touch(self, sid, expires):
+        table = SessionData.__table__
+        with self.engine.begin() as connection:
+            return connection.execute(table.update().where(table.c.id == sid).values(expires=expires)).rowcount == 1
+
+    def delete(self, sid):
+        table = SessionData.__table__
+        with self.engine.begin() as connection:
+            connection.execute(table.delete().where(table.c.id == sid))
+
+    def sweep(self, now, batch_size=SESSION_SWEEP_BATCH):
+        table = SessionData.__table__
+        deleted = 0
+        while True:
+            # Small batches keep each DELETE short; the expires index finds them without a scan
+            expired = select(table.c.id).where(table.c.expires < now).limit(batch_size).scalar_subquery()
+            with self.engine.begin() as connection:
+                count = connection.execute(table.delete().where(table.c.id.in_(expired))).rowcount
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+
+class SQLiteSessionStore(SessionStore):
+    """On-disk key/value file shared by all workers on a host (WAL mode)"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=None):
+        self.path = path or instance_file('sessions.sqlite3', 'SESSION_SQLITE_PATH')
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires)")
+
+    def _connect(self):
+        # One connection per thread, reopened after fork (connections must not cross processes)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _timestamp(expires):
+        return (expires - datetime(1970, 1, 1)).total_seconds()
+
+    def load(self, sid):
+        row = self._connect().execute("SELECT data, expires FROM sessions WHERE id = ?", (sid,)).fetchone()
+        return (row[0], datetime.utcfromtimestamp(row[1])) if row else None
+
+    def save(self, sid, payload, expires):
+        self._connect().execute("""
+            INSERT INTO sessions (id, data, expires) VALUES (?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires = excluded.expires
+        """, (sid, payload, self._timestamp(expires)))
+
+    def update(self, sid, payload, expires):
+        return self._connect().execute(
+            "UPDATE sessions SET data = ?, expires = ? WHERE id = ?", (payload, self._timestamp(expires), sid)
+        ).rowcount == 1
+
+    def touch(self, sid, expires):
+        return self._connect().execute(
+            "UPDATE sessions SET expires = ? WHERE id = ?", (self._timestamp(expires), sid)
+        ).rowcount == 1
+
+    def delete(self, sid):
+        self._connect().execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+    def sweep(self, now, batch_size=SESSION_SWEEP_BATCH):
+        deleted = 0
+        conn = self._connect()
+        while True:
+            count = conn.execute("""
+                DELETE FROM sessions WHERE id IN (SELECT id FROM sessions WHERE expires < ? LIMIT ?)
+            """, (self._timestamp(now), batch_size)).rowcount
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+
+def create_session_store(app, name=SESSION_BACKEND):
+    """Build the configured store; None for cookie sessions or if the store is unavailable"""
+    try:
+        if name == 'database':
+            return DatabaseSessionStore(app)
+        if name == 'sqlite':
+            return SQLiteSessionStore()
+    except Exception as e:
+        print(f"⚠️ Session backend '{name}' unavailable ({e}); using cookie sessions")
+    return None
+
+
+# ---------------------------------------------------------------------- interface
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface over a SessionStore with an in-process payload cache"""
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, cache_size=SESSION_CACHE_SIZE, cache_seconds=SESSION_CACHE_SECONDS,
+                 touch_seconds=SESSION_TOUCH_SECONDS):
+        self.store = store
+        self.cache_size = cache_size
+        self.cache_seconds = cache_seconds
+        self.touch_seconds = touch_seconds
+        self._cache = OrderedDict()  # sid -> (payload, expires, cached_at)
+        self._cache_lock = threading.Lock()
+        self.stats = {'cache_hits': 0, 'store_reads': 0, 'writes': 0, 'touches': 0, 'rotations': 0, 'ended': 0}
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='deciframe-server-session', key_derivation='hmac')
+
+    def _new_session(self):
+        return ServerSession(sid=uuid.uuid4().hex, new=True)
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie or not app.secret_key:
+            return self._new_session()
+        try:
+            sid, _, cookie_hash = self._signer(app).unsign(cookie).decode('utf-8').partition('.')
+        except (BadSignature, UnicodeDecodeError):
+            return self._new_session()
+
+        now = datetime.utcnow()
+        with self._cache_lock:
+            cached = self._cache.get(sid)
+            if cached is not None:
+                self._cache.move_to_end(sid)
+        if (cached is not None and payload_hash(cached[0]) == cookie_hash and cached[1] > now
+                and time.monotonic() - cached[2] < self.cache_seconds):
+            self.stats['cache_hits'] += 1
+            payload, expires, _ = cached
+            # Cached as the serialized payload so a request's in-place changes never leak into it
+            return ServerSession(self.serializer.loads(payload), sid=sid, payload=payload, expires=expires)
+
+        self.stats['store_reads'] += 1
+        row = self.store.load(sid)
+        if row is None or row[1] <= now:
+            # Unknown or expired: start over with a fresh id rather than reuse the client's
+            return self._new_session()
+        payload, expires = row
+        try:
+            data = self.serializer.loads(payload)
+        except ValueError:
+            return self._new_session()
+        self._remember(sid, payload, expires)
+        return ServerSession(data, sid=sid, payload=payload, expires=expires)
+
+    def _remember(self, sid, payload, expires):
+        with self._cache_lock:
+            self._cache[sid] = (payload, expires, time.monotonic())
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _forget(self, sid):
+        with self._cache_lock:
+            self._cache.pop(sid, None)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        def end_session():
+            self._forget(session.sid)
+            response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                   samesite=samesite, httponly=httponly)
+
+        if not session:
+            if not session.new:
+                # Cleared (e.g. logout): remove it from the store and the browser
+                self.store.delete(session.sid)
+                end_session()
+            return
+
+        if not session.new and session.get('_user_id') != session.user_id:
+            # Logged in, out or as someone else: continue under a new id, so an id handed out (or
+            # planted in the browser) before this point is never authenticated
+            self.store.delete(session.sid)
+            self._forget(session.sid)
+            session.sid = uuid.uuid4().hex
+            session.new = True
+            self.stats['rotations'] += 1
+
+        now = datetime.utcnow()
+        server_expires = now + app.permanent_session_lifetime
+        payload = self.serializer.dumps(dict(session))
+        written = False
+        if session.new or payload != session.payload:
+            if session.new:
+                self.store.save(session.sid, payload, server_expires)
+            elif not self.store.update(session.sid, payload, server_expires):
+                # Deleted elsewhere (logged out on another worker) after this worker cached it
+                self.stats['ended'] += 1
+                return end_session()
+            self._remember(session.sid, payload, server_expires)
+            self.stats['writes'] += 1
+            written = True
+        elif session.expires is None or (server_expires - session.expires).total_seconds() >= self.touch_seconds:
+            if not self.store.touch(session.sid, server_expires):
+                self.stats['ended'] += 1
+                return end_session()
+            self._remember(session.sid, payload, server_expires)
+            self.stats['touches'] += 1
+            written = True
+
+        if written or session.new or self.should_set_cookie(app, session):
+            value = self._signer(app).sign(f"{session.sid}.{payload_hash(payload)}").decode('utf-8')
+            response.set_cookie(name, value, expires=self.get_expiration_time(app, session), httponly=httponly,
+                                domain=domain, path=path, secure=secure, samesite=samesite)
+
+
+class SessionSweeper:
+    """Deletes expired sessions in the background instead of on every request"""
+
+    def __init__(self, interval=SESSION_SWEEP_SECONDS, batch_size=SESSION_SWEEP_BATCH):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.store = None
+        self._app = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {'runs': 0, 'swept': 0, 'last_run': None}
+
+    def sweep(self):
+        """Sweep the session store and the simple_sessions table; returns the number deleted"""
+        now = datetime.utcnow()
+        deleted = self.store.sweep(now, self.batch_size) if self.store is not None else 0
+        if self._app is not None:
+            from simple_session import sweep_expired_simple_sessions
+            with self._app.app_context():
+                deleted += sweep_expired_simple_sessions(db.engine, now, self.batch_size)
+        self.stats['runs'] += 1
+        self.stats['swept'] += deleted
+        self.stats['last_run'] = now.isoformat()
+        return deleted
+
+    def start(self, app, store=None):
+        """Start the sweeper thread (no-op if already running)"""
+        self._app = app
+        self.store = store
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name='session-sweeper')
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
             try:
-                return json.loads(session_record.data)
-            except (json.JSONDecodeError, TypeError):
-                pass
-        
-        return {}
-    
-    def save_session(self, session_data):
-        """Save session data to database"""
-        session_id = self.get_session_id()
-        expires = datetime.utcnow() + self.session_lifetime
-        
-        # Always save, even if session_data is empty
-        session_record = SessionData.query.get(session_id)
-        if session_record:
-            session_record.data = json.dumps(session_data)
-            session_record.expires = expires
-        else:
-            session_record = SessionData(
-                id=session_id,
-                data=json.dumps(session_data),
-                expires=expires
-            )
-            db.session.add(session_record)
-        
-        db.session.commit()
-        return session_id
-
-# Global session interface instance
-db_session = DatabaseSessionInterface()
\ No newline at end of file
+                deleted = self.sweep()
+                if deleted:
+                    logger.info(f"🧹 Swept {deleted} expired sessions")
+            except Exception as e:
+                logger.error(f"❌ Session sweep failed: {e}")
+
+
+def init_session_store(app, name=SESSION_BACKEND, sweep=True):
+    """Install server-side sessions on app (no-op for cookie sessions) and start the sweeper unless sweep is False"""
+    store = create_session_store(app, name)
+    interface = None
+    if store is not None:
+        interface = ServerSideSessionInterface(store)
+        app.session_interface = interface
+        print(f"✓ Server-side sessions enabled ({store.name} store)")
+    if sweep:
+        session_sweeper.start(app, store)
+    return interface
+
+
+# Global session sweeper
+session_sweeper = SessionSweeper()
@@ -11,7 +11,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def setup_fulltext_search():
-    """Set up PostgreSQL full-text search for Problems, BusinessCases, and Projects"""
+    """Set up PostgreSQL full-text search for Problems, BusinessCases, Projects and HelpArticles"""
     
     with app.app_context():
         try:
@@ -20,7 +20,8 @@ def setup_fulltext_search():
             cleanup_queries = [
                 "ALTER TABLE problems DROP COLUMN IF EXISTS search_vector",
                 "ALTER TABLE business_cases DROP COLUMN IF EXISTS search_vector", 
-                "ALTER TABLE projects DROP COLUMN IF EXISTS search_vector"
+                "ALTER TABLE projects DROP COLUMN IF EXISTS search_vector",
+                "ALTER TABLE help_articles DROP COLUMN IF EXISTS search_vector"
             ]
             
             for query in cleanup_queries:
@@ -49,6 +50,12 @@ def setup_fulltext_search():
                 ALTER TABLE projects ADD COLUMN search_vector tsvector
             """))
             
+            # 3b. Add tsvector columns for Help Articles
+            logger.info("Adding search_vector column to help_articles table...")
+            db.session.execute(text("""
+                ALTER TABLE help_articles ADD COLUMN search_vector tsvector
+            """))
+            
             # 4. Create GIN indexes for fast full-text search
             logger.info("Creating GIN indexes for search vectors...")
             
@@ -64,6 +71,10 @@ def setup_fulltext_search():
                 CREATE INDEX idx_projects_search ON projects USING GIN(search_vector)
             """))
             
+            db.session.execute(text("""
+                CREATE INDEX idx_help_articles_search ON help_articles USING GIN(search_vector)
+            """))
+            
             # 5. Create triggers for automatic search vector updates
             logger.info("Creating triggers for automatic search vector updates...")
             
@@ -91,6 +102,14 @@ def setup_fulltext_search():
                 tsvector_update_trigger('search_vector', 'pg_catalog.english', 'name', 'description')
             """))
             
+            # Help Articles trigger
+            db.session.execute(text("""
+                CREATE TRIGGER tsvectorupdate_help_articles 
+                BEFORE INSERT OR UPDATE ON help_articles 
+                FOR EACH ROW EXECUTE FUNCTION
+                tsvector_update_trigger('search_vector', 'pg_catalog.english', 'title', 'content', 'tags')
+            """))
+            
             # 6. Populate existing records with search vectors
             logger.info("Populating search vectors for existing records...")
             
@@ -120,6 +139,17 @@ def setup_fulltext_search():
                 WHERE search_vector IS NULL
             """))
             
+            # Update existing Help Articles
+            db.session.execute(text("""
+                UPDATE help_articles SET search_vector = 
+                to_tsvector('pg_catalog.english', 
+                    COALESCE(title, '') || ' ' || 
+                    COALESCE(content, '') || ' ' || 
+                    COALESCE(tags, '')
+                )
+                WHERE search_vector IS NULL
+            """))
+            
             db.session.commit()
             logger.info("✓ Full-text search setup completed successfully!")
             
@@ -183,12 +213,15 @@ def drop_fulltext_search():
                 "DROP TRIGGER IF EXISTS tsvectorupdate_problems ON problems",
                 "DROP TRIGGER IF EXISTS tsvectorupdate_business_cases ON business_cases", 
                 "DROP TRIGGER IF EXISTS tsvectorupdate_projects ON projects",
+                "DROP TRIGGER IF EXISTS tsvectorupdate_help_articles ON help_articles",
                 "DROP INDEX IF EXISTS idx_problems_search",
                 "DROP INDEX IF EXISTS idx_business_cases_search",
                 "DROP INDEX IF EXISTS idx_projects_search",
+                "DROP INDEX IF EXISTS idx_help_articles_search",
                 "ALTER TABLE problems DROP COLUMN IF EXISTS search_vector",
                 "ALTER TABLE business_cases DROP COLUMN IF EXISTS search_vector",
-                "ALTER TABLE projects DROP COLUMN IF EXISTS search_vector"
+                "ALTER TABLE projects DROP COLUMN IF EXISTS search_vector",
+                "ALTER TABLE help_articles DROP COLUMN IF EXISTS search_vector"
             ]
             
             for query in drop_queries:
@@ -93,11 +93,10 @@ try:
         print(f"Training Jobs: {len(status['jobs'])} scheduled")
         
         # Check model directory
-        import os
-        models_dir = status.get('models_directory', 'analytics/models')
-        if os.path.exists(models_dir):
-            model_files = [f for f in os.listdir(models_dir) if f.endswith('.pkl')]
-            print(f"Model Files: {len(model_files)} available")
+        registry = status.get('model_registry', {})
+        available = registry.get('models_available') or {}
+        print(f"Model Version: {registry.get('manifest_version') or 'none published'}")
+        print(f"Models: {sum(available.values())} available")
         
         print("System Status: AI-Enhanced Production Ready")
         
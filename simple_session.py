@@ -3,6 +3,7 @@ import json
 import uuid
 from datetime import datetime, timedelta
 from flask import session
+from sqlalchemy import inspect, select
 from app import db
 
 class SimpleSessionData(db.Model):
@@ -10,7 +11,7 @@ class SimpleSessionData(db.Model):
     
     session_key = db.Column(db.String(255), primary_key=True)
     data = db.Column(db.Text, nullable=False)
-    expires = db.Column(db.DateTime, nullable=False)
+    expires = db.Column(db.DateTime, nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 def init_session():
@@ -23,19 +24,22 @@ def init_session():
 def save_session_data(data):
     """Save data to database using Flask session key"""
     session_key = init_session()
-    expires = datetime.utcnow() + timedelta(hours=1)
+    now = datetime.utcnow()
+    expires = now + timedelta(hours=1)
+    payload = json.dumps(data)
     
-    # Clean up expired sessions
-    SimpleSessionData.query.filter(SimpleSessionData.expires < datetime.utcnow()).delete()
-    
-    session_record = SimpleSessionData.query.get(session_key)
+    # Expired rows are deleted by the background session sweeper, not on every save
+    session_record = db.session.get(SimpleSessionData, session_key)
     if session_record:
-        session_record.data = json.dumps(data)
+        if session_record.data == payload and session_record.expires - now > timedelta(minutes=55):
+            # Unchanged and recently extended: nothing to write
+            return session_key
+        session_record.data = payload
         session_record.expires = expires
     else:
         session_record = SimpleSessionData(
             session_key=session_key,
-            data=json.dumps(data),
+            data=payload,
             expires=expires
         )
         db.session.add(session_record)
@@ -51,7 +55,7 @@ def load_session_data():
         print("🔧 No session key found")
         return {}
     
-    session_record = SimpleSessionData.query.get(session_key)
+    session_record = db.session.get(SimpleSessionData, session_key)
     if session_record and session_record.expires > datetime.utcnow():
         try:
             data = json.loads(session_record.data)
@@ -61,4 +65,18 @@ def load_session_data():
             pass
     
     print(f"🔧 No valid session data for key: {session_key}")
-    return {}
\ No newline at end of file
+    return {}
+
+def sweep_expired_simple_sessions(engine, now, batch_size=1000):
+    """Delete expired simple_sessions rows in batches (called by the session sweeper)"""
+    if not inspect(engine).has_table(SimpleSessionData.__tablename__):
+        return 0
+    table = SimpleSessionData.__table__
+    deleted = 0
+    while True:
+        expired = select(table.c.session_key).where(table.c.expires < now).limit(batch_size).scalar_subquery()
+        with engine.begin() as connection:
+            count = connection.execute(table.delete().where(table.c.session_key.in_(expired))).rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
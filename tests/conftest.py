@@ -4,15 +4,25 @@ Test configuration and fixtures for DeciFrame Flask app
 
 import pytest
 import os
+import tempfile
 from datetime import datetime
 
+# app.py builds the app at import time: point it at a throwaway SQLite database and instance
+# folder and keep the background schedulers off before it is imported
+TEST_STATE_DIR = tempfile.mkdtemp(prefix='deciframe-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TEST_STATE_DIR, 'test.db')}"
+os.environ['DECIFRAME_INSTANCE_PATH'] = TEST_STATE_DIR
+os.environ['TESTING'] = 'true'
+os.environ['BACKGROUND_SERVICES'] = 'false'
+os.environ['WORKFLOW_QUEUE_AUTOSTART'] = 'False'
+
 # Import app creation function
 try:
     from app import create_app
 except ImportError:
     from app import app as create_app
 
-from models import db, User, Problem, BusinessCase, Project, Notification, RoleEnum, StatusEnum
+from models import db, Organization, Department, User, Problem, BusinessCase, Project, Notification, RoleEnum, StatusEnum
 
 
 @pytest.fixture
@@ -57,6 +67,24 @@ def client(app):
     return app.test_client()
 
 
+@pytest.fixture
+def organization(db_session):
+    """Create the test organization (id 1)."""
+    org = Organization(name='Test Org', domain='test.com')
+    db_session.session.add(org)
+    db_session.session.commit()
+    return org
+
+
+@pytest.fixture
+def department(db_session, organization):
+    """Create a top-level department in the test organization."""
+    dept = Department(name='Operations', organization_id=organization.id, level=1)
+    db_session.session.add(dept)
+    db_session.session.commit()
+    return dept
+
+
 @pytest.fixture
 def admin_user(db_session):
     """Create an admin user for testing."""
@@ -0,0 +1,104 @@
+"""
+Tests for the audit log pipeline (audit/pipeline.py)
+"""
+
+import pytest
+from sqlalchemy import create_engine
+
+from models import AuditLog, AuditLogBatch
+from audit.pipeline import AuditPipeline, batch_hash, verify_chain
+
+
+@pytest.fixture
+def pipeline(app):
+    pipeline = AuditPipeline(mode='async', batch_size=3)
+    pipeline._app = app
+    return pipeline
+
+
+def record(pipeline, user, *actions):
+    for action in actions:
+        pipeline.record({'user_id': user.id, 'action': action, 'target': 'User', 'details': {'n': action}})
+
+
+def stored_actions(db_session):
+    return [row.action for row in AuditLog.query.order_by(AuditLog.id)]
+
+
+def test_batches_are_hash_chained(db_session, pipeline, regular_user):
+    record(pipeline, regular_user, 'A1', 'A2', 'A3', 'A4')
+
+    assert stored_actions(db_session) == ['A1', 'A2', 'A3', 'A4']
+    batches = AuditLogBatch.query.filter_by(chain=pipeline.chain).order_by(AuditLogBatch.id).all()
+    assert len(batches) == 4  # no flusher thread: every record is written at once
+    assert batches[0].prev_hash is None
+    assert all(later.prev_hash == earlier.batch_hash for earlier, later in zip(batches, batches[1:]))
+    assert verify_chain(db_session.session, pipeline.chain) == (True, None)
+
+
+def test_tampered_row_breaks_the_chain(db_session, pipeline, regular_user):
+    record(pipeline, regular_user, 'A1', 'A2')
+    first_batch = AuditLogBatch.query.filter_by(chain=pipeline.chain).order_by(AuditLogBatch.id).first()
+
+    row = AuditLog.query.filter_by(action='A1').one()
+    row.action = 'EDITED'
+    db_session.session.commit()
+
+    assert verify_chain(db_session.session, pipeline.chain) == (False, first_batch.id)
+
+
+def test_batch_hash_depends_on_the_previous_hash():
+    rows = [{'id': 2, 'action': 'B'}, {'id': 1, 'action': 'A'}]
+
+    assert batch_hash(None, rows) == batch_hash(None, list(reversed(rows)))
+    assert batch_hash(None, rows) != batch_hash('previous', rows)
+
+
+def test_outage_keeps_rows_buffered_in_order(db_session, pipeline, regular_user):
+    working_engine = pipeline._engine
+    unreachable = create_engine('sqlite:////nonexistent/audit.db')
+    pipeline._engine = lambda: unreachable
+
+    record(pipeline, regular_user, 'A1', 'A2', 'A3', 'A4', 'A5')
+
+    # The first write fails and starts the backoff; later records are only buffered
+    assert pipeline.pending() == 5
+    assert pipeline.stats['requeued'] == 1
+    assert pipeline.stats['written'] == 0
+    assert pipeline.flush() == 0  # backing off: nothing is attempted until _retry_at
+
+    pipeline._engine = working_engine
+    pipeline._retry_at = 0.0
+    assert pipeline.flush() == 5
+
+    assert pipeline.pending() == 0
+    assert stored_actions(db_session) == ['A1', 'A2', 'A3', 'A4', 'A5']
+    assert verify_chain(db_session.session, pipeline.chain) == (True, None)
+
+
+def test_rejected_row_is_dead_lettered(db_session, pipeline, regular_user):
+    pipeline.mode = 'sync'
+    pipeline.batch_size = 10
+    with pipeline._lock:
+        pipeline._buffer.extend([
+            {'user_id': regular_user.id, 'action': 'A1', 'details': {}},
+            {'user_id': None, 'action': 'BAD', 'details': {}},
+            {'user_id': regular_user.id, 'action': 'A2', 'details': {}},
+        ])
+
+    assert pipeline.flush() == 2
+
+    assert pipeline.pending() == 0
+    assert [row['action'] for row in pipeline.dead_letters] == ['BAD']
+    assert pipeline.stats['failed'] == 1
+    assert stored_actions(db_session) == ['A1', 'A2']
+    assert verify_chain(db_session.session, pipeline.chain) == (True, None)
+
+
+def test_audit_fills_the_organization_of_an_explicit_actor(db_session, regular_user):
+    from audit.log import audit
+
+    entry = audit('USER_UPDATE', 'User', regular_user.id, actor_id=regular_user.id)
+
+    assert entry['details']['organization_id'] == regular_user.organization_id
+    assert AuditLog.query.filter_by(action='USER_UPDATE').count() == 1
@@ -0,0 +1,158 @@
+"""
+Tests for the materialized badge counters (services/badge_counters.py)
+"""
+
+from sqlalchemy import text
+
+from models import BusinessCase, Notification, NotificationEventEnum, StatusEnum
+from services.badge_counters import badge_counters
+
+
+def make_case(db_session, user, department, status=StatusEnum.Open):
+    case = BusinessCase(
+        title='New CRM',
+        description='Replace the CRM',
+        cost_estimate=1000,
+        benefit_estimate=5000,
+        status=status,
+        created_by=user.id,
+        dept_id=department.id,
+        organization_id=department.organization_id
+    )
+    db_session.session.add(case)
+    db_session.session.commit()
+    return case
+
+
+def make_notification(db_session, user, read=False):
+    notification = Notification(
+        user_id=user.id,
+        organization_id=user.organization_id,
+        message='Case approved',
+        event_type=NotificationEventEnum.BUSINESS_CASE_APPROVED,
+        read_flag=read
+    )
+    db_session.session.add(notification)
+    db_session.session.commit()
+    return notification
+
+
+def pending_cases(organization_id):
+    return badge_counters.get_pending_counts(organization_id)['pending_cases']
+
+
+def test_pending_counter_follows_status_transitions(db_session, regular_user, department):
+    org_id = department.organization_id
+    submitted = make_case(db_session, regular_user, department, StatusEnum.Submitted)
+    make_case(db_session, regular_user, department, StatusEnum.Submitted)
+    draft = make_case(db_session, regular_user, department)
+    assert pending_cases(org_id) == 2
+
+    draft.status = StatusEnum.Submitted
+    db_session.session.commit()
+    assert pending_cases(org_id) == 3
+
+    # The status is expired by the commit above; the transition is still seen
+    submitted.status = StatusEnum.Approved
+    db_session.session.commit()
+    assert pending_cases(org_id) == 2
+
+    db_session.session.delete(draft)
+    db_session.session.commit()
+    counts = badge_counters.get_pending_counts(org_id)
+    assert counts['pending_cases'] == 1
+    assert counts['total_pending'] == 1
+
+
+def test_unrelated_update_leaves_the_counter(db_session, regular_user, department):
+    case = make_case(db_session, regular_user, department, StatusEnum.Submitted)
+
+    case.title = 'New CRM (phase 1)'
+    db_session.session.commit()
+
+    assert pending_cases(department.organization_id) == 1
+
+
+def test_rolled_back_change_leaves_the_counter(db_session, regular_user, department):
+    case = make_case(db_session, regular_user, department, StatusEnum.Submitted)
+
+    case.status = StatusEnum.Approved
+    db_session.session.flush()
+    db_session.session.rollback()
+
+    assert pending_cases(department.organization_id) == 1
+
+
+def test_unread_counter(db_session, regular_user):
+    org_id = regular_user.organization_id
+    first = make_notification(db_session, regular_user)
+    make_notification(db_session, regular_user)
+    make_notification(db_session, regular_user, read=True)
+    assert badge_counters.get_unread_count(org_id, regular_user.id) == 2
+
+    first.read_flag = True
+    db_session.session.commit()
+    assert badge_counters.get_unread_count(org_id, regular_user.id) == 1
+
+    make_notification(db_session, regular_user)
+    assert badge_counters.get_unread_count(org_id, regular_user.id) == 2
+
+
+def test_reconcile_corrects_bulk_updates(db_session, regular_user, department):
+    org_id = department.organization_id
+    make_case(db_session, regular_user, department, StatusEnum.Submitted)
+    make_case(db_session, regular_user, department, StatusEnum.Submitted)
+
+    # Written outside the ORM, so no counter event fires
+    db_session.session.execute(text("UPDATE business_cases SET status = 'Approved'"))
+    db_session.session.commit()
+    assert pending_cases(org_id) == 2
+
+    assert badge_counters.reconcile() == 1
+    assert pending_cases(org_id) == 0
+    assert badge_counters.reconcile() == 0
+
+
+def test_counter_seeded_by_a_multi_row_flush(db_session, regular_user, department):
+    # Neither counter row exists yet; every row arrives in the same flush
+    for _ in range(5):
+        db_session.session.add(BusinessCase(
+            title='New CRM', description='Replace the CRM', cost_estimate=1000, benefit_estimate=5000,
+            status=StatusEnum.Submitted, created_by=regular_user.id, dept_id=department.id,
+            organization_id=department.organization_id
+        ))
+    for _ in range(4):
+        db_session.session.add(Notification(
+            user_id=regular_user.id, organization_id=regular_user.organization_id, message='Case approved',
+            event_type=NotificationEventEnum.BUSINESS_CASE_APPROVED
+        ))
+    db_session.session.commit()
+
+    assert pending_cases(department.organization_id) == 5
+    assert badge_counters.get_unread_count(regular_user.organization_id, regular_user.id) == 4
+
+
+def test_notifications_for_a_user_created_in_the_same_flush(db_session, organization):
+    from models import User
+
+    user = User(email='new@test.com', name='New User', organization_id=organization.id)
+    db_session.session.add(user)
+    for _ in range(4):
+        db_session.session.add(Notification(
+            user=user, organization_id=organization.id, message='Welcome',
+            event_type=NotificationEventEnum.PROJECT_CREATED
+        ))
+    db_session.session.commit()
+
+    assert badge_counters.get_unread_count(organization.id, user.id) == 4
+
+
+def test_registering_twice_does_not_double_count(db_session, regular_user, department):
+    from services.badge_counters import register_badge_counter_signals
+
+    register_badge_counter_signals()
+    make_case(db_session, regular_user, department, StatusEnum.Submitted)
+    make_case(db_session, regular_user, department, StatusEnum.Submitted)
+    make_case(db_session, regular_user, department, StatusEnum.Submitted)
+
+    assert pending_cases(department.organization_id) == 3
@@ -0,0 +1,110 @@
+"""
+Tests for code allocation (services/code_sequences.py)
+"""
+
+import pytest
+
+from models import Problem, CodeSequence
+from services.code_sequences import code_allocator, code_number, format_code
+
+
+def make_problem(db_session, user, code=None):
+    problem = Problem(
+        title='Printer jams',
+        description='The printer jams on every job',
+        code=code,
+        reported_by=user.id,
+        created_by=user.id,
+        organization_id=user.organization_id,
+        department_id=user.department_id
+    )
+    db_session.session.add(problem)
+    db_session.session.commit()
+    return problem
+
+
+def counter(db_session, prefix):
+    db_session.session.expire_all()
+    return db_session.session.get(CodeSequence, prefix).last_value
+
+
+def test_format_and_parse_codes():
+    assert format_code('P', 57) == 'P0057'
+    assert format_code('PRJ', 12345) == 'PRJ12345'
+    assert code_number('P', 'P0057') == 57
+    assert code_number('PRJ', 'PRJ0003') == 3
+    assert code_number('P', 'PRJ0003') is None
+    assert code_number('P', 'P-12') is None
+    assert code_number('P', None) is None
+
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        code_allocator.prefix_for('Epic')
+
+
+def test_problems_get_consecutive_codes(db_session, regular_user):
+    first = make_problem(db_session, regular_user)
+    second = make_problem(db_session, regular_user)
+
+    assert first.code == 'P0001'
+    assert second.code == 'P0002'
+    assert counter(db_session, 'P') == 2
+
+
+def test_counter_is_seeded_from_existing_codes(db_session, regular_user):
+    make_problem(db_session, regular_user, code='P0041')
+    db_session.session.query(CodeSequence).delete()
+    db_session.session.commit()
+
+    assert code_allocator.next_code('Problem') == 'P0042'
+
+
+def test_allocate_reserves_a_block(db_session, regular_user):
+    make_problem(db_session, regular_user)
+
+    codes = code_allocator.allocate('Problem', 3)
+    db_session.session.commit()
+
+    assert codes == ['P0002', 'P0003', 'P0004']
+    assert make_problem(db_session, regular_user).code == 'P0005'
+    assert code_allocator.allocate('Problem', 0) == []
+
+
+def test_explicit_code_raises_the_counter(db_session, regular_user):
+    make_problem(db_session, regular_user)
+    make_problem(db_session, regular_user, code='P0900')
+
+    assert counter(db_session, 'P') == 900
+    assert make_problem(db_session, regular_user).code == 'P0901'
+
+
+def test_lower_explicit_code_keeps_the_counter(db_session, regular_user):
+    make_problem(db_session, regular_user, code='P0050')
+    make_problem(db_session, regular_user, code='P0010')
+
+    assert counter(db_session, 'P') == 50
+
+
+def test_reserve_through_seeds_a_missing_counter(db_session):
+    code_allocator.reserve_through('BusinessCase', 7)
+    db_session.session.commit()
+
+    assert counter(db_session, 'C') == 7
+    assert code_allocator.next_code('BusinessCase') == 'C0008'
+
+
+def test_import_codes_skip_supplied_ones(db_session, regular_user):
+    from admin.import_service import _ImportContext
+
+    make_problem(db_session, regular_user)
+
+    class Context:
+        data_type = 'Problem'
+
+    rows = [{'code': 'P0020'}, {}, {}]
+    _ImportContext.assign_codes(Context, rows)
+    db_session.session.commit()
+
+    assert [row['code'] for row in rows] == ['P0020', 'P0021', 'P0022']
+    assert counter(db_session, 'P') == 22
@@ -0,0 +1,108 @@
+"""
+Tests for the department closure table (services/department_closure.py)
+"""
+
+import pytest
+from sqlalchemy import text
+
+from models import Department, DepartmentClosure
+from services.department_closure import DepartmentHierarchyError, rebuild_department_closure
+
+
+@pytest.fixture
+def tree(db_session, organization):
+    """Company > IT > Development, Company > Finance"""
+    def add(name, parent=None):
+        dept = Department(name=name, organization_id=organization.id, parent=parent)
+        db_session.session.add(dept)
+        db_session.session.flush()
+        return dept
+
+    company = add('Company')
+    it = add('IT', company)
+    development = add('Development', it)
+    finance = add('Finance', company)
+    db_session.session.commit()
+    return company, it, development, finance
+
+
+def closure_rows(db_session):
+    return set(db_session.session.query(
+        DepartmentClosure.ancestor_id, DepartmentClosure.descendant_id, DepartmentClosure.depth
+    ))
+
+
+def test_insert_links_every_ancestor(db_session, tree):
+    company, it, development, finance = tree
+
+    assert development.get_full_path() == 'Company > IT > Development'
+    assert development.get_hierarchy_level() == 2
+    assert company.get_descendant_ids() == [company.id, it.id, finance.id, development.id]
+    assert it.get_descendant_ids(include_self=False) == [development.id]
+
+
+def test_move_reparents_the_whole_subtree(db_session, tree):
+    company, it, development, finance = tree
+
+    it.parent = finance
+    db_session.session.commit()
+
+    assert development.get_full_path() == 'Company > Finance > IT > Development'
+    assert development.get_hierarchy_level() == 3
+    assert finance.get_descendant_ids(include_self=False) == [it.id, development.id]
+    assert [d.name for d in company.get_all_descendants()] == ['Finance', 'IT', 'Development']
+
+
+def test_move_to_root(db_session, tree):
+    company, it, development, finance = tree
+
+    it.parent_id = None
+    db_session.session.commit()
+
+    assert development.get_full_path() == 'IT > Development'
+    assert company.get_descendant_ids() == [company.id, finance.id]
+
+
+def test_move_under_own_descendant_is_rejected(db_session, tree):
+    company, it, development, finance = tree
+    before = closure_rows(db_session)
+
+    it.parent = development
+    with pytest.raises(DepartmentHierarchyError):
+        db_session.session.commit()
+    db_session.session.rollback()
+
+    assert closure_rows(db_session) == before
+
+
+def test_move_under_itself_is_rejected(db_session, tree):
+    company, it, development, finance = tree
+
+    it.parent_id = it.id
+    with pytest.raises(DepartmentHierarchyError):
+        db_session.session.flush()
+    db_session.session.rollback()
+
+
+def test_delete_removes_its_rows(db_session, tree):
+    company, it, development, finance = tree
+    finance_id = finance.id
+
+    db_session.session.delete(finance)
+    db_session.session.commit()
+
+    assert not any(finance_id in (ancestor, descendant) for ancestor, descendant, _ in closure_rows(db_session))
+
+
+def test_rebuild_matches_maintained_rows(db_session, tree):
+    company, it, development, finance = tree
+    it.parent = finance
+    db_session.session.commit()
+    maintained = closure_rows(db_session)
+
+    assert rebuild_department_closure() == 0  # already complete
+    db_session.session.execute(text("DELETE FROM department_closure"))
+    db_session.session.commit()
+
+    assert rebuild_department_closure() == len(maintained)
+    assert closure_rows(db_session) == maintained
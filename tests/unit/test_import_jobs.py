@@ -0,0 +1,50 @@
+"""
+Tests for import job recovery (admin/import_service.py)
+"""
+
+from datetime import datetime, timedelta
+
+from models import ImportJob
+from admin.import_service import ImportService
+
+
+def make_job(db_session, user, status='Importing', heartbeat_age=None, created_age=0):
+    now = datetime.utcnow()
+    job = ImportJob(
+        user_id=user.id,
+        data_type='Problem',
+        filename='problems.csv',
+        status=status,
+        rows_success=40,
+        created_at=now - timedelta(seconds=created_age),
+        heartbeat_at=now - timedelta(seconds=heartbeat_age) if heartbeat_age is not None else None
+    )
+    db_session.session.add(job)
+    db_session.session.commit()
+    return job
+
+
+def test_stale_import_is_marked_failed(db_session, regular_user):
+    stale = make_job(db_session, regular_user, heartbeat_age=1000, created_age=2000)
+
+    assert ImportService.fail_stale_imports(stale_seconds=900) == 1
+
+    db_session.session.refresh(stale)
+    assert stale.status == 'Failed'
+    assert 'after 40 rows' in stale.error_details[-1]['error']
+
+
+def test_running_imports_are_left_alone(db_session, regular_user):
+    running = make_job(db_session, regular_user, heartbeat_age=10, created_age=2000)
+    just_started = make_job(db_session, regular_user, created_age=10)
+    finished = make_job(db_session, regular_user, status='Complete', heartbeat_age=5000, created_age=5000)
+
+    assert ImportService.fail_stale_imports(stale_seconds=900) == 0
+
+    assert [job.status for job in (running, just_started, finished)] == ['Importing', 'Importing', 'Complete']
+
+
+def test_job_without_heartbeat_falls_back_to_created_at(db_session, regular_user):
+    make_job(db_session, regular_user, created_age=1000)
+
+    assert ImportService.fail_stale_imports(stale_seconds=900) == 1
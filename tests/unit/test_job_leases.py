@@ -0,0 +1,55 @@
+"""
+Tests for cross-process job leases (services/job_leases.py)
+"""
+
+from datetime import datetime, timedelta
+
+from models import JobLease
+from services.job_leases import job_leases
+
+
+def test_lease_is_exclusive_until_released(db_session):
+    token = job_leases.acquire('nightly_report', 60)
+
+    assert token is not None
+    assert job_leases.acquire('nightly_report', 60) is None
+    assert job_leases.acquire('ml_training', 60) is not None
+
+    assert job_leases.release('nightly_report', token)
+    assert job_leases.acquire('nightly_report', 60) is not None
+
+
+def test_release_needs_the_holder_token(db_session):
+    token = job_leases.acquire('nightly_report', 60)
+
+    assert not job_leases.release('nightly_report', 'someone-else')
+    assert job_leases.acquire('nightly_report', 60) is None
+    assert job_leases.release('nightly_report', token)
+
+
+def test_expired_lease_can_be_taken_over(db_session):
+    crashed = job_leases.acquire('nightly_report', 60)
+    lease = db_session.session.get(JobLease, 'nightly_report')
+    lease.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db_session.session.commit()
+
+    token = job_leases.acquire('nightly_report', 60)
+
+    assert token is not None
+    # The crashed holder's late release does not free the new holder's lease
+    assert not job_leases.release('nightly_report', crashed)
+    assert job_leases.acquire('nightly_report', 60) is None
+
+
+def test_training_is_skipped_while_another_process_trains(db_session, monkeypatch):
+    from analytics import scheduler
+
+    monkeypatch.setattr(scheduler, 'TRAIN_IN_SUBPROCESS', True)
+    monkeypatch.setattr(scheduler, 'train_in_subprocess', lambda: True)
+    token = job_leases.acquire(scheduler.TRAINING_LEASE, 60)
+
+    assert scheduler.ml_scheduler.manual_retrain() == {"success": False, "error": "Training is already running"}
+
+    job_leases.release(scheduler.TRAINING_LEASE, token)
+    assert scheduler.ml_scheduler.manual_retrain()['success']
+    assert job_leases.acquire(scheduler.TRAINING_LEASE, 60) is not None
@@ -0,0 +1,72 @@
+"""
+Tests for the LLM response cache (ai/llm_gateway.py)
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from ai.llm_gateway import LLMGateway, SQLiteResponseCache
+
+MESSAGES = [{'role': 'user', 'content': 'Summarize the open problems'}]
+
+
+class StubClient:
+    """OpenAI-compatible client that counts create() calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **params):
+        self.calls += 1
+        message = SimpleNamespace(content=f"answer {self.calls}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def client():
+    return StubClient()
+
+
+@pytest.fixture
+def gateway(client, tmp_path):
+    return LLMGateway(client=client, cache=SQLiteResponseCache(path=str(tmp_path / 'llm_cache.sqlite3')))
+
+
+def test_identical_prompt_is_served_from_the_cache(gateway, client):
+    first = gateway.complete(MESSAGES, organization_id=1, max_tokens=100)
+    second = gateway.complete(MESSAGES, organization_id=1, max_tokens=100)
+
+    assert first == second == 'answer 1'
+    assert client.calls == 1
+
+
+def test_cached_responses_are_not_shared_across_organizations(gateway, client):
+    assert gateway.complete(MESSAGES, organization_id=1) == 'answer 1'
+    assert gateway.complete(MESSAGES, organization_id=2) == 'answer 2'
+    assert gateway.complete(MESSAGES, organization_id=1) == 'answer 1'
+
+    assert client.calls == 2
+
+
+def test_cached_responses_are_not_shared_across_deployments(gateway, client, monkeypatch):
+    monkeypatch.setenv('DEPLOYMENT_NAME', 'staging')
+    gateway.complete(MESSAGES, organization_id=1)
+    monkeypatch.setenv('DEPLOYMENT_NAME', 'production')
+    gateway.complete(MESSAGES, organization_id=1)
+
+    assert client.calls == 2
+
+
+def test_sqlite_cache_file_is_created_on_first_use(client, tmp_path, monkeypatch):
+    path = tmp_path / 'instance' / 'llm_cache.sqlite3'
+    monkeypatch.setenv('LLM_CACHE_PATH', str(path))
+    gateway = LLMGateway(client=client, cache=SQLiteResponseCache())
+
+    assert not path.exists()
+    gateway.complete(MESSAGES, organization_id=1)
+
+    assert path.exists()
+    assert oct(os.stat(path).st_mode & 0o777) == '0o600'
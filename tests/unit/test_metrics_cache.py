@@ -0,0 +1,56 @@
+"""
+Tests for the shared metrics cache backends (metrics/cache.py)
+"""
+
+import os
+import stat
+import time
+
+from metrics.cache import SQLiteCacheBackend
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'metrics_cache.sqlite3')
+    first = SQLiteCacheBackend(path=path)
+    second = SQLiteCacheBackend(path=path)
+
+    first.set('metrics:org:1', {'total_problems': 3}, time.time())
+
+    assert second.get('metrics:org:1').value == {'total_problems': 3}
+    token = first.acquire_lock('metrics:org:1', 30)
+    assert token is not None
+    assert second.acquire_lock('metrics:org:1', 30) is None
+    first.release_lock('metrics:org:1', token)
+    assert second.acquire_lock('metrics:org:1', 30) is not None
+
+
+def test_sqlite_backend_is_bounded(tmp_path):
+    backend = SQLiteCacheBackend(path=str(tmp_path / 'metrics_cache.sqlite3'), maxsize=3)
+    now = time.time()
+    for org_id in range(5):
+        backend.set(f"metrics:org:{org_id}", {'org': org_id}, now + org_id)
+
+    assert backend.size() == 3
+    assert backend.get('metrics:org:0') is None
+    assert backend.get('metrics:org:4').value == {'org': 4}
+
+
+def test_sqlite_backend_defaults_to_a_private_instance_file(tmp_path, monkeypatch):
+    monkeypatch.setenv('DECIFRAME_INSTANCE_PATH', str(tmp_path / 'instance'))
+
+    backend = SQLiteCacheBackend()
+
+    assert backend.path == str(tmp_path / 'instance' / 'metrics_cache.sqlite3')
+    assert stat.S_IMODE(os.stat(backend.path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(tmp_path / 'instance').st_mode) == 0o700
+
+
+def test_keys_are_namespaced_per_deployment(app, monkeypatch):
+    from metrics.service import _key
+
+    monkeypatch.setenv('DEPLOYMENT_NAME', 'staging')
+    staging = _key(1)
+    monkeypatch.setenv('DEPLOYMENT_NAME', 'production')
+
+    assert staging == 'metrics:staging:org:1'
+    assert _key(1) == 'metrics:production:org:1'
@@ -0,0 +1,43 @@
+"""
+Tests for the notification batch jobs (notifications/events.py)
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from models import Notification, NotificationEventEnum, Project, ProjectMilestone
+from notifications import events
+from notifications.events import NotificationEvents
+
+
+@pytest.fixture
+def overdue_milestone(db_session, regular_user, department):
+    project = Project(name='CRM rollout', project_manager_id=regular_user.id, department_id=department.id,
+                      organization_id=department.organization_id, created_by=regular_user.id)
+    db_session.session.add(project)
+    db_session.session.flush()
+    milestone = ProjectMilestone(organization_id=department.organization_id, project_id=project.id,
+                                 name='Data migration', due_date=date.today() - timedelta(days=3),
+                                 owner_id=regular_user.id)
+    db_session.session.add(milestone)
+    db_session.session.commit()
+    return milestone
+
+
+def test_overdue_check_commits_the_notifications_it_adds(app, db_session, overdue_milestone, monkeypatch):
+    def send_in_callers_transaction(event_type, user_id, context_data=None):
+        # Like dispatch(): add the row, leave the commit to the caller
+        db_session.session.add(Notification(user_id=user_id, organization_id=overdue_milestone.organization_id,
+                                            message=context_data['milestone_name'], event_type=event_type))
+        return True
+
+    monkeypatch.setattr(events, 'send_notification', send_in_callers_transaction)
+
+    with app.test_request_context():
+        assert NotificationEvents.check_overdue_milestones() == 1
+    db_session.session.rollback()  # the batch job's session ends
+
+    notification = Notification.query.one()
+    assert notification.event_type == NotificationEventEnum.MILESTONE_OVERDUE
+    assert notification.message == 'Data migration'
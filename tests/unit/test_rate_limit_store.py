@@ -0,0 +1,100 @@
+"""
+Tests for GCRA rate limiting (utils/rate_limit_store.py)
+"""
+
+import os
+import stat
+import pytest
+
+from utils.rate_limit_store import (
+    gcra, parse_rate_limit, InProcessRateLimitStore, SQLiteRateLimitStore
+)
+
+NOW = 1_000_000.0
+
+
+@pytest.mark.parametrize('rate_limit, expected', [
+    ('10/min', (10, 60)),
+    ('100/hour', (100, 3600)),
+    ('5/day', (5, 86400)),
+    ('20/30', (20, 30)),
+])
+def test_parse_rate_limit(rate_limit, expected):
+    assert parse_rate_limit(rate_limit) == expected
+
+
+@pytest.mark.parametrize('rate_limit', ['0/min', '10/0', '10', 'ten/min'])
+def test_parse_rate_limit_rejects_malformed(rate_limit):
+    with pytest.raises((ValueError, KeyError)):
+        parse_rate_limit(rate_limit)
+
+
+def test_gcra_admits_a_burst_then_denies():
+    tat = None
+    for _ in range(3):
+        allowed, tat, retry_after = gcra(tat, NOW, 20, 60)
+        assert allowed and retry_after == 0.0
+
+    allowed, new_tat, retry_after = gcra(tat, NOW, 20, 60)
+    assert not allowed
+    assert new_tat == tat  # a denied request does not consume capacity
+    assert retry_after == pytest.approx(20)
+
+
+def test_gcra_recovers_one_request_per_interval():
+    tat = NOW + 60  # burst of 3/min fully used
+    assert not gcra(tat, NOW + 19, 20, 60)[0]
+    assert gcra(tat, NOW + 20, 20, 60)[0]
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return InProcessRateLimitStore(max_keys=100)
+    return SQLiteRateLimitStore(path=str(tmp_path / 'rate_limits.sqlite3'), evict_every=2)
+
+
+def test_store_limits_per_key(store):
+    results = [store.hit('ip:1', 3, 60, now=NOW) for _ in range(4)]
+
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert results[-1][1] == pytest.approx(20)
+    assert store.hit('ip:2', 3, 60, now=NOW)[0]
+
+
+def test_store_allows_again_after_the_interval(store):
+    for _ in range(3):
+        store.hit('ip:1', 3, 60, now=NOW)
+
+    assert not store.hit('ip:1', 3, 60, now=NOW + 10)[0]
+    assert store.hit('ip:1', 3, 60, now=NOW + 20)[0]
+
+
+def test_store_evicts_recovered_keys(store):
+    store.hit('ip:1', 3, 60, now=NOW)
+    store.hit('ip:2', 3, 60, now=NOW)
+
+    # Both keys have recovered a minute later; eviction drops them without changing any decision
+    store.hit('ip:3', 3, 60, now=NOW + 61)
+    store.hit('ip:3', 3, 60, now=NOW + 61)
+
+    assert store.size() == 1
+
+
+def test_memory_store_is_capped():
+    store = InProcessRateLimitStore(max_keys=2)
+    for n in range(5):
+        store.hit(f"ip:{n}", 3, 60, now=NOW)
+
+    assert store.size() == 2
+
+
+def test_sqlite_store_is_shared_and_private(tmp_path, monkeypatch):
+    path = str(tmp_path / 'state' / 'rate_limits.sqlite3')
+    monkeypatch.setenv('RATE_LIMIT_PATH', path)
+    first = SQLiteRateLimitStore()
+    second = SQLiteRateLimitStore(path=path)
+
+    assert first.hit('ip:1', 1, 60, now=NOW)[0]
+    assert not second.hit('ip:1', 1, 60, now=NOW)[0]
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
@@ -0,0 +1,76 @@
+"""
+Tests for stored review insights (services/review_insights.py)
+"""
+
+import pytest
+from models import BusinessCase, ReviewInsight, StatusEnum
+from services import review_insights as insights_module
+from services.review_insights import review_insights, register_review_insight_signals
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Stub the LLM call and count it"""
+    calls = []
+
+    def fake_insights(**inputs):
+        calls.append(inputs['title'])
+        return {'success': True, 'confidence_score': 80, 'risks': ['Scope'], 'recommendation': 'Approve',
+                'raw_output': '{}'}
+
+    monkeypatch.setattr('utils.ai_review_insights.get_ai_review_insights', fake_insights)
+    return calls
+
+
+@pytest.fixture
+def submitted_case(db_session, regular_user, department):
+    case = BusinessCase(
+        title='New CRM', description='Replace the CRM', cost_estimate=1000, benefit_estimate=5000,
+        status=StatusEnum.Submitted, created_by=regular_user.id, dept_id=department.id,
+        organization_id=department.organization_id
+    )
+    db_session.session.add(case)
+    db_session.session.commit()
+    return case
+
+
+def test_signals_are_registered_once(db_session, regular_user, department, monkeypatch):
+    queued = []
+    monkeypatch.setattr(insights_module, '_queue', queued.append)
+    register_review_insight_signals()
+    register_review_insight_signals()
+
+    case = BusinessCase(
+        title='New CRM', description='Replace the CRM', cost_estimate=1000, benefit_estimate=5000,
+        status=StatusEnum.Submitted, created_by=regular_user.id, dept_id=department.id,
+        organization_id=department.organization_id
+    )
+    db_session.session.add(case)
+    db_session.session.commit()
+
+    assert queued == [case]
+
+
+def test_commit_queues_nothing_without_background_services(submitted_case, llm_calls, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(review_insights.executor, 'submit', lambda *args: submitted.append(args))
+
+    submitted_case.title = 'New CRM (phase 1)'
+    from models import db
+    db.session.commit()
+
+    assert submitted == []
+    assert llm_calls == []
+
+
+def test_review_page_computes_on_the_request(submitted_case, llm_calls):
+    result = review_insights.get_for_display('business_case', submitted_case)
+
+    assert result['status'] == 'ready'
+    assert result['confidence_score'] == 80
+    assert llm_calls == ['New CRM']
+
+    # Stored for the content hash: the next view does not call the LLM again
+    assert review_insights.get_for_display('business_case', submitted_case)['status'] == 'ready'
+    assert llm_calls == ['New CRM']
+    assert ReviewInsight.query.count() == 1
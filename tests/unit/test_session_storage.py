@@ -0,0 +1,160 @@
+"""
+Tests for server-side sessions (session_storage.py)
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from flask import Flask, session
+from itsdangerous import Signer
+
+from session_storage import ServerSideSessionInterface, SQLiteSessionStore, SessionSweeper
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteSessionStore(path=str(tmp_path / 'sessions.sqlite3'))
+
+
+@pytest.fixture
+def site(store):
+    """A bare Flask app on the session store, with one interface per simulated worker"""
+    site = Flask('sessions')
+    site.secret_key = 'test-secret-key'
+    site.workers = [ServerSideSessionInterface(store), ServerSideSessionInterface(store)]
+    site.session_interface = site.workers[0]
+
+    @site.route('/read')
+    def read():
+        return str(session.get('_user_id'))
+
+    @site.route('/cart')
+    def cart():
+        session['cart'] = session.get('cart', 0) + 1
+        return str(session['cart'])
+
+    @site.route('/login')
+    def login():
+        session['_user_id'] = '7'
+        return 'ok'
+
+    @site.route('/logout')
+    def logout():
+        session.pop('_user_id', None)
+        return 'ok'
+
+    return site
+
+
+def session_id(site, client):
+    cookie = client.get_cookie('session').value
+    return Signer(site.secret_key, salt='deciframe-server-session',
+                  key_derivation='hmac').unsign(cookie).decode('utf-8').split('.')[0]
+
+
+def test_unchanged_session_is_not_written(site):
+    worker = site.workers[0]
+    client = site.test_client()
+    client.get('/cart')
+    assert worker.stats['writes'] == 1
+
+    for _ in range(3):
+        assert client.get('/read').status_code == 200
+
+    assert worker.stats['writes'] == 1
+    assert worker.stats['touches'] == 0
+    assert worker.stats['cache_hits'] == 3
+
+
+def test_changed_session_is_written(site, store):
+    client = site.test_client()
+    client.get('/cart')
+    client.get('/cart')
+
+    assert site.workers[0].stats['writes'] == 2
+    payload, expires = store.load(session_id(site, client))
+    assert '"cart":2' in payload
+
+
+def test_expiry_is_extended_once_per_touch_interval(site):
+    worker = site.workers[0]
+    worker.touch_seconds = 0
+    client = site.test_client()
+    client.get('/cart')
+
+    client.get('/read')
+
+    assert worker.stats['writes'] == 1
+    assert worker.stats['touches'] == 1
+
+
+def test_login_rotates_the_session_id(site, store):
+    client = site.test_client()
+    client.get('/cart')
+    anonymous_id = session_id(site, client)
+    anonymous_cookie = client.get_cookie('session').value
+
+    client.get('/login')
+
+    assert session_id(site, client) != anonymous_id
+    assert store.load(anonymous_id) is None
+    assert site.workers[0].stats['rotations'] == 1
+    # A pre-login id planted in another browser is not authenticated
+    other = site.test_client()
+    other.set_cookie('session', anonymous_cookie)
+    assert other.get('/read').data == b'None'
+
+
+def test_logged_out_session_is_not_revived(site, store):
+    client = site.test_client()
+    client.get('/login')
+    cookie = client.get_cookie('session').value
+    old_id = session_id(site, client)
+
+    # A second worker caches the authenticated session
+    site.session_interface = site.workers[1]
+    stale = site.test_client()
+    stale.set_cookie('session', cookie)
+    assert stale.get('/read').data == b'7'
+
+    # Logged out on the first worker
+    site.session_interface = site.workers[0]
+    client.get('/logout')
+    assert store.load(old_id) is None
+
+    # The second worker still has it cached, but a write does not recreate the row
+    site.session_interface = site.workers[1]
+    stale.get('/cart')
+    assert store.load(old_id) is None
+    assert site.workers[1].stats['ended'] == 1
+    assert stale.get_cookie('session') is None
+
+
+def test_sweep_deletes_only_expired_sessions(store):
+    now = datetime.utcnow()
+    for n in range(5):
+        store.save(f"expired-{n}", '{}', now - timedelta(minutes=1))
+    store.save('live', '{}', now + timedelta(hours=1))
+
+    assert store.sweep(now, batch_size=2) == 5
+    assert store.load('live') is not None
+    assert store.load('expired-0') is None
+
+
+def test_sweeper_counts_its_runs(store):
+    store.save('expired', '{}', datetime.utcnow() - timedelta(minutes=1))
+    sweeper = SessionSweeper(interval=3600)
+    sweeper.store = store
+
+    assert sweeper.sweep() == 1
+    assert sweeper.stats['runs'] == 1
+    assert sweeper.stats['swept'] == 1
+
+
+def test_expired_session_starts_over(site, store):
+    client = site.test_client()
+    client.get('/login')
+    old_id = session_id(site, client)
+    store.update(old_id, store.load(old_id)[0], datetime.utcnow() - timedelta(seconds=1))
+    site.session_interface = site.workers[1]  # no cached copy
+
+    assert client.get('/read').data == b'None'
@@ -0,0 +1,57 @@
+"""
+Tests for bulk triage rule execution (services/triage_engine.py)
+"""
+
+from sqlalchemy.exc import OperationalError
+
+from models import BusinessCase, StatusEnum, TriageRule
+from services.badge_counters import badge_counters
+from services.triage_engine import TriageEngine
+
+
+def make_rule(db_session, organization, user, **overrides):
+    values = dict(organization_id=organization.id, name='Approve small cases', target='BusinessCase',
+                  field='cost_estimate', operator='<', value='5000', action='auto_approve',
+                  created_by=user.id)
+    values.update(overrides)
+    rule = TriageRule(**values)
+    db_session.session.add(rule)
+    db_session.session.commit()
+    return rule
+
+
+def make_case(db_session, user, department, cost):
+    case = BusinessCase(
+        title='New CRM', description='Replace the CRM', cost_estimate=cost, benefit_estimate=5000,
+        status=StatusEnum.Submitted, created_by=user.id, dept_id=department.id,
+        organization_id=department.organization_id
+    )
+    db_session.session.add(case)
+    db_session.session.commit()
+    return case
+
+
+def test_bulk_rule_approves_matching_rows(db_session, organization, regular_user, department):
+    make_rule(db_session, organization, regular_user)
+    small = make_case(db_session, regular_user, department, 1000)
+    large = make_case(db_session, regular_user, department, 90000)
+
+    assert TriageEngine.apply_all_rules(bulk=True) == 1
+
+    db_session.session.expire_all()
+    assert small.status == StatusEnum.Approved
+    assert large.status == StatusEnum.Submitted
+    assert badge_counters.get_pending_counts(department.organization_id)['pending_cases'] == 1
+
+
+def test_watermark_error_is_contained_to_its_rule(db_session, organization, regular_user, department, monkeypatch):
+    rule = make_rule(db_session, organization, regular_user)
+    make_case(db_session, regular_user, department, 1000)
+
+    def unavailable(cls, rule):
+        raise OperationalError('SELECT', {}, Exception('connection lost'))
+
+    monkeypatch.setattr(TriageEngine, '_get_watermark', classmethod(unavailable))
+
+    assert TriageEngine._apply_rule_bulk(rule, rule.created_at) == 0
+    db_session.session.commit()
@@ -3,17 +3,13 @@ AI Review Insights for DeciFrame
 Provides approval confidence scoring and risk assessment for business cases, epics, and projects
 """
 
-import os
-import openai
 import re
 from typing import Dict, Optional, List
-
-# Initialize OpenAI client
-openai_client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+from ai.llm_gateway import llm_gateway
 
 def get_ai_review_insights(content_type: str, title: str, description: str, 
                           cost: Optional[float] = None, benefit: Optional[float] = None,
-                          additional_context: str = "") -> Dict[str, any]:
+                          additional_context: str = "", organization_id: Optional[int] = None) -> Dict[str, any]:
     """
     Get AI-powered review insights including confidence score and risk assessment
     
@@ -24,6 +20,7 @@ def get_ai_review_insights(content_type: str, title: str, description: str,
         cost: Estimated cost (optional)
         benefit: Expected benefit (optional)
         additional_context: Additional context for analysis
+        organization_id: Organization of the item (scopes the LLM response cache)
     
     Returns:
         Dict containing confidence_score, risks, and raw_output
@@ -60,7 +57,8 @@ Focus on business viability, implementation feasibility, resource requirements,
     try:
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
-        response = openai_client.chat.completions.create(
+        # Identical inputs are served from the LLM gateway cache instead of a new completion
+        raw_output = llm_gateway.complete(
             model="gpt-4o",
             messages=[
                 {
@@ -73,11 +71,10 @@ Focus on business viability, implementation feasibility, resource requirements,
                 }
             ],
             max_tokens=800,
-            temperature=0.3
+            temperature=0.3,
+            organization_id=organization_id
         )
         
-        raw_output = response.choices[0].message.content
-        
         # Parse the structured response
         confidence_score = _extract_confidence_score(raw_output)
         risks = _extract_risks(raw_output)
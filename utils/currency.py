@@ -13,10 +13,9 @@ def format_currency(amount):
     
     # Get organization settings from database
     try:
-        from models import OrganizationSettings
-        org_settings = OrganizationSettings.get_organization_settings()
+        from utils.preferences import get_org_settings
+        org_settings = get_org_settings()
         currency_code = org_settings.currency if org_settings else 'USD'
-        print(f"🔧 utils/currency.py Debug: Retrieved currency_code={currency_code} from org_settings")
     except Exception as e:
         print(f"🔧 utils/currency.py Debug: Error getting org settings: {e}")
         currency_code = 'USD'
@@ -40,7 +39,6 @@ def format_currency(amount):
     # Format amount with proper number formatting
     try:
         result = f"{symbol}{amount:,.2f}"
-        print(f"🔧 utils/currency.py Debug: amount={amount}, currency_code={currency_code}, symbol={symbol}, result={result}")
         return result
     except (ValueError, TypeError):
         result = f"{symbol}0.00"
@@ -14,10 +14,9 @@ def format_date(dt):
     
     # Get organization settings from database
     try:
-        from models import OrganizationSettings
-        org_settings = OrganizationSettings.get_organization_settings()
+        from utils.preferences import get_org_settings
+        org_settings = get_org_settings()
         date_format = org_settings.date_format if org_settings else 'ISO'
-        print(f"🔧 utils/date.py format_date Debug: Retrieved date_format={date_format}")
     except Exception as e:
         print(f"🔧 utils/date.py format_date Debug: Error getting org settings: {e}")
         date_format = 'ISO'
@@ -35,7 +34,6 @@ def format_date(dt):
     # Format date with proper error handling
     try:
         result = dt.strftime(fmt)
-        print(f"🔧 utils/date.py format_date Debug: dt={dt}, date_format={date_format}, fmt={fmt}, result={result}")
         return result
     except (ValueError, AttributeError):
         result = dt.strftime("%d/%m/%Y") if dt else "N/A"
@@ -57,11 +55,10 @@ def format_datetime(dt):
     
     # Get organization settings from database
     try:
-        from models import OrganizationSettings
-        org_settings = OrganizationSettings.get_organization_settings()
+        from utils.preferences import get_org_settings
+        org_settings = get_org_settings()
         date_format = org_settings.date_format if org_settings else 'ISO'
         timezone_name = org_settings.timezone if org_settings else 'UTC'
-        print(f"🔧 utils/date.py format_datetime Debug: Retrieved date_format={date_format}, timezone={timezone_name}")
     except Exception as e:
         print(f"🔧 utils/date.py format_datetime Debug: Error getting org settings: {e}")
         date_format = 'ISO'
@@ -96,7 +93,6 @@ def format_datetime(dt):
     # Format datetime with proper error handling
     try:
         result = dt.strftime(datetime_fmt)
-        print(f"🔧 utils/date.py format_datetime Debug: dt={dt}, date_format={date_format}, result={result}")
         return result
     except (ValueError, AttributeError):
         result = dt.strftime("%d/%m/%Y %H:%M:%S") if dt else "N/A"
@@ -0,0 +1,57 @@
+"""
+Local state files for DeciFrame
+SQLite caches and stores shared by the workers on a host live in the Flask instance folder
+(app.instance_path, or DECIFRAME_INSTANCE_PATH), not in the system temp directory, because
+they hold organization data: the folder is created 0700 and each file 0600. Every file can
+also be placed explicitly through its own environment variable.
+
+Files whose contents depend on the database are also keyed by deployment_namespace(), so two
+deployments (or a test database) that share a file never read each other's entries.
+"""
+
+import os
+import hashlib
+from flask import current_app, has_app_context
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def instance_path():
+    """The instance folder: DECIFRAME_INSTANCE_PATH, the current app's, or <project>/instance"""
+    configured = os.getenv('DECIFRAME_INSTANCE_PATH')
+    if configured:
+        return configured
+    if has_app_context():
+        return current_app.instance_path
+    # Flask's default for the app module at the project root
+    return os.path.join(PROJECT_ROOT, 'instance')
+
+
+def instance_file(filename, env_var=None):
+    """
+    Path for a local state file, created empty and readable by this user only (0600)
+
+    Args:
+        filename: file name inside the instance folder
+        env_var: environment variable that overrides the full path
+    """
+    path = (os.getenv(env_var) if env_var else None) or os.path.join(instance_path(), filename)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+    # Create it before SQLite does: SQLite's -wal/-shm files copy the database file's permissions
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    os.close(fd)
+    os.chmod(path, 0o600)
+    return path
+
+
+def deployment_namespace():
+    """Short stable id of this deployment: DEPLOYMENT_NAME, else a hash of the database URL"""
+    name = os.getenv('DEPLOYMENT_NAME')
+    if name:
+        return name
+    if has_app_context():
+        url = current_app.config.get('SQLALCHEMY_DATABASE_URI')
+    else:
+        from config import Config
+        url = Config.SQLALCHEMY_DATABASE_URI
+    return hashlib.sha256(str(url).encode('utf-8')).hexdigest()[:12]
@@ -1,12 +1,167 @@
 """
 Organization and User Preference Utilities
 Provides centralized access to organization-level settings and user preferences
+
+Organization settings are read on every page (context processors, date/currency filters), so
+they are cached at two levels: a memo on flask.g for the current request and a per-organization
+TTL cache shared by requests in this process. Commits that change OrganizationSettings (or add
+or remove users) invalidate the organization's entry; other workers pick changes up within
+PREFERENCES_CACHE_TTL seconds.
 """
 
-from flask import current_app
+import os
+import time
+import threading
+from flask import current_app, g, has_request_context
 from flask_login import current_user
 from models import OrganizationSettings
 
+PREFERENCES_CACHE_TTL = float(os.getenv('PREFERENCES_CACHE_TTL', '60'))
+
+_org_cache = {}  # organization_id -> (expires_at, {key: value})
+_org_cache_lock = threading.Lock()
+_PENDING_KEY = 'pending_preference_invalidations'
+
+CURRENCY_SYMBOLS = {
+    'USD': '$',
+    'EUR': '€',
+    'GBP': '£',
+    'CAD': 'C$',
+    'AUD': 'A$',
+    'JPY': '¥',
+    'CNY': '¥',
+    'INR': '₹'
+}
+
+
+class OrgSettingsSnapshot:
+    """Read-only copy of an organization's settings, safe to share between requests"""
+
+    __slots__ = ('organization_id', 'timezone', 'currency', 'date_format', 'time_format', 'default_theme')
+
+    def __init__(self, organization_id, timezone='UTC', currency='USD', date_format='ISO',
+                 time_format='%H:%M:%S', default_theme='light'):
+        self.organization_id = organization_id
+        self.timezone = timezone or 'UTC'
+        self.currency = currency or 'USD'
+        self.date_format = date_format or 'ISO'
+        self.time_format = time_format or '%H:%M:%S'
+        self.default_theme = default_theme or 'light'
+
+    def get_currency_symbol(self):
+        return CURRENCY_SYMBOLS.get(self.currency, '$')
+
+
+def _current_organization_id():
+    if has_request_context() and current_user and getattr(current_user, 'is_authenticated', False):
+        if current_user.organization_id:
+            return current_user.organization_id
+    return 1  # Fallback for backwards compatibility (matches OrganizationSettings)
+
+
+def _cached_org_value(organization_id, key, loader):
+    """Two-level lookup: request memo on flask.g, then the per-org TTL cache, then loader()"""
+    memo = None
+    if has_request_context():
+        memo = g.setdefault('_org_preference_memo', {})
+        if (organization_id, key) in memo:
+            return memo[(organization_id, key)]
+
+    now = time.monotonic()
+    with _org_cache_lock:
+        entry = _org_cache.get(organization_id)
+        if entry and entry[0] > now and key in entry[1]:
+            value = entry[1][key]
+        else:
+            value = None
+            entry = None
+
+    if entry is None:
+        value = loader()
+        with _org_cache_lock:
+            current = _org_cache.get(organization_id)
+            values = dict(current[1]) if current and current[0] > now else {}
+            values[key] = value
+            expires_at = current[0] if current and current[0] > now else now + PREFERENCES_CACHE_TTL
+            _org_cache[organization_id] = (expires_at, values)
+
+    if memo is not None:
+        memo[(organization_id, key)] = value
+    return value
+
+
+def get_org_settings(organization_id=None):
+    """
+    Cached organization settings for the current (or given) organization
+
+    Returns an OrgSettingsSnapshot; creates default settings on first use like
+    OrganizationSettings.get_organization_settings.
+    """
+    organization_id = organization_id or _current_organization_id()
+
+    def load():
+        settings = OrganizationSettings.get_organization_settings(organization_id)
+        return OrgSettingsSnapshot(
+            organization_id,
+            timezone=settings.timezone,
+            currency=settings.currency,
+            date_format=settings.date_format,
+            time_format=settings.time_format,
+            default_theme=settings.default_theme
+        )
+
+    return _cached_org_value(organization_id, 'settings', load)
+
+
+def get_org_user_count(organization_id=None):
+    """Cached number of users in an organization"""
+    organization_id = organization_id or _current_organization_id()
+
+    def load():
+        from models import User
+        return User.query.filter_by(organization_id=organization_id).count()
+
+    return _cached_org_value(organization_id, 'user_count', load)
+
+
+def invalidate_org_preferences(organization_id=None):
+    """Drop cached preferences for one organization (or all) in this process and request"""
+    with _org_cache_lock:
+        if organization_id is None:
+            _org_cache.clear()
+        else:
+            _org_cache.pop(organization_id, None)
+    if has_request_context():
+        memo = g.get('_org_preference_memo')
+        if memo:
+            for key in [k for k in memo if organization_id is None or k[0] == organization_id]:
+                del memo[key]
+
+
+def register_preference_signals():
+    """Invalidate cached preferences after commits that change settings or organization membership"""
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session, object_session
+    from models import User
+
+    def _record(mapper, connection, target):
+        organization_id = getattr(target, 'organization_id', None)
+        session = object_session(target)
+        if session is None:
+            invalidate_org_preferences(organization_id)
+            return
+        session.info.setdefault(_PENDING_KEY, set()).add(organization_id)
+
+    def _after_commit(session):
+        for organization_id in session.info.pop(_PENDING_KEY, ()):
+            invalidate_org_preferences(organization_id)
+
+    for model, events in ((OrganizationSettings, ('after_insert', 'after_update', 'after_delete')),
+                          (User, ('after_insert', 'after_delete'))):
+        for name in events:
+            event.listen(model, name, _record)
+    event.listen(Session, 'after_commit', _after_commit)
+
 
 def get_org_preferences():
     """
@@ -14,19 +169,15 @@ def get_org_preferences():
     Returns a dictionary containing timezone, currency, and date format settings
     """
     try:
-        # Try to get organization settings
-        org_settings = OrganizationSettings.get_organization_settings()
+        org_settings = get_org_settings()
         
-        # Build preferences dictionary with fallbacks
-        preferences = {
-            'currency': getattr(org_settings, 'currency', current_app.config.get('DEFAULT_CURRENCY', 'USD')),
-            'date_format': getattr(org_settings, 'date_format', current_app.config.get('DEFAULT_DATE_FORMAT', '%Y-%m-%d')),
-            'timezone': getattr(org_settings, 'timezone', current_app.config.get('DEFAULT_TIMEZONE', 'UTC')),
-            'time_format': getattr(org_settings, 'time_format', '%H:%M:%S'),
-            'default_theme': getattr(org_settings, 'default_theme', 'light')
+        return {
+            'currency': org_settings.currency,
+            'date_format': org_settings.date_format,
+            'timezone': org_settings.timezone,
+            'time_format': org_settings.time_format,
+            'default_theme': org_settings.default_theme
         }
-        
-        return preferences
     except Exception:
         # Fallback to application defaults if database is unavailable
         return {
@@ -74,18 +225,7 @@ def get_currency_symbol(currency_code=None):
         prefs = get_org_preferences()
         currency_code = prefs['currency']
     
-    currency_symbols = {
-        'USD': '$',
-        'EUR': '€',
-        'GBP': '£',
-        'CAD': 'C$',
-        'AUD': 'A$',
-        'JPY': '¥',
-        'CNY': '¥',
-        'INR': '₹'
-    }
-    
-    return currency_symbols.get(currency_code, currency_code)
+    return CURRENCY_SYMBOLS.get(currency_code, currency_code)
 
 
 def format_currency_value(value, currency_code=None, include_symbol=True):
@@ -0,0 +1,116 @@
+"""
+SQL Query Counter for DeciFrame
+Counts SQL statements per request and attributes them to rendered templates, so pages that
+issue a query per row (N+1 lookups, per-call settings reads in filters) show up in the stats.
+
+Per template, two numbers are kept:
+    render_queries   statements executed while the template itself was rendering
+    request_queries  statements executed by the request up to the end of the render
+                     (view code, context processors and the render)
+
+Responses carry an X-SQL-Queries header; aggregated stats are served at
+/admin/template-query-stats (admins only).
+"""
+
+import os
+import logging
+import threading
+from flask import g, has_request_context, jsonify, before_render_template, template_rendered
+from flask_login import current_user, login_required
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNTER_ENABLED = os.getenv('SQL_QUERY_COUNTER', 'true').lower() == 'true'
+QUERY_WARN_THRESHOLD = int(os.getenv('SQL_QUERY_WARN_THRESHOLD', '50'))
+
+_stats_lock = threading.Lock()
+_template_stats = {}  # template name -> {'renders', 'render_queries', 'request_queries', 'max_request_queries'}
+_registered = False
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g._sql_query_count = g.get('_sql_query_count', 0) + 1
+
+
+def get_request_query_count():
+    """Number of SQL statements executed so far in the current request"""
+    return g.get('_sql_query_count', 0) if has_request_context() else 0
+
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault('_sql_render_stack', []).append(get_request_query_count())
+
+
+def _after_render(sender, template, context, **extra):
+    stack = g.get('_sql_render_stack')
+    if not stack:
+        return
+    started = stack.pop()
+    request_queries = get_request_query_count()
+    render_queries = request_queries - started
+    name = template.name or '<string>'
+
+    with _stats_lock:
+        stats = _template_stats.setdefault(name, {'renders': 0, 'render_queries': 0,
+                                                  'request_queries': 0, 'max_request_queries': 0})
+        stats['renders'] += 1
+        stats['render_queries'] += render_queries
+        stats['request_queries'] += request_queries
+        stats['max_request_queries'] = max(stats['max_request_queries'], request_queries)
+
+    if request_queries > QUERY_WARN_THRESHOLD:
+        logger.warning(f"⚠️ {name}: {request_queries} SQL queries for this request "
+                       f"({render_queries} while rendering)")
+
+
+def get_template_query_stats():
+    """Average and maximum SQL queries per rendered template, most expensive first"""
+    with _stats_lock:
+        rows = [
+            {
+                'template': name,
+                'renders': stats['renders'],
+                'avg_request_queries': round(stats['request_queries'] / stats['renders'], 1),
+                'avg_render_queries': round(stats['render_queries'] / stats['renders'], 1),
+                'max_request_queries': stats['max_request_queries']
+            }
+            for name, stats in _template_stats.items()
+        ]
+    return sorted(rows, key=lambda row: row['avg_request_queries'], reverse=True)
+
+
+def reset_template_query_stats():
+    with _stats_lock:
+        _template_stats.clear()
+
+
+def init_query_counter(app):
+    """Register the statement counter, template signals, response header and stats endpoint"""
+    global _registered
+    if not QUERY_COUNTER_ENABLED:
+        return
+
+    if not _registered:
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+        _registered = True
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.after_request
+    def add_query_count_header(response):
+        response.headers['X-SQL-Queries'] = str(get_request_query_count())
+        return response
+
+    @app.route('/admin/template-query-stats')
+    @login_required
+    def template_query_stats():
+        """SQL queries per rendered template (admins only)"""
+        if current_user.role.value != 'Admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        return jsonify({'templates': get_template_query_stats(), 'warn_threshold': QUERY_WARN_THRESHOLD})
+
+    print("✓ SQL query counter enabled (X-SQL-Queries header, /admin/template-query-stats)")
@@ -0,0 +1,223 @@
+"""
+Rate limit storage for DeciFrame
+GCRA (generic cell rate algorithm) rate limiting with constant memory per client key.
+
+Each key stores a single number, its theoretical arrival time (TAT). A request is allowed when
+pushing the TAT forward by one emission interval (period / count) keeps it within one period of
+now; this admits a burst of `count` requests and then a steady `count` per period, like a
+sliding window, without keeping a timestamp per request. A key whose TAT is in the past is
+indistinguishable from a new key, so idle keys are evicted without changing any decision.
+
+Backends (RATE_LIMIT_BACKEND):
+- 'memory': in-process LRU capped at RATE_LIMIT_MAX_KEYS; per worker
+- 'sqlite': a shared SQLite file in WAL mode in the instance folder (or RATE_LIMIT_PATH);
+  limits hold across all gunicorn workers on a host. The default
+- 'redis':  Redis at RATE_LIMIT_REDIS_URL / REDIS_URL (requires the redis package); limits
+  hold across hosts
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from functools import lru_cache
+from collections import OrderedDict
+from utils.local_state import instance_file
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'sqlite')
+RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', '100000'))
+RATE_LIMIT_EVICT_EVERY = int(os.getenv('RATE_LIMIT_EVICT_EVERY', '1000'))
+
+PERIODS = {'sec': 1, 'min': 60, 'hour': 3600, 'day': 86400}
+
+
+@lru_cache(maxsize=256)
+def parse_rate_limit(rate_limit):
+    """
+    Parse "10/min", "100/hour", "5/day" or "20/30" (per 30 seconds)
+
+    Returns:
+        (count, period_seconds); raises ValueError for malformed limits
+    """
+    count, period = rate_limit.split('/')
+    count = int(count)
+    period_seconds = PERIODS[period] if period in PERIODS else int(period)
+    if count < 1 or period_seconds <= 0:
+        raise ValueError(f"Invalid rate limit: {rate_limit}")
+    return count, period_seconds
+
+
+def gcra(tat, now, interval, period):
+    """
+    One GCRA step
+
+    Returns:
+        (allowed, new_tat, retry_after_seconds); new_tat is unchanged when the request is denied
+    """
+    tat = max(tat or now, now)
+    new_tat = tat + interval
+    if new_tat - now > period:
+        return False, tat, new_tat - period - now
+    return True, new_tat, 0.0
+
+
+class RateLimitStore:
+    """Storage interface for RateLimiter"""
+
+    name = 'base'
+
+    def hit(self, key, count, period, now=None):
+        """
+        Record a request for key against a limit of count per period seconds
+
+        Returns:
+            (allowed, retry_after_seconds)
+        """
+        raise NotImplementedError
+
+    def size(self):
+        raise NotImplementedError
+
+
+class InProcessRateLimitStore(RateLimitStore):
+    """Per-process store: one float per key in an LRU capped at max_keys"""
+
+    name = 'memory'
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tats = OrderedDict()
+        self._mutex = threading.Lock()
+
+    def hit(self, key, count, period, now=None):
+        now = now or time.time()
+        with self._mutex:
+            allowed, tat, retry_after = gcra(self._tats.get(key), now, period / count, period)
+            if allowed:
+                self._tats[key] = tat
+                self._tats.move_to_end(key)
+            self._evict(now)
+        return allowed, retry_after
+
+    def _evict(self, now):
+        # Oldest-used first: drop keys that have fully recovered, and anything beyond max_keys
+        tats = self._tats
+        while tats:
+            key = next(iter(tats))
+            if tats[key] > now and len(tats) <= self.max_keys:
+                break
+            del tats[key]
+
+    def size(self):
+        return len(self._tats)
+
+
+class SQLiteRateLimitStore(RateLimitStore):
+    """Store shared by all workers on a host through a SQLite file in WAL mode"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=None, evict_every=RATE_LIMIT_EVICT_EVERY):
+        self.path = path or instance_file('rate_limits.sqlite3', 'RATE_LIMIT_PATH')
+        self.evict_every = evict_every
+        self._writes = 0
+        self._local = threading.local()
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                tat REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+
+    def _connect(self):
+        # One connection per thread, reopened after fork (connections must not cross processes)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def hit(self, key, count, period, now=None):
+        now = now or time.time()
+        interval = period / count
+        conn = self._connect()
+        # One atomic upsert: the conditional update is skipped (no row returned) when denied
+        allowed = conn.execute("""
+            INSERT INTO rate_limits (key, tat) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET tat = max(tat, ?) + ?
+            WHERE max(tat, ?) + ? - ? <= ?
+            RETURNING tat
+        """, (key, now + interval, now, interval, now, interval, now, period)).fetchall()
+
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            conn.execute("DELETE FROM rate_limits WHERE tat < ?", (now,))
+
+        if allowed:
+            return True, 0.0
+        row = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+        return False, gcra(row[0] if row else None, now, interval, period)[2]
+
+    def size(self):
+        return self._connect().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """Store shared across hosts; each key expires from Redis once it has fully recovered"""
+
+    name = 'redis'
+    PREFIX = 'deciframe:ratelimit:'
+
+    _GCRA_SCRIPT = """
+        local now = tonumber(ARGV[1])
+        local interval = tonumber(ARGV[2])
+        local period = tonumber(ARGV[3])
+        local tat = tonumber(redis.call('get', KEYS[1]) or ARGV[1])
+        if tat < now then tat = now end
+        local new_tat = tat + interval
+        if new_tat - now > period then
+            return {0, tostring(new_tat - period - now)}
+        end
+        redis.call('set', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+        return {1, '0'}
+    """
+
+    def __init__(self, url=RATE_LIMIT_REDIS_URL):
+        self.client = redis.Redis.from_url(url)
+        self.client.ping()
+        self._script = self.client.register_script(self._GCRA_SCRIPT)
+
+    def hit(self, key, count, period, now=None):
+        now = now or time.time()
+        allowed, retry_after = self._script(keys=[self.PREFIX + key], args=[now, period / count, period])
+        return bool(allowed), float(retry_after)
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(self.PREFIX + '*'))
+
+
+def create_rate_limit_store(name=RATE_LIMIT_BACKEND):
+    """Build the configured store, falling back to a per-process store if it is unavailable"""
+    try:
+        if name == 'redis':
+            if not REDIS_AVAILABLE:
+                raise RuntimeError("redis package is not installed")
+            return RedisRateLimitStore()
+        if name == 'sqlite':
+            return SQLiteRateLimitStore()
+    except Exception as e:
+        print(f"⚠️ Rate limit backend '{name}' unavailable ({e}); using in-process store")
+    return InProcessRateLimitStore()
@@ -2,6 +2,7 @@
 Workflow Action Handlers - Implementation of workflow actions
 """
 
+import os
 import logging
 from typing import Dict, Callable
 from datetime import datetime, timedelta
@@ -9,8 +10,17 @@ from workflows.context import WorkflowContext
 
 logger = logging.getLogger(__name__)
 
+NOTIFICATION_CHUNK_SIZE = int(os.getenv('WORKFLOW_NOTIFICATION_CHUNK_SIZE', '1000'))
+
 def send_notification(step: dict, context: WorkflowContext) -> dict:
-    """Send notification to specified target"""
+    """
+    Send notification to specified target
+
+    Set-based fan-out: recipients are read as (id, organization_id) rows in keyset chunks, the
+    message is rendered once, and each chunk is written with one bulk INSERT into notifications
+    (plus one into the notification outbox when the event's setting has email enabled) and
+    committed on its own, so a 100k-user audience never loads User objects or holds one transaction.
+    """
     target = step.get('target', 'unknown')
     template = step.get('template', 'default')
     
@@ -18,55 +28,77 @@ def send_notification(step: dict, context: WorkflowContext) -> dict:
     
     try:
         # Import here to avoid circular imports
-        from notifications.service import NotificationService
-        
-        # Determine recipients based on target
-        recipients = _resolve_recipients(target, context)
-        
-        if not recipients:
+        from models import User, Notification, db
+        from notifications.service import get_setting
+        from notifications.digest import outbox_entries, enqueue_outbox
+        from services.badge_counters import badge_counters, UNREAD_NOTIFICATIONS
+        
+        recipient_query = _recipient_query(target, context)
+        if recipient_query is None:
+            recipients = _resolve_recipients(target, context)
+            if not recipients:
+                logger.warning(f"⚠️ Could not resolve target users for: {target}")
+                return {'status': 'warning', 'message': f'Could not resolve target: {target}'}
+            recipient_query = db.session.query(User.id, User.organization_id).filter(User.id.in_(recipients))
+        
+        # Rendered once for every recipient
+        event_name = _map_template_to_event_type(template)
+        notification_context = _build_notification_context(context)
+        message = _render_notification_message(event_name, notification_context)
+        link = context.get_data('link')
+        event_type = _map_event_name_to_enum(event_name)
+        
+        setting = get_setting(event_name)
+        in_app = setting is None or setting.channel_in_app
+        email_frequency = setting.frequency if setting is not None and setting.channel_email else None
+        
+        recipients_count = notifications_created = emails_queued = 0
+        for chunk in _iter_recipient_chunks(recipient_query):
+            now = datetime.utcnow()
+            if in_app:
+                db.session.execute(Notification.__table__.insert(), [{
+                    'organization_id': organization_id,
+                    'user_id': user_id,
+                    'message': message,
+                    'link': link,
+                    'read_flag': False,
+                    'event_type': event_type,
+                    'email_sent': False,
+                    'created_at': now
+                } for user_id, organization_id in chunk])
+                # Bulk inserts bypass the badge counter mapper events
+                by_organization = {}
+                for user_id, organization_id in chunk:
+                    by_organization.setdefault(organization_id, []).append(user_id)
+                for organization_id, user_ids in by_organization.items():
+                    badge_counters.adjust_users(db.session.connection(), organization_id, user_ids,
+                                                UNREAD_NOTIFICATIONS, 1)
+                notifications_created += len(chunk)
+            if email_frequency is not None:
+                emails_queued += enqueue_outbox(outbox_entries(chunk, event_name, email_frequency,
+                                                               notification_context, now))
+            db.session.commit()
+            recipients_count += len(chunk)
+        
+        if not recipients_count:
             logger.warning(f"⚠️ Could not resolve target users for: {target}")
             return {'status': 'warning', 'message': f'Could not resolve target: {target}'}
         
-        notification_service = NotificationService()
-        sent_notifications = []
-        
-        # Send notification to all resolved recipients
-        for user_id in recipients:
-            try:
-                # Create notification based on event type and template
-                event_type = _map_template_to_event_type(template)
-                notification_context = _build_notification_context(context)
-                
-                # Send notification
-                result = notification_service.create_notification(
-                    user_id=user_id,
-                    event_type=event_type,
-                    context=notification_context
-                )
-                
-                sent_notifications.append({
-                    'user_id': user_id,
-                    'notification_id': result.get('notification_id'),
-                    'status': 'sent'
-                })
-                
-            except Exception as e:
-                logger.error(f"❌ Failed to send notification to user {user_id}: {e}")
-                sent_notifications.append({
-                    'user_id': user_id,
-                    'status': 'failed',
-                    'error': str(e)
-                })
-        
-        logger.info(f"✅ Notifications processed for {len(sent_notifications)} recipients")
+        logger.info(f"✅ Notifications processed for {recipients_count} recipients")
         return {
             'status': 'success',
-            'recipients_count': len(recipients),
-            'notifications': sent_notifications
+            'recipients_count': recipients_count,
+            'notifications_created': notifications_created,
+            'emails_queued': emails_queued
         }
         
     except Exception as e:
         logger.error(f"❌ Failed to send notification: {e}")
+        try:
+            from models import db
+            db.session.rollback()
+        except Exception:
+            pass
         return {'status': 'error', 'message': str(e)}
 
 def create_task(step: dict, context: WorkflowContext) -> dict:
@@ -235,21 +267,25 @@ def create_business_case(step: dict, context: WorkflowContext) -> dict:
             return {'status': 'warning', 'message': 'No problem data available'}
         
         # Import here to avoid circular imports
-        from models import BusinessCase, db
-        from business.utils import generate_case_code
+        from models import BusinessCase, Problem, CaseTypeEnum, StatusEnum, db
+        
+        problem = db.session.get(Problem, problem_data.get('id')) if problem_data.get('id') else None
+        if not problem:
+            logger.warning("⚠️ Problem not found for business case creation")
+            return {'status': 'warning', 'message': 'Problem not found'}
         
-        # Create business case
+        # Create business case (its C code is allocated from code_sequences on insert)
         case = BusinessCase(
-            code=generate_case_code(),
-            title=f"Business Case for Problem: {problem_data.get('title', 'Unknown')}",
-            summary=f"Automatically generated from problem: {problem_data.get('description', '')}",
-            problem_id=problem_data.get('id'),
-            created_by=context.get_user_id(),
-            dept_id=context.get_department_id(),
-            case_type='Reactive',
-            status='Draft',
-            estimated_cost=problem_data.get('estimated_cost', 0),
-            priority=problem_data.get('priority', 'Medium')
+            title=f"Business Case for Problem: {problem.title}"[:200],
+            description=f"Automatically generated from problem: {problem.description}",
+            problem_id=problem.id,
+            created_by=context.get_user_id() or problem.created_by,
+            dept_id=context.get_department_id() or problem.department_id,
+            organization_id=problem.organization_id,
+            case_type=CaseTypeEnum.Reactive,
+            status=StatusEnum.Open,
+            cost_estimate=float(problem_data.get('estimated_cost') or 0),
+            benefit_estimate=0.0
         )
         
         db.session.add(case)
@@ -407,15 +443,8 @@ def _resolve_recipients(target: str, context: WorkflowContext) -> list:
             
             recipients = list(stakeholders)
         
-        elif target == 'all_employees':
-            # Get all active users
-            all_users = User.query.filter_by(is_active=True).all()
-            recipients = [user.id for user in all_users]
-        
-        elif target == 'executives':
-            # Get CEO and Directors
-            executives = User.query.filter(User.role.in_(['CEO', 'Director'])).all()
-            recipients = [exec.id for exec in executives]
+        elif target in ('all_employees', 'executives'):
+            recipients = [user_id for user_id, _ in _recipient_query(target, context)]
         
         return recipients
         
@@ -423,6 +452,41 @@ def _resolve_recipients(target: str, context: WorkflowContext) -> list:
         logger.error(f"❌ Error resolving recipients for {target}: {e}")
         return []
 
+def _recipient_query(target: str, context: WorkflowContext):
+    """
+    Id-only query of (user id, organization id) for organization-wide targets, None for other targets
+
+    Scoped to the workflow template's organization when it has one.
+    """
+    from models import User, UserRoleEnum, db
+    
+    query = db.session.query(User.id, User.organization_id)
+    if target == 'all_employees':
+        # User.is_active is the Flask-Login method, not a mapped column, so there is no active filter
+        pass
+    elif target == 'executives':
+        query = query.filter(User.role.in_([UserRoleEnum.CEO, UserRoleEnum.Director]))
+    else:
+        return None
+    
+    organization_id = getattr(context.workflow_template, 'organization_id', None)
+    if organization_id:
+        query = query.filter(User.organization_id == organization_id)
+    return query
+
+def _iter_recipient_chunks(query, chunk_size: int = None):
+    """Yield lists of (user id, organization id) from a recipient query, keyset-paginated on users.id"""
+    from models import User
+    
+    chunk_size = chunk_size or NOTIFICATION_CHUNK_SIZE
+    last_id = 0
+    while True:
+        chunk = [tuple(row) for row in query.filter(User.id > last_id).order_by(User.id).limit(chunk_size)]
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1][0]
+
 def _resolve_assignee(assignee_role: str, context: WorkflowContext) -> int:
     """Resolve assignee role to specific user ID"""
     try:
@@ -552,6 +616,30 @@ def _build_notification_context(context: WorkflowContext) -> dict:
     
     return notification_context
 
+def _map_event_name_to_enum(event_name: str):
+    """Notification.event_type for a mapped event name; other workflow events are rule-triggered"""
+    from models import NotificationEventEnum
+    
+    mapping = {
+        'problem_created': NotificationEventEnum.PROBLEM_CREATED,
+        'case_approved': NotificationEventEnum.BUSINESS_CASE_APPROVED,
+        'problem_escalated': NotificationEventEnum.ESCALATION,
+        'milestone_due_soon': NotificationEventEnum.MILESTONE_DUE_SOON
+    }
+    return mapping.get(event_name, NotificationEventEnum.TRIAGE_RULE_TRIGGERED)
+
+def _render_notification_message(event_name: str, notification_context: dict) -> str:
+    """In-app message for a workflow notification"""
+    message = event_name.replace('_', ' ').title()
+    for entity, field in (('problem', 'title'), ('case', 'title'), ('project', 'name'), ('milestone', 'name')):
+        value = (notification_context.get(entity) or {}).get(field)
+        if value:
+            message += f": {value}"
+            break
+    if notification_context.get('workflow_name'):
+        message += f" ({notification_context['workflow_name']})"
+    return message
+
 # Fixed: removed duplicate keys 'notify_manager' and 'assign_user' to ensure unique action mappings
 ACTION_HANDLERS: Dict[str, Callable] = {
     'send_notification': send_notification,
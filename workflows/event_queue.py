@@ -1,145 +1,350 @@
 """
-Asynchronous Event Queue System for Workflow Processing
-Provides background processing for workflow events to improve response times
+Durable Event Queue System for Workflow Processing
+Stores workflow events in the workflow_events table so they survive restarts and
+can be shared by every gunicorn worker. A pool of worker threads claims events in
+batches (SELECT ... FOR UPDATE SKIP LOCKED on PostgreSQL; SQLite serializes writers
+so the same claim statement is safe there), retries failures with exponential
+backoff and moves events that exhaust their retries to workflow_dead_letters.
+
+Run a dedicated consumer with `python -m workflows.event_queue` and set
+WORKFLOW_QUEUE_AUTOSTART=False on web workers to keep dispatch out of the web tier.
+BACKGROUND_SERVICES=false (one-off processes such as ML training) also disables autostart.
 """
 
-import queue
+import os
+import json
+import random
+import socket
 import threading
+import time
+import uuid
 import logging
-from typing import Dict, Any
-from datetime import datetime
+from typing import Dict, Any, List
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, insert, func, or_, and_
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Queue configuration
+WORKER_COUNT = int(os.getenv('WORKFLOW_QUEUE_WORKERS', '2'))
+BATCH_SIZE = int(os.getenv('WORKFLOW_QUEUE_BATCH_SIZE', '10'))
+POLL_INTERVAL = float(os.getenv('WORKFLOW_QUEUE_POLL_INTERVAL', '1.0'))
+MAX_ATTEMPTS = int(os.getenv('WORKFLOW_QUEUE_MAX_ATTEMPTS', '5'))
+RETRY_BASE_SECONDS = float(os.getenv('WORKFLOW_QUEUE_RETRY_BASE', '5'))
+RETRY_MAX_SECONDS = float(os.getenv('WORKFLOW_QUEUE_RETRY_MAX', '3600'))
+VISIBILITY_TIMEOUT = int(os.getenv('WORKFLOW_QUEUE_VISIBILITY_TIMEOUT', '300'))  # Reclaim crashed claims
+DONE_RETENTION_HOURS = int(os.getenv('WORKFLOW_QUEUE_DONE_RETENTION_HOURS', '24'))
+AUTOSTART = (os.getenv('WORKFLOW_QUEUE_AUTOSTART', 'True') == 'True'
+             and os.getenv('BACKGROUND_SERVICES', 'true').lower() == 'true')
+
+STATS_WINDOW_MINUTES = 5
+
+
+def _retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for the given attempt number (1-based)"""
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
 class WorkflowEventQueue:
-    """Thread-safe event queue for background workflow processing"""
-    
-    def __init__(self):
-        self.event_queue = queue.Queue(maxsize=1000)  # Prevent memory issues
-        self.worker_thread = None
+    """Database-backed event queue with a pool of background worker threads"""
+
+    def __init__(self, worker_count: int = WORKER_COUNT, batch_size: int = BATCH_SIZE):
+        self.worker_count = worker_count
+        self.batch_size = batch_size
+        self.worker_threads: List[threading.Thread] = []
         self.running = False
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
         self.processed_count = 0
         self.error_count = 0
-        
+        self.dead_letter_count = 0
+        self._last_purge = 0.0
+
     def start(self):
-        """Start the background worker thread"""
+        """Start the background worker pool"""
         if self.running:
             logger.warning("🔄 Event queue already running")
             return
-            
+        if self.worker_count <= 0:
+            logger.info("⏸️ Workflow event queue workers disabled (WORKFLOW_QUEUE_WORKERS=0)")
+            return
+
         self.running = True
-        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
-        self.worker_thread.start()
-        logger.info("🚀 Workflow event queue started")
-        
+        self._stop_event.clear()
+        self.worker_threads = []
+        for index in range(self.worker_count):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"workflow-queue-{index}",
+                daemon=True
+            )
+            thread.start()
+            self.worker_threads.append(thread)
+        logger.info(f"🚀 Workflow event queue started with {self.worker_count} worker(s)")
+
     def stop(self):
-        """Stop the background worker thread"""
+        """Stop the background worker pool; claimed events finish their current batch"""
         self.running = False
-        if self.worker_thread:
-            self.worker_thread.join(timeout=5.0)
+        self._stop_event.set()
+        for thread in self.worker_threads:
+            thread.join(timeout=5.0)
         logger.info("🛑 Workflow event queue stopped")
-        
+
     def enqueue_event(self, event_name: str, context: Dict[str, Any]) -> bool:
-        """Add an event to the processing queue"""
+        """Persist an event for background processing"""
         try:
-            # Add timestamp for processing metrics
-            event_data = {
-                'name': event_name,
-                'context': context,
-                'timestamp': datetime.utcnow().isoformat(),
-                'retry_count': 0
-            }
-            
-            self.event_queue.put(event_data, block=False)
+            from app import db
+            from models import WorkflowEvent
+
+            # Round-trip through JSON so dates and enums are stored as strings
+            payload = json.loads(json.dumps(context, default=str))
+            now = datetime.utcnow()
+
+            # Separate connection so the caller's session transaction is untouched
+            with db.engine.begin() as conn:
+                conn.execute(insert(WorkflowEvent.__table__).values(
+                    event_name=event_name,
+                    context_data=payload,
+                    status='Pending',
+                    attempts=0,
+                    available_at=now,
+                    created_at=now
+                ))
+
             logger.debug(f"📥 Queued event: {event_name}")
             return True
-            
-        except queue.Full:
-            logger.error(f"❌ Event queue full, dropping event: {event_name}")
-            return False
+
         except Exception as e:
             logger.error(f"❌ Failed to queue event {event_name}: {e}")
             return False
-    
+
     def _worker_loop(self):
-        """Background worker that processes queued events"""
-        logger.info("🔄 Event queue worker started")
-        
+        """Background worker that claims and processes batches of events"""
+        logger.info(f"🔄 Event queue worker started ({threading.current_thread().name})")
+
         while self.running:
             try:
-                # Wait for events with timeout to allow clean shutdown
-                event_data = self.event_queue.get(timeout=1.0)
-                self._process_event(event_data)
-                self.event_queue.task_done()
-                
-            except queue.Empty:
-                continue  # Timeout, check if still running
+                app_context = self._get_app_context()
+                if app_context is None:
+                    # App module still importing; try again shortly
+                    self._stop_event.wait(POLL_INTERVAL)
+                    continue
+
+                with app_context:
+                    batch = self._claim_batch()
+                    for event_data in batch:
+                        self._process_event(event_data)
+                    self._purge_done_events()
+
+                if not batch:
+                    self._stop_event.wait(POLL_INTERVAL)
+
             except Exception as e:
                 logger.error(f"❌ Worker loop error: {e}")
-                
-        logger.info("🔄 Event queue worker stopped")
-    
+                self._stop_event.wait(POLL_INTERVAL)
+
+        logger.info(f"🔄 Event queue worker stopped ({threading.current_thread().name})")
+
+    def _claim_batch(self) -> List[Dict[str, Any]]:
+        """Atomically claim up to batch_size due events for this worker"""
+        from app import db
+        from models import WorkflowEvent
+
+        table = WorkflowEvent.__table__
+        now = datetime.utcnow()
+        claim_token = f"{self.node_id}:{uuid.uuid4().hex[:12]}"
+
+        due = or_(
+            and_(table.c.status == 'Pending', table.c.available_at <= now),
+            # Claims abandoned by a crashed worker become visible again
+            and_(table.c.status == 'Processing',
+                 table.c.locked_at < now - timedelta(seconds=VISIBILITY_TIMEOUT))
+        )
+        candidates = (
+            select(table.c.id)
+            .where(due)
+            .order_by(table.c.available_at, table.c.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)  # Rendered on PostgreSQL, ignored on SQLite
+        )
+
+        with db.engine.begin() as conn:
+            ids = [row[0] for row in conn.execute(candidates)]
+            if not ids:
+                return []
+            conn.execute(
+                update(table)
+                .where(table.c.id.in_(ids), due)
+                .values(status='Processing', locked_by=claim_token, locked_at=now,
+                        attempts=table.c.attempts + 1)
+            )
+            rows = conn.execute(
+                select(table.c.id, table.c.event_name, table.c.context_data,
+                       table.c.attempts, table.c.created_at)
+                .where(table.c.locked_by == claim_token)
+                .order_by(table.c.id)
+            ).mappings().all()
+
+        return [dict(row, claim_token=claim_token) for row in rows]
+
     def _process_event(self, event_data: Dict[str, Any]):
-        """Process a single workflow event"""
+        """Process a single claimed workflow event"""
+        from app import db
+        from models import WorkflowEvent
+
+        table = WorkflowEvent.__table__
+        event_name = event_data.get('event_name', 'unknown')
+
         try:
-            # Import inside Flask app context to avoid circular imports
-            with self._get_app_context():
-                from workflows.processor import dispatch_event
-                
-                event_name = event_data['name']
-                context = event_data['context']
-                
-                logger.info(f"🔄 Processing event: {event_name}")
-                dispatch_event(event_name, context)
-                
+            from workflows.processor import dispatch_event
+
+            logger.info(f"🔄 Processing event: {event_name}")
+            dispatch_event(event_name, event_data.get('context_data') or {})
+
+            with db.engine.begin() as conn:
+                conn.execute(
+                    update(table)
+                    .where(table.c.id == event_data['id'], table.c.locked_by == event_data['claim_token'])
+                    .values(status='Done', processed_at=datetime.utcnow(), locked_by=None, last_error=None)
+                )
+
+            with self._stats_lock:
                 self.processed_count += 1
-                logger.debug(f"✅ Event processed: {event_name}")
-            
+            logger.debug(f"✅ Event processed: {event_name}")
+
         except Exception as e:
-            self.error_count += 1
-            event_name = event_data.get('name', 'unknown')
+            with self._stats_lock:
+                self.error_count += 1
             logger.error(f"❌ Failed to process event {event_name}: {e}")
-            
-            # Implement retry logic
-            retry_count = event_data.get('retry_count', 0)
-            if retry_count < 3:  # Max 3 retries
-                event_data['retry_count'] = retry_count + 1
-                logger.info(f"🔄 Retrying event {event_name} (attempt {retry_count + 1})")
-                try:
-                    self.event_queue.put(event_data, block=False)
-                except queue.Full:
-                    logger.error(f"❌ Queue full, cannot retry event {event_name}")
-    
+            self._handle_failure(event_data, e)
+        finally:
+            db.session.remove()
+
+    def _handle_failure(self, event_data: Dict[str, Any], error: Exception):
+        """Schedule a backoff retry or move the event to the dead-letter table"""
+        from app import db
+        from models import WorkflowEvent, WorkflowDeadLetter
+
+        table = WorkflowEvent.__table__
+        attempts = event_data.get('attempts', 1)
+        event_name = event_data.get('event_name', 'unknown')
+        claimed = and_(table.c.id == event_data['id'], table.c.locked_by == event_data['claim_token'])
+
+        try:
+            with db.engine.begin() as conn:
+                if attempts >= MAX_ATTEMPTS:
+                    conn.execute(insert(WorkflowDeadLetter.__table__).values(
+                        event_id=event_data['id'],
+                        event_name=event_name,
+                        context_data=event_data.get('context_data'),
+                        attempts=attempts,
+                        last_error=str(error),
+                        enqueued_at=event_data.get('created_at'),
+                        failed_at=datetime.utcnow()
+                    ))
+                    conn.execute(delete(table).where(claimed))
+                    with self._stats_lock:
+                        self.dead_letter_count += 1
+                    logger.error(f"☠️ Event {event_name} moved to dead-letter queue after {attempts} attempts")
+                else:
+                    delay = _retry_delay(attempts)
+                    conn.execute(
+                        update(table)
+                        .where(claimed)
+                        .values(status='Pending', locked_by=None, locked_at=None, last_error=str(error),
+                                available_at=datetime.utcnow() + timedelta(seconds=delay))
+                    )
+                    logger.info(f"🔄 Retrying event {event_name} in {delay:.0f}s (attempt {attempts + 1})")
+        except Exception as e:
+            # The claim times out after VISIBILITY_TIMEOUT and the event is retried then
+            logger.error(f"❌ Failed to record failure for event {event_name}: {e}")
+
+    def _purge_done_events(self):
+        """Delete processed events older than the retention window (at most every 10 minutes)"""
+        if time.monotonic() - self._last_purge < 600:
+            return
+        self._last_purge = time.monotonic()
+
+        from app import db
+        from models import WorkflowEvent
+
+        table = WorkflowEvent.__table__
+        cutoff = datetime.utcnow() - timedelta(hours=DONE_RETENTION_HOURS)
+        with db.engine.begin() as conn:
+            conn.execute(delete(table).where(table.c.status == 'Done', table.c.processed_at < cutoff))
+
     def _get_app_context(self):
         """Get Flask application context for database operations"""
         try:
             from flask import current_app
             return current_app.app_context()
         except RuntimeError:
-            # No app context available, create one
+            # No app context available in worker threads, use the global app
             try:
                 from app import app
                 return app.app_context()
             except Exception as e:
-                import logging
-                logging.getLogger(__name__).warning(f"Failed to get app context: {e}")
-                # Fallback - create a mock context that does nothing
-                class MockContext:
-                    def __enter__(self): return self
-                    def __exit__(self, *args): pass
-                return MockContext()
-    
+                logger.debug(f"Failed to get app context: {e}")
+                return None
+
     def get_stats(self) -> Dict[str, Any]:
-        """Get queue processing statistics"""
-        return {
-            'running': self.running,
-            'queue_size': self.event_queue.qsize(),
-            'processed_count': self.processed_count,
-            'error_count': self.error_count,
-            'worker_alive': self.worker_thread.is_alive() if self.worker_thread else False
-        }
+        """Get queue processing statistics (database-wide depth, throughput and lag)"""
+        with self._stats_lock:
+            stats = {
+                'running': self.running,
+                'node_id': self.node_id,
+                'workers': self.worker_count,
+                'workers_alive': sum(1 for t in self.worker_threads if t.is_alive()),
+                'worker_alive': any(t.is_alive() for t in self.worker_threads),
+                'batch_size': self.batch_size,
+                'processed_count': self.processed_count,
+                'error_count': self.error_count,
+                'dead_letter_count': self.dead_letter_count,
+            }
+
+        try:
+            from app import db
+            from models import WorkflowEvent, WorkflowDeadLetter
+
+            table = WorkflowEvent.__table__
+            now = datetime.utcnow()
+            window_start = now - timedelta(minutes=STATS_WINDOW_MINUTES)
+
+            with db.engine.connect() as conn:
+                by_status = dict(conn.execute(
+                    select(table.c.status, func.count()).group_by(table.c.status)
+                ).all())
+                oldest_pending = conn.execute(
+                    select(func.min(table.c.created_at)).where(table.c.status == 'Pending')
+                ).scalar()
+                recent = conn.execute(
+                    select(table.c.created_at, table.c.processed_at)
+                    .where(table.c.status == 'Done', table.c.processed_at >= window_start)
+                ).all()
+                dead_letters = conn.execute(
+                    select(func.count()).select_from(WorkflowDeadLetter.__table__)
+                ).scalar()
+
+            latencies = [(done - created).total_seconds() for created, done in recent if created and done]
+            stats.update({
+                'queue_size': by_status.get('Pending', 0) + by_status.get('Processing', 0),
+                'pending': by_status.get('Pending', 0),
+                'processing': by_status.get('Processing', 0),
+                'done_retained': by_status.get('Done', 0),
+                'dead_letters': dead_letters or 0,
+                'throughput_per_minute': round(len(recent) / STATS_WINDOW_MINUTES, 2),
+                'lag_seconds': round((now - oldest_pending).total_seconds(), 1) if oldest_pending else 0,
+                'avg_latency_seconds': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            })
+        except Exception as e:
+            logger.error(f"❌ Failed to read queue statistics: {e}")
+            stats.update({'queue_size': None, 'stats_error': str(e)})
+
+        return stats
 
 # Global event queue instance
 _event_queue = WorkflowEventQueue()
@@ -160,5 +365,18 @@ def get_queue_stats() -> Dict[str, Any]:
     """Get event queue statistics"""
     return _event_queue.get_stats()
 
-# Auto-start the queue when module is imported
-start_event_queue()
\ No newline at end of file
+# Auto-start the worker pool when module is imported (disable for web-only workers)
+if AUTOSTART and __name__ != '__main__':
+    start_event_queue()
+
+
+if __name__ == '__main__':
+    # Dedicated consumer process: python -m workflows.event_queue
+    # Import the module by name so the web app and this process share one queue instance
+    from workflows import event_queue as consumer
+    consumer.start_event_queue()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        consumer.stop_event_queue()
@@ -5,10 +5,9 @@ Workflow Processor - Execute admin-defined WorkflowTemplates on incoming events
 import logging
 from typing import Dict, Any, List
 from datetime import datetime
-from sqlalchemy import text
-from models import WorkflowTemplate
 from workflows.actions import ACTION_HANDLERS
 from workflows.context import WorkflowContext
+from workflows.trigger_index import CompiledWorkflow, trigger_index
 
 logger = logging.getLogger(__name__)
 
@@ -60,75 +59,15 @@ class WorkflowProcessor:
         
         return execution_results
     
-    def _get_matching_templates(self, event_name: str) -> List[WorkflowTemplate]:
+    def _get_matching_templates(self, event_name: str) -> List[CompiledWorkflow]:
         """Find active workflow templates that match the given event trigger"""
         try:
-            # Method 1: Try PostgreSQL JSON ? operator for exact array membership
-            try:
-                templates = WorkflowTemplate.query.filter(
-                    WorkflowTemplate.is_active.is_(True),
-                    text("definition->'triggers' ? :event_name")
-                ).params(event_name=event_name).all()
-                
-                if templates:
-                    return templates
-            except Exception:
-                pass
-            
-            # Method 2: Try JSONB @> operator for containment
-            try:
-                templates = WorkflowTemplate.query.filter(
-                    WorkflowTemplate.is_active.is_(True),
-                    text("definition->'triggers' @> :event_array")
-                ).params(event_array=f'["{event_name}"]').all()
-                
-                if templates:
-                    return templates
-            except Exception:
-                pass
-            
-            # Method 3: Try text-based search using CAST
-            try:
-                templates = WorkflowTemplate.query.filter(
-                    WorkflowTemplate.is_active.is_(True),
-                    text("CAST(definition->'triggers' AS TEXT) LIKE :pattern")
-                ).params(pattern=f'%"{event_name}"%').all()
-                
-                if templates:
-                    return templates
-            except Exception:
-                pass
-            
-            # Method 4: SQLAlchemy JSON column text search
-            try:
-                templates = WorkflowTemplate.query.filter(
-                    WorkflowTemplate.is_active.is_(True),
-                    WorkflowTemplate.definition['triggers'].astext.contains(f'"{event_name}"')
-                ).all()
-                
-                if templates:
-                    return templates
-            except Exception:
-                pass
-            
-            # Final fallback: Python filtering
-            all_templates = WorkflowTemplate.query.filter(
-                WorkflowTemplate.is_active.is_(True)
-            ).all()
-            
-            matching_templates = []
-            for template in all_templates:
-                triggers = template.definition.get('triggers', [])
-                if event_name in triggers:
-                    matching_templates.append(template)
-            
-            return matching_templates
-            
+            return trigger_index.get(event_name)
         except Exception as e:
             self.logger.error(f"❌ Error querying workflow templates: {e}")
             return []
     
-    def _execute_workflow(self, template: WorkflowTemplate, event_name: str, context: dict) -> Dict[str, Any]:
+    def _execute_workflow(self, template: CompiledWorkflow, event_name: str, context: dict) -> Dict[str, Any]:
         """Execute a single workflow template"""
         self.logger.info(f"⚡ Executing workflow: {template.name}")
         
@@ -306,6 +245,6 @@ def dispatch_event(event_name: str, context: dict) -> List[Dict[str, Any]]:
     """
     return workflow_processor.dispatch_event(event_name, context)
 
-def get_active_workflows_for_event(event_name: str) -> List[WorkflowTemplate]:
+def get_active_workflows_for_event(event_name: str) -> List[CompiledWorkflow]:
     """Get list of active workflows that would be triggered by an event"""
     return workflow_processor._get_matching_templates(event_name)
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""
+Workflow Trigger Index - Per-process map from event name to compiled workflow templates
+
+Replaces the chain of JSON/text queries in WorkflowProcessor._get_matching_templates
+with a single dict lookup. The index is built once from every active
+WorkflowTemplate.definition['triggers'] and dropped when an ORM insert, update
+or delete of a template commits. Because other worker processes cannot see
+those ORM events, the index is also rebuilt after max_age seconds.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from models import WorkflowTemplate
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how stale another worker's index can get after a template change
+DEFAULT_MAX_AGE = float(os.getenv('WORKFLOW_TRIGGER_INDEX_MAX_AGE', '60'))
+
+
+class CompiledWorkflow:
+    """
+    Detached, read-only snapshot of an active WorkflowTemplate
+
+    Exposes the same id/name/definition attributes WorkflowContext and the
+    processor read from WorkflowTemplate, so it can be executed without the
+    ORM instance (which would be bound to whichever session built the index).
+    """
+
+    __slots__ = ('id', 'name', 'organization_id', 'definition', 'triggers', 'steps')
+
+    def __init__(self, template_id: int, name: str, organization_id: Optional[int], definition: dict):
+        self.id = template_id
+        self.name = name
+        self.organization_id = organization_id
+        self.definition = definition or {}
+        triggers = self.definition.get('triggers', []) if isinstance(self.definition, dict) else []
+        self.triggers = tuple(t for t in triggers if isinstance(t, str)) if isinstance(triggers, list) else ()
+        self.steps = self.definition.get('steps', []) if isinstance(self.definition, dict) else []
+
+    def __repr__(self):
+        return f'<CompiledWorkflow {self.id}: {self.name}>'
+
+
+class WorkflowTriggerIndex:
+    """Thread-safe, lazily built event name -> [CompiledWorkflow] index"""
+
+    def __init__(self, max_age: float = DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        self._index: Optional[Dict[str, List[CompiledWorkflow]]] = None
+        self._built_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.build_count = 0
+        self.last_build_ms = 0.0
+
+    def get(self, event_name: str) -> List[CompiledWorkflow]:
+        """Return compiled workflows triggered by event_name, building the index if needed"""
+        index = self._index
+        if index is None or (self.max_age and time.monotonic() - self._built_at > self.max_age):
+            index = self._build()
+        return index.get(event_name, [])
+
+    def invalidate(self) -> None:
+        """Drop the index so the next lookup rebuilds it from the database"""
+        with self._lock:
+            self._index = None
+            self._generation += 1
+
+    def _build(self) -> Dict[str, List[CompiledWorkflow]]:
+        with self._lock:
+            # Another thread may have rebuilt while we waited for the lock
+            if self._index is not None and not (
+                self.max_age and time.monotonic() - self._built_at > self.max_age
+            ):
+                return self._index
+            generation = self._generation
+
+        started = time.perf_counter()
+        rows = WorkflowTemplate.query.with_entities(
+            WorkflowTemplate.id,
+            WorkflowTemplate.name,
+            WorkflowTemplate.organization_id,
+            WorkflowTemplate.definition
+        ).filter(WorkflowTemplate.is_active.is_(True)).order_by(WorkflowTemplate.id).all()
+
+        index: Dict[str, List[CompiledWorkflow]] = {}
+        for template_id, name, organization_id, definition in rows:
+            compiled = CompiledWorkflow(template_id, name, organization_id, definition)
+            for trigger in dict.fromkeys(compiled.triggers):
+                index.setdefault(trigger, []).append(compiled)
+
+        with self._lock:
+            # Only publish if no invalidation happened while we were querying
+            if generation == self._generation:
+                self._index = index
+                self._built_at = time.monotonic()
+            self.build_count += 1
+            self.last_build_ms = (time.perf_counter() - started) * 1000
+
+        logger.info(f"📇 Workflow trigger index built: {len(rows)} templates, {len(index)} events")
+        return index
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics for monitoring"""
+        index = self._index
+        return {
+            'built': index is not None,
+            'events': len(index) if index is not None else 0,
+            'templates': len({w.id for ws in index.values() for w in ws}) if index is not None else 0,
+            'age_seconds': round(time.monotonic() - self._built_at, 1) if index is not None else None,
+            'max_age_seconds': self.max_age,
+            'build_count': self.build_count,
+            'last_build_ms': round(self.last_build_ms, 2)
+        }
+
+
+# Global per-process index
+trigger_index = WorkflowTriggerIndex()
+
+
+def invalidate_trigger_index() -> None:
+    """Drop the workflow trigger index (e.g. after raw SQL writes to workflow_templates)"""
+    trigger_index.invalidate()
+
+
+def get_trigger_index_stats() -> Dict[str, Any]:
+    """Get workflow trigger index statistics"""
+    return trigger_index.get_stats()
+
+
+_PENDING_KEY = 'workflow_trigger_index_dirty'
+
+
+def _invalidate_for(mapper, connection, target):
+    # Drop the index only once the change is committed: a rebuild by another thread before then
+    # would read the old rows and keep them until max_age
+    session = object_session(target)
+    if session is None:
+        trigger_index.invalidate()
+        return
+    session.info[_PENDING_KEY] = True
+
+
+def _after_commit(session):
+    if session.info.pop(_PENDING_KEY, False):
+        trigger_index.invalidate()
+
+
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    if not event.contains(WorkflowTemplate, _event_name, _invalidate_for):
+        event.listen(WorkflowTemplate, _event_name, _invalidate_for)
+
+if not event.contains(Session, 'after_commit', _after_commit):
+    event.listen(Session, 'after_commit', _after_commit)
+if not event.contains(Session, 'after_rollback', _after_rollback):
+    event.listen(Session, 'after_rollback', _after_rollback)